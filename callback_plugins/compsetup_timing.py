@@ -0,0 +1,134 @@
+"""Ansible callback that records wall-clock timing events for CompSetup runs.
+
+Events (task start, loop item, task end) are written as JSON once the
+playbook finishes; aggregation and reporting live in
+scripts/timing_report.py so they can be run against recorded event files
+without Ansible.
+
+    python3 scripts/timing_report.py summarize --top 15
+    python3 scripts/timing_report.py compare
+"""
+
+DOCUMENTATION = """
+    name: compsetup_timing
+    type: aggregate
+    short_description: Record per-role, per-task and per-loop-item wall time
+    description:
+      - Writes one JSON file per playbook run containing task start,
+        loop item and task end events with timestamps.
+      - Summarize or compare runs with C(scripts/timing_report.py).
+    requirements:
+      - Enabled via C(callbacks_enabled) in ansible.cfg
+    options:
+      output_dir:
+        description: Directory that receives run-<timestamp>.json and latest.json.
+        default: ~/.local/state/compsetup/timing
+        env:
+          - name: COMPSETUP_TIMING_DIR
+        ini:
+          - section: callback_compsetup_timing
+            key: output_dir
+"""
+
+import json
+import os
+import tempfile
+import time
+
+from ansible.plugins.callback import CallbackBase
+
+EVENT_FORMAT_VERSION = 1
+
+
+def _label(result):
+    """Return a short, JSON-safe label for a loop item result."""
+    res = result._result
+    label = res.get("_ansible_item_label", res.get("item"))
+    if isinstance(label, dict):
+        label = label.get("name") or label.get("id") or json.dumps(label, sort_keys=True, default=str)
+    label = str(label)
+    return label if len(label) <= 120 else label[:117] + "..."
+
+
+class CallbackModule(CallbackBase):
+    CALLBACK_VERSION = 2.0
+    CALLBACK_TYPE = "aggregate"
+    CALLBACK_NAME = "compsetup_timing"
+    CALLBACK_NEEDS_ENABLED = True
+
+    def __init__(self, display=None):
+        super().__init__(display=display)
+        self.output_dir = None
+        self.run = {"version": EVENT_FORMAT_VERSION, "playbook": None,
+                    "started": time.time(), "finished": None, "events": []}
+
+    def set_options(self, task_keys=None, var_options=None, direct=None):
+        super().set_options(task_keys=task_keys, var_options=var_options, direct=direct)
+        self.output_dir = os.path.expanduser(self.get_option("output_dir"))
+
+    def _event(self, kind, **fields):
+        fields["type"] = kind
+        fields["ts"] = time.time()
+        self.run["events"].append(fields)
+
+    # -- playbook and task boundaries ---------------------------------------
+
+    def v2_playbook_on_start(self, playbook):
+        self.run["playbook"] = os.path.basename(playbook._file_name)
+
+    def v2_playbook_on_task_start(self, task, is_conditional):
+        self._event("task_start", uuid=task._uuid, task=task.get_name(),
+                    role=task._role.get_name() if task._role else None,
+                    action=task.action)
+
+    def v2_playbook_on_handler_task_start(self, task):
+        self.v2_playbook_on_task_start(task, False)
+
+    def _task_end(self, result, status):
+        self._event("task_end", uuid=result._task._uuid, host=result._host.get_name(), status=status)
+
+    def v2_runner_on_ok(self, result):
+        self._task_end(result, "changed" if result._result.get("changed") else "ok")
+
+    def v2_runner_on_failed(self, result, ignore_errors=False):
+        self._task_end(result, "ignored" if ignore_errors else "failed")
+
+    def v2_runner_on_skipped(self, result):
+        self._task_end(result, "skipped")
+
+    def v2_runner_on_unreachable(self, result):
+        self._task_end(result, "unreachable")
+
+    # -- loop items -----------------------------------------------------------
+
+    def _item(self, result, status):
+        self._event("item", uuid=result._task._uuid, host=result._host.get_name(),
+                    item=_label(result), status=status)
+
+    def v2_runner_item_on_ok(self, result):
+        self._item(result, "changed" if result._result.get("changed") else "ok")
+
+    def v2_runner_item_on_failed(self, result):
+        self._item(result, "failed")
+
+    def v2_runner_item_on_skipped(self, result):
+        self._item(result, "skipped")
+
+    # -- write-out ------------------------------------------------------------
+
+    def v2_playbook_on_stats(self, stats):
+        self.run["finished"] = time.time()
+        stamp = time.strftime("%Y%m%dT%H%M%S", time.localtime(self.run["started"]))
+        payload = json.dumps(self.run, indent=1)
+        try:
+            os.makedirs(self.output_dir, exist_ok=True)
+            for name in (f"run-{stamp}.json", "latest.json"):
+                fd, tmp = tempfile.mkstemp(dir=self.output_dir, prefix=".tmp-")
+                with os.fdopen(fd, "w") as fh:
+                    fh.write(payload)
+                os.replace(tmp, os.path.join(self.output_dir, name))
+        except OSError as exc:
+            self._display.warning(f"compsetup_timing: could not write timing file: {exc}")
+            return
+        path = os.path.join(self.output_dir, f"run-{stamp}.json")
+        self._display.display(f"Timing data written to {path} (summarize with scripts/timing_report.py)")
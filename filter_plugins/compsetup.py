@@ -0,0 +1,41 @@
+"""Ansible filters backed by scripts/manifest_resolver.py.
+
+site.yml and scripts/package_selector.py resolve packages.yml through the
+same module, so the playbook and the selector cannot drift apart.
+
+    package_manifest | compsetup_filter_manifest(omit=..., skip_ai_tools=..., arch=...)
+    (playbook_dir ~ '/packages.yml') | compsetup_targets(distribution=..., desktops=..., ...)
+    playbook_dir | compsetup_role_fingerprints(inputs_by_role, common)   # scripts/role_state.py
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "scripts"))
+
+import manifest_resolver  # noqa: E402
+import role_state  # noqa: E402
+
+
+def compsetup_filter_manifest(manifest, omit=None, skip_ai_tools=False, arch=None):
+    return manifest_resolver.filter_manifest(manifest, omit, skip_ai_tools, arch)
+
+
+def compsetup_targets(path, distribution="", desktops=None, arch=None, omit=None,
+                      skip_ai_tools=False, cache_dir=manifest_resolver.DEFAULT_CACHE_DIR):
+    compiled = manifest_resolver.load_compiled(path, cache_dir)
+    return manifest_resolver.select_targets(compiled, distribution, desktops or (), arch,
+                                            omit, skip_ai_tools)
+
+
+def compsetup_role_fingerprints(repo_dir, inputs_by_role, common=None):
+    return role_state.fingerprints(repo_dir, inputs_by_role, common)
+
+
+class FilterModule(object):
+    def filters(self):
+        return {
+            "compsetup_filter_manifest": compsetup_filter_manifest,
+            "compsetup_targets": compsetup_targets,
+            "compsetup_role_fingerprints": compsetup_role_fingerprints,
+        }
@@ -22,6 +22,9 @@ INSTALL_FIX_AUDIO=false
 INSTALL_KONSOLE_TABS=false
 SKIP_VSCODE=false
 OMIT_LIST=""
+VERIFY_FULL=false
+PARALLEL_ROLES=false
+NVIM_BUNDLE=false
 
 while [[ $# -gt 0 ]]; do
   case "$1" in
@@ -65,6 +68,18 @@ while [[ $# -gt 0 ]]; do
       OMIT_LIST="$2"
       shift 2
       ;;
+    --verify-full)
+      VERIFY_FULL=true
+      shift
+      ;;
+    --parallel-roles)
+      PARALLEL_ROLES=true
+      shift
+      ;;
+    --nvim-bundle)
+      NVIM_BUNDLE=true
+      shift
+      ;;
     *)
       shift
       ;;
@@ -179,11 +194,18 @@ cat <<EOF > "$VARS_FILE"
   "install_fix_audio": ${INSTALL_FIX_AUDIO},
   "install_konsole_tabs": ${INSTALL_KONSOLE_TABS},
   "skip_vscode_extensions": ${SKIP_VSCODE},
-  "omit_list_str": "${OMIT_LIST}"
+  "omit_list_str": "${OMIT_LIST}",
+  "compsetup_verify_full": ${VERIFY_FULL},
+  "compsetup_nvim_bundle": ${NVIM_BUNDLE}
 }
 EOF
 
-log_and_run env ANSIBLE_FORCE_COLOR=1 ansible-playbook "$PLAYBOOK" --extra-vars @"$VARS_FILE" && ansible_exit=0 || ansible_exit=$?
+if [[ "$PARALLEL_ROLES" == "true" ]]; then
+  # Independent roles as parallel playbook runs (roles/*/meta/schedule.yml)
+  log_and_run python3 scripts/role_graph.py run -- --extra-vars @"$VARS_FILE" && ansible_exit=0 || ansible_exit=$?
+else
+  log_and_run env ANSIBLE_FORCE_COLOR=1 ansible-playbook "$PLAYBOOK" --extra-vars @"$VARS_FILE" && ansible_exit=0 || ansible_exit=$?
+fi
 
 rm -f "$VARS_FILE"
 
@@ -197,6 +219,8 @@ fi
 
 echo -e "${GREEN}Playbook completed successfully.${NC}" | tee -a "$LOGFILE"
 
+python3 "$SCRIPT_DIR/scripts/timing_report.py" summarize --top 10 2>/dev/null | tee -a "$LOGFILE" || true
+
 if [ ! -f "$HOME/.p10k.zsh" ]; then
   echo "" | tee -a "$LOGFILE"
   echo -e "${YELLOW}━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━${NC}" | tee -a "$LOGFILE"
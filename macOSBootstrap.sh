@@ -17,6 +17,9 @@ DAVINCI_EDITION=""
 INSTALL_SYNERGY=false
 SKIP_VSCODE=false
 OMIT_LIST=""
+VERIFY_FULL=false
+PARALLEL_ROLES=false
+NVIM_BUNDLE=false
 
 while [[ $# -gt 0 ]]; do
   case "$1" in
@@ -44,6 +47,18 @@ while [[ $# -gt 0 ]]; do
       OMIT_LIST="$2"
       shift 2
       ;;
+    --verify-full)
+      VERIFY_FULL=true
+      shift
+      ;;
+    --parallel-roles)
+      PARALLEL_ROLES=true
+      shift
+      ;;
+    --nvim-bundle)
+      NVIM_BUNDLE=true
+      shift
+      ;;
     *)
       shift
       ;;
@@ -203,11 +218,18 @@ if [[ -f "$PLAYBOOK" ]]; then
   fi
 VARS_FILE=$(mktemp -t ansible-vars.XXXXXX)
   chmod 600 "$VARS_FILE"
-printf '{"install_vscode_extensions": %s, "ansible_become_password": "%s", "skip_ai_tools": %s, "install_davinci": %s, "davinci_edition": "%s", "install_synergy": %s, "omit_list_str": "%s"}\n' "$VSCODE_FLAG" "$ANSIBLE_BECOME_PASSWORD" "$SKIP_AI_TOOLS" "$INSTALL_DAVINCI" "$DAVINCI_EDITION" "$INSTALL_SYNERGY" "$OMIT_LIST" > "$VARS_FILE"
-log_and_run "ansible-playbook $PLAYBOOK --extra-vars @\"$VARS_FILE\""
+printf '{"install_vscode_extensions": %s, "ansible_become_password": "%s", "skip_ai_tools": %s, "install_davinci": %s, "davinci_edition": "%s", "install_synergy": %s, "omit_list_str": "%s", "compsetup_verify_full": %s, "compsetup_nvim_bundle": %s}\n' "$VSCODE_FLAG" "$ANSIBLE_BECOME_PASSWORD" "$SKIP_AI_TOOLS" "$INSTALL_DAVINCI" "$DAVINCI_EDITION" "$INSTALL_SYNERGY" "$OMIT_LIST" "$VERIFY_FULL" "$NVIM_BUNDLE" > "$VARS_FILE"
+if [[ "$PARALLEL_ROLES" == "true" ]]; then
+  # Independent roles as parallel playbook runs (roles/*/meta/schedule.yml)
+  log_and_run "python3 scripts/role_graph.py run -- --extra-vars @\"$VARS_FILE\""
+else
+  log_and_run "ansible-playbook $PLAYBOOK --extra-vars @\"$VARS_FILE\""
+fi
   rm -f "$VARS_FILE" 2>/dev/null || true
   echo -e "${GREEN}Playbook completed successfully.${NC}" | tee -a "$LOGFILE"
 
+  python3 scripts/timing_report.py summarize --top 10 2>/dev/null | tee -a "$LOGFILE" || true
+
   if [ ! -f "$HOME/.p10k.zsh" ]; then
     echo "" | tee -a "$LOGFILE"
     echo -e "${YELLOW}━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━${NC}" | tee -a "$LOGFILE"
@@ -0,0 +1,413 @@
+#!/usr/bin/env python3
+"""Incremental upgrade history and changelog cache for apt-upgrade-report.
+
+Reads ``/var/log/apt/history.log*`` (including rotated ``.gz`` files) as a
+stream of ``Start-Date`` ... ``End-Date`` entries. Every entry that was
+read is kept in an on-disk index, so a daily run only reads what apt
+appended since the last one:
+
+    <cache>/index.json
+        {"index_version",
+         "files": {"<dev>:<ino>": {"name", "size", "mtime_ns", "head", "offset"}},
+         "entries": {id: {"start", "command", "upgrades": [[pkg, old, new]]}}}
+    <cache>/changelogs/<package>/<version>.txt   - changelog excerpt
+
+The plain log is resumed from the byte offset after its last complete
+entry. That includes ``history.log.1``, which keeps the inode when it is
+rotated. A compressed file is read once and skipped while its inode, size
+and mtime are unchanged. Entries are identified by a hash of their
+contents, so re-reading a file that was rotated and compressed adds
+nothing twice.
+
+For every upgraded package, the changelog is fetched once per new
+version with ``apt-get changelog``. The text between the new version and
+the version it replaced is cached as the excerpt.
+
+Output:
+    report -> the text report on stdout (also written to --txt/--md);
+              with --json, a summary instead:
+              {"days", "packages": [{"package", "old", "new", "changelog"}],
+               "index": {...}, "changelogs": {"cached", "fetched", "failed"}}
+    index  -> {"entries", "new_entries", "files_read", "files_skipped"}
+
+Usage:
+    apt_history.py report --days 3 --txt report.txt --md report.md
+    apt_history.py index --log-dir tests/fixtures/apt/history --cache-dir /tmp/upgrades
+    apt_history.py report --log-dir tests/fixtures/apt/history --cache-dir /tmp/upgrades \\
+        --changelog-cmd ./stub-changelog --now 2024-05-03T12:00:00
+
+Exit codes:
+    0 - Report generated (or nothing was upgraded in the window)
+    1 - Invalid arguments or the logs/cache could not be read or written
+"""
+
+import argparse
+import concurrent.futures
+import datetime
+import glob
+import gzip
+import hashlib
+import json
+import os
+import re
+import shlex
+import subprocess
+import sys
+import tempfile
+
+INDEX_VERSION = 1
+DEFAULT_LOG_DIR = "/var/log/apt"
+DEFAULT_KEEP_DAYS = 400
+MAX_EXCERPT_LINES = 200
+PACKAGE_RE = re.compile(r"([^\s,(]+) \(([^)]*)\)")
+HEADER_RE = re.compile(r"^(\S+) \(([^)]+)\) .*;")
+
+# ---------------------------------------------------------------------------
+# Paths and ownership
+# ---------------------------------------------------------------------------
+
+
+def _sudo_owner():
+    """``(uid, gid)`` of the invoking user when running under sudo, else None."""
+    if os.geteuid() == 0 and os.environ.get("SUDO_UID"):
+        return int(os.environ["SUDO_UID"]), int(os.environ.get("SUDO_GID", os.environ["SUDO_UID"]))
+    return None
+
+
+def default_cache_dir():
+    # Same home resolution as the report directory in apt-upgrade-report
+    user = os.environ.get("SUDO_USER") if os.geteuid() == 0 else None
+    home = os.path.expanduser(f"~{user}" if user else "~")
+    return os.path.join(home, ".cache", "compsetup", "upgrades")
+
+
+def _write_json(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+    with os.fdopen(fd, "w") as fh:
+        json.dump(data, fh, separators=(",", ":"))
+    os.replace(tmp, path)
+
+
+def _chown_tree(path, owner):
+    if not owner:
+        return
+    for root, dirs, files in os.walk(path):
+        for name in [root] + [os.path.join(root, n) for n in dirs + files]:
+            try:
+                os.chown(name, *owner)
+            except OSError:
+                pass
+
+
+# ---------------------------------------------------------------------------
+# Log parsing
+# ---------------------------------------------------------------------------
+
+def iter_entries(fh, offset=0):
+    """Yield ``(fields, end_offset)`` for each complete entry in binary *fh*.
+
+    *end_offset* is the position just after the entry. An entry at the end of
+    the file without an ``End-Date`` (apt still running) is not yielded.
+    """
+    pos = offset
+    fields = {}
+    for raw in fh:
+        line_start = pos
+        pos += len(raw)
+        key, sep, value = raw.decode("utf-8", "replace").rstrip("\r\n").partition(": ")
+        if not sep:
+            continue
+        if key == "Start-Date" and fields:
+            yield fields, line_start  # previous entry was cut short
+            fields = {}
+        fields[key] = value.strip()
+        if key == "End-Date":
+            yield fields, pos
+            fields = {}
+
+
+def parse_upgrades(value):
+    """``"a:amd64 (1.0, 1.1), b (2, 3)"`` -> ``[["a", "1.0", "1.1"], ["b", "2", "3"]]``."""
+    upgrades = []
+    for name, versions in PACKAGE_RE.findall(value or ""):
+        old, sep, new = versions.partition(", ")
+        if sep:
+            upgrades.append([name.split(":")[0], old.strip(), new.strip()])
+    return upgrades
+
+
+def entry_record(fields):
+    """Return ``(id, record)`` for an entry with upgrades, else ``(None, None)``."""
+    upgrades = parse_upgrades(fields.get("Upgrade"))
+    if not upgrades or "Start-Date" not in fields:
+        return None, None
+    digest = hashlib.sha256("\n".join(
+        fields.get(k, "") for k in ("Start-Date", "Commandline", "Upgrade")).encode()).hexdigest()[:16]
+    return digest, {"start": " ".join(fields["Start-Date"].split()),
+                    "command": fields.get("Commandline", ""), "upgrades": upgrades}
+
+
+def log_files(log_dir):
+    """history.log* oldest first: history.log.N.gz ... history.log.1, history.log."""
+    def rotation(path):
+        suffix = os.path.basename(path)[len("history.log"):].lstrip(".").split(".")[0]
+        return int(suffix) if suffix.isdigit() else 0
+    return sorted(glob.glob(os.path.join(glob.escape(log_dir), "history.log*")), key=rotation, reverse=True)
+
+
+# ---------------------------------------------------------------------------
+# Index
+# ---------------------------------------------------------------------------
+
+def load_index(cache_dir):
+    try:
+        with open(os.path.join(cache_dir, "index.json"), "r") as fh:
+            index = json.load(fh)
+        if index.get("index_version") == INDEX_VERSION:
+            return index
+    except (OSError, ValueError):
+        pass
+    return {"index_version": INDEX_VERSION, "files": {}, "entries": {}}
+
+
+def _head(path):
+    with open(path, "rb") as fh:
+        return hashlib.sha256(fh.read(64)).hexdigest()[:16]
+
+
+def update_index(index, log_dir, keep_days=DEFAULT_KEEP_DAYS, now=None):
+    """Read what is new in *log_dir* into *index*; return a summary."""
+    summary = {"entries": 0, "new_entries": 0, "files_read": [], "files_skipped": []}
+    files = {}
+    for path in log_files(log_dir):
+        st = os.stat(path)
+        ident = f"{st.st_dev}:{st.st_ino}"
+        known = index["files"].get(ident) or {}
+        compressed = path.endswith(".gz")
+        if compressed:
+            if known.get("size") == st.st_size and known.get("mtime_ns") == st.st_mtime_ns:
+                files[ident] = known
+                summary["files_skipped"].append(path)
+                continue
+            offset, opener = 0, gzip.open
+        else:
+            # A reused inode or a truncated file starts over
+            head = _head(path)
+            same = known.get("head") == head and known.get("size", 0) <= st.st_size
+            offset = known.get("offset", 0) if same else 0
+            if same and offset == st.st_size:
+                files[ident] = dict(known, name=os.path.basename(path))
+                summary["files_skipped"].append(path)
+                continue
+            opener = open
+
+        end = offset
+        with opener(path, "rb") as fh:
+            if offset:
+                fh.seek(offset)
+            for fields, end in iter_entries(fh, offset):
+                ident_entry, record = entry_record(fields)
+                if ident_entry and ident_entry not in index["entries"]:
+                    index["entries"][ident_entry] = record
+                    summary["new_entries"] += 1
+        files[ident] = {"name": os.path.basename(path), "size": st.st_size,
+                        "mtime_ns": st.st_mtime_ns, "head": None if compressed else head,
+                        "offset": st.st_size if compressed else end}
+        summary["files_read"].append(path)
+
+    # Forget files that were rotated away and entries older than any report window
+    index["files"] = files
+    cutoff = ((now or datetime.datetime.now()) - datetime.timedelta(days=keep_days)).strftime("%Y-%m-%d")
+    index["entries"] = {k: v for k, v in index["entries"].items() if v["start"][:10] >= cutoff}
+    summary["entries"] = len(index["entries"])
+    return summary
+
+
+def upgrades_since(index, cutoff):
+    """``{package: [old, new]}`` for upgrades started on or after *cutoff* (YYYY-MM-DD)."""
+    result = {}
+    for record in sorted(index["entries"].values(), key=lambda r: r["start"]):
+        if record["start"][:10] < cutoff:
+            continue
+        for name, old, new in record["upgrades"]:
+            # Several upgrades in the window: earliest old, latest new
+            result[name] = [result[name][0] if name in result else old, new]
+    return dict(sorted(result.items()))
+
+
+# ---------------------------------------------------------------------------
+# Changelogs
+# ---------------------------------------------------------------------------
+
+def excerpt(text, old, new):
+    """The changelog entries after *old*, starting at *new* when it is listed."""
+    lines = text.splitlines()
+    headers = [(i, m.group(2)) for i, m in
+               ((i, HEADER_RE.match(line)) for i, line in enumerate(lines)) if m]
+    start = next((i for i, version in headers if version == new), 0)
+    stop = next((i for i, version in headers if i > start and version == old), len(lines))
+    chunk = lines[start:stop]
+    while chunk and not chunk[-1].strip():
+        chunk.pop()
+    if len(chunk) > MAX_EXCERPT_LINES:
+        chunk = chunk[:MAX_EXCERPT_LINES] + [f"... ({len(chunk) - MAX_EXCERPT_LINES} more lines)"]
+    return "\n".join(chunk)
+
+
+def _changelog_path(cache_dir, package, version):
+    safe = re.sub(r"[^A-Za-z0-9.+~_-]", "_", version)
+    return os.path.join(cache_dir, "changelogs", package, safe + ".txt")
+
+
+def fetch_changelog(cmd, package, old, new):
+    """Run the changelog command for ``package=new``, falling back to the candidate."""
+    for arg in (f"{package}={new}", package):
+        try:
+            proc = subprocess.run([*cmd, arg], stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                                  text=True, errors="replace", timeout=120)
+        except (OSError, subprocess.SubprocessError):
+            return None
+        if proc.returncode == 0 and proc.stdout.strip():
+            return excerpt(proc.stdout, old, new)
+    return None
+
+
+def changelogs(upgrades, cache_dir, cmd, jobs=4):
+    """Return ``({package: text or None}, stats)``, fetching only uncached versions."""
+    texts, missing = {}, []
+    stats = {"cached": 0, "fetched": 0, "failed": 0}
+    for package, (old, new) in upgrades.items():
+        try:
+            with open(_changelog_path(cache_dir, package, new), "r") as fh:
+                texts[package] = fh.read()
+            stats["cached"] += 1
+        except OSError:
+            missing.append(package)
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max(1, jobs)) as pool:
+        futures = {pool.submit(fetch_changelog, cmd, p, *upgrades[p]): p for p in missing}
+        for future in concurrent.futures.as_completed(futures):
+            package = futures[future]
+            text = future.result()
+            texts[package] = text
+            if text is None:
+                stats["failed"] += 1  # not cached: may be a transient network error
+                continue
+            stats["fetched"] += 1
+            path = _changelog_path(cache_dir, package, upgrades[package][1])
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+            with os.fdopen(fd, "w") as fh:
+                fh.write(text)
+            os.replace(tmp, path)
+    return texts, stats
+
+
+# ---------------------------------------------------------------------------
+# Reports
+# ---------------------------------------------------------------------------
+
+def render_text(upgrades, texts, days, generated):
+    out = ["============================================",
+           f"📅 Upgrade Report - Generated on {generated}",
+           f"🗂  Time window: Last {days} day(s)",
+           "============================================", ""]
+    for package, (old, new) in upgrades.items():
+        out += ["==============================", f"📦 {package} ({old} → {new})",
+                "==============================", texts.get(package) or "(No changelog available)", ""]
+    return "\n".join(out) + "\n"
+
+
+def render_markdown(upgrades, texts, days, generated):
+    out = ["# Upgrade Report", "", f"- Generated: {generated}", f"- Window: Last {days} day(s)", ""]
+    for package, (old, new) in upgrades.items():
+        out += [f"## {package}", "", f"`{old}` → `{new}`", ""]
+        text = texts.get(package)
+        out += (["```", text, "```"] if text else ["(No changelog available)"]) + [""]
+    return "\n".join(out) + "\n"
+
+
+def _write_text(path, text, owner):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w") as fh:
+        fh.write(text)
+    if owner:
+        os.chown(path, *owner)
+
+
+# ---------------------------------------------------------------------------
+# Main
+# ---------------------------------------------------------------------------
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Incremental apt upgrade history and changelog cache")
+    sub = parser.add_subparsers(dest="command", required=True)
+    index_cmd = sub.add_parser("index", help="Read new history.log entries into the index")
+    report_cmd = sub.add_parser("report", help="Report upgrades of the last N days with changelogs")
+    for cmd in (index_cmd, report_cmd):
+        cmd.add_argument("--log-dir", default=DEFAULT_LOG_DIR,
+                         help=f"Directory with history.log* (default: {DEFAULT_LOG_DIR})")
+        cmd.add_argument("--cache-dir", help="Index and changelog cache (default: ~/.cache/compsetup/upgrades)")
+        cmd.add_argument("--keep-days", type=int, default=DEFAULT_KEEP_DAYS,
+                         help=f"Drop indexed entries older than this (default: {DEFAULT_KEEP_DAYS})")
+        cmd.add_argument("--now", help="Reference time, YYYY-MM-DDTHH:MM:SS (default: now; for fixtures)")
+    report_cmd.add_argument("--days", "-d", type=int, default=1, help="Days to include (default: 1)")
+    report_cmd.add_argument("--txt", help="Also write the text report here")
+    report_cmd.add_argument("--md", help="Also write a Markdown report here")
+    report_cmd.add_argument("--changelog-cmd", default="apt-get changelog",
+                            help="Command printing a package's changelog (default: apt-get changelog)")
+    report_cmd.add_argument("--jobs", type=int, default=4, help="Parallel changelog fetches (default: 4)")
+    report_cmd.add_argument("--json", action="store_true", help="Print a JSON summary instead of the report")
+    args = parser.parse_args(argv)
+
+    try:
+        now = datetime.datetime.fromisoformat(args.now) if args.now else datetime.datetime.now()
+        if args.command == "report" and args.days < 1:
+            raise ValueError("--days must be at least 1")
+        cache_dir = os.path.expanduser(args.cache_dir or default_cache_dir())
+        owner = _sudo_owner()
+        index = load_index(cache_dir)
+        summary = update_index(index, args.log_dir, args.keep_days, now)
+        _write_json(os.path.join(cache_dir, "index.json"), index)
+        if args.command == "index":
+            _chown_tree(cache_dir, owner)
+            json.dump(summary, sys.stdout, indent=2)
+            sys.stdout.write("\n")
+            return 0
+
+        cutoff = (now.date() - datetime.timedelta(days=args.days - 1)).isoformat()
+        upgrades = upgrades_since(index, cutoff)
+        texts, stats = changelogs(upgrades, cache_dir, shlex.split(args.changelog_cmd), args.jobs)
+        _chown_tree(cache_dir, owner)
+    except (OSError, ValueError) as exc:
+        print(f"Error: {exc}", file=sys.stderr)
+        return 1
+
+    if args.json:
+        json.dump({"days": args.days,
+                   "packages": [{"package": p, "old": o, "new": n, "changelog": texts.get(p) is not None}
+                                for p, (o, n) in upgrades.items()],
+                   "index": summary, "changelogs": stats}, sys.stdout, indent=2)
+        sys.stdout.write("\n")
+        return 0
+    if not upgrades:
+        print(f"No packages upgraded in the last {args.days} day(s).")
+        return 0
+
+    generated = now.strftime("%a %b %d %H:%M:%S %Y")
+    text = render_text(upgrades, texts, args.days, generated)
+    sys.stdout.write(text)
+    try:
+        if args.txt:
+            _write_text(args.txt, text, owner)
+        if args.md:
+            _write_text(args.md, render_markdown(upgrades, texts, args.days, generated), owner)
+    except OSError as exc:
+        print(f"Error: {exc}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
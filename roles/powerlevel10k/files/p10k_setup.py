@@ -1,7 +1,9 @@
 #!/usr/bin/env python3
 import os
+import re
 import shutil
 import subprocess
+import sys
 from pathlib import Path
 
 HOME = Path.home()
@@ -19,18 +21,40 @@ def _detect_default_src() -> Path | None:
             return candidate
     return None
 
+# Any line that sources ~/.p10k.zsh, guarded or not, with the path quoted
+# as "$HOME"/.p10k.zsh or "$HOME/.p10k.zsh"
+SOURCE_P10K_RE = re.compile(r'^\s*(\[\[?[^\]]*p10k\.zsh"?\s*\]\]?\s*(&&|\|\|)\s*)?'
+                            r'(source|\.)\s+"?(~|\$HOME|\$\{HOME\})"?/\.p10k\.zsh"?\s*$')
+
+
 def ensure_zshrc_sources_p10k():
+    """Make ~/.zshrc source ~/.p10k.zsh exactly once.
+
+    Keeps the last source line (it has to follow oh-my-zsh) and drops the
+    others, so repeated runs of the role, the template and this helper
+    never stack up duplicate sources. Returns True if ~/.zshrc changed.
+    """
     ZSHRC.parent.mkdir(parents=True, exist_ok=True)
     ZSHRC.touch(exist_ok=True)
-    line = '[ -f ~/.p10k.zsh ] && source ~/.p10k.zsh'
+    line = '[[ ! -f ~/.p10k.zsh ]] || source ~/.p10k.zsh'
     with ZSHRC.open("r", encoding="utf-8") as f:
         content = f.read()
-    if line not in content:
-        with ZSHRC.open("a", encoding="utf-8") as f:
-            f.write(("\n" if not content.endswith("\n") else "") + line + "\n")
-        print("Added source line to ~/.zshrc")
-    else:
+    lines = content.splitlines()
+    hits = [i for i, text in enumerate(lines) if SOURCE_P10K_RE.match(text)]
+    if len(hits) == 1:
         print("~/.zshrc already set to source ~/.p10k.zsh")
+        return False
+    if hits:
+        drop = set(hits[:-1])
+        lines = [text for i, text in enumerate(lines) if i not in drop]
+        message = f"Removed {len(drop)} duplicate ~/.p10k.zsh source line(s) from ~/.zshrc"
+    else:
+        lines.append(line)
+        message = "Added source line to ~/.zshrc"
+    with ZSHRC.open("w", encoding="utf-8") as f:
+        f.write("\n".join(lines) + "\n")
+    print(message)
+    return True
 
 def backup_existing_p10k():
     if P10K_DEST.exists():
@@ -89,4 +113,8 @@ def main():
     print("\nAll set! Open a new terminal tab/window or run: exec zsh\n")
 
 if __name__ == "__main__":
-    main()
+    if sys.argv[1:] == ["--ensure-zshrc"]:
+        # Non-interactive: used by the powerlevel10k role
+        ensure_zshrc_sources_p10k()
+    else:
+        main()
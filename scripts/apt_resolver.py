@@ -0,0 +1,442 @@
+#!/usr/bin/env python3
+"""Batch apt availability resolver for CompSetup.
+
+Classifies a list of apt package names as available, virtual or missing
+using a single snapshot of the package index instead of one
+``apt-cache show`` process per package.
+
+Snapshot sources:
+    apt-cache policy NAME...   - default; one process for all names
+    --index FILE               - deb822 ``Packages`` file(s), e.g. a fixture
+                                 or the output of ``apt-cache dumpavail``
+
+Policy answers are cached in ``~/.cache/compsetup/apt`` keyed by a
+fingerprint of the apt lists, sources, pinning and dpkg architectures, so
+names already classified against the same state (e.g. by the package
+selector before the playbook starts, or by aptPackages before
+davinci_resolve) are not queried again. The dpkg status file is left
+out: every install rewrites it, which would empty the cache between the
+roles that share it.
+
+Output (stdout, JSON):
+    resolve      -> {"available": [...], "virtual": [...], "missing": [...]}
+    alternatives -> {"chosen": [...], "groups": [{"candidates", "chosen"}],
+                     "unresolved": [{"candidates", "chosen": null, "reason"}]}
+
+    available - has an installation candidate
+    virtual   - known to apt (provided by other packages) but has no
+                candidate of its own, so it cannot be installed by name
+    missing   - unknown to apt
+
+``alternatives`` takes a JSON list of candidate groups and picks the
+first available name in each group from a single snapshot of every
+alternative.
+
+Usage:
+    apt_resolver.py resolve git ripgrep cosmic-term
+    apt_resolver.py resolve --index tests/fixtures/apt/Packages git vim libc6:i386
+    apt_resolver.py alternatives --groups-json '[["libasound2t64", "libasound2"]]'
+    apt_resolver.py bench --index tests/fixtures/apt/Packages git vim editor
+
+Exit codes:
+    0 - Resolution succeeded (even if some packages are missing)
+    1 - apt-cache could not be run or an index file could not be read
+"""
+
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+DEFAULT_CACHE_DIR = os.path.join("~", ".cache", "compsetup", "apt")
+# Candidates come from the lists, sources and pins; dpkg/arch adds name:arch
+# candidates (davinci_resolve enables i386). Not dpkg/status: installs rewrite it.
+APT_STATE_PATHS = ("/var/lib/apt/lists", "/etc/apt/sources.list", "/etc/apt/sources.list.d",
+                   "/etc/apt/preferences.d", "/var/lib/dpkg/arch")
+
+# ---------------------------------------------------------------------------
+# Index snapshot
+# ---------------------------------------------------------------------------
+
+
+class AptIndex:
+    """Snapshot of the package index.
+
+    ``candidates`` maps a package name (optionally ``name:arch``) to its
+    candidate version. ``virtual`` holds names apt knows about that have
+    no candidate, typically names that only appear in ``Provides:``.
+    """
+
+    def __init__(self, candidates=None, virtual=None):
+        self.candidates = candidates if candidates is not None else {}
+        self.virtual = virtual if virtual is not None else set()
+
+    def status(self, name):
+        """Return ``available``, ``virtual`` or ``missing`` for *name*."""
+        if name in self.candidates:
+            return "available"
+        if name in self.virtual:
+            return "virtual"
+        return "missing"
+
+    def resolve(self, names):
+        """Classify *names*, preserving input order and dropping duplicates."""
+        result = {"available": [], "virtual": [], "missing": []}
+        seen = set()
+        for name in names:
+            if name in seen:
+                continue
+            seen.add(name)
+            result[self.status(name)].append(name)
+        return result
+
+
+def _apt_env():
+    """Environment for apt-cache with untranslated output."""
+    env = dict(os.environ)
+    env["LC_ALL"] = "C"
+    return env
+
+
+def parse_policy(stream):
+    """Build an AptIndex from ``apt-cache policy NAME...`` output.
+
+    Each queried package that apt knows about produces a header line
+    ``name:`` followed by indented ``Installed:``/``Candidate:`` lines.
+    Unknown packages produce no output at all.
+    """
+    candidates = {}
+    virtual = set()
+    current = None
+    for raw_line in stream:
+        line = raw_line.rstrip("\n")
+        if not line.strip():
+            continue
+        if not line[0].isspace() and line.endswith(":"):
+            current = line[:-1]
+            virtual.add(current)
+            continue
+        if current is None:
+            continue
+        stripped = line.strip()
+        if stripped.startswith("Candidate:"):
+            version = stripped.partition(":")[2].strip()
+            if version and version != "(none)":
+                candidates[current] = version
+                virtual.discard(current)
+            current = None
+    return AptIndex(candidates, virtual)
+
+
+def parse_packages(stream):
+    """Build an AptIndex from a deb822 ``Packages`` stream.
+
+    Only the ``Package``, ``Version``, ``Architecture`` and ``Provides``
+    fields are read. Real packages are recorded both as ``name`` and
+    ``name:arch``; names that only appear in ``Provides`` are virtual.
+    """
+    candidates = {}
+    provided = set()
+    pkg = version = arch = None
+
+    def flush():
+        if pkg:
+            candidates.setdefault(pkg, version or "")
+            if arch and arch != "all":
+                candidates.setdefault(f"{pkg}:{arch}", version or "")
+
+    for raw_line in stream:
+        if raw_line[:1] in (" ", "\t"):
+            continue
+        line = raw_line.rstrip("\n")
+        if not line:
+            flush()
+            pkg = version = arch = None
+            continue
+        field, _, value = line.partition(":")
+        if field == "Package":
+            pkg = value.strip()
+        elif field == "Version":
+            version = value.strip()
+        elif field == "Architecture":
+            arch = value.strip()
+        elif field == "Provides":
+            for entry in value.split(","):
+                name = entry.strip().split(" ", 1)[0]
+                if name:
+                    provided.add(name)
+    flush()
+
+    virtual = provided.difference(candidates)
+    return AptIndex(candidates, virtual)
+
+
+def _query_policy(names, apt_cache):
+    proc = subprocess.run(
+        [apt_cache, "policy", *names],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL,
+        text=True,
+        env=_apt_env(),
+        check=True,
+    )
+    return parse_policy(proc.stdout.splitlines())
+
+
+def apt_state_fingerprint(paths=APT_STATE_PATHS):
+    """Hash the names, sizes and mtimes of the files that define the index.
+
+    Returns None if none of *paths* exist (not an apt system).
+    """
+    digest = hashlib.sha256()
+    found = False
+    for path in paths:
+        try:
+            if os.path.isdir(path):
+                entries = sorted(os.scandir(path), key=lambda e: e.name)
+                stats = [(e.name, e.stat()) for e in entries if e.is_file()]
+            else:
+                stats = [(path, os.stat(path))]
+        except OSError:
+            continue
+        found = True
+        for name, st in stats:
+            digest.update(f"{path}/{name}:{st.st_size}:{st.st_mtime_ns}\n".encode())
+    return digest.hexdigest() if found else None
+
+
+class PolicyCache:
+    """Classification cache for ``apt-cache policy`` answers.
+
+    Entries are only valid for the apt state they were computed against;
+    a different fingerprint starts an empty cache.
+    """
+
+    def __init__(self, cache_dir, fingerprint):
+        self.path = os.path.join(os.path.expanduser(cache_dir), "policy.json")
+        self.fingerprint = fingerprint
+        self.candidates, self.virtual, self.missing = {}, set(), set()
+        try:
+            with open(self.path, "r") as fh:
+                data = json.load(fh)
+        except (OSError, ValueError):
+            return
+        if data.get("fingerprint") == fingerprint:
+            self.candidates = data.get("candidates", {})
+            self.virtual = set(data.get("virtual", []))
+            self.missing = set(data.get("missing", []))
+
+    def unknown(self, names):
+        return [n for n in names
+                if n not in self.candidates and n not in self.virtual and n not in self.missing]
+
+    def update(self, queried, index):
+        self.candidates.update(index.candidates)
+        self.virtual.update(index.virtual)
+        self.missing.update(n for n in queried if index.status(n) == "missing")
+
+    def save(self):
+        payload = {"fingerprint": self.fingerprint, "candidates": self.candidates,
+                   "virtual": sorted(self.virtual), "missing": sorted(self.missing)}
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=os.path.dirname(self.path), prefix=".tmp-")
+            with os.fdopen(fd, "w") as fh:
+                json.dump(payload, fh)
+            os.replace(tmp, self.path)
+        except OSError:
+            pass  # the cache only saves a query; never fail resolution over it
+
+
+def snapshot_from_policy(names, apt_cache="apt-cache", cache_dir=None):
+    """Query ``apt-cache policy`` once for all *names* not already cached."""
+    if not names:
+        return AptIndex()
+    fingerprint = apt_state_fingerprint() if cache_dir else None
+    if not fingerprint:
+        return _query_policy(names, apt_cache)
+    cache = PolicyCache(cache_dir, fingerprint)
+    todo = cache.unknown(names)
+    if todo:
+        cache.update(todo, _query_policy(todo, apt_cache))
+        cache.save()
+    return AptIndex(dict(cache.candidates), set(cache.virtual))
+
+
+def _open_index(path):
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt", encoding="utf-8", errors="replace")
+    return open(path, "r", encoding="utf-8", errors="replace")
+
+
+def snapshot_from_index(paths):
+    """Read one or more ``Packages`` files into a single AptIndex."""
+    merged = AptIndex()
+    for path in paths:
+        with _open_index(path) as fh:
+            index = parse_packages(fh)
+        for name, version in index.candidates.items():
+            merged.candidates.setdefault(name, version)
+        merged.virtual.update(index.virtual)
+    merged.virtual.difference_update(merged.candidates)
+    return merged
+
+
+def load_snapshot(names, index_files=None, apt_cache="apt-cache", cache_dir=None):
+    """Return an AptIndex from *index_files* or, if none, from apt-cache."""
+    if index_files:
+        return snapshot_from_index(index_files)
+    return snapshot_from_policy(names, apt_cache, cache_dir)
+
+
+def resolve(names, index_files=None, apt_cache="apt-cache", cache_dir=None):
+    """Classify *names* with a single index snapshot."""
+    names = list(names)
+    return load_snapshot(names, index_files, apt_cache, cache_dir).resolve(names)
+
+
+# ---------------------------------------------------------------------------
+# Alternatives
+# ---------------------------------------------------------------------------
+
+_REASONS = {
+    "virtual": "virtual package with no installation candidate",
+    "missing": "not in the package index",
+}
+
+
+def choose_alternatives(groups, index):
+    """Pick the first available package of each candidate group."""
+    result = {"chosen": [], "groups": [], "unresolved": []}
+    for group in groups:
+        group = [str(name) for name in group]
+        chosen = next((name for name in group if index.status(name) == "available"), None)
+        entry = {"candidates": group, "chosen": chosen}
+        if chosen:
+            result["chosen"].append(chosen)
+        else:
+            reasons = []
+            for name in group:
+                reason = _REASONS[index.status(name)]
+                if ":" in name and index.status(name) == "missing":
+                    reason += f" (is the {name.rsplit(':', 1)[1]} architecture enabled?)"
+                reasons.append(f"{name}: {reason}")
+            entry["reason"] = "; ".join(reasons) or "empty candidate group"
+            result["unresolved"].append(entry)
+        result["groups"].append(entry)
+    return result
+
+
+def resolve_alternatives(groups, index_files=None, apt_cache="apt-cache", cache_dir=None):
+    """Resolve every candidate group against one snapshot of all alternatives."""
+    names = [str(name) for group in groups for name in group]
+    return choose_alternatives(groups, load_snapshot(names, index_files, apt_cache, cache_dir))
+
+
+# ---------------------------------------------------------------------------
+# Benchmark
+# ---------------------------------------------------------------------------
+
+def _bench_legacy(names, index_files, apt_cache):
+    """Mimic the old loop: one process (and index read) per package."""
+    available = []
+    for name in names:
+        if index_files:
+            cmd = [sys.executable, os.path.abspath(__file__), "resolve"]
+            for path in index_files:
+                cmd += ["--index", path]
+            cmd.append(name)
+            proc = subprocess.run(cmd, stdout=subprocess.PIPE, text=True)
+            if name in json.loads(proc.stdout or "{}").get("available", []):
+                available.append(name)
+        else:
+            proc = subprocess.run(
+                [apt_cache, "show", name],
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+                env=_apt_env(),
+            )
+            if proc.returncode == 0:
+                available.append(name)
+    return available
+
+
+def run_bench(names, index_files, apt_cache, runs):
+    """Time the per-package loop against a single batched resolve."""
+    timings = {"legacy_loop": [], "batched": []}
+    for _ in range(runs):
+        start = time.perf_counter()
+        legacy = _bench_legacy(names, index_files, apt_cache)
+        timings["legacy_loop"].append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        batched = resolve(names, index_files, apt_cache)
+        timings["batched"].append(time.perf_counter() - start)
+
+    report = {
+        "packages": len(names),
+        "runs": runs,
+        "legacy_loop_s": min(timings["legacy_loop"]),
+        "batched_s": min(timings["batched"]),
+        "same_available": sorted(legacy) == sorted(batched["available"]),
+    }
+    if report["batched_s"] > 0:
+        report["speedup"] = round(report["legacy_loop_s"] / report["batched_s"], 1)
+    return report
+
+
+# ---------------------------------------------------------------------------
+# Main
+# ---------------------------------------------------------------------------
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Batch apt availability resolver for CompSetup")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    for name, help_text in (("resolve", "Classify package names"),
+                            ("alternatives", "Pick the first available package of each candidate group"),
+                            ("bench", "Compare the per-package loop with one batched resolve")):
+        cmd = sub.add_parser(name, help=help_text)
+        if name == "alternatives":
+            cmd.add_argument("--groups-json", required=True,
+                             help='JSON list of candidate lists, e.g. \'[["libasound2t64", "libasound2"]]\'')
+        else:
+            cmd.add_argument("names", nargs="*", help="Package names (name or name:arch)")
+        cmd.add_argument("--index", action="append", default=[], metavar="FILE",
+                         help="Read a deb822 Packages file instead of calling apt-cache (repeatable)")
+        cmd.add_argument("--apt-cache", default="apt-cache",
+                         help="apt-cache binary to use (default: apt-cache)")
+        if name == "bench":
+            cmd.add_argument("--runs", type=int, default=3, help="Repetitions per variant (default: 3)")
+        else:
+            cmd.add_argument("--cache-dir", default=DEFAULT_CACHE_DIR,
+                             help="Policy answer cache directory ('' disables the cache)")
+
+    args = parser.parse_args(argv)
+
+    try:
+        if args.command == "bench":
+            result = run_bench(args.names, args.index, args.apt_cache, max(1, args.runs))
+        elif args.command == "alternatives":
+            groups = json.loads(args.groups_json)
+            if not isinstance(groups, list) or not all(isinstance(g, list) for g in groups):
+                raise ValueError("--groups-json must be a list of lists")
+            result = resolve_alternatives(groups, args.index, args.apt_cache, args.cache_dir)
+        else:
+            result = resolve(args.names, args.index, args.apt_cache, args.cache_dir)
+    except (OSError, ValueError, subprocess.CalledProcessError) as exc:
+        print(f"Error: {exc}", file=sys.stderr)
+        return 1
+
+    json.dump(result, sys.stdout)
+    sys.stdout.write("\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,423 @@
+#!/usr/bin/env python3
+"""Content-addressed artifact store for repeat and offline provisioning.
+
+Everything the Linux roles download directly - repository signing keys,
+the VS Code ``.deb``, npm CLI tarballs, the Flathub remote file - goes
+through this store. ``prefetch`` resolves all of them for one OS/arch
+from packages.yml and downloads them in parallel. The roles call
+``fetch``, which copies from the store after a conditional request
+(ETag/If-Modified-Since) confirms the stored copy is still current, so
+only changed artifacts are downloaded again. With ``--offline`` (the
+``compsetup_offline`` variable) the store is used as is and the network
+is never touched.
+
+Nerd Font archives live in font_fetcher.py's cache, which uses the same
+content-addressed layout. ``prefetch`` fills that cache as well.
+
+Store layout (default ``~/.cache/compsetup/artifacts``, or
+``$COMPSETUP_ARTIFACT_DIR``):
+    blobs/<sha256>   - artifact contents, named by their sha256
+    index.json       - {key: {"url", "sha256", "size", "etag",
+                              "last_modified", "kind", "name"}}
+
+Keys are upstream URLs. npm packages are also indexed as
+``npm:<package>``, which points at the tarball of the version that was
+``latest`` when it was fetched.
+
+Output (stdout, JSON):
+    prefetch -> {"artifacts": [{"key", "name", "kind", "status"}],
+                 "fonts": [...], "changed": bool}
+    fetch    -> {"key", "path", "source": "store"|"network", "changed"}
+    list     -> {key: entry, ...}
+    verify   -> {"ok": [...], "corrupt": [...], "missing": [...]}
+
+    status is one of: stored, downloaded, error
+
+Usage:
+    artifact_cache.py prefetch --packages-file packages.yml --os ubuntu --arch x86_64
+    artifact_cache.py prefetch --packages-file packages.yml --os pop_os --arch aarch64
+    artifact_cache.py prefetch ... --rewrite https://=http://127.0.0.1:8000/ \\
+        --npm-registry http://127.0.0.1:8000/npm     # local test upstream
+    artifact_cache.py fetch https://updates.signal.org/desktop/apt/keys.asc --dest /tmp/k.asc
+    artifact_cache.py fetch npm:@google/gemini-cli --dest /tmp/compsetup-npm/ --offline
+
+Exit codes:
+    0 - Every artifact is in the store / was copied
+    1 - At least one artifact failed, or is missing in offline mode
+"""
+
+import argparse
+import concurrent.futures
+import hashlib
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import urllib.error
+import urllib.parse
+import urllib.request
+
+DEFAULT_STORE = os.path.join("~", ".cache", "compsetup", "artifacts")
+FONT_CACHE_DIR = os.path.join("~", ".cache", "compsetup", "fonts")
+NPM_REGISTRY = "https://registry.npmjs.org"
+# --os value (a distribution id, as in compsetup_os) -> package family
+OS_FAMILIES = {
+    "ubuntu": "apt", "pop_os": "apt", "debian": "apt", "linuxmint": "apt",
+    "fedora": "dnf", "redhat": "dnf",
+    "macos": "brew",
+}
+ARCHES = {"x86_64": "x86_64", "amd64": "x86_64", "aarch64": "aarch64", "arm64": "aarch64"}
+
+# Artifacts the roles download outside packages.yml (repository signing
+# keys come from its ``repositories`` section):
+# (url, package families, gui app that needs it or None, description)
+ROLE_ARTIFACTS = (
+    ("https://flathub.org/repo/flathub.flatpakrepo", ("apt", "dnf"), None,
+     "Flathub remote"),
+)
+
+# ---------------------------------------------------------------------------
+# Store
+# ---------------------------------------------------------------------------
+
+
+def default_store():
+    return os.environ.get("COMPSETUP_ARTIFACT_DIR") or DEFAULT_STORE
+
+
+def _atomic_write(path, data):
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "wb") as fh:
+            fh.write(data)
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+        raise
+
+
+class ArtifactStore:
+    """Blobs stored by sha256, indexed by upstream URL (and npm aliases)."""
+
+    def __init__(self, root):
+        self.root = os.path.expanduser(root)
+        self.index_path = os.path.join(self.root, "index.json")
+        self._lock = threading.Lock()
+        try:
+            with open(self.index_path, "r") as fh:
+                self.index = json.load(fh)
+        except (OSError, ValueError):
+            self.index = {}
+
+    def blob_path(self, digest):
+        return os.path.join(self.root, "blobs", digest)
+
+    def lookup(self, key):
+        """Return the index entry for *key* if its blob is still on disk."""
+        with self._lock:
+            entry = self.index.get(key)
+        if entry and os.path.isfile(self.blob_path(entry["sha256"])):
+            return entry
+        return None
+
+    def store(self, key, data, **meta):
+        digest = hashlib.sha256(data).hexdigest()
+        path = self.blob_path(digest)
+        if not os.path.isfile(path):
+            _atomic_write(path, data)
+        entry = dict(meta, sha256=digest, size=len(data))
+        with self._lock:
+            self.index[key] = entry
+        return entry
+
+    def alias(self, key, entry):
+        with self._lock:
+            self.index[key] = entry
+
+    def save(self):
+        with self._lock:
+            payload = json.dumps(self.index, indent=2, sort_keys=True).encode()
+        _atomic_write(self.index_path, payload)
+
+    def verify(self):
+        result = {"ok": [], "corrupt": [], "missing": []}
+        for key, entry in sorted(self.index.items()):
+            try:
+                with open(self.blob_path(entry["sha256"]), "rb") as fh:
+                    digest = hashlib.sha256(fh.read()).hexdigest()
+            except OSError:
+                result["missing"].append(key)
+                continue
+            result["ok" if digest == entry["sha256"] else "corrupt"].append(key)
+        return result
+
+
+# ---------------------------------------------------------------------------
+# Downloads
+# ---------------------------------------------------------------------------
+
+def rewrite_url(url, rewrites):
+    """Apply the first matching ``(prefix, replacement)`` pair to *url*."""
+    for prefix, replacement in rewrites:
+        if url.startswith(prefix):
+            return replacement + url[len(prefix):]
+    return url
+
+
+def _download(url, rewrites, entry=None, timeout=60):
+    """Return ``(data, etag, last_modified)``; ``data`` is None on 304."""
+    request = urllib.request.Request(rewrite_url(url, rewrites),
+                                     headers={"User-Agent": "compsetup-artifact-cache"})
+    if entry:
+        if entry.get("etag"):
+            request.add_header("If-None-Match", entry["etag"])
+        if entry.get("last_modified"):
+            request.add_header("If-Modified-Since", entry["last_modified"])
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as resp:
+            return resp.read(), resp.headers.get("ETag"), resp.headers.get("Last-Modified")
+    except urllib.error.HTTPError as exc:
+        if exc.code == 304 and entry:
+            return None, entry.get("etag"), entry.get("last_modified")
+        raise
+
+
+def fetch_url(store, url, rewrites=(), kind="file", name="", revalidate=True):
+    """Make sure *url* is in the store; return ``(entry, downloaded)``."""
+    entry = store.lookup(url)
+    if entry and not revalidate:
+        return entry, False
+    data, etag, last_modified = _download(url, rewrites, entry)
+    if data is None:
+        return entry, False
+    new = store.store(url, data, url=url, etag=etag, last_modified=last_modified,
+                      kind=kind, name=name)
+    return new, not entry or entry["sha256"] != new["sha256"]
+
+
+def fetch_npm(store, package, registry=NPM_REGISTRY, rewrites=()):
+    """Store the ``latest`` tarball of *package* and alias it as ``npm:<package>``."""
+    meta_url = f"{registry.rstrip('/')}/{package}/latest"
+    data, _, _ = _download(meta_url, rewrites)
+    dist = json.loads(data.decode("utf-8")).get("dist") or {}
+    if not dist.get("tarball"):
+        raise ValueError(f"{package}: registry metadata has no tarball")
+    entry, downloaded = fetch_url(store, dist["tarball"], rewrites, kind="npm", name=package,
+                                  revalidate=False)
+    if dist.get("shasum"):
+        with open(store.blob_path(entry["sha256"]), "rb") as fh:
+            if hashlib.sha1(fh.read()).hexdigest() != dist["shasum"]:
+                raise ValueError(f"{package}: tarball does not match the registry shasum")
+    store.alias(f"npm:{package}", entry)
+    return entry, downloaded
+
+
+# ---------------------------------------------------------------------------
+# Resolution from packages.yml
+# ---------------------------------------------------------------------------
+
+def _arch_matches(architectures, arch):
+    """True when *arch* is in *architectures* (dpkg or uname names), or none are given."""
+    if not architectures:
+        return True
+    if isinstance(architectures, str):
+        architectures = architectures.split()
+    return ARCHES.get(arch, arch) in {ARCHES.get(a, a) for a in architectures}
+
+
+def collect_artifacts(manifest, os_name, arch="x86_64"):
+    """List ``{"key", "name", "kind"}`` for everything the roles download on *os_name*/*arch*.
+
+    *os_name* is a distribution id; every apt distribution gets the
+    signing keys and ``.deb`` files. Entries restricted by
+    ``architectures`` (repositories and gui app ``linux`` blocks) are
+    skipped on other architectures, as are repositories limited to other
+    ``distributions``.
+    """
+    family = OS_FAMILIES.get(os_name)
+    gui_apps = [a for a in manifest.get("gui_apps") or [] if a.get("linux")]
+    gui_names = {a["name"] for a in gui_apps}
+    artifacts = []
+    for url, families, needs, description in ROLE_ARTIFACTS:
+        if family in families and (needs is None or needs in gui_names):
+            artifacts.append({"key": url, "name": description, "kind": "key"})
+    if family == "apt":
+        for repo in manifest.get("repositories") or []:
+            apt = repo.get("apt") or {}
+            if not apt.get("key_url") or (repo.get("app") and repo["app"] not in gui_names):
+                continue
+            if apt.get("distributions") and os_name not in apt["distributions"]:
+                continue
+            if _arch_matches(apt.get("architectures"), arch):
+                artifacts.append({"key": apt["key_url"], "name": f"{repo['name']} signing key",
+                                  "kind": "key"})
+        for app in gui_apps:
+            linux = app["linux"]
+            if (linux.get("type") == "deb" and linux.get("url")
+                    and _arch_matches(linux.get("architectures"), arch)):
+                artifacts.append({"key": linux["url"], "name": app["name"], "kind": "deb"})
+    if family in ("apt", "dnf"):
+        for tool in manifest.get("cli_tools") or []:
+            linux = tool.get("linux") or {}
+            if linux.get("type") == "npm" and linux.get("package"):
+                artifacts.append({"key": f"npm:{linux['package']}", "name": tool["name"], "kind": "npm"})
+    return artifacts
+
+
+def prefetch(manifest, os_name, arch, store, jobs=8, rewrites=(), registry=NPM_REGISTRY,
+             font_cache=FONT_CACHE_DIR):
+    """Download every artifact for *os_name*/*arch* in parallel."""
+    # Imported here: roles run ``fetch`` through ansible.builtin.script,
+    # which copies this file alone to the host
+    from font_fetcher import prefetch_fonts
+
+    def one(artifact):
+        result = dict(artifact, status="stored")
+        try:
+            if artifact["kind"] == "npm":
+                _, downloaded = fetch_npm(store, artifact["key"][4:], registry, rewrites)
+            else:
+                _, downloaded = fetch_url(store, artifact["key"], rewrites, artifact["kind"],
+                                          artifact["name"])
+            result["status"] = "downloaded" if downloaded else "stored"
+        except Exception as exc:  # reported per artifact, never aborts the batch
+            result["status"] = "error"
+            result["error"] = str(exc)
+        return result
+
+    artifacts = collect_artifacts(manifest, os_name, arch)
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max(1, jobs)) as pool:
+        results = list(pool.map(one, artifacts))
+    store.save()
+
+    fonts = {"fonts": [], "changed": False}
+    if OS_FAMILIES.get(os_name) in ("apt", "dnf"):
+        font_entries = [f for f in manifest.get("fonts") or [] if (f.get("linux") or {}).get("url")]
+        fonts = prefetch_fonts(font_entries, font_cache, jobs, lambda url: rewrite_url(url, rewrites))
+    changed = fonts["changed"] or any(r["status"] == "downloaded" for r in results)
+    return {"artifacts": results, "fonts": fonts["fonts"], "changed": changed}
+
+
+# ---------------------------------------------------------------------------
+# Role-side copy
+# ---------------------------------------------------------------------------
+
+def copy_out(store, key, dest, offline=False, rewrites=(), registry=NPM_REGISTRY, mode=0o644):
+    """Copy artifact *key* to *dest*, revalidating it first unless *offline*."""
+    entry = store.lookup(key)
+    source = "store"
+    if offline:
+        if entry is None:
+            raise RuntimeError(f"{key} is not in the artifact store and offline mode is on")
+    else:
+        # Revalidate stored URLs with their ETag/Last-Modified; npm keys
+        # re-read ``latest`` and only download a tarball they do not have
+        if key.startswith("npm:"):
+            entry, downloaded = fetch_npm(store, key[4:], registry, rewrites)
+        else:
+            entry, downloaded = fetch_url(store, key, rewrites)
+        store.save()
+        if downloaded:
+            source = "network"
+
+    if dest.endswith(os.sep) or os.path.isdir(dest):
+        url_name = os.path.basename(urllib.parse.urlparse(entry.get("url", "")).path)
+        dest = os.path.join(dest, url_name or entry["sha256"])
+    blob = store.blob_path(entry["sha256"])
+    changed = True
+    if os.path.isfile(dest):
+        with open(dest, "rb") as fh:
+            changed = hashlib.sha256(fh.read()).hexdigest() != entry["sha256"]
+    if changed:
+        os.makedirs(os.path.dirname(os.path.abspath(dest)), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(dest)), prefix=".tmp-")
+        os.close(fd)
+        shutil.copyfile(blob, tmp)
+        os.chmod(tmp, mode)
+        os.replace(tmp, dest)
+    return {"key": key, "path": dest, "source": source, "changed": changed}
+
+
+# ---------------------------------------------------------------------------
+# Main
+# ---------------------------------------------------------------------------
+
+def _rewrites(values):
+    pairs = []
+    for value in values:
+        prefix, sep, replacement = value.partition("=")
+        if not sep:
+            raise ValueError(f"--rewrite expects PREFIX=REPLACEMENT, got {value!r}")
+        pairs.append((prefix, replacement))
+    return pairs
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Content-addressed artifact store for CompSetup")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    prefetch_cmd = sub.add_parser("prefetch", help="Download every artifact for one OS/arch")
+    prefetch_cmd.add_argument("--packages-file", required=True, help="Path to packages.yml")
+    prefetch_cmd.add_argument("--os", required=True, choices=sorted(OS_FAMILIES),
+                              help="Target distribution id (ubuntu, pop_os, debian, fedora, ...)")
+    prefetch_cmd.add_argument("--arch", default="x86_64", help="Target architecture (default: x86_64)")
+    prefetch_cmd.add_argument("--jobs", type=int, default=8, help="Concurrent downloads (default: 8)")
+    prefetch_cmd.add_argument("--font-cache", default=FONT_CACHE_DIR,
+                              help=f"Font archive cache (default: {FONT_CACHE_DIR})")
+
+    fetch_cmd = sub.add_parser("fetch", help="Copy one artifact out of the store")
+    fetch_cmd.add_argument("key", help="Upstream URL or npm:<package>")
+    fetch_cmd.add_argument("--dest", required=True, help="Destination file, or directory ending in /")
+    fetch_cmd.add_argument("--offline", action="store_true", help="Never use the network")
+    fetch_cmd.add_argument("--mode", default="0644", help="File mode of the copy (default: 0644)")
+
+    list_cmd = sub.add_parser("list", help="Print the store index")
+    verify_cmd = sub.add_parser("verify", help="Re-hash every blob in the store")
+
+    for cmd in (prefetch_cmd, fetch_cmd, list_cmd, verify_cmd):
+        cmd.add_argument("--store", default=default_store(),
+                         help="Store directory (default: $COMPSETUP_ARTIFACT_DIR or ~/.cache/compsetup/artifacts)")
+    for cmd in (prefetch_cmd, fetch_cmd):
+        cmd.add_argument("--rewrite", action="append", default=[], metavar="PREFIX=REPLACEMENT",
+                         help="Download URLs starting with PREFIX from REPLACEMENT instead (repeatable)")
+        cmd.add_argument("--npm-registry", default=NPM_REGISTRY,
+                         help=f"npm registry base URL (default: {NPM_REGISTRY})")
+
+    args = parser.parse_args(argv)
+    store = ArtifactStore(args.store)
+
+    try:
+        if args.command == "list":
+            result = store.index
+        elif args.command == "verify":
+            result = store.verify()
+        elif args.command == "prefetch":
+            from manifest_resolver import load_yaml
+
+            manifest = load_yaml(args.packages_file).get("package_manifest") or {}
+            result = prefetch(manifest, args.os, args.arch, store, args.jobs,
+                              _rewrites(args.rewrite), args.npm_registry, args.font_cache)
+        else:
+            result = copy_out(store, args.key, args.dest, args.offline, _rewrites(args.rewrite),
+                              args.npm_registry, int(args.mode, 8))
+    except (OSError, ValueError, RuntimeError, urllib.error.URLError) as exc:
+        print(f"Error: {exc}", file=sys.stderr)
+        return 1
+
+    json.dump(result, sys.stdout)
+    sys.stdout.write("\n")
+    if args.command == "prefetch":
+        failed = [r for r in result["artifacts"] + result["fonts"] if r["status"] == "error"]
+        return 1 if failed else 0
+    if args.command == "verify":
+        return 1 if result["corrupt"] or result["missing"] else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
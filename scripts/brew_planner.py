@@ -0,0 +1,306 @@
+#!/usr/bin/env python3
+"""Snapshot-based Homebrew planner and batched installer for CompSetup.
+
+Takes one ``brew info --json=v2 --installed`` snapshot of the installed
+formulae and casks, plus one ``brew info --json=v2 --cask`` lookup of the
+requested casks' app artifacts, and computes:
+
+    - formulae and casks that are already installed (names, aliases,
+      old names and tap-qualified names all count)
+    - casks whose app bundle already exists outside Homebrew
+    - formulae skipped because the same name is requested as a cask
+    - cask/formula duplicates (installed formulae that also exist as
+      installed casks), which are uninstalled
+
+``apply`` installs the pending casks and formulae with one
+``brew install`` call each on the ARM brew. Only the items that fail
+there are retried individually, and only the ones that still fail fall
+back to the Intel brew under Rosetta, again in one batch.
+
+The planning functions are pure, so recorded JSON can be replayed on any
+OS with ``--installed-json``/``--cask-info-json``/``--apps-dir``.
+
+Output (stdout, JSON):
+    plan   -> {"formulae": {"present", "pending", "skipped_for_cask"},
+               "casks": {"present", "pending", "preexisting_app"},
+               "duplicates": [...]}
+    apply  -> plan + {"installed": {"formulae", "casks"},
+                      "intel": {"formulae", "casks"},
+                      "failed": {"formulae", "casks"},
+                      "uninstalled_duplicates": [...], "changed": bool}
+
+Usage:
+    brew_planner.py plan --formulae-json '["git"]' --casks-json '["docker"]'
+    brew_planner.py plan --installed-json tests/fixtures/brew/installed.json \\
+        --cask-info-json tests/fixtures/brew/cask-info.json --apps-dir /Applications ...
+    brew_planner.py apply --formulae-json ... --casks-json ...
+
+Exit codes:
+    0 - Plan computed / everything pending was installed
+    1 - brew could not be run or at least one item failed on both brews
+"""
+
+import argparse
+import json
+import os
+import re
+import shlex
+import subprocess
+import sys
+
+ARM_BREW = "/usr/bin/arch -arm64 /opt/homebrew/bin/brew"
+INTEL_BREW = "/usr/bin/arch -x86_64 /usr/local/bin/brew"
+ROSETTA_CMD = "/usr/sbin/softwareupdate --install-rosetta --agree-to-license"
+APP_DIRS = ("/Applications", os.path.join("~", "Applications"))
+
+# ---------------------------------------------------------------------------
+# Snapshot parsing (pure)
+# ---------------------------------------------------------------------------
+
+
+def _short(name):
+    """``homebrew/cask-fonts/font-x`` -> ``font-x``."""
+    return name.rsplit("/", 1)[-1]
+
+
+def installed_names(snapshot):
+    """Return ``(formula_names, cask_tokens)`` from ``brew info --json=v2 --installed``."""
+    formulae, casks = set(), set()
+    for formula in snapshot.get("formulae", []):
+        if not formula.get("installed"):
+            continue
+        for key in ("name", "full_name"):
+            if formula.get(key):
+                formulae.add(formula[key])
+        formulae.update(formula.get("aliases") or [])
+        formulae.update(formula.get("oldnames") or [])
+        if formula.get("oldname"):
+            formulae.add(formula["oldname"])  # brew < 4.3
+    for cask in snapshot.get("casks", []):
+        if not cask.get("installed"):
+            continue
+        for key in ("token", "full_token"):
+            if cask.get(key):
+                casks.add(cask[key])
+        casks.update(cask.get("old_tokens") or [])
+    return formulae, casks
+
+
+def cask_apps(cask_info):
+    """Map cask tokens to the ``.app`` bundle names their artifacts install."""
+    apps = {}
+    for cask in cask_info.get("casks", []):
+        names = []
+        for artifact in cask.get("artifacts", []):
+            if isinstance(artifact, dict):
+                for entry in artifact.get("app", []):
+                    if isinstance(entry, str):
+                        names.append(entry)
+                    elif isinstance(entry, dict) and entry.get("target"):
+                        names.append(entry["target"])
+        for key in ("token", "full_token"):
+            if cask.get(key):
+                apps[cask[key]] = [os.path.basename(n) for n in names]
+    return apps
+
+
+def _fuzzy_app_match(token, bundles):
+    """Name heuristic for casks without artifact data (e.g. an offline lookup)."""
+    pattern = _short(token).replace("-", " ").lower()
+    trimmed = re.sub(r"[0-9]+$", "", pattern).strip()
+    for bundle in bundles:
+        lower = bundle[:-4].lower() if bundle.endswith(".app") else bundle.lower()
+        if pattern in lower or (trimmed and trimmed in lower):
+            return bundle
+    return None
+
+
+def _present(name, names):
+    return name in names or _short(name) in names
+
+
+def plan(formulae, casks, snapshot, cask_info=None, bundles=()):
+    """Compute what to install; pure function of the recorded inputs."""
+    have_formulae, have_casks = installed_names(snapshot)
+    apps = cask_apps(cask_info or {})
+    bundles = set(bundles)
+    requested_casks = {_short(c) for c in casks}
+
+    result = {
+        "formulae": {"present": [], "pending": [], "skipped_for_cask": []},
+        "casks": {"present": [], "pending": [], "preexisting_app": {}},
+        "duplicates": sorted(n for n in have_formulae
+                             if "/" not in n and n in have_casks),
+    }
+    for cask in dict.fromkeys(casks):
+        if _present(cask, have_casks):
+            result["casks"]["present"].append(cask)
+            continue
+        known = apps.get(cask, apps.get(_short(cask)))
+        if known:
+            bundle = next((b for b in known if b in bundles), None)
+        else:
+            bundle = _fuzzy_app_match(cask, bundles)
+        if bundle:
+            result["casks"]["preexisting_app"][cask] = bundle
+        else:
+            result["casks"]["pending"].append(cask)
+    for formula in dict.fromkeys(formulae):
+        if _present(formula, have_formulae):
+            result["formulae"]["present"].append(formula)
+        elif _short(formula) in requested_casks:
+            result["formulae"]["skipped_for_cask"].append(formula)
+        else:
+            result["formulae"]["pending"].append(formula)
+    return result
+
+
+# ---------------------------------------------------------------------------
+# brew calls
+# ---------------------------------------------------------------------------
+
+def _brew_env():
+    env = dict(os.environ)
+    env["PATH"] = "/opt/homebrew/bin:/opt/homebrew/sbin:" + env.get("PATH", "")
+    return env
+
+
+def _run(cmd, capture=True):
+    return subprocess.run(cmd, stdout=subprocess.PIPE if capture else subprocess.DEVNULL,
+                          stderr=subprocess.PIPE if capture else subprocess.STDOUT,
+                          text=True, env=_brew_env())
+
+
+def brew_json(brew, args):
+    proc = _run([*brew, "info", "--json=v2", *args])
+    if proc.returncode != 0:
+        raise subprocess.CalledProcessError(proc.returncode, proc.args, proc.stdout, proc.stderr)
+    return json.loads(proc.stdout or "{}")
+
+
+def list_bundles(dirs=APP_DIRS):
+    bundles = set()
+    for directory in dirs:
+        try:
+            bundles.update(n for n in os.listdir(os.path.expanduser(directory)) if n.endswith(".app"))
+        except OSError:
+            continue
+    return bundles
+
+
+def _install(brew, names, cask):
+    """Install *names* in one call; retry singly on failure. Return the failures."""
+    if not names:
+        return []
+    base = [*brew, "install", *(["--cask"] if cask else [])]
+    if _run([*base, *names], capture=False).returncode == 0:
+        return []
+    if len(names) == 1:
+        return list(names)
+    return [name for name in names if _run([*base, name], capture=False).returncode != 0]
+
+
+def apply_plan(result, snapshot, brew, intel_brew, rosetta_cmd):
+    """Install everything pending and remove cask/formula duplicates.
+
+    Duplicates are the ones in the plan plus installed formulae shadowed
+    by a cask this run installed; casks that failed never trigger an
+    uninstall.
+    """
+    result = dict(result)
+    installed = {"formulae": [], "casks": []}
+    intel = {"formulae": [], "casks": []}
+    failed = {"formulae": [], "casks": []}
+    intel_ok = bool(intel_brew) and os.path.exists(intel_brew[-1])
+    rosetta_done = False
+
+    for kind, cask in (("casks", True), ("formulae", False)):
+        pending = result[kind]["pending"]
+        arm_failed = _install(brew, pending, cask)
+        installed[kind] = [n for n in pending if n not in arm_failed]
+        if arm_failed and intel_ok:
+            if not rosetta_done and rosetta_cmd and os.path.exists(rosetta_cmd[0]):
+                _run(rosetta_cmd, capture=False)
+                rosetta_done = True
+            still_failed = _install(intel_brew, arm_failed, cask)
+            intel[kind] = [n for n in arm_failed if n not in still_failed]
+            arm_failed = still_failed
+        failed[kind] = arm_failed
+
+    new_casks = {_short(c) for c in installed["casks"] + intel["casks"]}
+    have_formulae, _ = installed_names(snapshot)
+    duplicates = sorted(set(result["duplicates"])
+                        | {n for n in have_formulae if "/" not in n and n in new_casks})
+    removed = []
+    if duplicates:
+        if _run([*brew, "uninstall", "--formula", *duplicates], capture=False).returncode == 0:
+            removed = duplicates
+
+    result.update(installed=installed, intel=intel, failed=failed, uninstalled_duplicates=removed)
+    result["changed"] = bool(removed or any(installed.values()) or any(intel.values()))
+    return result
+
+
+# ---------------------------------------------------------------------------
+# Main
+# ---------------------------------------------------------------------------
+
+def _load_json(path):
+    with open(path, "r") as fh:
+        return json.load(fh)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Snapshot-based Homebrew planner for CompSetup")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    for name, help_text in (("plan", "Show what is present, pending and duplicated"),
+                            ("apply", "Install everything pending in batched brew calls")):
+        cmd = sub.add_parser(name, help=help_text)
+        cmd.add_argument("--formulae-json", default="[]", help="JSON list of formulae")
+        cmd.add_argument("--casks-json", default="[]", help="JSON list of casks")
+        cmd.add_argument("--brew", default=ARM_BREW, help=f"ARM brew command (default: {ARM_BREW})")
+        cmd.add_argument("--intel-brew", default=INTEL_BREW,
+                         help=f"Intel fallback brew command, '' to disable (default: {INTEL_BREW})")
+        cmd.add_argument("--rosetta-cmd", default=ROSETTA_CMD, help="Command that installs Rosetta")
+        cmd.add_argument("--installed-json", metavar="FILE",
+                         help="Recorded 'brew info --json=v2 --installed' output")
+        cmd.add_argument("--cask-info-json", metavar="FILE",
+                         help="Recorded 'brew info --json=v2 --cask ...' output")
+        cmd.add_argument("--apps-dir", action="append", default=[], metavar="DIR",
+                         help="Directory to scan for .app bundles (default: /Applications, ~/Applications)")
+
+    args = parser.parse_args(argv)
+    brew = shlex.split(args.brew)
+    intel_brew = shlex.split(args.intel_brew)
+
+    try:
+        formulae = json.loads(args.formulae_json)
+        casks = json.loads(args.casks_json)
+        if args.installed_json:
+            snapshot = _load_json(args.installed_json)
+        else:
+            snapshot = brew_json(brew, ["--installed"])
+        if args.cask_info_json:
+            cask_info = _load_json(args.cask_info_json)
+        else:
+            have = installed_names(snapshot)[1]
+            lookup = [c for c in casks if not _present(c, have)]
+            try:
+                cask_info = brew_json(brew, ["--cask", *lookup]) if lookup else {}
+            except (subprocess.CalledProcessError, ValueError):
+                cask_info = {}  # unknown token; fall back to the name heuristic
+        result = plan(formulae, casks, snapshot, cask_info, list_bundles(args.apps_dir or APP_DIRS))
+        if args.command == "apply":
+            result = apply_plan(result, snapshot, brew, intel_brew, shlex.split(args.rosetta_cmd))
+    except (OSError, ValueError, subprocess.CalledProcessError) as exc:
+        print(f"Error: {exc}", file=sys.stderr)
+        return 1
+
+    json.dump(result, sys.stdout)
+    sys.stdout.write("\n")
+    return 1 if any(result.get("failed", {}).values()) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
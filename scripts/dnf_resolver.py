@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+"""Batch dnf availability and group resolver for CompSetup.
+
+Classifies a list of rpm package names and ``@group`` entries with one
+``dnf repoquery`` and one ``dnf group list`` call against the cached
+metadata, instead of one ``dnf info`` process per package.
+
+Snapshot sources:
+    dnf repoquery --whatprovides=NAME,...   - default; tries --cacheonly
+                                              first, then a normal query
+    --repoquery-output FILE                 - recorded repoquery output
+    --group-output FILE                     - recorded ``dnf group list`` output
+
+Output (stdout, JSON):
+    {"available": [...], "provides": {"name": ["provider", ...]},
+     "missing": [...], "groups": {"valid": [...], "missing": [...]}}
+
+    available - a package with exactly this name exists
+    provides  - no package has this name, but these packages provide it
+                (dnf can still install it by that name)
+    missing   - nothing in the enabled repositories matches
+    groups    - ``@id`` entries validated against the group and
+                environment ids (``@^id`` is an environment)
+
+Usage:
+    dnf_resolver.py resolve git ripgrep @development-tools
+    dnf_resolver.py resolve --repoquery-output tests/fixtures/dnf/repoquery.txt \\
+        --group-output tests/fixtures/dnf/groups-dnf4.txt git @development-tools
+
+Exit codes:
+    0 - Resolution succeeded (even if some names are missing)
+    1 - dnf could not be run or a recorded output file could not be read
+"""
+
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+
+# Each package record starts with this marker, followed by its provides
+REPOQUERY_FORMAT = "@@%{name}\n%{provides}\n"
+
+# ---------------------------------------------------------------------------
+# Snapshot parsing
+# ---------------------------------------------------------------------------
+
+
+def parse_repoquery(stream):
+    """Map package names to the set of capabilities they provide.
+
+    Reads the output of ``dnf repoquery --qf REPOQUERY_FORMAT``. Version
+    constraints are dropped, so ``bash = 5.2.26-3.fc40`` becomes ``bash``.
+    """
+    providers = {}
+    current = None
+    for raw_line in stream:
+        line = raw_line.strip()
+        if not line:
+            continue
+        if line.startswith("@@"):
+            current = providers.setdefault(line[2:], set())
+            current.add(line[2:])
+        elif current is not None:
+            current.add(line.split(" ", 1)[0])
+    return providers
+
+
+_GROUP_ID_RE = re.compile(r"\(([A-Za-z0-9_.+-]+)\)\s*$")
+_GROUP_HEADERS = ("id", "available", "installed", "last metadata", "updating", "environment",
+                  "group", "hidden", "repo")
+
+
+def parse_group_ids(stream):
+    """Return the set of group/environment ids from ``dnf group list`` output.
+
+    Understands dnf4 ``group list --ids --hidden`` lines (``Name (id)``)
+    and the dnf5 table whose first column is the id.
+    """
+    ids = set()
+    for raw_line in stream:
+        line = raw_line.strip()
+        if not line:
+            continue
+        match = _GROUP_ID_RE.search(line)
+        if match:
+            ids.add(match.group(1).lower())
+            continue
+        first = line.split()[0]
+        if line.lower().startswith(_GROUP_HEADERS) or line.endswith(":"):
+            continue
+        if re.fullmatch(r"[a-z0-9_.+-]+", first):
+            ids.add(first)
+    return ids
+
+
+class DnfIndex:
+    """Snapshot of which packages exist and what they provide."""
+
+    def __init__(self, providers=None, group_ids=None):
+        self.providers = providers if providers is not None else {}
+        self.group_ids = group_ids if group_ids is not None else set()
+        self._by_capability = {}
+        for pkg, caps in self.providers.items():
+            for cap in caps:
+                self._by_capability.setdefault(cap, set()).add(pkg)
+
+    def resolve(self, names):
+        """Classify *names*; ``@`` entries are checked as groups."""
+        result = {"available": [], "provides": {}, "missing": [],
+                  "groups": {"valid": [], "missing": []}}
+        seen = set()
+        for name in names:
+            if not name or name in seen:
+                continue
+            seen.add(name)
+            if name.startswith("@"):
+                group_id = name.lstrip("@^").lower()
+                result["groups"]["valid" if group_id in self.group_ids else "missing"].append(name)
+            elif name in self.providers:
+                result["available"].append(name)
+            elif name in self._by_capability:
+                result["provides"][name] = sorted(self._by_capability[name])
+            else:
+                result["missing"].append(name)
+        return result
+
+
+# ---------------------------------------------------------------------------
+# dnf queries
+# ---------------------------------------------------------------------------
+
+def _dnf_env():
+    env = dict(os.environ)
+    env["LC_ALL"] = "C"
+    return env
+
+
+def _run_dnf(dnf, *variants):
+    """Run the first dnf argument list that succeeds and return its stdout.
+
+    Each variant is tried against the metadata cache first and only
+    refreshes metadata if there is no usable cache. Later variants cover
+    options that only one of dnf4/dnf5 understands.
+    """
+    proc = None
+    for args in variants:
+        for extra in (["--cacheonly"], []):
+            proc = subprocess.run(
+                [dnf, "--quiet", *extra, *args],
+                stdout=subprocess.PIPE,
+                stderr=subprocess.PIPE,
+                text=True,
+                env=_dnf_env(),
+            )
+            if proc.returncode == 0:
+                return proc.stdout
+    raise subprocess.CalledProcessError(proc.returncode, proc.args, proc.stdout, proc.stderr)
+
+
+def query_providers(names, dnf="dnf"):
+    """Query every package name and capability in one repoquery call."""
+    if not names:
+        return {}
+    output = _run_dnf(dnf, ["repoquery", f"--whatprovides={','.join(names)}",
+                            "--qf", REPOQUERY_FORMAT])
+    return parse_repoquery(output.splitlines())
+
+
+def query_group_ids(dnf="dnf"):
+    # dnf4 needs --ids to print them; dnf5 always shows an ID column
+    output = _run_dnf(dnf, ["group", "list", "--hidden", "--ids"], ["group", "list", "--hidden"])
+    return parse_group_ids(output.splitlines())
+
+
+def _read_lines(path):
+    with open(path, "r", encoding="utf-8", errors="replace") as fh:
+        return fh.readlines()
+
+
+def resolve(names, repoquery_output=None, group_output=None, dnf="dnf"):
+    """Classify *names* with one package snapshot and one group snapshot."""
+    names = list(names)
+    packages = [n for n in names if n and not n.startswith("@")]
+    groups = [n for n in names if n.startswith("@")]
+
+    if repoquery_output:
+        providers = parse_repoquery(_read_lines(repoquery_output))
+    else:
+        providers = query_providers(packages, dnf)
+    group_ids = set()
+    if group_output:
+        group_ids = parse_group_ids(_read_lines(group_output))
+    elif groups:
+        group_ids = query_group_ids(dnf)
+    return DnfIndex(providers, group_ids).resolve(names)
+
+
+# ---------------------------------------------------------------------------
+# Main
+# ---------------------------------------------------------------------------
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Batch dnf availability and group resolver for CompSetup")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    cmd = sub.add_parser("resolve", help="Classify package names and @groups")
+    cmd.add_argument("names", nargs="*", help="Package names, capabilities or @group ids")
+    cmd.add_argument("--repoquery-output", metavar="FILE",
+                     help="Parse recorded repoquery output instead of calling dnf")
+    cmd.add_argument("--group-output", metavar="FILE",
+                     help="Parse recorded 'dnf group list' output instead of calling dnf")
+    cmd.add_argument("--dnf", default="dnf", help="dnf binary to use (default: dnf)")
+
+    args = parser.parse_args(argv)
+
+    try:
+        result = resolve(args.names, args.repoquery_output, args.group_output, args.dnf)
+    except (OSError, subprocess.CalledProcessError) as exc:
+        print(f"Error: {exc}", file=sys.stderr)
+        return 1
+
+    json.dump(result, sys.stdout)
+    sys.stdout.write("\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
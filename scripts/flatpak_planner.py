@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""Single-pass Flatpak install planner for CompSetup.
+
+Takes one snapshot of the installed system apps with
+``flatpak list --app --columns=application``, diffs it against the
+requested app IDs, and installs everything that is missing in a single
+``flatpak install`` transaction.
+
+Output (stdout, JSON):
+    plan   -> {"present": [...], "missing": [...]}
+    apply  -> {"present": [...], "missing": [...],
+               "installed": [...], "failed": [...], "changed": bool}
+
+If the batched transaction fails, each missing app is retried on its own
+so a single broken ref does not block the rest and ``failed`` names the
+culprits.
+
+Usage:
+    flatpak_planner.py plan com.brave.Browser org.gimp.GIMP
+    flatpak_planner.py apply --remote flathub com.brave.Browser org.gimp.GIMP
+    flatpak_planner.py apply --flatpak ./fake-flatpak ...   # test stand-in
+
+Exit codes:
+    0 - Plan computed / every missing app installed
+    1 - flatpak could not be run or at least one app failed to install
+"""
+
+import argparse
+import json
+import subprocess
+import sys
+
+# ---------------------------------------------------------------------------
+# Snapshot and diff
+# ---------------------------------------------------------------------------
+
+
+def parse_app_list(text):
+    """Return the set of application IDs from ``--columns=application`` output."""
+    apps = set()
+    for line in text.splitlines():
+        app = line.strip()
+        # Older flatpak versions print a header row even with --columns
+        if app and app != "Application ID":
+            apps.add(app)
+    return apps
+
+
+def installed_apps(flatpak="flatpak", scope="--system"):
+    """Snapshot the installed apps with a single ``flatpak list`` call."""
+    proc = subprocess.run(
+        [flatpak, "list", scope, "--app", "--columns=application"],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        text=True,
+        check=True,
+    )
+    return parse_app_list(proc.stdout)
+
+
+def plan(requested, installed):
+    """Split *requested* into present and missing apps, keeping order."""
+    present, missing = [], []
+    seen = set()
+    for app in requested:
+        if not app or app in seen:
+            continue
+        seen.add(app)
+        (present if app in installed else missing).append(app)
+    return {"present": present, "missing": missing}
+
+
+# ---------------------------------------------------------------------------
+# Install
+# ---------------------------------------------------------------------------
+
+def _install(flatpak, scope, remote, apps):
+    cmd = [flatpak, "install", scope, "--assumeyes", "--noninteractive", remote, *apps]
+    return subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+
+
+def apply_plan(result, flatpak="flatpak", scope="--system", remote="flathub"):
+    """Install ``result["missing"]`` in one transaction, retrying singly on failure."""
+    result = dict(result, installed=[], failed=[])
+    missing = result["missing"]
+    if missing:
+        if _install(flatpak, scope, remote, missing).returncode == 0:
+            result["installed"] = list(missing)
+        else:
+            for app in missing:
+                if _install(flatpak, scope, remote, [app]).returncode == 0:
+                    result["installed"].append(app)
+                else:
+                    result["failed"].append(app)
+    result["changed"] = bool(result["installed"])
+    return result
+
+
+# ---------------------------------------------------------------------------
+# Main
+# ---------------------------------------------------------------------------
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Single-pass Flatpak install planner for CompSetup")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    for name, help_text in (("plan", "Show which apps are present and missing"),
+                            ("apply", "Install every missing app in one transaction")):
+        cmd = sub.add_parser(name, help=help_text)
+        cmd.add_argument("apps", nargs="*", help="Flatpak application IDs")
+        cmd.add_argument("--remote", default="flathub", help="Remote to install from (default: flathub)")
+        cmd.add_argument("--user", action="store_true",
+                         help="Use the per-user installation instead of --system")
+        cmd.add_argument("--flatpak", default="flatpak", help="flatpak binary to use (default: flatpak)")
+
+    args = parser.parse_args(argv)
+
+    scope = "--user" if args.user else "--system"
+    try:
+        result = plan(args.apps, installed_apps(args.flatpak, scope))
+        if args.command == "apply":
+            result = apply_plan(result, args.flatpak, scope, args.remote)
+    except (OSError, subprocess.CalledProcessError) as exc:
+        print(f"Error: {exc}", file=sys.stderr)
+        return 1
+
+    json.dump(result, sys.stdout)
+    sys.stdout.write("\n")
+    return 1 if result.get("failed") else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+"""Fleet mode for CompSetup: provision many workstations in one run.
+
+Runs site.yml against every host of an inventory group (default
+``fleet``) with the free strategy, so fast desks never wait for slow ones.
+Each host declares what it is supposed to be:
+
+    compsetup_os     - ubuntu, pop_os, debian, fedora, macos, ...
+    compsetup_arch   - x86_64, aarch64/arm64
+    compsetup_omit   - list of manifest names to skip on this host
+
+site.yml fails a host early when its facts disagree with the declared
+os/arch. Before the play starts the controller does the shared work
+once: packages.yml is compiled into the controller's manifest cache (the
+``compsetup_targets`` filter runs on the controller for every host), and
+the Nerd Font archives are fetched into ``--shared-cache``/fonts, which
+every host is seeded from instead of downloading them itself.
+
+An HTTP caching proxy (apt-cacher-ng, squid) given as
+``--package-proxy`` is configured for apt and dnf on every host so the
+packages themselves are only fetched once as well.
+
+Output:
+    plan -> JSON: {"group", "hosts": [{"host", "os", "arch", "omit",
+                   "targets": {backend: count}}], "errors": [...]}
+    run  -> ansible-playbook output, then a per-host recap
+            (scripts/timing_report.py hosts)
+
+Usage:
+    fleet.py plan -i fleet.yml
+    fleet.py run -i fleet.yml --forks 20 --package-proxy http://cache:3142
+    fleet.py run -i fleet.yml -- --extra-vars skip_ai_tools=true
+
+Exit codes:
+    0 - Plan is valid / every host finished without failures
+    1 - Invalid inventory, or at least one host failed or was unreachable
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+from font_fetcher import prefetch_fonts
+from manifest_resolver import load_compiled, load_yaml, select_targets
+from timing_report import host_summary, load_run, print_hosts, timing_dir
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PLAYBOOK = os.path.join(REPO_DIR, "site.yml")
+PACKAGES_FILE = os.path.join(REPO_DIR, "packages.yml")
+DEFAULT_GROUP = "fleet"
+DEFAULT_SHARED_CACHE = os.path.join("~", ".cache", "compsetup", "fleet")
+
+# compsetup_os value -> (backend targets to count, distribution id)
+OS_BACKENDS = {
+    "macos": ("brew", ""), "darwin": ("brew", ""),
+    "ubuntu": ("apt", "ubuntu"), "pop_os": ("apt", "pop_os"), "debian": ("apt", "debian"),
+    "fedora": ("rpm", "fedora"), "redhat": ("rpm", "redhat"),
+}
+ARCHES = {"x86_64": "x86_64", "amd64": "x86_64", "aarch64": "aarch64", "arm64": "aarch64"}
+
+# ---------------------------------------------------------------------------
+# Inventory
+# ---------------------------------------------------------------------------
+
+
+def read_inventory(inventory, inventory_json=None):
+    """Return ``ansible-inventory --list`` output for *inventory*."""
+    if inventory_json:
+        with open(inventory_json, "r") as fh:
+            return json.load(fh)
+    proc = subprocess.run(["ansible-inventory", "-i", inventory, "--list"],
+                          stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, cwd=REPO_DIR)
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.strip() or "ansible-inventory failed")
+    return json.loads(proc.stdout)
+
+
+def group_hosts(listing, group):
+    """All hosts of *group*, including those of its child groups."""
+    hosts, stack, seen = [], [group], set()
+    while stack:
+        name = stack.pop()
+        if name in seen:
+            continue
+        seen.add(name)
+        entry = listing.get(name) or {}
+        hosts.extend(h for h in entry.get("hosts", []) if h not in hosts)
+        stack.extend(entry.get("children", []))
+    return hosts
+
+
+def plan(listing, group, compiled):
+    """Validate per-host declarations and count each host's install targets."""
+    hostvars = listing.get("_meta", {}).get("hostvars", {})
+    result = {"group": group, "hosts": [], "errors": []}
+    hosts = group_hosts(listing, group)
+    if not hosts:
+        result["errors"].append(f"group '{group}' has no hosts")
+    for host in sorted(hosts):
+        hv = hostvars.get(host, {})
+        os_name = str(hv.get("compsetup_os", "")).lower()
+        arch = ARCHES.get(str(hv.get("compsetup_arch", "")).lower())
+        omit = hv.get("compsetup_omit") or []
+        if isinstance(omit, str):
+            omit = omit.split()
+        rec = {"host": host, "os": os_name or None, "arch": arch, "omit": omit, "targets": {}}
+        if os_name not in OS_BACKENDS:
+            result["errors"].append(f"{host}: compsetup_os must be one of {', '.join(sorted(OS_BACKENDS))}")
+        elif arch is None:
+            result["errors"].append(f"{host}: compsetup_arch must be one of {', '.join(sorted(ARCHES))}")
+        else:
+            backend, distribution = OS_BACKENDS[os_name]
+            targets = select_targets(compiled, distribution, (), arch, omit)
+            if backend == "brew":
+                keys = ("brew_formulae", "brew_casks")
+            else:
+                keys = (f"{backend}_packages", "flatpak_apps")
+            keys += ("vscode_extensions",)
+            rec["targets"] = {key: len(targets[key]) for key in keys}
+        result["hosts"].append(rec)
+    return result
+
+
+# ---------------------------------------------------------------------------
+# Shared cache and run
+# ---------------------------------------------------------------------------
+
+def warm_shared_cache(shared_cache, jobs=8):
+    """Fetch every font archive once on the controller."""
+    fonts = (load_yaml(PACKAGES_FILE).get("package_manifest") or {}).get("fonts") or []
+    return prefetch_fonts(fonts, os.path.join(shared_cache, "fonts"), jobs)
+
+
+def run_playbook(inventory, group, forks, shared_cache, package_proxy, extra):
+    extra_vars = {"compsetup_hosts": group, "compsetup_shared_cache": shared_cache}
+    if package_proxy:
+        extra_vars["compsetup_package_proxy"] = package_proxy
+    env = dict(os.environ, ANSIBLE_FORKS=str(forks), ANSIBLE_STRATEGY="free")
+    cmd = ["ansible-playbook", "-i", inventory, PLAYBOOK,
+           "--extra-vars", json.dumps(extra_vars), *extra]
+    return subprocess.run(cmd, env=env, cwd=REPO_DIR).returncode
+
+
+# ---------------------------------------------------------------------------
+# Main
+# ---------------------------------------------------------------------------
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Fleet mode for CompSetup")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    plan_cmd = sub.add_parser("plan", help="Validate the inventory and show per-host targets")
+    run_cmd = sub.add_parser("run", help="Provision every host of the group concurrently")
+    for cmd in (plan_cmd, run_cmd):
+        cmd.add_argument("-i", "--inventory", required=True, help="Ansible inventory of the fleet")
+        cmd.add_argument("--group", default=DEFAULT_GROUP, help=f"Inventory group (default: {DEFAULT_GROUP})")
+        cmd.add_argument("--inventory-json", metavar="FILE",
+                         help="Recorded 'ansible-inventory --list' output instead of running it")
+    run_cmd.add_argument("--forks", type=int, default=10, help="Hosts provisioned at once (default: 10)")
+    run_cmd.add_argument("--shared-cache", default=DEFAULT_SHARED_CACHE,
+                         help=f"Controller cache shared by all hosts (default: {DEFAULT_SHARED_CACHE})")
+    run_cmd.add_argument("--package-proxy", metavar="URL",
+                         help="HTTP caching proxy for apt/dnf on every host")
+    run_cmd.add_argument("--no-prefetch", action="store_true", help="Do not warm the shared cache first")
+    run_cmd.add_argument("ansible_args", nargs=argparse.REMAINDER,
+                         help="Extra ansible-playbook arguments after '--'")
+
+    args = parser.parse_args(argv)
+
+    try:
+        compiled = load_compiled(PACKAGES_FILE)
+        result = plan(read_inventory(args.inventory, args.inventory_json), args.group, compiled)
+    except (OSError, ValueError, RuntimeError) as exc:
+        print(f"Error: {exc}", file=sys.stderr)
+        return 1
+
+    if args.command == "plan":
+        json.dump(result, sys.stdout, indent=2)
+        sys.stdout.write("\n")
+        return 1 if result["errors"] else 0
+
+    if result["errors"]:
+        for error in result["errors"]:
+            print(f"Error: {error}", file=sys.stderr)
+        return 1
+
+    shared_cache = os.path.abspath(os.path.expanduser(args.shared_cache))
+    if not args.no_prefetch:
+        try:
+            fonts = warm_shared_cache(shared_cache)
+        except (OSError, ValueError) as exc:
+            print(f"Error: could not warm {shared_cache}: {exc}", file=sys.stderr)
+            return 1
+        for font in fonts["fonts"]:
+            if font["status"] == "error":
+                print(f"Warning: {font['name']}: {font['error']}", file=sys.stderr)
+
+    extra = [a for a in args.ansible_args if a != "--"]
+    rc = run_playbook(args.inventory, args.group, max(1, args.forks), shared_cache,
+                      args.package_proxy, extra)
+
+    try:
+        rows = host_summary(load_run(os.path.join(timing_dir(), "latest.json")))
+    except (OSError, ValueError) as exc:
+        print(f"Warning: no per-host summary: {exc}", file=sys.stderr)
+        return 1 if rc else 0
+    print()
+    print_hosts(rows)
+    return 1 if rc or any(r["failed"] or r["unreachable"] for r in rows) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
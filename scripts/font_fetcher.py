@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+"""Parallel, cache-backed Nerd Font fetcher for CompSetup.
+
+Downloads the font archives listed in ``package_manifest.fonts``
+concurrently, keeps them in a persistent content-addressed cache and
+extracts only the matching ``.ttf``/``.otf`` members straight from the
+cached archive into the destination directory.
+
+Cache layout (default ``~/.cache/compsetup/fonts``):
+    blobs/<sha256>.zip   - archive contents, named by their sha256
+    index.json           - {url: {"sha256", "etag", "last_modified"}}
+
+A cached URL is revalidated with ``If-None-Match``/``If-Modified-Since``
+so a warm cache costs one small request per font; ``--offline`` skips
+the network entirely when a blob is cached. ``--download-only`` fills the
+cache without extracting anything, e.g. to warm one shared cache on the
+controller before a fleet run (scripts/fleet.py).
+
+Input (``--fonts-json``): a JSON list of manifest font entries, e.g.
+    [{"name": "font-0xproto-nerd-font",
+      "linux": {"url": "...", "dest": "~/.local/share/fonts", "pattern": "0xProto*"}}]
+
+Output (stdout, JSON):
+    {"fonts": [{"name", "status", "files"}], "changed": bool}
+
+    status is one of: present, cached, downloaded, error
+
+Exit codes:
+    0 - All fonts present or installed
+    1 - At least one font failed
+"""
+
+import argparse
+import concurrent.futures
+import fnmatch
+import hashlib
+import io
+import json
+import os
+import sys
+import tempfile
+import threading
+import urllib.error
+import urllib.request
+import zipfile
+
+FONT_EXTENSIONS = (".ttf", ".otf")
+DEFAULT_CACHE_DIR = os.path.join("~", ".cache", "compsetup", "fonts")
+DEFAULT_DEST = os.path.join("~", ".local", "share", "fonts")
+
+# ---------------------------------------------------------------------------
+# Content-addressed cache
+# ---------------------------------------------------------------------------
+
+
+def _atomic_write(path, data):
+    """Write *data* to *path* via a temp file in the same directory."""
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "wb") as fh:
+            fh.write(data)
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+        raise
+
+
+class BlobCache:
+    """Archive cache keyed by URL plus ETag/Last-Modified, stored by sha256."""
+
+    def __init__(self, root):
+        self.root = os.path.expanduser(root)
+        self.index_path = os.path.join(self.root, "index.json")
+        self._lock = threading.Lock()
+        try:
+            with open(self.index_path, "r") as fh:
+                self.index = json.load(fh)
+        except (OSError, ValueError):
+            self.index = {}
+
+    def blob_path(self, digest):
+        return os.path.join(self.root, "blobs", f"{digest}.zip")
+
+    def lookup(self, url):
+        """Return the index entry for *url* if its blob is still on disk."""
+        with self._lock:
+            entry = self.index.get(url)
+        if entry and os.path.isfile(self.blob_path(entry["sha256"])):
+            return entry
+        return None
+
+    def read(self, entry):
+        with open(self.blob_path(entry["sha256"]), "rb") as fh:
+            data = fh.read()
+        if hashlib.sha256(data).hexdigest() != entry["sha256"]:
+            raise ValueError("cached archive is corrupt")
+        return data
+
+    def store(self, url, data, etag=None, last_modified=None):
+        digest = hashlib.sha256(data).hexdigest()
+        path = self.blob_path(digest)
+        if not os.path.isfile(path):
+            _atomic_write(path, data)
+        entry = {"sha256": digest, "etag": etag, "last_modified": last_modified}
+        with self._lock:
+            self.index[url] = entry
+        return entry
+
+    def save(self):
+        with self._lock:
+            payload = json.dumps(self.index, indent=2, sort_keys=True).encode()
+        _atomic_write(self.index_path, payload)
+
+
+# ---------------------------------------------------------------------------
+# Fetch and extract
+# ---------------------------------------------------------------------------
+
+def fetch(url, cache, offline=False, timeout=60, source=None):
+    """Return ``(archive_bytes, from_cache)`` for *url*.
+
+    *source* downloads from another location (e.g. a local mirror) while
+    still caching the archive under *url*.
+    """
+    entry = cache.lookup(url)
+    if entry and offline:
+        return cache.read(entry), True
+    if offline:
+        raise RuntimeError(f"{url} is not cached and --offline was given")
+
+    request = urllib.request.Request(source or url, headers={"User-Agent": "compsetup-font-fetcher"})
+    if entry:
+        if entry.get("etag"):
+            request.add_header("If-None-Match", entry["etag"])
+        if entry.get("last_modified"):
+            request.add_header("If-Modified-Since", entry["last_modified"])
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as resp:
+            data = resp.read()
+            etag = resp.headers.get("ETag")
+            last_modified = resp.headers.get("Last-Modified")
+    except urllib.error.HTTPError as exc:
+        if exc.code == 304 and entry:
+            return cache.read(entry), True
+        raise
+    cache.store(url, data, etag, last_modified)
+    return data, False
+
+
+def extract_fonts(data, dest, pattern="*"):
+    """Extract font members matching *pattern* from zip *data* into *dest*.
+
+    Members are flattened into *dest* by basename. Returns the number of
+    files written.
+    """
+    os.makedirs(dest, exist_ok=True)
+    written = 0
+    with zipfile.ZipFile(io.BytesIO(data)) as archive:
+        for member in archive.infolist():
+            if member.is_dir():
+                continue
+            base = os.path.basename(member.filename)
+            if not base.lower().endswith(FONT_EXTENSIONS):
+                continue
+            if not fnmatch.fnmatch(base, pattern):
+                continue
+            _atomic_write(os.path.join(dest, base), archive.read(member))
+            written += 1
+    return written
+
+
+def fonts_present(dest, pattern):
+    """Return True if *dest* already holds a file matching *pattern*."""
+    try:
+        return any(fnmatch.fnmatch(name, pattern) for name in os.listdir(dest))
+    except OSError:
+        return False
+
+
+def install_font(font, cache, offline=False, force=False):
+    """Fetch and extract a single manifest font entry."""
+    linux = font.get("linux") or {}
+    dest = os.path.expanduser(linux.get("dest") or DEFAULT_DEST)
+    pattern = linux.get("pattern") or "*"
+    result = {"name": font.get("name", ""), "status": "present", "files": 0}
+    try:
+        if not force and fonts_present(dest, pattern):
+            return result
+        data, from_cache = fetch(linux["url"], cache, offline)
+        result["files"] = extract_fonts(data, dest, pattern)
+        result["status"] = "cached" if from_cache else "downloaded"
+    except Exception as exc:  # reported per font, never aborts the batch
+        result["status"] = "error"
+        result["error"] = str(exc)
+    return result
+
+
+def install_fonts(fonts, cache_dir=DEFAULT_CACHE_DIR, jobs=4, offline=False, force=False):
+    """Install *fonts* concurrently and return the JSON-ready summary."""
+    cache = BlobCache(cache_dir)
+    fonts = [f for f in fonts if (f.get("linux") or {}).get("url")]
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max(1, jobs)) as pool:
+        results = list(pool.map(lambda f: install_font(f, cache, offline, force), fonts))
+    cache.save()
+    changed = any(r["status"] in ("cached", "downloaded") and r["files"] for r in results)
+    return {"fonts": results, "changed": changed}
+
+
+def prefetch_fonts(fonts, cache_dir=DEFAULT_CACHE_DIR, jobs=4, rewrite=None):
+    """Download (or revalidate) every font archive into the cache only.
+
+    *rewrite* maps an upstream URL to the URL to download it from.
+    """
+    cache = BlobCache(cache_dir)
+    fonts = [f for f in fonts if (f.get("linux") or {}).get("url")]
+
+    def one(font):
+        result = {"name": font.get("name", ""), "status": "cached", "files": 0}
+        try:
+            url = font["linux"]["url"]
+            _, from_cache = fetch(url, cache, source=rewrite(url) if rewrite else None)
+            result["status"] = "cached" if from_cache else "downloaded"
+        except Exception as exc:  # reported per font, never aborts the batch
+            result["status"] = "error"
+            result["error"] = str(exc)
+        return result
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max(1, jobs)) as pool:
+        results = list(pool.map(one, fonts))
+    cache.save()
+    return {"fonts": results, "changed": any(r["status"] == "downloaded" for r in results)}
+
+
+# ---------------------------------------------------------------------------
+# Main
+# ---------------------------------------------------------------------------
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Parallel, cache-backed Nerd Font fetcher for CompSetup")
+    parser.add_argument("--fonts-json", required=True,
+                        help="JSON list of font entries from package_manifest.fonts")
+    parser.add_argument("--cache-dir", default=DEFAULT_CACHE_DIR,
+                        help=f"Archive cache directory (default: {DEFAULT_CACHE_DIR})")
+    parser.add_argument("--jobs", type=int, default=4, help="Concurrent downloads (default: 4)")
+    parser.add_argument("--offline", action="store_true", help="Only use cached archives")
+    parser.add_argument("--force", action="store_true",
+                        help="Re-extract even when matching font files already exist")
+    parser.add_argument("--download-only", action="store_true",
+                        help="Only fill the archive cache; do not extract fonts")
+    args = parser.parse_args(argv)
+
+    try:
+        fonts = json.loads(args.fonts_json)
+    except ValueError as exc:
+        print(f"Error: invalid --fonts-json: {exc}", file=sys.stderr)
+        return 1
+
+    if args.download_only:
+        result = prefetch_fonts(fonts, args.cache_dir, args.jobs)
+    else:
+        result = install_fonts(fonts, args.cache_dir, args.jobs, args.offline, args.force)
+    json.dump(result, sys.stdout)
+    sys.stdout.write("\n")
+    return 1 if any(r["status"] == "error" for r in result["fonts"]) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
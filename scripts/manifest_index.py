@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+"""Compact selector index for CompSetup's package manifest.
+
+The package selector only needs, per OS and architecture, the ordered
+list of ``(category, display name, identifier)`` rows to draw its first
+page. This module stores exactly that as a per-view index file next to
+the compiled manifest cache:
+
+    <cache>/<key>.<os>.<x86_64|other>.json
+    {"index_version", "compiler_version", "mtime_ns", "size",
+     "cats": [...], "counts": [...],       - categories and their sizes
+     "ids": [...], "displays": [...],      - "" when display == id
+     "details": [...]}                     - per-item JSON, decoded lazily
+
+An index is trusted while the manifest's mtime and size match. Otherwise
+it is rebuilt from ``manifest_resolver.load_compiled``, which itself only
+re-parses packages.yml when its content changed. Rows become ``Item``
+records (``__slots__``, details decoded on first use), and descriptions
+come from ``package_descriptions.json``, read the first time one is
+needed.
+
+Usage:
+    manifest_index.py build --packages-file packages.yml --os ubuntu --arch x86_64
+    manifest_index.py synthetic 10000 > /tmp/big.yml
+
+Output (stdout, JSON):
+    build     -> {"os", "arch", "items", "categories": {cat: count}, "path"}
+    synthetic -> a packages.yml-shaped manifest with about N selector items
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+import tempfile
+
+from manifest_resolver import (COMPILER_VERSION, DEFAULT_CACHE_DIR, OS_NAMES, X86_64_ARCHES,
+                               load_compiled, select_categories)
+
+INDEX_VERSION = 1
+DESCRIPTIONS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                 "package_descriptions.json")
+
+# ---------------------------------------------------------------------------
+# Records
+# ---------------------------------------------------------------------------
+
+
+class Item:
+    """One selector row. ``details`` is kept as JSON text until first read."""
+
+    __slots__ = ("cat", "display", "id", "sel", "bl", "na", "_details")
+
+    def __init__(self, cat, display, ident, details="", sel=True, bl=False, na=False):
+        self.cat = cat
+        self.display = display
+        self.id = ident
+        self.sel = sel
+        self.bl = bl
+        self.na = na
+        self._details = details
+
+    @property
+    def details(self):
+        if not isinstance(self._details, dict):
+            self._details = json.loads(self._details) if self._details else {}
+        return self._details
+
+
+class Descriptions:
+    """Package descriptions, read from *path* on the first lookup."""
+
+    def __init__(self, path=DESCRIPTIONS_FILE):
+        self.path = path
+        self._data = None
+
+    def get(self, ident, default=""):
+        if self._data is None:
+            try:
+                with open(self.path, "r") as fh:
+                    self._data = json.load(fh)
+            except (OSError, ValueError):
+                self._data = {}
+        return self._data.get(ident, default)
+
+
+DESCRIPTIONS = Descriptions()
+
+# ---------------------------------------------------------------------------
+# Index files
+# ---------------------------------------------------------------------------
+
+
+def _arch_key(arch):
+    return "x86_64" if (not arch or arch in X86_64_ARCHES) else "other"
+
+
+def _index_file(path, os_name, arch, cache_dir):
+    # Same key as the compiled manifest cache, so both live side by side
+    key = hashlib.sha256(os.path.abspath(path).encode()).hexdigest()[:16]
+    return os.path.join(os.path.expanduser(cache_dir), f"{key}.{os_name}.{_arch_key(arch)}.json")
+
+
+def build_view(compiled, os_name, arch=None):
+    """Flatten the selector categories for one OS/arch into parallel arrays."""
+    view = {"cats": [], "counts": [], "ids": [], "displays": [], "details": []}
+    for cat, rows in select_categories(compiled, os_name, arch):
+        view["cats"].append(cat)
+        view["counts"].append(len(rows))
+        for display, ident, details in rows:
+            view["ids"].append(ident)
+            view["displays"].append("" if display == ident else display)
+            view["details"].append(json.dumps(details, separators=(",", ":")) if details else "")
+    return view
+
+
+def load_view(path, os_name, arch=None, cache_dir=DEFAULT_CACHE_DIR):
+    """Return the index view for *path*, rebuilding it if the manifest changed."""
+    st = os.stat(path)
+    index_path = _index_file(path, os_name, arch, cache_dir) if cache_dir else None
+    if index_path:
+        try:
+            with open(index_path, "r") as fh:
+                view = json.load(fh)
+            if (view.get("index_version") == INDEX_VERSION
+                    and view.get("compiler_version") == COMPILER_VERSION
+                    and view.get("mtime_ns") == st.st_mtime_ns and view.get("size") == st.st_size):
+                return view
+        except (OSError, ValueError):
+            pass
+
+    view = build_view(load_compiled(path, cache_dir), os_name, arch)
+    view.update(index_version=INDEX_VERSION, compiler_version=COMPILER_VERSION,
+                mtime_ns=st.st_mtime_ns, size=st.st_size)
+    if index_path:
+        try:
+            os.makedirs(os.path.dirname(index_path), exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=os.path.dirname(index_path), prefix=".tmp-")
+            with os.fdopen(fd, "w") as fh:
+                json.dump(view, fh, separators=(",", ":"))
+            os.replace(tmp, index_path)
+        except OSError:
+            pass  # the index is an optimisation, like the compiled cache
+    return view
+
+
+def items_from_view(view, blacklist=()):
+    """Return ``Item`` records for *view*; blacklisted ones start deselected."""
+    items = []
+    ids, displays, details = view["ids"], view["displays"], view["details"]
+    pos = 0
+    for cat, count in zip(view["cats"], view["counts"]):
+        for i in range(pos, pos + count):
+            ident = ids[i]
+            bl = ident in blacklist
+            items.append(Item(cat, displays[i] or ident, ident, details[i], not bl, bl))
+        pos += count
+    return items
+
+
+def load_items(path, os_name, arch=None, blacklist=(), cache_dir=DEFAULT_CACHE_DIR):
+    return items_from_view(load_view(path, os_name, arch, cache_dir), blacklist)
+
+
+# ---------------------------------------------------------------------------
+# Synthetic manifests (benchmarks)
+# ---------------------------------------------------------------------------
+
+def synthetic_manifest(n):
+    """A packages.yml-shaped mapping with roughly *n* items per OS view."""
+    quarter = max(1, n // 4)
+    return {"package_manifest": {
+        "cli_tools": [{"name": f"tool-{i}", "brew_formula": f"tool-{i}", "apt": f"tool-{i}",
+                       "dnf": f"tool-{i}"} for i in range(quarter)],
+        "gui_apps": [{"name": f"app-{i}", "brew_cask": f"app-{i}",
+                      "linux": {"type": "deb", "url": f"https://example.invalid/app-{i}.deb"}}
+                     for i in range(quarter)],
+        "flatpak_apps": [f"org.example.App{i}" for i in range(quarter)],
+        "vscode_extensions": [f"publisher{i % 50}.extension-{i}" for i in range(n - 3 * quarter)],
+    }}
+
+
+# ---------------------------------------------------------------------------
+# Main
+# ---------------------------------------------------------------------------
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compact selector index for packages.yml")
+    sub = parser.add_subparsers(dest="command", required=True)
+    build_cmd = sub.add_parser("build", help="Build (or reuse) the index for one OS/arch")
+    build_cmd.add_argument("--packages-file", required=True, help="Path to packages.yml")
+    build_cmd.add_argument("--os", required=True, choices=OS_NAMES)
+    build_cmd.add_argument("--arch", default="x86_64", help="Target architecture (default: x86_64)")
+    build_cmd.add_argument("--cache-dir", default=DEFAULT_CACHE_DIR,
+                           help=f"Cache directory (default: {DEFAULT_CACHE_DIR})")
+    synth_cmd = sub.add_parser("synthetic", help="Print a synthetic manifest with about N items")
+    synth_cmd.add_argument("items", type=int)
+    args = parser.parse_args(argv)
+
+    if args.command == "synthetic":
+        json.dump(synthetic_manifest(args.items), sys.stdout)
+        sys.stdout.write("\n")
+        return 0
+
+    try:
+        view = load_view(args.packages_file, args.os, args.arch, args.cache_dir)
+    except (OSError, ValueError) as exc:
+        print(f"Error: cannot index {args.packages_file}: {exc}", file=sys.stderr)
+        return 1
+    json.dump({"os": args.os, "arch": args.arch, "items": len(view["ids"]),
+               "categories": dict(zip(view["cats"], view["counts"])),
+               "path": _index_file(args.packages_file, args.os, args.arch, args.cache_dir)},
+              sys.stdout, indent=2)
+    sys.stdout.write("\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
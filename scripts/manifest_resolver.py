@@ -0,0 +1,420 @@
+#!/usr/bin/env python3
+"""Compiled, cached package manifest resolution for CompSetup.
+
+Single source of truth for turning packages.yml into install targets.
+Both consumers import this module:
+
+    site.yml              - via the ``compsetup_targets`` and
+                            ``compsetup_filter_manifest`` filters in
+                            filter_plugins/compsetup.py
+    package_selector.py   - for the per-OS category view
+
+The manifest is compiled once into per-OS/per-arch selector categories
+and per-backend ``[name, package]`` pairs. The compiled form is cached
+on disk (default ``~/.cache/compsetup/manifest``) keyed by the manifest's
+mtime, size and sha256, so repeat runs skip YAML parsing entirely.
+
+Usage:
+    manifest_resolver.py --packages-file packages.yml --os ubuntu \\
+        --distribution pop_os --desktop cosmic --arch x86_64 --omit "slack gh"
+
+Output (stdout, JSON): the resolved targets, see ``select_targets``.
+"""
+
+import argparse
+import copy
+import hashlib
+import json
+import os
+import sys
+import tempfile
+
+# ---------------------------------------------------------------------------
+# YAML parsing
+# ---------------------------------------------------------------------------
+
+try:
+    import yaml
+
+    def load_yaml(path):
+        with open(path, "r") as fh:
+            return yaml.safe_load(fh)
+
+except ImportError:
+    # Fresh machines may not have PyYAML yet. The streaming subset loader
+    # returns the same structures as yaml.safe_load for packages.yml and
+    # raises YAMLSubsetError (a ValueError) naming the offending line.
+    from mini_yaml import load_path as load_yaml
+
+
+# ---------------------------------------------------------------------------
+# Package filtering by OS
+# ---------------------------------------------------------------------------
+
+def _build_details(pkg_data, os_name):
+    """Build a detail dict for a package entry."""
+    details = {}
+    if isinstance(pkg_data, dict):
+        if pkg_data.get("brew_formula"):
+            details["brew_formula"] = pkg_data["brew_formula"]
+        if pkg_data.get("brew_cask"):
+            details["brew_cask"] = pkg_data["brew_cask"]
+        if pkg_data.get("apt"):
+            details["apt"] = pkg_data["apt"]
+        if pkg_data.get("dnf"):
+            details["dnf"] = pkg_data["dnf"]
+        linux = pkg_data.get("linux")
+        if isinstance(linux, dict):
+            if linux.get("type"):
+                details["linux_type"] = linux["type"]
+            if linux.get("package"):
+                details["linux_package"] = linux["package"]
+            if linux.get("url"):
+                details["linux_url"] = linux["url"]
+            if linux.get("dest"):
+                details["linux_dest"] = linux["dest"]
+            if linux.get("installed_path"):
+                details["installed_path"] = linux["installed_path"]
+    return details
+
+
+def filter_packages(manifest, os_name):
+    """Return a list of (category_name, [(display_name, identifier, details), ...])."""
+    categories = []
+
+    # --- CLI Tools ---
+    cli = []
+    for tool in manifest.get("cli_tools", []):
+        name = tool.get("name", "")
+        if not name:
+            continue
+        if os_name == "macos":
+            if tool.get("brew_formula") or tool.get("brew_cask"):
+                cli.append((name, name, _build_details(tool, os_name)))
+        elif os_name == "ubuntu":
+            if tool.get("apt"):
+                cli.append((name, name, _build_details(tool, os_name)))
+            elif isinstance(tool.get("linux"), dict):
+                ltype = tool["linux"].get("type", "")
+                if ltype in ("apt", "deb", "npm"):
+                    cli.append((name, name, _build_details(tool, os_name)))
+        elif os_name == "fedora":
+            if tool.get("dnf"):
+                cli.append((name, name, _build_details(tool, os_name)))
+            elif isinstance(tool.get("linux"), dict):
+                ltype = tool["linux"].get("type", "")
+                if ltype == "npm":
+                    cli.append((name, name, _build_details(tool, os_name)))
+    if cli:
+        categories.append(("CLI Tools", cli))
+
+    # --- GUI Apps ---
+    gui = []
+    for app in manifest.get("gui_apps", []):
+        name = app.get("name", "")
+        if not name:
+            continue
+        if os_name == "macos":
+            if app.get("brew_cask"):
+                gui.append((name, name, _build_details(app, os_name)))
+        elif os_name in ("ubuntu", "fedora"):
+            if isinstance(app.get("linux"), dict):
+                ltype = app["linux"].get("type", "")
+                if os_name == "ubuntu" and ltype in ("apt", "deb"):
+                    gui.append((name, name, _build_details(app, os_name)))
+                elif os_name == "fedora" and ltype in ("deb",):
+                    gui.append((name, name, _build_details(app, os_name)))
+            elif os_name == "ubuntu" and app.get("apt"):
+                gui.append((name, name, _build_details(app, os_name)))
+            elif os_name == "fedora" and app.get("dnf"):
+                gui.append((name, name, _build_details(app, os_name)))
+    if gui:
+        categories.append(("GUI Apps", gui))
+
+    # --- Flatpak Apps (Linux only) ---
+    if os_name in ("ubuntu", "fedora"):
+        flatpak = []
+        for fp in manifest.get("flatpak_apps", []):
+            if isinstance(fp, str):
+                flatpak.append((fp, fp, {"flatpak_id": fp}))
+        if flatpak:
+            categories.append(("Flatpak Apps", flatpak))
+
+    # --- Fonts (all platforms) ---
+    fonts = []
+    for font in manifest.get("fonts", []):
+        name = font.get("name", "")
+        if not name:
+            continue
+        if os_name == "macos":
+            if font.get("brew_cask"):
+                fonts.append((name, name, _build_details(font, os_name)))
+        elif os_name in ("ubuntu", "fedora"):
+            if isinstance(font.get("linux"), dict) and font["linux"].get("url"):
+                fonts.append((name, name, _build_details(font, os_name)))
+    if fonts:
+        categories.append(("Fonts", fonts))
+
+    # --- VS Code Extensions (all platforms) ---
+    vscode = []
+    for ext in manifest.get("vscode_extensions", []):
+        if isinstance(ext, str):
+            vscode.append((ext, ext, {"extension_id": ext}))
+    if vscode:
+        categories.append(("VS Code Extensions", vscode))
+
+    # --- System Packages (apt_only / dnf_only common) ---
+    sys_pkgs = []
+    if os_name == "ubuntu":
+        for pkg in manifest.get("apt_only", {}).get("common", []):
+            if isinstance(pkg, str):
+                sys_pkgs.append((pkg, pkg, {"apt": pkg}))
+    elif os_name == "fedora":
+        for pkg in manifest.get("dnf_only", {}).get("common", []):
+            if isinstance(pkg, str):
+                sys_pkgs.append((pkg, pkg, {"dnf": pkg}))
+    if sys_pkgs:
+        categories.append(("System Packages", sys_pkgs))
+
+    return categories
+
+
+# ---------------------------------------------------------------------------
+# Manifest filtering (AI tools, omit list, architecture)
+# ---------------------------------------------------------------------------
+
+AI_TOOL_NAMES = ("gemini-cli", "claude-code", "antigravity")
+X86_64_ARCHES = ("x86_64", "amd64")
+
+
+def _omit_set(omit=None, skip_ai_tools=False):
+    omit = set(omit or ())
+    if skip_ai_tools:
+        omit.update(AI_TOOL_NAMES)
+    return omit
+
+
+def filter_manifest(manifest, omit=None, skip_ai_tools=False, arch=None):
+    """Return a copy of *manifest* without omitted, AI-only or non-native entries.
+
+    Named sections (``cli_tools``, ``gui_apps``, ``fonts``) are filtered by
+    ``name``; ``flatpak_apps``, ``vscode_extensions`` and the ``common``
+    lists of ``apt_only``/``dnf_only`` are filtered by the raw identifier.
+    x86_64-only flatpaks are dropped when *arch* is not x86_64.
+    """
+    omit = _omit_set(omit, skip_ai_tools)
+    result = copy.deepcopy(manifest)
+    for section in ("cli_tools", "gui_apps", "fonts"):
+        if section in result:
+            result[section] = [e for e in result[section] or []
+                               if e.get("name") not in omit]
+    for section in ("flatpak_apps", "vscode_extensions"):
+        if section in result:
+            result[section] = [e for e in result[section] or [] if e not in omit]
+    for section in ("apt_only", "dnf_only"):
+        if isinstance(result.get(section), dict) and "common" in result[section]:
+            result[section]["common"] = [e for e in result[section]["common"] or []
+                                         if e not in omit]
+    if arch and arch not in X86_64_ARCHES and "flatpak_apps" in result:
+        x86_only = set(result.get("x86_64_only_flatpak_apps") or ())
+        result["flatpak_apps"] = [e for e in result["flatpak_apps"] if e not in x86_only]
+    return result
+
+
+# ---------------------------------------------------------------------------
+# Compilation
+# ---------------------------------------------------------------------------
+
+COMPILER_VERSION = 1
+OS_NAMES = ("macos", "ubuntu", "fedora")
+DEFAULT_CACHE_DIR = os.path.join("~", ".cache", "compsetup", "manifest")
+
+
+def _pairs(entries, field):
+    """``[name, value]`` pairs for named entries that define *field*."""
+    return [[e["name"], e[field]] for e in entries or []
+            if isinstance(e, dict) and e.get("name") and e.get(field)]
+
+
+def _plain(entries):
+    return [[e, e] for e in entries or [] if isinstance(e, str)]
+
+
+def _system_section(section):
+    section = section or {}
+    return {
+        "common": _plain(section.get("common")),
+        "by_distribution": dict(section.get("by_distribution") or {}),
+        "by_desktop": dict(section.get("by_desktop") or {}),
+    }
+
+
+def compile_manifest(data):
+    """Compile parsed packages.yml *data* into the cached resolution form."""
+    manifest = data.get("package_manifest", data)
+    cli = manifest.get("cli_tools") or []
+    gui = manifest.get("gui_apps") or []
+    fonts = manifest.get("fonts") or []
+
+    categories = {}
+    for os_name in OS_NAMES:
+        categories[os_name] = {
+            "x86_64": filter_packages(manifest, os_name),
+            "other": filter_packages(filter_manifest(manifest, arch="other"), os_name),
+        }
+
+    return {
+        "compiler_version": COMPILER_VERSION,
+        "brew_taps": list(manifest.get("brew_taps") or []),
+        "brew_formula": _pairs(cli, "brew_formula"),
+        "brew_cask": _pairs(gui, "brew_cask") + _pairs(cli, "brew_cask") + _pairs(fonts, "brew_cask"),
+        "apt": _pairs(cli, "apt"),
+        "dnf": _pairs(cli, "dnf"),
+        "apt_only": _system_section(manifest.get("apt_only")),
+        "dnf_only": _system_section(manifest.get("dnf_only")),
+        "flatpak": _plain(manifest.get("flatpak_apps")),
+        "x86_64_only_flatpak": list(manifest.get("x86_64_only_flatpak_apps") or []),
+        "vscode": _plain(manifest.get("vscode_extensions")),
+        "categories": categories,
+    }
+
+
+def _unique(values):
+    seen = set()
+    out = []
+    for value in values:
+        if value not in seen:
+            seen.add(value)
+            out.append(value)
+    return out
+
+
+def _keep(pairs, omit):
+    return [pkg for name, pkg in pairs if name not in omit]
+
+
+def _system_targets(section, backend_pairs, distribution, desktops, omit):
+    extras = list(section["by_distribution"].get(distribution) or [])
+    for desktop in desktops or ():
+        extras += section["by_desktop"].get(desktop) or []
+    return _unique(_keep(backend_pairs, omit) + _keep(section["common"], omit) + extras)
+
+
+def select_targets(compiled, distribution="", desktops=(), arch=None, omit=None,
+                   skip_ai_tools=False):
+    """Resolve per-backend install targets from a compiled manifest.
+
+    Returns a dict with ``brew_taps``, ``brew_formulae``, ``brew_casks``,
+    ``apt_packages``, ``rpm_packages``, ``flatpak_apps`` and
+    ``vscode_extensions``.
+    """
+    omit = _omit_set(omit, skip_ai_tools)
+    flatpak = _keep(compiled["flatpak"], omit)
+    if arch and arch not in X86_64_ARCHES:
+        x86_only = set(compiled["x86_64_only_flatpak"])
+        flatpak = [app for app in flatpak if app not in x86_only]
+    return {
+        "brew_taps": list(compiled["brew_taps"]),
+        "brew_formulae": _unique(_keep(compiled["brew_formula"], omit)),
+        "brew_casks": _unique(_keep(compiled["brew_cask"], omit)),
+        "apt_packages": _system_targets(compiled["apt_only"], compiled["apt"],
+                                        distribution, desktops, omit),
+        "rpm_packages": _system_targets(compiled["dnf_only"], compiled["dnf"],
+                                        distribution, desktops, omit),
+        "flatpak_apps": flatpak,
+        "vscode_extensions": _unique(_keep(compiled["vscode"], omit)),
+    }
+
+
+def select_categories(compiled, os_name, arch=None):
+    """Return the selector's ``(category, [(display, id, details), ...])`` list."""
+    key = "x86_64" if (not arch or arch in X86_64_ARCHES) else "other"
+    return [(cat, [tuple(item) for item in items])
+            for cat, items in compiled["categories"][os_name][key]]
+
+
+# ---------------------------------------------------------------------------
+# On-disk cache
+# ---------------------------------------------------------------------------
+
+def _cache_file(path, cache_dir):
+    key = hashlib.sha256(os.path.abspath(path).encode()).hexdigest()[:16]
+    return os.path.join(os.path.expanduser(cache_dir), f"{key}.json")
+
+
+def load_compiled(path, cache_dir=DEFAULT_CACHE_DIR):
+    """Return the compiled manifest for *path*, using the on-disk cache.
+
+    The cache is trusted when mtime and size match; otherwise the
+    manifest is hashed and only recompiled if its content changed.
+    """
+    st = os.stat(path)
+    cache_path = _cache_file(path, cache_dir) if cache_dir else None
+    cached = None
+    if cache_path:
+        try:
+            with open(cache_path, "r") as fh:
+                cached = json.load(fh)
+        except (OSError, ValueError):
+            cached = None
+    if cached and cached.get("compiler_version") != COMPILER_VERSION:
+        cached = None
+
+    if cached and cached.get("mtime_ns") == st.st_mtime_ns and cached.get("size") == st.st_size:
+        return cached["compiled"]
+
+    with open(path, "rb") as fh:
+        raw = fh.read()
+    digest = hashlib.sha256(raw).hexdigest()
+    if cached and cached.get("sha256") == digest:
+        compiled = cached["compiled"]
+    else:
+        compiled = compile_manifest(load_yaml(path))
+
+    if cache_path:
+        payload = {"compiler_version": COMPILER_VERSION, "mtime_ns": st.st_mtime_ns,
+                   "size": st.st_size, "sha256": digest, "compiled": compiled}
+        try:
+            os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=os.path.dirname(cache_path), prefix=".tmp-")
+            with os.fdopen(fd, "w") as fh:
+                json.dump(payload, fh)
+            os.replace(tmp, cache_path)
+        except OSError:
+            pass  # cache is an optimisation; a read-only home must not break resolution
+    return compiled
+
+
+# ---------------------------------------------------------------------------
+# Main
+# ---------------------------------------------------------------------------
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Resolve CompSetup package targets")
+    parser.add_argument("--packages-file", required=True, help="Path to packages.yml")
+    parser.add_argument("--os", choices=OS_NAMES, help="Also print the selector categories for this OS")
+    parser.add_argument("--distribution", default="", help="Normalized distribution id (e.g. ubuntu, pop_os)")
+    parser.add_argument("--desktop", action="append", default=[], help="Desktop identifier (repeatable)")
+    parser.add_argument("--arch", default=None, help="Target architecture")
+    parser.add_argument("--omit", default="", help="Space-separated names to omit")
+    parser.add_argument("--skip-ai-tools", action="store_true", help="Omit AI tools")
+    parser.add_argument("--cache-dir", default=DEFAULT_CACHE_DIR,
+                        help="Compiled manifest cache directory ('' disables the cache)")
+    args = parser.parse_args(argv)
+
+    try:
+        compiled = load_compiled(args.packages_file, args.cache_dir)
+    except (OSError, ValueError) as exc:
+        print(f"Error: cannot load {args.packages_file}: {exc}", file=sys.stderr)
+        return 1
+    result = select_targets(compiled, args.distribution, args.desktop, args.arch,
+                            args.omit.split(), args.skip_ai_tools)
+    if args.os:
+        result["categories"] = select_categories(compiled, args.os, args.arch)
+    json.dump(result, sys.stdout, indent=2)
+    sys.stdout.write("\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,696 @@
+#!/usr/bin/env python3
+"""Streaming YAML-subset loader used when PyYAML is not installed.
+
+Fresh machines often lack PyYAML, so packages.yml must be readable
+without it. This loader reads the file line by line in a single pass
+and supports the subset of YAML the manifest uses:
+
+    - block mappings and block sequences (including ``key:`` followed by
+      a sequence at the same indentation)
+    - sequences of mappings (``- name: foo`` with continuation keys)
+    - flow collections on one line: ``[a, b]``, ``{}``, ``{k: v, l: [x]}``
+    - plain, 'single-quoted' and "double-quoted" scalars
+    - comments, including comments after values
+    - ``---`` document start and ``...`` document end markers
+
+Plain scalars are resolved with the same implicit resolvers as PyYAML's
+safe loader (YAML 1.1): null, booleans (true/yes/on ...), integers
+(decimal, 0x hex, 0 octal, 0b binary, 1:20 sexagesimal), floats
+(including sexagesimal, .inf and .nan) and timestamps (``datetime.date``
+or ``datetime.datetime``). Anything else (anchors, aliases, tags, block
+scalars, multi-line scalars and flow collections, complex and merge
+keys, ``=`` values, several documents) raises ``YAMLSubsetError`` naming
+the offending line. A document this loader accepts is loaded exactly as
+``yaml.safe_load`` loads it; tests/test_mini_yaml.py checks that against
+PyYAML.
+
+Usage:
+    mini_yaml.py check packages.yml ...         # diff files against PyYAML
+    mini_yaml.py bench --entries 5000            # generated manifest
+"""
+
+import argparse
+import datetime
+import io
+import json
+import os
+import re
+import sys
+import tempfile
+import time
+
+__all__ = ["YAMLSubsetError", "load", "load_path"]
+
+
+class YAMLSubsetError(ValueError):
+    """Raised for malformed input or YAML outside the supported subset."""
+
+    def __init__(self, lineno, message):
+        super().__init__(f"line {lineno}: {message}")
+        self.lineno = lineno
+
+
+# ---------------------------------------------------------------------------
+# Scalars
+# ---------------------------------------------------------------------------
+
+_NULLS = {"", "~", "null", "Null", "NULL"}
+_TRUE = {"true", "True", "TRUE", "yes", "Yes", "YES", "on", "On", "ON"}
+_FALSE = {"false", "False", "FALSE", "no", "No", "NO", "off", "Off", "OFF"}
+# The implicit resolvers of PyYAML's safe loader, tried in the same order
+_FLOAT_RE = re.compile(r"""^(?:[-+]?(?:[0-9][0-9_]*)\.[0-9_]*(?:[eE][-+][0-9]+)?
+    |\.[0-9][0-9_]*(?:[eE][-+][0-9]+)?
+    |[-+]?[0-9][0-9_]*(?::[0-5]?[0-9])+\.[0-9_]*
+    |[-+]?\.(?:inf|Inf|INF)
+    |\.(?:nan|NaN|NAN))$""", re.X)
+_INT_RE = re.compile(r"""^(?:[-+]?0b[0-1_]+
+    |[-+]?0[0-7_]+
+    |[-+]?(?:0|[1-9][0-9_]*)
+    |[-+]?0x[0-9a-fA-F_]+
+    |[-+]?[1-9][0-9_]*(?::[0-5]?[0-9])+)$""", re.X)
+_TIMESTAMP_RE = re.compile(r"""^(?P<year>[0-9][0-9][0-9][0-9])
+    -(?P<month>[0-9][0-9]?)
+    -(?P<day>[0-9][0-9]?)
+    (?:(?:[Tt]|[ \t]+)
+    (?P<hour>[0-9][0-9]?)
+    :(?P<minute>[0-9][0-9])
+    :(?P<second>[0-9][0-9])
+    (?:\.(?P<fraction>[0-9]*))?
+    (?:[ \t]*(?P<tz>Z|(?P<tz_sign>[-+])(?P<tz_hour>[0-9][0-9]?)
+    (?::(?P<tz_minute>[0-9][0-9]))?))?)?$""", re.X)
+# Only "YYYY-MM-DD" or a full date-time resolves; "2024-5-1" stays a string
+_TIMESTAMP_IMPLICIT_RE = re.compile(r"""^(?:[0-9][0-9][0-9][0-9]-[0-9][0-9]-[0-9][0-9]
+    |[0-9][0-9][0-9][0-9] -[0-9][0-9]? -[0-9][0-9]?
+    (?:[Tt]|[ \t]+)[0-9][0-9]?
+    :[0-9][0-9] :[0-9][0-9] (?:\.[0-9]*)?
+    (?:[ \t]*(?:Z|[-+][0-9][0-9]?(?::[0-9][0-9])?))?)$""", re.X)
+_ESCAPES = {"0": "\0", "a": "\a", "b": "\b", "t": "\t", "\t": "\t", "n": "\n",
+            "v": "\v", "f": "\f", "r": "\r", "e": "\x1b", " ": " ", '"': '"',
+            "/": "/", "\\": "\\", "N": "\x85", "_": "\xa0", "L": "\u2028", "P": "\u2029"}
+_HEX_ESCAPES = {"x": 2, "u": 4, "U": 8}
+
+
+def _sexagesimal(text, cast):
+    value = cast(0)
+    for part in text.split(":"):
+        value = value * 60 + cast(part)
+    return value
+
+
+def _resolve_int(text):
+    value = text.replace("_", "")
+    sign = -1 if value[0] == "-" else 1
+    if value[0] in "+-":
+        value = value[1:]
+    if value == "0":
+        return 0
+    if value.startswith("0b"):
+        return sign * int(value[2:], 2)
+    if value.startswith("0x"):
+        return sign * int(value[2:], 16)
+    if value[0] == "0":
+        return sign * int(value, 8)
+    if ":" in value:
+        return sign * _sexagesimal(value, int)
+    return sign * int(value)
+
+
+def _resolve_float(text):
+    value = text.replace("_", "").lower()
+    sign = -1 if value[0] == "-" else 1
+    if value[0] in "+-":
+        value = value[1:]
+    if value == ".inf":
+        return sign * float("inf")
+    if value == ".nan":
+        return float("nan")
+    if ":" in value:
+        return sign * _sexagesimal(value, float)
+    return sign * float(value)
+
+
+def _resolve_timestamp(text):
+    parts = _TIMESTAMP_RE.match(text).groupdict()
+    year, month, day = int(parts["year"]), int(parts["month"]), int(parts["day"])
+    if not parts["hour"]:
+        return datetime.date(year, month, day)
+    fraction = int((parts["fraction"] or "")[:6].ljust(6, "0"))
+    tzinfo = None
+    if parts["tz_sign"]:
+        delta = datetime.timedelta(hours=int(parts["tz_hour"]), minutes=int(parts["tz_minute"] or 0))
+        tzinfo = datetime.timezone(-delta if parts["tz_sign"] == "-" else delta)
+    elif parts["tz"]:
+        tzinfo = datetime.timezone.utc
+    return datetime.datetime(year, month, day, int(parts["hour"]), int(parts["minute"]),
+                             int(parts["second"]), fraction, tzinfo=tzinfo)
+
+
+def resolve_plain(text, lineno=0):
+    """Convert an unquoted scalar to None/bool/int/float/date/datetime/str."""
+    if text in _NULLS:
+        return None
+    if text in _TRUE:
+        return True
+    if text in _FALSE:
+        return False
+    if text == "=" or text == "<<":
+        raise YAMLSubsetError(lineno, f"{text!r} (a YAML 1.1 value or merge key) is not supported")
+    try:
+        if _FLOAT_RE.match(text):
+            return _resolve_float(text)
+        if _INT_RE.match(text):
+            return _resolve_int(text)
+        if _TIMESTAMP_IMPLICIT_RE.match(text):
+            return _resolve_timestamp(text)
+    except ValueError as exc:  # e.g. 0x_ or 2024-13-01, which PyYAML rejects too
+        raise YAMLSubsetError(lineno, f"invalid scalar {text!r}: {exc}") from None
+    return text
+
+
+def _scan_quoted(text, pos, lineno):
+    """Parse a quoted scalar starting at *pos*; return ``(value, end)``."""
+    quote = text[pos]
+    out = []
+    i = pos + 1
+    n = len(text)
+    while i < n:
+        ch = text[i]
+        if quote == "'":
+            if ch == "'":
+                if i + 1 < n and text[i + 1] == "'":
+                    out.append("'")
+                    i += 2
+                    continue
+                return "".join(out), i + 1
+            out.append(ch)
+            i += 1
+            continue
+        if ch == '"':
+            return "".join(out), i + 1
+        if ch == "\\":
+            if i + 1 >= n:
+                break
+            esc = text[i + 1]
+            if esc in _ESCAPES:
+                out.append(_ESCAPES[esc])
+                i += 2
+                continue
+            if esc in _HEX_ESCAPES:
+                width = _HEX_ESCAPES[esc]
+                digits = text[i + 2:i + 2 + width]
+                try:
+                    out.append(chr(int(digits, 16)))
+                except ValueError:
+                    raise YAMLSubsetError(lineno, f"invalid escape \\{esc}{digits}") from None
+                i += 2 + width
+                continue
+            raise YAMLSubsetError(lineno, f"invalid escape \\{esc}")
+        out.append(ch)
+        i += 1
+    raise YAMLSubsetError(lineno, "unterminated quoted scalar (multi-line scalars are not supported)")
+
+
+def _strip_comment(text):
+    """Remove a trailing ``# comment`` that is outside quotes.
+
+    A quote only opens a quoted scalar where a scalar can start: at the
+    beginning, after a ``- ``, ``? `` or ``: `` indicator, or after ``[``,
+    ``{`` or ``,`` inside a flow collection. Anywhere else it belongs to a
+    plain scalar (``it's``, ``a 'b # c`` -> ``a 'b``).
+    """
+    i = 0
+    n = len(text)
+    quote = None
+    depth = 0
+    start = True
+    while i < n:
+        ch = text[i]
+        spaced = i + 1 == n or text[i + 1] in " \t"
+        if quote:
+            if ch == quote:
+                if quote == "'" and i + 1 < n and text[i + 1] == "'":
+                    i += 2
+                    continue
+                quote = None
+            elif ch == "\\" and quote == '"':
+                i += 2
+                continue
+        elif ch in " \t":
+            pass
+        elif ch == "#" and (i == 0 or text[i - 1] in " \t"):
+            return text[:i].rstrip()
+        elif ch in "\"'" and start:
+            quote = ch
+            start = False
+        elif ch in "-?" and start and spaced:
+            pass
+        elif ch == ":" and (spaced or (depth and text[i + 1] in ",]}")):
+            start = True
+        elif ch in "[{" and (start or depth):
+            depth += 1
+            start = True
+        elif ch in "]}" and depth:
+            depth -= 1
+            start = False
+        elif ch == "," and depth:
+            start = True
+        else:
+            start = False
+        i += 1
+    return text.rstrip()
+
+
+# ---------------------------------------------------------------------------
+# Flow collections and inline values
+# ---------------------------------------------------------------------------
+
+class _Flow:
+    """Recursive-descent parser for a single-line flow collection."""
+
+    def __init__(self, text, lineno):
+        self.text = text
+        self.pos = 0
+        self.lineno = lineno
+
+    def error(self, message):
+        raise YAMLSubsetError(self.lineno, message)
+
+    def skip_ws(self):
+        while self.pos < len(self.text) and self.text[self.pos] in " \t":
+            self.pos += 1
+
+    def peek(self):
+        self.skip_ws()
+        return self.text[self.pos] if self.pos < len(self.text) else ""
+
+    def expect(self, ch):
+        if self.peek() != ch:
+            self.error(f"expected {ch!r} in flow collection")
+        self.pos += 1
+
+    def value(self, stops):
+        ch = self.peek()
+        if ch == "[":
+            return self.sequence()
+        if ch == "{":
+            return self.mapping()
+        if ch in "\"'":
+            value, self.pos = _scan_quoted(self.text, self.pos, self.lineno)
+            return value
+        _check_plain_start(self.text[self.pos:], self.lineno)
+        if ch in "?:":
+            # Inside flow collections these are always indicators to PyYAML
+            self.error(f"unexpected {ch!r} indicator in flow collection")
+        start = self.pos
+        # Same stopping rules as PyYAML's plain scanner at flow level: ':'
+        # ends a scalar only before a space or flow punctuation ("a:b" is
+        # one scalar), ',', ']' and '}' always do
+        while self.pos < len(self.text):
+            c = self.text[self.pos]
+            if c == ":" and (self.pos + 1 >= len(self.text) or self.text[self.pos + 1] in " \t,[]{}"):
+                if ":" in stops:
+                    break
+                self.error("single-pair mappings inside flow sequences are not supported")
+            if c in ",]}":
+                if c in stops:
+                    break
+                self.error(f"unexpected {c!r} in flow collection")
+            if c in "[{?":
+                self.error(f"unexpected {c!r} in flow scalar")
+            self.pos += 1
+        return resolve_plain(self.text[start:self.pos].strip(), self.lineno)
+
+    def sequence(self):
+        self.expect("[")
+        items = []
+        while True:
+            if self.peek() == "]":
+                self.pos += 1
+                return items
+            if self.peek() == "":
+                self.error("unterminated flow sequence (multi-line flow collections are not supported)")
+            if self.peek() == ",":
+                self.error("empty entry in flow sequence")
+            items.append(self.value(",]"))
+            if self.peek() == ",":
+                self.pos += 1
+            elif self.peek() != "]":
+                self.error("expected ',' or ']' in flow sequence")
+
+    def mapping(self):
+        self.expect("{")
+        result = {}
+        while True:
+            if self.peek() == "}":
+                self.pos += 1
+                return result
+            if self.peek() == "":
+                self.error("unterminated flow mapping (multi-line flow collections are not supported)")
+            if self.peek() in (":", ","):
+                self.error("empty key in flow mapping")
+            key = self.value(":,}")
+            value = None
+            if self.peek() == ":":
+                self.pos += 1
+                if self.peek() not in (",", "}"):
+                    value = self.value(",}")
+            result[key] = value
+            if self.peek() == ",":
+                self.pos += 1
+            elif self.peek() != "}":
+                self.error("expected ',' or '}' in flow mapping")
+
+    def parse(self):
+        result = self.value("")
+        if self.peek():
+            self.error(f"unexpected trailing text {self.text[self.pos:]!r}")
+        return result
+
+
+def _check_plain_start(text, lineno):
+    """Reject what PyYAML would read as an indicator rather than a plain scalar."""
+    first = text[:1]
+    if first and first in "&*!|>%@`":
+        raise YAMLSubsetError(lineno, f"unsupported YAML construct starting with {first!r}")
+    if first and first in ",]}":
+        raise YAMLSubsetError(lineno, f"a plain scalar cannot start with {first!r}")
+    if first and first in "-?:" and (len(text) == 1 or text[1] in " \t"):
+        raise YAMLSubsetError(lineno, f"unexpected {first!r} indicator (complex keys and "
+                                      "sequences after a key on one line are not supported)")
+
+
+def parse_inline(text, lineno):
+    """Parse the value part of a line (scalar or flow collection)."""
+    if not text:
+        return None
+    first = text[0]
+    if first in "[{":
+        return _Flow(text, lineno).parse()
+    if first in "\"'":
+        value, end = _scan_quoted(text, 0, lineno)
+        if text[end:].strip():
+            raise YAMLSubsetError(lineno, f"unexpected text after quoted scalar: {text[end:].strip()!r}")
+        return value
+    _check_plain_start(text, lineno)
+    if text.endswith(":") or ": " in text or ":\t" in text:
+        raise YAMLSubsetError(lineno, "mapping values are not allowed here")
+    return resolve_plain(text, lineno)
+
+
+def split_key(text, lineno):
+    """Split ``key: value`` into ``(key, value_text)``; return None if not a mapping line."""
+    if text[0] in "\"'":
+        key, end = _scan_quoted(text, 0, lineno)
+        rest = text[end:].lstrip()
+        if not rest.startswith(":"):
+            return None
+        return key, rest[1:].strip()
+    if text[0] in "[{":
+        return None
+    for i, ch in enumerate(text):
+        if ch == ":" and (i + 1 == len(text) or text[i + 1] in " \t"):
+            key = text[:i].rstrip()
+            if not key:
+                raise YAMLSubsetError(lineno, "empty mapping key")
+            _check_plain_start(key, lineno)
+            return resolve_plain(key, lineno), text[i + 1:].strip()
+    return None
+
+
+# ---------------------------------------------------------------------------
+# Block structure
+# ---------------------------------------------------------------------------
+
+def _is_seq_item(text):
+    return text == "-" or text.startswith("- ")
+
+
+class _BlockParser:
+    """Single-pass, indentation-driven parser over logical lines."""
+
+    def __init__(self, stream):
+        self._lines = self._logical_lines(stream)
+        self._pending = None
+
+    @staticmethod
+    def _logical_lines(stream):
+        started = content = ended = False
+        for lineno, raw in enumerate(stream, 1):
+            line = raw.rstrip("\r\n")
+            body = line.lstrip(" ")
+            if body.startswith("\t"):
+                raise YAMLSubsetError(lineno, "tabs are not allowed in indentation")
+            text = _strip_comment(body)
+            if not text:
+                continue
+            indent = len(line) - len(body)
+            if indent == 0 and (text == "---" or text.startswith("--- ")):
+                if started or content or ended:
+                    raise YAMLSubsetError(lineno, "only a single document is supported")
+                started = True
+                text = text[4:].strip()
+                if not text:
+                    continue
+            elif indent == 0 and text == "...":
+                ended = True
+                continue
+            if ended:
+                raise YAMLSubsetError(lineno, "content after the document end marker '...'")
+            if text.startswith("%"):
+                raise YAMLSubsetError(lineno, "directives are not supported")
+            content = True
+            yield lineno, indent, text
+
+    def peek(self):
+        if self._pending is None:
+            self._pending = next(self._lines, None)
+        return self._pending
+
+    def take(self):
+        line = self.peek()
+        self._pending = None
+        return line
+
+    def push(self, line):
+        self._pending = line
+
+    def parse_document(self):
+        line = self.peek()
+        if line is None:
+            return None
+        lineno, indent, text = line
+        if not _is_seq_item(text) and split_key(text, lineno) is None:
+            self.take()
+            value = parse_inline(text, lineno)
+            extra = self.peek()
+            if extra is not None:
+                raise YAMLSubsetError(extra[0], "unexpected content after top-level scalar")
+            return value
+        value = self.parse_block(indent)
+        extra = self.peek()
+        if extra is not None:
+            if extra[1] == indent:
+                raise YAMLSubsetError(extra[0], "cannot mix mapping keys and sequence items at one level")
+            raise YAMLSubsetError(extra[0], "unexpected indentation")
+        return value
+
+    def parse_block(self, indent):
+        line = self.peek()
+        if _is_seq_item(line[2]):
+            return self.parse_sequence(indent)
+        return self.parse_mapping(indent)
+
+    def _child(self, parent_indent, allow_compact_seq):
+        """Parse the nested block under a ``key:`` or ``-`` with no inline value."""
+        line = self.peek()
+        if line is None:
+            return None
+        _, indent, text = line
+        if indent > parent_indent:
+            return self.parse_block(indent)
+        if allow_compact_seq and indent == parent_indent and _is_seq_item(text):
+            return self.parse_sequence(indent)
+        return None
+
+    def _check_dedent(self, indent):
+        line = self.peek()
+        if line is not None and line[1] > indent:
+            raise YAMLSubsetError(line[0], "unexpected indentation (multi-line plain scalars are not supported)")
+
+    def parse_sequence(self, indent):
+        items = []
+        while True:
+            line = self.peek()
+            if line is None or line[1] != indent or not _is_seq_item(line[2]):
+                break
+            lineno, _, text = self.take()
+            rest = text[1:].lstrip(" ")
+            if not rest:
+                items.append(self._child(indent, False))
+                continue
+            if _is_seq_item(rest) or split_key(rest, lineno) is not None:
+                # Inline block ("- key: v" or "- - x"): re-feed it at its own column
+                self.push((lineno, indent + (len(text) - len(rest)), rest))
+                items.append(self.parse_block(indent + (len(text) - len(rest))))
+                continue
+            items.append(parse_inline(rest, lineno))
+            self._check_dedent(indent)
+        return items
+
+    def parse_mapping(self, indent):
+        result = {}
+        while True:
+            line = self.peek()
+            if line is None or line[1] != indent:
+                break
+            lineno, _, text = line
+            if _is_seq_item(text):
+                break
+            self.take()
+            pair = split_key(text, lineno)
+            if pair is None:
+                raise YAMLSubsetError(lineno, f"expected 'key: value', got {text!r}")
+            key, value_text = pair
+            if value_text:
+                result[key] = parse_inline(value_text, lineno)
+                self._check_dedent(indent)
+            else:
+                result[key] = self._child(indent, True)
+        line = self.peek()
+        if line is not None and line[1] > indent:
+            raise YAMLSubsetError(line[0], "unexpected indentation")
+        return result
+
+
+def load(stream):
+    """Parse YAML-subset text from an iterable of lines (e.g. an open file)."""
+    if isinstance(stream, str):
+        stream = io.StringIO(stream)
+    return _BlockParser(stream).parse_document()
+
+
+def load_path(path):
+    """Parse the YAML-subset file at *path*."""
+    with open(path, "r", encoding="utf-8") as fh:
+        return load(fh)
+
+
+# ---------------------------------------------------------------------------
+# Differential check and benchmark against PyYAML
+# ---------------------------------------------------------------------------
+
+def generate_manifest(entries):
+    """Return a synthetic packages.yml exercising the supported subset."""
+    out = ["# generated manifest", "---", "package_manifest:", "  brew_taps: [homebrew/cask-fonts]",
+           "  cli_tools:"]
+    for i in range(entries):
+        out.append(f"    - name: tool-{i}  # comment {i}")
+        out.append(f"      brew_formula: tool-{i}")
+        if i % 3 == 0:
+            out.append(f"      apt: 'tool-{i}'")
+        if i % 5 == 0:
+            out.append(f"      dnf: \"tool-{i}-ng\"")
+        if i % 7 == 0:
+            out.append("      linux:")
+            out.append("        type: npm")
+            out.append(f"        package: \"@scope/tool-{i}\"")
+    out.append("  flatpak_apps:")
+    out += [f"    - org.example.App{i}" for i in range(entries)]
+    out.append("  vscode_extensions:")
+    out += [f"  - publisher{i}.ext-{i}" for i in range(entries)]
+    out.append("  apt_only:")
+    out.append("    common: [build-essential, \"python3-pip\", 'tree']")
+    out.append("    by_distribution: {}")
+    out.append("    by_desktop: {cosmic: [cosmic-term], kde: []}")
+    out.append("  flags: {enabled: true, retries: 3, ratio: 0.5, empty: ~, label: 'yes'}")
+    return "\n".join(out) + "\n"
+
+
+def same(a, b):
+    """Deep equality that also compares types (``1`` is not ``True``) and treats NaN as equal."""
+    if type(a) is not type(b):
+        return False
+    if isinstance(a, dict):
+        return len(a) == len(b) and all(k in b and same(v, b[k]) for k, v in a.items())
+    if isinstance(a, list):
+        return len(a) == len(b) and all(same(x, y) for x, y in zip(a, b))
+    if isinstance(a, float) and a != a:
+        return b != b
+    if isinstance(a, datetime.datetime):
+        return a == b and a.utcoffset() == b.utcoffset()
+    return a == b
+
+
+def _pyyaml():
+    try:
+        import yaml
+    except ImportError:
+        print("Error: PyYAML is required for check/bench", file=sys.stderr)
+        sys.exit(1)
+    return yaml
+
+
+def check(paths):
+    yaml = _pyyaml()
+    failures = 0
+    for path in paths:
+        with open(path, "r", encoding="utf-8") as fh:
+            expected = yaml.safe_load(fh)
+        try:
+            actual = load_path(path)
+        except YAMLSubsetError as exc:
+            print(f"{path}: {exc}")
+            failures += 1
+            continue
+        if not same(actual, expected):
+            print(f"{path}: differs from PyYAML")
+            failures += 1
+        else:
+            print(f"{path}: ok")
+    return 1 if failures else 0
+
+
+def bench(entries, runs):
+    yaml = _pyyaml()
+    text = generate_manifest(entries)
+    fd, path = tempfile.mkstemp(suffix=".yml")
+    with os.fdopen(fd, "w") as fh:
+        fh.write(text)
+    try:
+        timings = {}
+        for name, loader in (("mini_yaml", load_path),
+                             ("pyyaml_safe_load", lambda p: yaml.safe_load(open(p)))):
+            best = None
+            for _ in range(runs):
+                start = time.perf_counter()
+                result = loader(path)
+                elapsed = time.perf_counter() - start
+                best = elapsed if best is None else min(best, elapsed)
+            timings[name] = (best, result)
+    finally:
+        os.unlink(path)
+    identical = same(timings["mini_yaml"][1], timings["pyyaml_safe_load"][1])
+    report = {"entries": entries, "lines": text.count("\n"), "runs": runs, "identical": identical}
+    for name, (best, _) in timings.items():
+        report[f"{name}_s"] = round(best, 4)
+    json.dump(report, sys.stdout)
+    sys.stdout.write("\n")
+    return 0 if identical else 1
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="YAML-subset loader checks")
+    sub = parser.add_subparsers(dest="command", required=True)
+    check_cmd = sub.add_parser("check", help="Compare parsing of FILEs with PyYAML")
+    check_cmd.add_argument("files", nargs="+")
+    bench_cmd = sub.add_parser("bench", help="Benchmark against PyYAML on a generated manifest")
+    bench_cmd.add_argument("--entries", type=int, default=5000)
+    bench_cmd.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args(argv)
+    if args.command == "check":
+        return check(args.files)
+    return bench(args.entries, max(1, args.runs))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,322 @@
+#!/usr/bin/env python3
+"""Pre-built NVChad plugin bundles for CompSetup.
+
+A fresh NVChad install fetches every lazy.nvim plugin over git and then
+compiles the Treesitter parsers. That takes several cold Neovim starts.
+``build`` packs the result of one such install into a versioned tarball
+instead. The tarball holds the lazy plugin directory (which contains the
+compiled parsers under ``nvim-treesitter/parser``), ``site/parser`` if
+present, and the ``lazy-lock.json`` that pins it. ``install`` unpacks the
+matching bundle, and ``verify`` checks the result with one headless start.
+
+Bundles are keyed by platform, Neovim minor version (parser ABI) and the
+sha256 of lazy-lock.json:
+
+    <bundle-dir>/nvchad-<system>-<machine>-nvim<X.Y>-<lock sha256[:16]>.tar.gz
+        bundle.json      - {"bundle_version", "key", "lock_sha256",
+                            "platform", "nvim", "plugins", "parsers"}
+        lazy-lock.json
+        lazy/...         - plugins, including nvim-treesitter/parser/*.so
+        site/parser/...  - only when Neovim keeps parsers there
+
+``install`` picks the bundle for the existing lazy-lock.json in the
+config directory. Without one it takes the newest bundle for this
+platform and copies its lock file into place. It records the installed
+key in ``<data-dir>/compsetup-bundle.json`` and does nothing while that
+key is current.
+
+Output (stdout, JSON):
+    build   -> {"key", "path", "plugins", "parsers", "size", "changed"}
+    install -> {"key", "path", "status": "installed"|"current"|"missing", "changed"}
+    verify  -> {"ok", "missing_plugins", "missing_parsers", "seconds"}
+
+Usage:
+    nvim_bundle.py build --config-dir ~/.config/nvim --data-dir ~/.local/share/nvim
+    nvim_bundle.py install --config-dir ~/.config/nvim --data-dir ~/.local/share/nvim
+    nvim_bundle.py install ... --bundle-dir /tmp/bundles --nvim-version 0.10   # offline test
+    nvim_bundle.py verify --parsers lua,vim,bash
+
+Exit codes:
+    0 - Bundle built/installed (or none matched, status "missing"), or verification passed
+    1 - Invalid arguments, unreadable bundle/lock file, or verification failed
+"""
+
+import argparse
+import glob
+import hashlib
+import io
+import json
+import os
+import platform
+import re
+import shutil
+import subprocess
+import sys
+import tarfile
+import tempfile
+import time
+
+BUNDLE_VERSION = 1
+DEFAULT_BUNDLE_DIR = os.path.join("~", ".cache", "compsetup", "nvim")
+DEFAULT_CONFIG_DIR = os.path.join("~", ".config", "nvim")
+DEFAULT_DATA_DIR = os.path.join("~", ".local", "share", "nvim")
+MARKER = "compsetup-bundle.json"
+# Directories under the Neovim data dir that a bundle replaces
+CONTENT = ("lazy", os.path.join("site", "parser"))
+
+# ---------------------------------------------------------------------------
+# Keys
+# ---------------------------------------------------------------------------
+
+
+def nvim_version(nvim):
+    """Return ``X.Y`` from ``nvim --version``."""
+    proc = subprocess.run([nvim, "--version"], stdout=subprocess.PIPE,
+                          stderr=subprocess.PIPE, text=True)
+    match = re.search(r"NVIM v(\d+)\.(\d+)", proc.stdout)
+    if proc.returncode != 0 or not match:
+        raise RuntimeError(proc.stderr.strip() or f"cannot read the version of {nvim}")
+    return f"{match.group(1)}.{match.group(2)}"
+
+
+def platform_tag():
+    return f"{platform.system().lower()}-{platform.machine().lower()}"
+
+
+def lock_sha256(path):
+    with open(path, "rb") as fh:
+        return hashlib.sha256(fh.read()).hexdigest()
+
+
+def bundle_prefix(version):
+    return f"nvchad-{platform_tag()}-nvim{version}-"
+
+
+def bundle_key(version, lock_hash):
+    return f"{bundle_prefix(version)}{lock_hash[:16]}"
+
+
+def find_bundle(bundle_dir, version, lock_hash=None):
+    """Return the bundle for *lock_hash*, or the newest one for this platform."""
+    if lock_hash:
+        path = os.path.join(bundle_dir, bundle_key(version, lock_hash) + ".tar.gz")
+        return path if os.path.isfile(path) else None
+    candidates = glob.glob(os.path.join(glob.escape(bundle_dir), bundle_prefix(version) + "*.tar.gz"))
+    return max(candidates, key=os.path.getmtime) if candidates else None
+
+
+# ---------------------------------------------------------------------------
+# Build
+# ---------------------------------------------------------------------------
+
+def _count_parsers(data_dir):
+    found = set()
+    for pattern in ("lazy/*/parser/*.so", "site/parser/*.so"):
+        found.update(os.path.basename(p) for p in glob.glob(os.path.join(glob.escape(data_dir), pattern)))
+    return len(found)
+
+
+def build(config_dir, data_dir, bundle_dir, version, force=False):
+    lock = os.path.join(config_dir, "lazy-lock.json")
+    lock_hash = lock_sha256(lock)
+    lazy_dir = os.path.join(data_dir, "lazy")
+    if not os.path.isdir(lazy_dir):
+        raise RuntimeError(f"{lazy_dir} does not exist; run a Lazy sync first")
+
+    key = bundle_key(version, lock_hash)
+    path = os.path.join(bundle_dir, key + ".tar.gz")
+    plugins = sorted(d for d in os.listdir(lazy_dir) if os.path.isdir(os.path.join(lazy_dir, d)))
+    result = {"key": key, "path": path, "plugins": len(plugins),
+              "parsers": _count_parsers(data_dir), "size": 0, "changed": False}
+    if os.path.isfile(path) and not force:
+        result["size"] = os.path.getsize(path)
+        return result
+
+    meta = {"bundle_version": BUNDLE_VERSION, "key": key, "lock_sha256": lock_hash,
+            "platform": platform_tag(), "nvim": version, "plugins": plugins,
+            "parsers": result["parsers"]}
+    os.makedirs(bundle_dir, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=bundle_dir, prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "wb") as raw, tarfile.open(fileobj=raw, mode="w:gz") as tar:
+            data = json.dumps(meta, indent=2).encode()
+            info = tarfile.TarInfo("bundle.json")
+            info.size, info.mtime = len(data), int(time.time())
+            tar.addfile(info, io.BytesIO(data))
+            tar.add(lock, arcname="lazy-lock.json")
+            for rel in CONTENT:
+                src = os.path.join(data_dir, rel)
+                if os.path.isdir(src):
+                    tar.add(src, arcname=rel.replace(os.sep, "/"))
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+        raise
+    result.update(size=os.path.getsize(path), changed=True)
+    return result
+
+
+# ---------------------------------------------------------------------------
+# Install
+# ---------------------------------------------------------------------------
+
+def _read_marker(data_dir):
+    try:
+        with open(os.path.join(data_dir, MARKER), "r") as fh:
+            return json.load(fh).get("key")
+    except (OSError, ValueError):
+        return None
+
+
+def _extract(tar, dest):
+    if hasattr(tarfile, "data_filter"):
+        tar.extractall(dest, filter="data")
+        return
+    root = os.path.realpath(dest)
+    for member in tar.getmembers():
+        target = os.path.realpath(os.path.join(dest, member.name))
+        if os.path.commonpath([root, target]) != root:
+            raise RuntimeError(f"refusing to extract {member.name} outside {dest}")
+    tar.extractall(dest)
+
+
+def install(config_dir, data_dir, bundle_dir, version):
+    lock = os.path.join(config_dir, "lazy-lock.json")
+    lock_hash = lock_sha256(lock) if os.path.isfile(lock) else None
+    path = find_bundle(bundle_dir, version, lock_hash)
+    if not path:
+        key = bundle_key(version, lock_hash) if lock_hash else None
+        return {"key": key, "path": None, "status": "missing", "changed": False}
+
+    key = os.path.basename(path)[:-len(".tar.gz")]
+    if _read_marker(data_dir) == key and os.path.isdir(os.path.join(data_dir, "lazy")):
+        return {"key": key, "path": path, "status": "current", "changed": False}
+
+    os.makedirs(data_dir, exist_ok=True)
+    staging = tempfile.mkdtemp(dir=data_dir, prefix=".compsetup-bundle-")
+    try:
+        with tarfile.open(path, "r:gz") as tar:
+            _extract(tar, staging)
+        with open(os.path.join(staging, "bundle.json"), "r") as fh:
+            meta = json.load(fh)
+        if meta.get("bundle_version") != BUNDLE_VERSION or meta.get("key") != key:
+            raise RuntimeError(f"{path} is not a bundle for {key}")
+
+        # Swap each directory in with a rename; the old copy goes last
+        for rel in CONTENT:
+            new = os.path.join(staging, rel)
+            dest = os.path.join(data_dir, rel)
+            if not os.path.isdir(new):
+                continue
+            os.makedirs(os.path.dirname(dest), exist_ok=True)
+            if os.path.lexists(dest):
+                os.replace(dest, os.path.join(staging, "old-" + rel.replace(os.sep, "-")))
+            os.replace(new, dest)
+
+        os.makedirs(config_dir, exist_ok=True)
+        shutil.copyfile(os.path.join(staging, "lazy-lock.json"), lock)
+        fd, tmp = tempfile.mkstemp(dir=data_dir, prefix=".tmp-")
+        with os.fdopen(fd, "w") as fh:
+            json.dump({"key": key, "lock_sha256": meta["lock_sha256"],
+                       "installed": int(time.time())}, fh)
+        os.replace(tmp, os.path.join(data_dir, MARKER))
+    finally:
+        shutil.rmtree(staging, ignore_errors=True)
+    return {"key": key, "path": path, "status": "installed", "changed": True}
+
+
+# ---------------------------------------------------------------------------
+# Verify
+# ---------------------------------------------------------------------------
+
+VERIFY_LUA = """
+local r = { lazy = false, missing_plugins = {}, missing_parsers = {} }
+local ok, cfg = pcall(require, "lazy.core.config")
+if ok then
+  r.lazy = true
+  for name, p in pairs(cfg.plugins) do
+    if not (p._ and p._.installed) then table.insert(r.missing_plugins, name) end
+  end
+end
+for lang in string.gmatch(vim.env.COMPSETUP_PARSERS or "", "[^,]+") do
+  if #vim.api.nvim_get_runtime_file("parser/" .. lang .. ".*", false) == 0 then
+    table.insert(r.missing_parsers, lang)
+  end
+end
+io.stdout:write("\\n" .. vim.json.encode(r) .. "\\n")
+"""
+
+
+def verify(nvim, parsers):
+    """One headless start: lazy loaded, every plugin installed, parsers on the runtimepath."""
+    env = dict(os.environ, COMPSETUP_PARSERS=",".join(parsers))
+    start = time.monotonic()
+    proc = subprocess.run([nvim, "--headless", "+lua " + " ".join(VERIFY_LUA.split()), "+qa!"],
+                          stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, env=env,
+                          timeout=120)
+    seconds = round(time.monotonic() - start, 2)
+    report = None
+    for line in reversed((proc.stdout + proc.stderr).splitlines()):
+        if line.startswith("{"):
+            try:
+                report = json.loads(line)
+                break
+            except ValueError:
+                continue
+    if report is None or not report.get("lazy"):
+        return {"ok": False, "missing_plugins": [], "missing_parsers": list(parsers),
+                "seconds": seconds, "error": (proc.stderr.strip() or "lazy.nvim did not load")[-400:]}
+    # vim.json encodes empty tables as {}
+    missing_plugins = sorted(report.get("missing_plugins") or [])
+    missing_parsers = sorted(report.get("missing_parsers") or [])
+    return {"ok": not missing_plugins and not missing_parsers, "missing_plugins": missing_plugins,
+            "missing_parsers": missing_parsers, "seconds": seconds}
+
+
+# ---------------------------------------------------------------------------
+# Main
+# ---------------------------------------------------------------------------
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Pre-built NVChad plugin bundles")
+    sub = parser.add_subparsers(dest="command", required=True)
+    build_cmd = sub.add_parser("build", help="Pack the installed plugins and parsers into a bundle")
+    install_cmd = sub.add_parser("install", help="Unpack the bundle matching lazy-lock.json")
+    verify_cmd = sub.add_parser("verify", help="Check the install with one headless Neovim start")
+    for cmd in (build_cmd, install_cmd):
+        cmd.add_argument("--config-dir", default=DEFAULT_CONFIG_DIR,
+                         help=f"Neovim config directory (default: {DEFAULT_CONFIG_DIR})")
+        cmd.add_argument("--data-dir", default=DEFAULT_DATA_DIR,
+                         help=f"Neovim data directory (default: {DEFAULT_DATA_DIR})")
+        cmd.add_argument("--bundle-dir", default=DEFAULT_BUNDLE_DIR,
+                         help=f"Bundle directory (default: {DEFAULT_BUNDLE_DIR})")
+        cmd.add_argument("--nvim-version", help="Neovim X.Y (default: from nvim --version)")
+    build_cmd.add_argument("--force", action="store_true", help="Rebuild an existing bundle")
+    verify_cmd.add_argument("--parsers", default="",
+                            help="Comma-separated Treesitter languages that must be present")
+    for cmd in (build_cmd, install_cmd, verify_cmd):
+        cmd.add_argument("--nvim", default="nvim", help="nvim command (default: nvim)")
+    args = parser.parse_args(argv)
+
+    try:
+        if args.command == "verify":
+            result = verify(args.nvim, [p for p in args.parsers.split(",") if p])
+        else:
+            version = args.nvim_version or nvim_version(args.nvim)
+            dirs = [os.path.expanduser(d) for d in (args.config_dir, args.data_dir, args.bundle_dir)]
+            if args.command == "build":
+                result = build(*dirs, version, force=args.force)
+            else:
+                result = install(*dirs, version)
+    except (OSError, ValueError, RuntimeError, tarfile.TarError, subprocess.SubprocessError) as exc:
+        print(f"Error: {exc}", file=sys.stderr)
+        return 1
+
+    json.dump(result, sys.stdout, indent=2)
+    sys.stdout.write("\n")
+    return 0 if result.get("ok", True) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -11,126 +11,42 @@ Output protocol (stdout):
 
 All UI rendering goes to stderr so stdout stays clean for pipe integration.
 
+Headless mode (``--headless``) needs no TTY. It applies include/exclude
+globs from the command line or a ``--profile`` file and prints one JSON
+plan per ``--target OS[/ARCH]``:
+    {"plans": [{"os", "arch", "categories": {cat: [ids]},
+                "backends": {backend: [packages]}, "deselected": [...],
+                "remove_from_blacklist": [], "unmanaged": [...]}]}
+The apt/dnf/brew/flatpak/vscode backends are manifest_resolver's
+``select_targets`` with the deselected packages omitted, i.e. what
+site.yml installs for that selection.
+
 Exit codes:
-    0 - Confirmed selection (tagged output on stdout)
+    0 - Confirmed selection (tagged output on stdout) / plan printed
+    1 - Bad arguments, manifest or profile
     2 - Cancelled by user (no output)
 """
 
 import argparse
+import bisect
+import fnmatch
+import json
 import os
 import platform
+import re
+import select
+import shutil
+import signal
+import subprocess
 import sys
 import termios
 import tty
 
-# ---------------------------------------------------------------------------
-# YAML parsing
-# ---------------------------------------------------------------------------
-
-try:
-    import yaml
-
-    def load_yaml(path):
-        with open(path, "r") as fh:
-            return yaml.safe_load(fh)
-
-except ImportError:
-    # Minimal fallback parser for the flat structure of packages.yml.
-    # Handles the subset of YAML used by this project: mappings, sequences
-    # of strings, and sequences of mappings with scalar values.
-
-    def _parse_scalar(val):
-        """Convert a YAML scalar string to a Python type."""
-        if val in ("true", "True", "yes"):
-            return True
-        if val in ("false", "False", "no"):
-            return False
-        if val in ("null", "~", ""):
-            return None
-        try:
-            return int(val)
-        except ValueError:
-            pass
-        try:
-            return float(val)
-        except ValueError:
-            pass
-        return val
-
-    def load_yaml(path):
-        with open(path, "r") as fh:
-            lines = fh.readlines()
-
-        root = {}
-        # stack entries: (container, indent, parent_dict, parent_key)
-        # parent_dict and parent_key allow replacing a dict with a list
-        # when we discover list items under a mapping key.
-        stack = [(root, -1, None, None)]
-
-        for raw_line in lines:
-            stripped = raw_line.rstrip("\n")
-
-            # skip blank lines and comments
-            if not stripped.strip() or stripped.strip().startswith("#"):
-                continue
-
-            indent = len(stripped) - len(stripped.lstrip())
-            content = stripped.strip()
-
-            # Pop stack to correct nesting level
-            while len(stack) > 1 and indent <= stack[-1][1]:
-                stack.pop()
-
-            current, _, _, _ = stack[-1]
-
-            # Handle list item
-            if content.startswith("- "):
-                item_content = content[2:].strip()
-
-                # If current is a dict placeholder (empty dict created for a
-                # key with no inline value), convert it to a list on the parent
-                if isinstance(current, dict) and len(current) == 0:
-                    _, s_indent, parent, pkey = stack[-1]
-                    if parent is not None and pkey is not None:
-                        new_list = []
-                        parent[pkey] = new_list
-                        stack[-1] = (new_list, s_indent, parent, pkey)
-                        current = new_list
-
-                if isinstance(current, list):
-                    target_list = current
-                else:
-                    continue
-
-                if ":" in item_content:
-                    # item is a mapping  e.g. "- name: foo"
-                    new_map = {}
-                    key, _, val = item_content.partition(":")
-                    key = key.strip()
-                    val = val.strip()
-                    if val:
-                        new_map[key] = _parse_scalar(val)
-                    target_list.append(new_map)
-                    stack.append((new_map, indent, None, None))
-                else:
-                    target_list.append(_parse_scalar(item_content))
-
-            elif ":" in content:
-                key, _, val = content.partition(":")
-                key = key.strip()
-                val = val.strip()
-
-                if val:
-                    if isinstance(current, dict):
-                        current[key] = _parse_scalar(val)
-                else:
-                    # Key with no value -> placeholder dict (may become list)
-                    if isinstance(current, dict):
-                        current[key] = {}
-                        stack.append((current[key], indent, current, key))
-
-        return root
+import apt_resolver
+from manifest_index import DESCRIPTIONS, items_from_view, load_view
+from manifest_resolver import load_compiled, load_yaml, select_categories, select_targets
 
+OS_LABELS = {"macos": "macOS", "ubuntu": "Ubuntu", "fedora": "Fedora"}
 
 # ---------------------------------------------------------------------------
 # Blacklist loader
@@ -174,36 +90,134 @@ def getch():
     return ch
 
 
-def read_line_from_tty():
-    """Read a line of input in raw mode, echoing to stderr.
+class Terminal:
+    """Keystroke input for a whole selector session.
 
-    Supports backspace and returns on Enter.
+    The tty is switched to cbreak mode (no line buffering, no echo; output
+    processing and Ctrl-C stay on) once on entry and restored on exit.
+    Keys are read with ``os.read`` behind ``select``, so an escape sequence
+    split across reads (slow links) is put back together, and a lone Esc
+    is recognised once no more bytes follow within *esc_timeout*.
+    SIGWINCH wakes the reader through a self-pipe and is returned as the
+    key ``"resize"``.
+
+    ``read_key`` returns printable characters as themselves and named keys
+    as words: up, down, left, right, pgup, pgdn, home, end, delete, enter,
+    backspace, tab, esc, resize, ctrl-<letter>.
     """
-    fd = sys.stdin.fileno()
-    old = termios.tcgetattr(fd)
-    buf = []
-    try:
-        tty.setraw(fd)
+
+    SEQUENCES = {
+        b"[A": "up", b"[B": "down", b"[C": "right", b"[D": "left",
+        b"OA": "up", b"OB": "down", b"OC": "right", b"OD": "left",
+        b"[H": "home", b"[F": "end", b"OH": "home", b"OF": "end",
+        b"[1~": "home", b"[7~": "home", b"[4~": "end", b"[8~": "end",
+        b"[5~": "pgup", b"[6~": "pgdn", b"[3~": "delete",
+    }
+
+    def __init__(self, fd=None, esc_timeout=0.05):
+        self.fd = sys.stdin.fileno() if fd is None else fd
+        self.esc_timeout = esc_timeout
+        self._buf = bytearray()
+        self._resized = False
+        self._saved = None
+        self._wake = None
+        self._old_handler = None
+
+    def __enter__(self):
+        self._saved = termios.tcgetattr(self.fd)
+        tty.setcbreak(self.fd, termios.TCSANOW)
+        self._wake = os.pipe()
+        for end in self._wake:
+            os.set_blocking(end, False)
+        if hasattr(signal, "SIGWINCH"):
+            try:
+                self._old_handler = signal.signal(signal.SIGWINCH, self._on_winch)
+            except ValueError:  # not the main thread
+                self._old_handler = None
+        return self
+
+    def __exit__(self, *exc):
+        if self._old_handler is not None:
+            signal.signal(signal.SIGWINCH, self._old_handler)
+        termios.tcsetattr(self.fd, termios.TCSADRAIN, self._saved)
+        for end in self._wake:
+            os.close(end)
+        return False
+
+    def _on_winch(self, signum, frame):
+        try:
+            os.write(self._wake[1], b"w")
+        except OSError:
+            pass
+
+    def rows(self):
+        """Terminal height, from the tty itself (stdout may be a pipe)."""
+        try:
+            return os.get_terminal_size(self.fd).lines
+        except OSError:
+            return shutil.get_terminal_size((80, 24)).lines
+
+    def _fill(self, timeout):
+        """Wait up to *timeout* for input or a resize; False on timeout."""
+        ready, _, _ = select.select([self.fd, self._wake[0]], [], [], timeout)
+        if not ready:
+            return False
+        if self._wake[0] in ready:
+            try:
+                while os.read(self._wake[0], 64):
+                    pass
+            except BlockingIOError:
+                pass
+            self._resized = True
+        if self.fd in ready:
+            data = os.read(self.fd, 1024)
+            if not data:
+                raise EOFError
+            self._buf += data
+        return True
+
+    def _decode(self):
+        """Return ``(key, length)`` for the first key in the buffer, or ``(None, 0)``."""
+        buf = self._buf
+        if not buf:
+            return None, 0
+        byte = buf[0]
+        if byte == 0x1b:
+            if len(buf) == 1:
+                return None, 0
+            if buf[1] not in b"[O":
+                return "esc", 1  # Alt-<key>: drop the Esc, keep the key
+            for end in range(2, len(buf)):
+                if 0x40 <= buf[end] <= 0x7e:
+                    return self.SEQUENCES.get(bytes(buf[1:end + 1]), "unknown"), end + 1
+            return None, 0
+        if byte in (0x0d, 0x0a):
+            return "enter", 1
+        if byte in (0x7f, 0x08):
+            return "backspace", 1
+        if byte == 0x09:
+            return "tab", 1
+        if byte < 0x20:
+            return f"ctrl-{chr(byte + 0x60)}", 1
+        size = 1 if byte < 0x80 else 2 if byte < 0xe0 else 3 if byte < 0xf0 else 4
+        if len(buf) < size:
+            return None, 0
+        return bytes(buf[:size]).decode("utf-8", "replace"), size
+
+    def read_key(self):
+        """Block until the next key (or ``"resize"``) and return it."""
         while True:
-            ch = sys.stdin.read(1)
-            if ch in ("\r", "\n"):
-                sys.stderr.write("\r\n")
-                sys.stderr.flush()
-                break
-            elif ch in ("\x7f", "\x08"):  # backspace / delete
-                if buf:
-                    buf.pop()
-                    sys.stderr.write("\b \b")
-                    sys.stderr.flush()
-            elif ch == "\x03":  # Ctrl-C
-                raise KeyboardInterrupt
-            elif ch.isprintable():
-                buf.append(ch)
-                sys.stderr.write(ch)
-                sys.stderr.flush()
-    finally:
-        termios.tcsetattr(fd, termios.TCSADRAIN, old)
-    return "".join(buf)
+            if self._resized:
+                self._resized = False
+                return "resize"
+            key, size = self._decode()
+            if key is not None:
+                del self._buf[:size]
+                return key
+            # An unfinished escape sequence only waits briefly
+            if not self._fill(self.esc_timeout if self._buf else None) and self._buf:
+                del self._buf[:]
+                return "esc"
 
 
 # ---------------------------------------------------------------------------
@@ -222,246 +236,52 @@ WHITE = f"{ESC}[37m"
 
 
 # ---------------------------------------------------------------------------
-# Package filtering by OS
+# Package descriptions and availability
 # ---------------------------------------------------------------------------
 
-PACKAGE_DESCRIPTIONS = {
-    # CLI Tools
-    "ansible": "IT automation engine for configuration management, app deployment, and orchestration",
-    "bitwarden-cli": "Command-line interface for the Bitwarden password manager",
-    "ffmpeg": "Universal multimedia toolkit for converting, streaming, and recording audio/video",
-    "git": "Distributed version control system",
-    "gnupg": "GNU Privacy Guard -- encryption and signing tool for secure communication",
-    "gotop": "Terminal-based graphical activity monitor inspired by gtop and vtop",
-    "graphviz": "Graph visualization software for creating diagrams from textual descriptions",
-    "helm": "Kubernetes package manager for deploying and managing applications",
-    "htop": "Interactive process viewer and system monitor for the terminal",
-    "locateme": "macOS command-line tool to find your geographic location",
-    "minikube": "Local Kubernetes cluster runner for development and testing",
-    "ncdu": "Disk usage analyzer with ncurses interface for finding large files",
-    "neovim": "Hyperextensible Vim-based text editor",
-    "node": "JavaScript runtime built on Chrome's V8 engine",
-    "pyvim": "Python bindings for Neovim, enabling Python-based Neovim plugins",
-    "ripgrep": "Blazing fast recursive grep alternative that respects .gitignore",
-    "sha3sum": "Compute and verify SHA-3 message digests",
-    "wakeonlan": "Send magic packets to wake up machines on a network",
-    "wget": "Network downloader supporting HTTP, HTTPS, and FTP protocols",
-    "curl": "Command-line tool for transferring data with URL syntax",
-    "fd": "Fast and user-friendly alternative to the find command",
-    "unzip": "Extraction utility for ZIP archives",
-    "python3": "High-level general-purpose programming language",
-    "ruby": "Dynamic, object-oriented programming language focused on simplicity",
-    "lsd": "Modern replacement for ls with color, icons, and tree view",
-    "watch": "Execute a program periodically and display the output in the terminal",
-    "trash": "Command-line tool to move files to the trash instead of permanently deleting",
-    "claude-code": "Anthropic's AI coding assistant for the command line",
-    "gemini-cli": "Google's Gemini AI assistant for the command line",
-    # GUI Apps
-    "cyberduck": "Cloud storage browser for FTP, SFTP, S3, and more",
-    "visual-studio-code": "Extensible source code editor by Microsoft",
-    "proton-pass": "End-to-end encrypted password manager by Proton",
-    "proton-mail": "End-to-end encrypted email service by Proton",
-    "docker": "Container platform for building, sharing, and running applications",
-    "google-chrome": "Web browser by Google built on the Chromium engine",
-    "ghostty": "Fast, feature-rich, native terminal emulator",
-    "handbrake": "Open-source video transcoder for converting video formats",
-    "qownnotes": "Plain-text markdown note-taking app with Nextcloud integration",
-    "typora": "Minimal markdown editor with live preview",
-    "signal-desktop": "End-to-end encrypted messaging app focused on privacy",
-    "antigravity": "Open-source AI assistant desktop application",
-    # Fonts
-    "font-0xproto-nerd-font": "0xProto monospace font patched with Nerd Font icons",
-    "font-fira-code-nerd-font": "Fira Code font with ligatures patched with Nerd Font icons",
-    "font-fira-mono-nerd-font": "Fira Mono font patched with Nerd Font icons",
-    # Flatpak Apps
-    "com.brave.Browser": "Privacy-focused web browser based on Chromium with built-in ad blocker",
-    "com.getmailspring.Mailspring": "Modern email client with unified inbox and snooze features",
-    "com.discordapp.Discord": "Voice, video, and text communication platform for communities",
-    "com.google.Chrome": "Web browser by Google built on the Chromium engine",
-    "com.slack.Slack": "Team communication and collaboration platform",
-    "com.vixalien.sticky": "Sticky notes app for the GNOME desktop",
-    "im.riot.Riot": "Element -- decentralized, encrypted messaging client using the Matrix protocol",
-    "io.github.pwr_solaar.solaar": "Device manager for Logitech wireless peripherals",
-    "md.obsidian.Obsidian": "Knowledge base and note-taking app using local Markdown files",
-    "me.proton.Pass": "End-to-end encrypted password manager by Proton",
-    "net.cozic.joplin_desktop": "Open-source note-taking and to-do app with sync support",
-    "network.loki.Session": "End-to-end encrypted messenger using decentralized servers",
-    "org.raspberrypi.rpi-imager": "Raspberry Pi imaging tool for writing OS images to SD cards",
-    "org.standardnotes.standardnotes": "End-to-end encrypted notes app with extensible editors",
-    "org.videolan.VLC": "Free cross-platform multimedia player supporting most formats",
-    "com.obsproject.Studio": "Free open-source software for live streaming and screen recording",
-    "io.podman_desktop.PodmanDesktop": "Desktop GUI for managing Podman containers",
-    "org.kde.kasts": "Podcast player for KDE and the Linux desktop",
-    "org.kde.kmymoney": "Personal finance manager for KDE",
-    "org.gimp.GIMP": "GNU Image Manipulation Program -- free raster graphics editor",
-    "org.jupyter.JupyterLab": "Interactive development environment for notebooks and code",
-    "com.vscodium.codium": "Community-driven, telemetry-free build of VS Code",
-    "org.localsend.localsend_app": "Share files to nearby devices over local Wi-Fi without internet",
-    "org.signal.Signal": "End-to-end encrypted messaging app focused on privacy",
-    # VS Code Extensions
-    "github.copilot": "AI pair programmer that suggests code completions",
-    "github.copilot-chat": "AI chat interface for GitHub Copilot inside VS Code",
-    "golang.go": "Rich Go language support including IntelliSense and debugging",
-    "ms-azuretools.vscode-docker": "Docker container management and Dockerfile support",
-    "ms-kubernetes-tools.vscode-kubernetes-tools": "Kubernetes cluster explorer and manifest editing",
-    "ms-python.python": "Python language support with IntelliSense and debugging",
-    "ms-python.vscode-pylance": "Fast, feature-rich Python language server for VS Code",
-    "redhat.ansible": "Ansible playbook and role authoring support",
-    "redhat.vscode-yaml": "YAML language support with schema validation",
-    "rust-lang.rust-analyzer": "Rust language support with completion, diagnostics, and refactoring",
-    "vscodevim.vim": "Vim emulation for Visual Studio Code",
-    # System Packages (apt_only / dnf_only common)
-    "build-essential": "Meta-package providing C/C++ compiler and standard build tools",
-    "python3-pip": "Python package installer for managing third-party libraries",
-    "python3-venv": "Python module for creating lightweight virtual environments",
-    "gnome-keyring": "GNOME secure credential storage for passwords and keys",
-    "seahorse": "GNOME application for managing encryption keys and passwords",
-    "libsecret-tools": "Command-line tools for accessing the Secret Service API",
-    "flatpak": "Framework for distributing sandboxed desktop applications on Linux",
-    "gnome-software-plugin-flatpak": "GNOME Software plugin enabling Flatpak app installation",
-    "fontconfig": "Library for configuring and customizing font access",
-    "docker-compose": "Tool for defining and running multi-container Docker applications",
-    "tree": "Recursive directory listing command producing a tree-style output",
-    "bat": "Cat clone with syntax highlighting, line numbers, and Git integration",
-    "gh": "GitHub CLI for managing repositories, issues, and pull requests from the terminal",
-    "software-properties-common": "Scripts for managing APT repository sources",
-    "@development-tools": "DNF group providing C/C++ compiler and standard build tools",
-}
+def _apt_name(details):
+    """Return the apt package name an item installs, or None."""
+    if details.get("apt"):
+        return details["apt"]
+    if details.get("linux_type") == "apt" and details.get("linux_package"):
+        return details["linux_package"]
+    return None
 
 
-def _build_details(pkg_data, os_name):
-    """Build a detail dict for a package entry."""
-    details = {}
-    if isinstance(pkg_data, dict):
-        if pkg_data.get("brew_formula"):
-            details["brew_formula"] = pkg_data["brew_formula"]
-        if pkg_data.get("brew_cask"):
-            details["brew_cask"] = pkg_data["brew_cask"]
-        if pkg_data.get("apt"):
-            details["apt"] = pkg_data["apt"]
-        if pkg_data.get("dnf"):
-            details["dnf"] = pkg_data["dnf"]
-        linux = pkg_data.get("linux")
-        if isinstance(linux, dict):
-            if linux.get("type"):
-                details["linux_type"] = linux["type"]
-            if linux.get("package"):
-                details["linux_package"] = linux["package"]
-            if linux.get("url"):
-                details["linux_url"] = linux["url"]
-            if linux.get("dest"):
-                details["linux_dest"] = linux["dest"]
-            if linux.get("installed_path"):
-                details["installed_path"] = linux["installed_path"]
-    return details
-
-
-def filter_packages(manifest, os_name):
-    """Return a list of (category_name, [(display_name, identifier, details), ...])."""
-    categories = []
-
-    # --- CLI Tools ---
-    cli = []
-    for tool in manifest.get("cli_tools", []):
-        name = tool.get("name", "")
-        if not name:
-            continue
-        if os_name == "macos":
-            if tool.get("brew_formula") or tool.get("brew_cask"):
-                cli.append((name, name, _build_details(tool, os_name)))
-        elif os_name == "ubuntu":
-            if tool.get("apt"):
-                cli.append((name, name, _build_details(tool, os_name)))
-            elif isinstance(tool.get("linux"), dict):
-                ltype = tool["linux"].get("type", "")
-                if ltype in ("apt", "deb", "npm"):
-                    cli.append((name, name, _build_details(tool, os_name)))
-        elif os_name == "fedora":
-            if tool.get("dnf"):
-                cli.append((name, name, _build_details(tool, os_name)))
-            elif isinstance(tool.get("linux"), dict):
-                ltype = tool["linux"].get("type", "")
-                if ltype == "npm":
-                    cli.append((name, name, _build_details(tool, os_name)))
-    if cli:
-        categories.append(("CLI Tools", cli))
-
-    # --- GUI Apps ---
-    gui = []
-    for app in manifest.get("gui_apps", []):
-        name = app.get("name", "")
-        if not name:
-            continue
-        if os_name == "macos":
-            if app.get("brew_cask"):
-                gui.append((name, name, _build_details(app, os_name)))
-        elif os_name in ("ubuntu", "fedora"):
-            if isinstance(app.get("linux"), dict):
-                ltype = app["linux"].get("type", "")
-                if os_name == "ubuntu" and ltype in ("apt", "deb"):
-                    gui.append((name, name, _build_details(app, os_name)))
-                elif os_name == "fedora" and ltype in ("deb",):
-                    gui.append((name, name, _build_details(app, os_name)))
-            elif os_name == "ubuntu" and app.get("apt"):
-                gui.append((name, name, _build_details(app, os_name)))
-            elif os_name == "fedora" and app.get("dnf"):
-                gui.append((name, name, _build_details(app, os_name)))
-    if gui:
-        categories.append(("GUI Apps", gui))
-
-    # --- Flatpak Apps (Linux only) ---
-    if os_name in ("ubuntu", "fedora"):
-        flatpak = []
-        for fp in manifest.get("flatpak_apps", []):
-            if isinstance(fp, str):
-                flatpak.append((fp, fp, {"flatpak_id": fp}))
-        if flatpak:
-            categories.append(("Flatpak Apps", flatpak))
-
-    # --- Fonts (all platforms) ---
-    fonts = []
-    for font in manifest.get("fonts", []):
-        name = font.get("name", "")
-        if not name:
-            continue
-        if os_name == "macos":
-            if font.get("brew_cask"):
-                fonts.append((name, name, _build_details(font, os_name)))
-        elif os_name in ("ubuntu", "fedora"):
-            if isinstance(font.get("linux"), dict) and font["linux"].get("url"):
-                fonts.append((name, name, _build_details(font, os_name)))
-    if fonts:
-        categories.append(("Fonts", fonts))
-
-    # --- VS Code Extensions (all platforms) ---
-    vscode = []
-    for ext in manifest.get("vscode_extensions", []):
-        if isinstance(ext, str):
-            vscode.append((ext, ext, {"extension_id": ext}))
-    if vscode:
-        categories.append(("VS Code Extensions", vscode))
-
-    # --- System Packages (apt_only / dnf_only common) ---
-    sys_pkgs = []
-    if os_name == "ubuntu":
-        for pkg in manifest.get("apt_only", {}).get("common", []):
-            if isinstance(pkg, str):
-                sys_pkgs.append((pkg, pkg, {"apt": pkg}))
-    elif os_name == "fedora":
-        for pkg in manifest.get("dnf_only", {}).get("common", []):
-            if isinstance(pkg, str):
-                sys_pkgs.append((pkg, pkg, {"dnf": pkg}))
-    if sys_pkgs:
-        categories.append(("System Packages", sys_pkgs))
-
-    return categories
+def find_unavailable(items, os_name, apt_cache="apt-cache"):
+    """Return the set of identifiers whose apt package cannot be installed.
+
+    Uses a single apt_resolver snapshot for every apt-backed item. Only
+    applies to Ubuntu; returns an empty set when apt-cache is unavailable.
+    """
+    if os_name != "ubuntu" or not shutil.which(apt_cache):
+        return set()
+    by_name = {}
+    for item in items:
+        name = _apt_name(item.details)
+        if name:
+            by_name.setdefault(name, []).append(item.id)
+    if not by_name:
+        return set()
+    try:
+        result = apt_resolver.resolve(list(by_name), apt_cache=apt_cache,
+                                      cache_dir=apt_resolver.DEFAULT_CACHE_DIR)
+    except (OSError, subprocess.CalledProcessError):
+        return set()
+    unavailable = set()
+    for name in result["missing"] + result["virtual"]:
+        unavailable.update(by_name[name])
+    return unavailable
 
 
 # ---------------------------------------------------------------------------
 # TUI
 # ---------------------------------------------------------------------------
 
-PAGE_SIZE = 20
+# Frame rows outside the package list (header, status, legend, prompt),
+# plus one so a frame never fills the screen and scrolls
+FRAME_CHROME = 14
+MIN_PAGE_ROWS = 3
 
 
 def parse_toggle_input(text):
@@ -494,7 +314,7 @@ def parse_toggle_input(text):
     return numbers
 
 
-def show_package_info(item):
+def show_package_info(item, read_key=getch):
     """Display detailed info about a package and wait for keypress."""
     eprint(f"\033[2J\033[H", end="")
     eprint("")
@@ -502,19 +322,21 @@ def show_package_info(item):
     eprint(f"  {BOLD}  Package Info{RESET}")
     eprint(f"  {BOLD}━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━{RESET}")
     eprint("")
-    eprint(f"  {BOLD}Name:{RESET}        {item['display']}")
-    eprint(f"  {BOLD}Category:{RESET}    {item['cat']}")
-    eprint(f"  {BOLD}Status:{RESET}      {GREEN}Selected{RESET}" if item["sel"] else f"  {BOLD}Status:{RESET}      {YELLOW}Deselected{RESET}")
-    if item.get("bl"):
+    eprint(f"  {BOLD}Name:{RESET}        {item.display}")
+    eprint(f"  {BOLD}Category:{RESET}    {item.cat}")
+    eprint(f"  {BOLD}Status:{RESET}      {GREEN}Selected{RESET}" if item.sel else f"  {BOLD}Status:{RESET}      {YELLOW}Deselected{RESET}")
+    if item.bl:
         eprint(f"  {BOLD}Blacklisted:{RESET} {YELLOW}Permanently blacklisted{RESET}")
+    if item.na:
+        eprint(f"  {BOLD}Available:{RESET}   {RED}Not found in the APT repositories{RESET}")
 
-    desc = PACKAGE_DESCRIPTIONS.get(item["id"], "")
+    desc = DESCRIPTIONS.get(item.id)
     if desc:
         eprint(f"  {BOLD}Description:{RESET} {desc}")
 
     eprint("")
 
-    details = item.get("details", {})
+    details = item.details
     if details:
         eprint(f"  {BOLD}{CYAN}Platform Details:{RESET}")
         label_map = {
@@ -540,12 +362,13 @@ def show_package_info(item):
     eprint("")
     eprint(f"  {DIM}Press any key to return...{RESET}")
     try:
-        getch()
+        while read_key() == "resize":
+            pass
     except (KeyboardInterrupt, EOFError):
         pass
 
 
-def _show_reenable_prompt(reenabled):
+def _show_reenable_prompt(reenabled, read_key=getch):
     """Prompt the user about re-enabled blacklisted packages.
 
     Returns 'i' (install once), 'r' (remove from blacklist), or 'b' (go back).
@@ -560,9 +383,9 @@ def _show_reenable_prompt(reenabled):
         eprint(f"  You re-selected {BOLD}{len(reenabled)}{RESET} blacklisted package(s):")
         eprint("")
         for item in reenabled:
-            desc = PACKAGE_DESCRIPTIONS.get(item["id"], "")
+            desc = DESCRIPTIONS.get(item.id)
             desc_str = f"  {DIM}({desc}){RESET}" if desc else ""
-            eprint(f"    {GREEN}+{RESET} {item['display']}{desc_str}")
+            eprint(f"    {GREEN}+{RESET} {item.display}{desc_str}")
         eprint("")
         eprint(f"  {CYAN}[I]{RESET}  Install this time only (keep in blacklist)")
         eprint(f"  {CYAN}[R]{RESET}  Remove from blacklist permanently & install")
@@ -571,148 +394,505 @@ def _show_reenable_prompt(reenabled):
         eprint(f"  {BOLD}>{RESET} ", end="")
         sys.stderr.flush()
         try:
-            ch = getch().lower()
+            ch = read_key().lower()
         except (KeyboardInterrupt, EOFError):
             return "b"
         if ch in ("i", "r", "b"):
             return ch
+        if ch == "esc":
+            return "b"
 
 
-def run_selector(categories, os_label, blacklist=None):
-    """Run the interactive selector.
+class FrameRenderer:
+    """Draw full-screen frames, rewriting only the rows that changed.
+
+    The previous frame is kept; changed rows are addressed with
+    ``CSI row;1H`` and cleared to end of line, so toggling an item redraws
+    that row and the status line instead of the whole screen. A full
+    clear-and-draw is used for the first frame, after ``invalidate()``
+    (another screen was shown), or when the frame does not fit the
+    terminal, since scrolling would shift the rows being addressed.
+    """
+
+    def __init__(self, out=None, rows=None, diff=True):
+        self.out = out if out is not None else sys.stderr
+        self.rows = rows
+        self.diff = diff
+        self.prev = None
+        self.bytes_written = 0
+
+    def invalidate(self):
+        self.prev = None
+
+    def _height(self):
+        if self.rows is not None:
+            return self.rows
+        return shutil.get_terminal_size((80, 24)).lines
+
+    def draw(self, lines):
+        """Draw *lines*, leaving the cursor at the end of the last line."""
+        if not self.diff or self.prev is None or len(lines) >= self._height():
+            text = "\033[2J\033[H" + "\n".join(lines)
+        else:
+            parts = []
+            last = len(lines) - 1
+            for row, line in enumerate(lines[:last]):
+                if row >= len(self.prev) or self.prev[row] != line:
+                    parts.append(f"\033[{row + 1};1H{line}\033[K")
+            if len(lines) < len(self.prev):
+                parts.append(f"\033[{len(lines) + 1};1H\033[J")
+            # The prompt row always goes last: it wipes the echoed input
+            # and leaves the cursor where the next input is typed.
+            parts.append(f"\033[{last + 1};1H{lines[last]}\033[K")
+            text = "".join(parts)
+        self.out.write(text)
+        self.out.flush()
+        self.bytes_written += len(text.encode("utf-8"))
+        self.prev = list(lines)
+
+
+class SearchIndex:
+    """Precomputed lowercase index for filtering selector items as you type.
+
+    Names (display name, identifier and platform details) are matched
+    fuzzily: the query's characters must appear in order within one
+    field, spaces ignored, so "vsdk" finds "vscode-docker". Descriptions
+    are prose, where in-order letters match almost anything, so they
+    match on the query as a substring instead. Per-character posting
+    lists narrow the candidates before the regex check, and a query that
+    extends the previous one only rechecks the previous matches.
+    """
+
+    def __init__(self, items):
+        self.names = []
+        self.descs = []
+        self.by_char = {}
+        for idx, item in enumerate(items):
+            fields = [item.display, item.id]
+            fields.extend(str(v) for v in item.details.values())
+            names = "\n".join(fields).lower()
+            desc = DESCRIPTIONS.get(item.id).lower()
+            self.names.append(names)
+            self.descs.append(desc)
+            for ch in set(names).union(desc):
+                self.by_char.setdefault(ch, []).append(idx)
+        self._last = ("", list(range(len(items))))
+
+    def search(self, query):
+        """Return the ascending indices of the items matching *query*."""
+        phrase = " ".join(query.lower().split())
+        needle = phrase.replace(" ", "")
+        if not needle:
+            return list(range(len(self.names)))
+        last_phrase, last_hits = self._last
+        candidates = min((self.by_char.get(ch, []) for ch in set(needle)), key=len)
+        if last_phrase and phrase.startswith(last_phrase) and len(last_hits) < len(candidates):
+            candidates = last_hits
+        if len(needle) == 1:
+            hits = list(candidates)
+        else:
+            # "[^b\n]*b" classes keep the match inside one field and never
+            # backtrack, so a miss costs one linear scan
+            pattern = re.compile(re.escape(needle[0]) + "".join(
+                f"[^{re.escape(ch)}\\n]*{re.escape(ch)}" for ch in needle[1:]))
+            fuzzy = pattern.search
+            names, descs = self.names, self.descs
+            hits = [idx for idx in candidates if fuzzy(names[idx]) or phrase in descs[idx]]
+        self._last = (phrase, hits)
+        return hits
+
+
+def page_starts(items, view, rows):
+    """Return the view positions where each page starts.
+
+    A page holds at most *rows* lines: its items plus a category header
+    at the top of the page and wherever the category changes.
+    """
+    rows = max(rows, MIN_PAGE_ROWS)
+    starts = [0]
+    used = 0
+    cat = None
+    for pos, idx in enumerate(view):
+        item_cat = items[idx].cat
+        need = 2 if (used == 0 or item_cat != cat) else 1
+        if used and used + need > rows:
+            starts.append(pos)
+            used, need = 0, 2
+        used += need
+        cat = item_cat
+    return starts
+
+
+def _build_frame(items, view, starts, page, os_label, sel_count, bl_count, query="",
+                 searching=False, cursor=-1, entry=None):
+    """Return the selector screen for *page* of *view* as a list of lines.
+
+    *view* lists the indices into *items* currently shown and *starts* is
+    its ``page_starts``; display numbers are positions in the view, so
+    toggles act on what is shown. *cursor* is the highlighted view
+    position and *entry* the number input being typed, if any.
+    """
+    total = len(items)
+    total_pages = len(starts)
+    start = starts[page]
+    end = starts[page + 1] if page + 1 < total_pages else len(view)
+
+    lines = []
+    lines.append("")
+    lines.append(f"  {BOLD}━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━{RESET}")
+    lines.append(f"  {BOLD}  Package Selector - {os_label}{RESET}")
+    lines.append(f"  {BOLD}━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━{RESET}")
+    lines.append("")
+
+    current_cat = None
+    for pos in range(start, end):
+        item = items[view[pos]]
+        if item.cat != current_cat:
+            current_cat = item.cat
+            lines.append(f"  {BOLD}{CYAN}{current_cat}{RESET}")
+
+        marker = f"  {BOLD}{CYAN}>{RESET} " if pos == cursor else "    "
+        check = f"{GREEN}x{RESET}" if item.sel else " "
+        bl_tag = f" {YELLOW}BL{RESET} " if item.bl else "    "
+        num_str = f"{pos + 1:>3}"  # 1-based display number
+        if item.na:
+            lines.append(f"{marker}[{check}]{bl_tag}{DIM}{num_str}. {item.display}  N/A{RESET}")
+        else:
+            lines.append(f"{marker}[{check}]{bl_tag}{DIM}{num_str}.{RESET} {item.display}")
+    if start == end:
+        lines.append(f"  {DIM}No packages match \"{query}\".{RESET}")
+
+    lines.append("")
+    desel_count = total - sel_count
+    bl_info = f"  |  {bl_count} blacklisted" if bl_count else ""
+    lines.append(f"  {DIM}Page {page + 1}/{total_pages}  |  "
+                  f"{sel_count} selected, {desel_count} deselected{bl_info}  |  "
+                  f"{total} total{RESET}")
+    if query:
+        lines.append(f"  {DIM}Filter: \"{query}\"  |  {len(view)} of {total} shown{RESET}")
+    lines.append("")
+    if searching:
+        lines.append(f"  Type to filter   {CYAN}[Enter]{RESET} Keep filter   {CYAN}[Esc]{RESET} Clear filter")
+        lines.append("")
+        lines.append(f"  {BOLD}/{RESET} {query}")
+        return lines
+    lines.append(f"  {CYAN}[↑↓/jk]{RESET} Move  {CYAN}[←→/np]{RESET} Page  {CYAN}[Space]{RESET} Toggle  "
+                 f"{CYAN}[A]{RESET}/{CYAN}[D]{RESET} All/None  {CYAN}[R]{RESET} Reset")
+    lines.append(f"  {CYAN}[I]{RESET} Info  {CYAN}[/]{RESET} Search  {CYAN}[C]{RESET} Confirm  "
+                 f"{CYAN}[Q]{RESET} Cancel  Numbers: {BOLD}4{RESET}, {BOLD}3-7{RESET}, {BOLD}1,3,9{RESET} + Enter")
+    lines.append("")
+    lines.append(f"  {BOLD}>{RESET} {entry or ''}")
+    return lines
+
+
+def run_selector(items, os_label, renderer=None, read_key=None, rows=None):
+    """Run the interactive selector over *items* (``manifest_index.Item``).
+
+    Blacklisted items (``bl``) start deselected; unavailable ones (``na``)
+    are drawn greyed out with an ``N/A`` tag.
+    Every command is a single keystroke: arrows or j/k move the cursor,
+    Space toggles the item under it, and pages follow the terminal height.
+    Digits start a number entry ("4", "3-7", "1,3,9") applied on Enter.
+    ``/`` enters a live search that filters the list on every keystroke;
+    toggles, A/D and package info then act on the filtered view.
+    Without *read_key*, the terminal is put into cbreak mode for the whole
+    session (``Terminal``). Tests and scripts/selector_bench.py pass
+    scripted keys, an in-memory *renderer* and a fixed number of *rows*
+    instead.
 
     Returns a dict ``{"deselected": [...], "remove_from_blacklist": [...]}``
     on confirmation, or ``None`` if cancelled.
     """
-    if blacklist is None:
-        blacklist = set()
-
-    # Flatten into ordered list
-    items = []
-    for cat_name, pkgs in categories:
-        for display, ident, details in pkgs:
-            bl = ident in blacklist
-            items.append({"cat": cat_name, "display": display, "id": ident,
-                          "sel": not bl, "bl": bl, "details": details})
+    if read_key is None:
+        with Terminal() as term:
+            return run_selector(items, os_label, renderer, term.read_key, rows or term.rows)
+    if renderer is None:
+        renderer = FrameRenderer()
 
     # Snapshot of initial selection state for Reset
-    initial_state = [(it["sel"], it["bl"]) for it in items]
+    initial_state = [(it.sel, it.bl) for it in items]
 
     if not items:
         eprint(f"\n  No packages found for {os_label}.\n")
         return None
 
-    total = len(items)
-    page = 0
-    total_pages = max(1, (total + PAGE_SIZE - 1) // PAGE_SIZE)
+    def height():
+        return rows() if callable(rows) else (rows or 24)
 
-    while True:
-        # Render
-        start = page * PAGE_SIZE
-        end = min(start + PAGE_SIZE, total)
-        page_items = items[start:end]
+    view = list(range(len(items)))
+    cursor = 0          # position in view
+    entry = None        # number entry being typed
+    query = ""
+    index = None        # built on first search
+    starts = None       # page_starts for view at the current height
 
-        lines = []
-        lines.append("")
-        lines.append(f"  {BOLD}━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━{RESET}")
-        lines.append(f"  {BOLD}  Package Selector - {os_label}{RESET}")
-        lines.append(f"  {BOLD}━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━━{RESET}")
-        lines.append("")
-
-        current_cat = None
-        for idx_offset, item in enumerate(page_items):
-            global_idx = start + idx_offset + 1  # 1-based display number
-            if item["cat"] != current_cat:
-                current_cat = item["cat"]
-                lines.append(f"  {BOLD}{CYAN}{current_cat}{RESET}")
-
-            check = f"{GREEN}x{RESET}" if item["sel"] else " "
-            bl_tag = f" {YELLOW}BL{RESET} " if item.get("bl") else "    "
-            num_str = f"{global_idx:>3}"
-            lines.append(f"    [{check}]{bl_tag}{DIM}{num_str}.{RESET} {item['display']}")
+    # Counters are maintained as items change rather than rescanned per frame
+    initial_sel = sum(1 for sel, _ in initial_state if sel)
+    bl_count = sum(1 for _, bl in initial_state if bl)
+    sel_count = initial_sel
 
-        lines.append("")
-        sel_count = sum(1 for i in items if i["sel"])
-        desel_count = total - sel_count
-        bl_count = sum(1 for i in items if i.get("bl"))
-        bl_info = f"  |  {bl_count} blacklisted" if bl_count else ""
-        lines.append(f"  {DIM}Page {page + 1}/{total_pages}  |  "
-                      f"{sel_count} selected, {desel_count} deselected{bl_info}  |  "
-                      f"{total} total{RESET}")
-        lines.append("")
-        lines.append(f"  {BOLD}{DIM}Legend:{RESET}")
-        lines.append("")
-        lines.append(f"  {CYAN}[A]{RESET} Select All   {CYAN}[D]{RESET} Deselect All   {CYAN}[R]{RESET} Reset")
-        lines.append(f"  {CYAN}[N]{RESET} Next Page    {CYAN}[P]{RESET} Prev Page")
-        lines.append(f"  {CYAN}[I]{RESET} Package Info {CYAN}[Q]{RESET} Cancel")
-        lines.append(f"  {CYAN}[C]{RESET} Confirm")
-        lines.append("")
-        lines.append(f"  Toggle: {BOLD}4{RESET}  range: {BOLD}3-7{RESET}  multi: {BOLD}1,3,9{RESET}  pkg info: {BOLD}i5{RESET}")
-        lines.append("")
-        lines.append(f"  {BOLD}>{RESET} ")
+    def toggle(pos):
+        nonlocal sel_count
+        if 0 <= pos < len(view):
+            item = items[view[pos]]
+            item.sel = not item.sel
+            sel_count += 1 if item.sel else -1
 
-        # Clear screen and draw
-        eprint(f"\033[2J\033[H", end="")
-        for line in lines[:-1]:
-            eprint(line)
-        eprint(lines[-1], end="")
-        sys.stderr.flush()
+    while True:
+        if starts is None:
+            renderer.rows = height()
+            starts = page_starts(items, view, renderer.rows - FRAME_CHROME)
+        page = bisect.bisect_right(starts, cursor) - 1
+        renderer.draw(_build_frame(items, view, starts, page, os_label, sel_count, bl_count,
+                                   query, cursor=cursor, entry=entry))
 
-        # Read input
         try:
-            user_input = read_line_from_tty().strip()
+            key = read_key()
         except (KeyboardInterrupt, EOFError):
             return None
 
-        if not user_input:
+        if key == "resize":
+            starts = None
+            renderer.invalidate()
             continue
 
-        low = user_input.lower()
+        if entry is not None:
+            # Number entry: toggles are applied on Enter, Esc discards
+            if key == "enter":
+                for num in parse_toggle_input(entry):
+                    toggle(num - 1)
+                entry = None
+            elif key in ("esc", "ctrl-c"):
+                entry = None
+            elif key == "backspace":
+                entry = entry[:-1] or None
+            elif len(key) == 1 and key in "0123456789,- ":
+                entry += key
+            continue
 
-        if low == "q":
+        low = key.lower() if len(key) == 1 else key
+        last = max(len(view) - 1, 0)
+
+        if len(key) == 1 and key.isdigit():
+            entry = key
+        elif low in ("up", "k"):
+            cursor = max(cursor - 1, 0)
+        elif low in ("down", "j"):
+            cursor = min(cursor + 1, last)
+        elif low in ("pgdn", "right", "l", "n"):
+            if page < len(starts) - 1:
+                cursor = starts[page + 1]
+        elif low in ("pgup", "left", "h", "p"):
+            if page > 0:
+                cursor = starts[page - 1]
+        elif key in ("home", "g"):
+            cursor = 0
+        elif key in ("end", "G"):
+            cursor = last
+        elif key == " ":
+            toggle(cursor)
+        elif key == "/":
+            if index is None:
+                index = SearchIndex(items)
+            # Live mode: refilter on every key until Enter (keep) or Esc (clear)
+            while True:
+                view = index.search(query)
+                starts = page_starts(items, view, renderer.rows - FRAME_CHROME)
+                renderer.draw(_build_frame(items, view, starts, 0, os_label, sel_count, bl_count,
+                                           query, searching=True))
+                try:
+                    ch = read_key()
+                except (KeyboardInterrupt, EOFError):
+                    ch = "esc"
+                if ch == "enter":
+                    break
+                if ch in ("esc", "ctrl-c"):
+                    query = ""
+                    view = index.search(query)
+                    break
+                if ch == "backspace":
+                    query = query[:-1]
+                elif ch == "resize":
+                    renderer.rows = height()
+                    renderer.invalidate()
+                elif len(ch) == 1 and ch.isprintable():
+                    query += ch
+            cursor = 0
+            starts = None
+        elif low == "esc":
+            if query and index is not None:
+                query = ""
+                view = index.search(query)
+                cursor = 0
+                starts = None
+        elif low == "q":
             return None
         elif low == "c":
             # Detect blacklisted packages the user re-enabled
-            reenabled = [i for i in items if i.get("bl") and i["sel"]]
+            reenabled = [i for i in items if i.bl and i.sel]
             remove_from_bl = []
             if reenabled:
-                action = _show_reenable_prompt(reenabled)
+                action = _show_reenable_prompt(reenabled, read_key)
+                renderer.invalidate()
                 if action == "b":
                     continue  # go back to selector
                 elif action == "r":
-                    remove_from_bl = [i["id"] for i in reenabled]
+                    remove_from_bl = [i.id for i in reenabled]
                 # action == "i" -> one-time install, keep in blacklist
-            deselected = [i["id"] for i in items if not i["sel"]]
+            deselected = [i.id for i in items if not i.sel]
             return {"deselected": deselected, "remove_from_blacklist": remove_from_bl}
-        elif low == "a":
-            for i in items:
-                i["sel"] = True
-        elif low == "d":
-            for i in items:
-                i["sel"] = False
+        elif low in ("a", "d"):
+            wanted = low == "a"
+            for idx in view:
+                if items[idx].sel != wanted:
+                    items[idx].sel = wanted
+                    sel_count += 1 if wanted else -1
         elif low == "r":
             for idx, (sel, bl) in enumerate(initial_state):
-                items[idx]["sel"] = sel
-                items[idx]["bl"] = bl
-        elif low == "n":
-            if page < total_pages - 1:
-                page += 1
-        elif low == "p":
-            if page > 0:
-                page -= 1
-        elif low.startswith("i") and low[1:].strip().isdigit():
-            # Info command: "i5", "i 5", "I12"
-            num = int(low[1:].strip())
-            idx = num - 1
-            if 0 <= idx < total:
-                show_package_info(items[idx])
+                items[idx].sel = sel
+                items[idx].bl = bl
+            sel_count = initial_sel
+        elif low == "i":
+            if view:
+                show_package_info(items[view[cursor]], read_key)
+                renderer.invalidate()
+
+
+# ---------------------------------------------------------------------------
+# Headless plan
+# ---------------------------------------------------------------------------
+
+# Package-manager backends in a plan, per OS: (backend, select_targets key).
+# These lists are exactly what site.yml installs for the same omit list.
+PLAN_BACKENDS = {
+    "macos": (("brew", "brew_formulae"), ("brew_cask", "brew_casks"), ("vscode", "vscode_extensions")),
+    "ubuntu": (("apt", "apt_packages"), ("flatpak", "flatpak_apps"), ("vscode", "vscode_extensions")),
+    "fedora": (("dnf", "rpm_packages"), ("flatpak", "flatpak_apps"), ("vscode", "vscode_extensions")),
+}
+# linux.type -> plan backend for what the roles install from the manifest itself
+ROLE_BACKENDS = {"apt": "apt_app", "deb": "deb", "npm": "npm"}
+
+
+def _backend(details, os_name, ident):
+    """Return ``(backend, package)`` for how an item installs on *os_name*."""
+    if "extension_id" in details:
+        return "vscode", details["extension_id"]
+    if "flatpak_id" in details:
+        return "flatpak", details["flatpak_id"]
+    if os_name == "macos":
+        if details.get("brew_formula"):
+            return "brew", details["brew_formula"]
+        return "brew_cask", details.get("brew_cask", ident)
+    native = "apt" if os_name == "ubuntu" else "dnf"
+    if details.get(native):
+        return native, details[native]
+    if details.get("linux_type"):
+        return ROLE_BACKENDS.get(details["linux_type"], details["linux_type"]), \
+            details.get("linux_package", ident)
+    if details.get("linux_url"):
+        return "font", ident
+    return native, ident
+
+
+def _matches(ident, cat_name, patterns):
+    """True if *ident* (or ``category:<name>``) matches any glob in *patterns*."""
+    cat_key = f"category:{cat_name}".lower()
+    return any(fnmatch.fnmatchcase(ident, pat) or fnmatch.fnmatch(cat_key, pat.lower())
+               for pat in patterns)
+
+
+def build_plan(compiled, os_name, arch, blacklist=(), include=(), exclude=()):
+    """Resolve a non-interactive selection into a JSON-ready plan.
+
+    Every item starts selected unless blacklisted. *exclude* patterns then
+    deselect and *include* patterns re-select, so ``exclude=["*"]`` with
+    a few includes acts as an allowlist. Patterns are shell globs matched
+    against the identifier, or ``category:<name>`` for a whole category.
+
+    The deselected identifiers are the omit list the playbook gets, so the
+    package-manager backends are ``select_targets`` for that omit list
+    (including distribution extras). Items the roles install from the
+    manifest (``apt_app``, ``deb``, ``npm``, ``font``) follow. Selected
+    items that no role installs on *os_name* are listed as ``unmanaged``.
+    """
+    plan = {"os": os_name, "arch": arch, "categories": {}, "backends": {},
+            "deselected": [], "remove_from_blacklist": [], "unmanaged": []}
+    chosen = []
+    for cat_name, pkgs in select_categories(compiled, os_name, arch):
+        for _, ident, details in pkgs:
+            selected = ident not in blacklist
+            if _matches(ident, cat_name, exclude):
+                selected = False
+            if _matches(ident, cat_name, include):
+                selected = True
+            if not selected:
+                plan["deselected"].append(ident)
+                continue
+            plan["categories"].setdefault(cat_name, []).append(ident)
+            chosen.append((ident, details))
+
+    distribution = "" if os_name == "macos" else os_name
+    targets = select_targets(compiled, distribution, (), arch, omit=plan["deselected"])
+    managers = dict(PLAN_BACKENDS[os_name])
+    for backend, key in PLAN_BACKENDS[os_name]:
+        if targets[key]:
+            plan["backends"][backend] = list(targets[key])
+    for ident, details in chosen:
+        backend, package = _backend(details, os_name, ident)
+        if backend in managers:
+            if package not in plan["backends"].get(backend, ()):
+                plan["unmanaged"].append(ident)
         else:
-            # Try parsing as toggle numbers (single, range, comma-separated, mixed)
-            nums = parse_toggle_input(user_input)
-            for num in nums:
-                idx = num - 1
-                if 0 <= idx < total:
-                    items[idx]["sel"] = not items[idx]["sel"]
+            plan["backends"].setdefault(backend, []).append(package)
+    return plan
+
+
+def load_profile(path):
+    """Read a headless profile (YAML or JSON) with include/exclude/targets lists."""
+    profile = load_yaml(path) or {}
+    if not isinstance(profile, dict):
+        raise ValueError("profile must be a mapping")
+    return {key: [str(v) for v in (profile.get(key) or [])]
+            for key in ("include", "exclude", "targets")}
+
+
+def parse_target(text, default_arch):
+    """Parse ``os[/arch]`` into ``(os, arch)``."""
+    os_name, _, arch = text.partition("/")
+    if os_name not in OS_LABELS:
+        raise ValueError(f"unknown OS in target {text!r} (expected one of {', '.join(OS_LABELS)})")
+    return os_name, arch or default_arch
+
+
+def run_headless(args, compiled, blacklist):
+    """Resolve one plan per target without a TTY; return the exit code."""
+    include, exclude, targets = list(args.include), list(args.exclude), list(args.target)
+    if args.profile:
+        try:
+            profile = load_profile(args.profile)
+        except (OSError, ValueError) as exc:
+            eprint(f"Error: cannot read profile {args.profile}: {exc}")
+            return 1
+        include += profile["include"]
+        exclude += profile["exclude"]
+        targets = targets or profile["targets"]
+    if not targets:
+        if not args.os:
+            eprint("Error: --headless needs --os or at least one --target")
+            return 1
+        targets = [f"{args.os}/{args.arch}"]
+
+    plans = []
+    for text in targets:
+        try:
+            os_name, arch = parse_target(text, args.arch)
+        except ValueError as exc:
+            eprint(f"Error: {exc}")
+            return 1
+        plans.append(build_plan(compiled, os_name, arch, blacklist, include, exclude))
+    json.dump({"plans": plans}, sys.stdout, indent=2)
+    sys.stdout.write("\n")
+    return 0
 
 
 # ---------------------------------------------------------------------------
@@ -722,35 +902,59 @@ def run_selector(categories, os_label, blacklist=None):
 def main():
     parser = argparse.ArgumentParser(description="Interactive package selector for CompSetup")
     parser.add_argument("--packages-file", required=True, help="Path to packages.yml")
-    parser.add_argument("--os", required=True, choices=["macos", "ubuntu", "fedora"],
-                        help="Target OS to filter packages")
+    parser.add_argument("--os", choices=list(OS_LABELS),
+                        help="Target OS to filter packages (required unless --headless --target is used)")
     parser.add_argument("--blacklist-file", default=None,
                         help="Path to permanent blacklist file (one package per line)")
     parser.add_argument("--arch", default=platform.machine(),
                         help="System architecture (default: auto-detected via platform.machine())")
+    parser.add_argument("--no-availability-check", action="store_true",
+                        help="Do not query apt for package availability (Ubuntu only)")
+    parser.add_argument("--headless", action="store_true",
+                        help="Do not open the TUI; print the resolved plan as JSON")
+    parser.add_argument("--target", action="append", default=[], metavar="OS[/ARCH]",
+                        help="Headless: resolve a plan for this OS/arch (repeatable)")
+    parser.add_argument("--include", action="append", default=[], metavar="GLOB",
+                        help="Headless: select matching packages, even if blacklisted (repeatable)")
+    parser.add_argument("--exclude", action="append", default=[], metavar="GLOB",
+                        help="Headless: deselect matching packages; 'category:Fonts' matches a category")
+    parser.add_argument("--profile", default=None,
+                        help="Headless: YAML/JSON file with include, exclude and targets lists")
     args = parser.parse_args()
 
     if not os.path.isfile(args.packages_file):
         eprint(f"Error: packages file not found: {args.packages_file}")
         sys.exit(1)
+    blacklist = load_blacklist(args.blacklist_file)
 
-    data = load_yaml(args.packages_file)
-    manifest = data.get("package_manifest", data)
+    if args.headless:
+        try:
+            compiled = load_compiled(args.packages_file)
+        except ValueError as exc:
+            eprint(f"Error: cannot parse {args.packages_file}: {exc}")
+            sys.exit(1)
+        sys.exit(run_headless(args, compiled, blacklist))
+
+    if not args.os:
+        parser.error("--os is required unless --headless is given")
+    os_label = OS_LABELS[args.os]
+    try:
+        view = load_view(args.packages_file, args.os, args.arch)
+    except ValueError as exc:
+        eprint(f"Error: cannot parse {args.packages_file}: {exc}")
+        sys.exit(1)
 
-    # Filter out x86_64-only flatpak apps on non-x86_64 architectures
-    if args.arch not in ("x86_64", "amd64"):
-        x86_only = set(manifest.get("x86_64_only_flatpak_apps", []))
-        if x86_only:
-            manifest["flatpak_apps"] = [
-                fp for fp in manifest.get("flatpak_apps", [])
-                if fp not in x86_only
-            ]
+    items = items_from_view(view, blacklist)
 
-    os_label = {"macos": "macOS", "ubuntu": "Ubuntu", "fedora": "Fedora"}[args.os]
-    categories = filter_packages(manifest, args.os)
-    blacklist = load_blacklist(args.blacklist_file)
+    if not args.no_availability_check:
+        unavailable = find_unavailable(items, args.os)
+        for item in items:
+            item.na = item.id in unavailable
 
-    result = run_selector(categories, os_label, blacklist)
+    if not sys.stdin.isatty():
+        eprint("Error: the package selector needs a terminal on stdin (use --headless)")
+        sys.exit(1)
+    result = run_selector(items, os_label)
 
     if result is None:
         sys.exit(2)
@@ -0,0 +1,351 @@
+#!/usr/bin/env python3
+"""Third-party package repositories for CompSetup, with one metadata refresh.
+
+Reads the ``repositories`` section of packages.yml and brings every
+keyring, apt ``.sources`` file and dnf ``.repo`` file for the selected
+entries up to date before any package work. The result says whether
+anything changed, so the role refreshes apt/dnf metadata exactly once,
+and only then, instead of after every repository.
+
+Entry kinds per family:
+    apt: ``uris``/``suites``/``components`` [``architectures``] with
+         ``key_url`` + ``keyring`` -> deb822 ``<name>.sources``
+         ``ppa`` [``distributions``] -> ``add-apt-repository --no-update``
+    dnf: ``baseurl`` [``gpgcheck``, ``gpgkey``, ``id``] -> ``<name>.repo``
+         ``release_rpm`` + ``repo_file`` -> one ``dnf install`` of the
+         missing release packages (``{releasever}`` is substituted)
+    ``replaces`` lists older files for the same repository (written by
+    apt_repository/yum_repository) that are removed once ours is in place.
+
+Signing keys are not downloaded here. ``plan`` lists the keyrings that
+are missing, the role fetches them through artifact_cache.py into
+``--keys-dir`` as ``<name>.key``, and ``apply`` dearmors and installs
+them.
+
+Output (stdout, JSON):
+    plan/apply -> {"family", "repositories": [...], "keys": [{"repo", "url"}],
+                   "changes": [{"repo", "action", "path"}],
+                   "refresh": bool, "changed": bool}
+
+    action is one of: create, update, remove, add-ppa, install-release
+
+Usage:
+    repo_setup.py plan --family apt --repos-json "$(...)" --distribution ubuntu \\
+        --apps-json '["signal-desktop"]'
+    repo_setup.py apply --family dnf --repos-json "$(...)" --flag install_nvidia \\
+        --releasever 40
+    repo_setup.py apply ... --root /tmp/fixture --dnf ./fake-dnf   # test stand-ins
+
+Exit codes:
+    0 - Plan computed / every change applied
+    1 - Invalid arguments, a key is missing, or a command failed
+"""
+
+import argparse
+import base64
+import binascii
+import glob
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+APT_SOURCES_DIR = "/etc/apt/sources.list.d"
+DNF_REPOS_DIR = "/etc/yum.repos.d"
+DEFAULT_KEYS_DIR = "/tmp/compsetup-repo-keys"
+PPA_HOSTS = ("ppa.launchpadcontent.net", "ppa.launchpad.net")
+ARMOR_BEGIN = "-----BEGIN PGP PUBLIC KEY BLOCK-----"
+ARMOR_END = "-----END PGP PUBLIC KEY BLOCK-----"
+FAMILIES = ("apt", "dnf")
+
+# ---------------------------------------------------------------------------
+# Selection and rendering
+# ---------------------------------------------------------------------------
+
+
+def select_repositories(repos, family, distribution="", apps=(), flags=()):
+    """Return ``[(name, spec)]`` for the entries that apply to this host."""
+    selected = []
+    for repo in repos or []:
+        spec = repo.get(family)
+        if not isinstance(spec, dict):
+            continue
+        if repo.get("app") and repo["app"] not in apps:
+            continue
+        if repo.get("flag") and repo["flag"] not in flags:
+            continue
+        distributions = spec.get("distributions")
+        if distributions and distribution not in distributions:
+            continue
+        selected.append((repo["name"], spec))
+    return selected
+
+
+def _words(value):
+    return " ".join(value) if isinstance(value, list) else str(value)
+
+
+def deb822(spec):
+    lines = ["Types: deb", f"URIs: {spec['uris']}", f"Suites: {_words(spec['suites'])}"]
+    if spec.get("components"):
+        lines.append(f"Components: {_words(spec['components'])}")
+    if spec.get("architectures"):
+        lines.append(f"Architectures: {_words(spec['architectures'])}")
+    if spec.get("keyring"):
+        lines.append(f"Signed-By: {spec['keyring']}")
+    return "\n".join(lines) + "\n"
+
+
+def dnf_repo(name, spec):
+    lines = [f"[{spec.get('id', name)}]", f"name={spec.get('description', name)}",
+             f"baseurl={spec['baseurl']}", "enabled=1",
+             f"gpgcheck={1 if spec.get('gpgcheck', True) else 0}"]
+    if spec.get("gpgkey"):
+        lines.append(f"gpgkey={spec['gpgkey']}")
+    return "\n".join(lines) + "\n"
+
+
+def crc24(data):
+    """OpenPGP armor checksum (RFC 4880, section 6.1)."""
+    crc = 0xB704CE
+    for byte in data:
+        crc ^= byte << 16
+        for _ in range(8):
+            crc <<= 1
+            if crc & 0x1000000:
+                crc ^= 0x1864CFB
+    return crc & 0xFFFFFF
+
+
+def _armor_payload(body, checksum, line):
+    try:
+        data = base64.b64decode("".join(body), validate=True)
+        expected = None if checksum is None else base64.b64decode(checksum, validate=True)
+    except binascii.Error:
+        raise ValueError(f"line {line}: armor block is not valid base64")
+    if expected is not None and (len(expected) != 3 or crc24(data) != int.from_bytes(expected, "big")):
+        raise ValueError(f"line {line}: armor checksum mismatch")
+    return data
+
+
+def dearmor(data):
+    """Binary OpenPGP keys from *data*, like ``gpg --dearmor``.
+
+    Binary input is returned as is. Every ASCII-armored public key block
+    (RFC 4880, section 6.2) is decoded: its armor headers run up to the
+    first blank line, and its ``=XXXX`` CRC24 line, when present, must
+    match. Several blocks are concatenated, as in a keyring file.
+    """
+    if data[:1] and data[0] & 0x80:
+        return data  # an OpenPGP packet header always has the top bit set
+    keys, state, body, checksum = [], None, [], None
+    for number, line in enumerate(data.decode("ascii", "replace").splitlines(), 1):
+        line = line.rstrip()
+        if state is None:
+            if line == ARMOR_BEGIN:
+                state, body, checksum = "headers", [], None
+        elif state == "headers":
+            if not line:
+                state = "body"
+            elif ": " not in line:
+                raise ValueError(f"line {number}: invalid armor header {line[:40]!r}")
+        elif line == ARMOR_END:
+            keys.append(_armor_payload(body, checksum, number))
+            state = None
+        elif checksum is not None:
+            raise ValueError(f"line {number}: data after the armor checksum")
+        elif line.startswith("="):
+            checksum = line[1:]
+        else:
+            body.append(line)
+    if state is not None:
+        raise ValueError(f"missing {ARMOR_END}")
+    if not keys:
+        raise ValueError("no OpenPGP public key block found")
+    return b"".join(keys)
+
+
+# ---------------------------------------------------------------------------
+# Diff
+# ---------------------------------------------------------------------------
+
+
+def _under(root, path):
+    return os.path.join(root, path.lstrip("/"))
+
+
+def _read(path):
+    try:
+        with open(path, "rb") as fh:
+            return fh.read()
+    except OSError:
+        return None
+
+
+def missing_keys(selected, root="/"):
+    """``[{"repo", "url"}]`` for keyrings that are not installed yet."""
+    return [{"repo": name, "url": spec["key_url"]} for name, spec in selected
+            if spec.get("key_url") and spec.get("keyring")
+            and not os.path.exists(_under(root, spec["keyring"]))]
+
+
+def ppa_present(ppa, root="/"):
+    """True when any apt source already points at ``ppa:<owner>/<name>``."""
+    needles = [f"{host}/{ppa}/" for host in PPA_HOSTS]
+    for path in glob.glob(os.path.join(_under(root, APT_SOURCES_DIR), "*")):
+        text = (_read(path) or b"").decode("utf-8", "replace")
+        if any(needle in text for needle in needles):
+            return True
+    return False
+
+
+def desired_files(selected, family, keys_dir, root="/", strict=True):
+    """``[{"repo", "path", "content"}]`` for every file this run manages.
+
+    A keyring is only managed when it is missing. Its content comes from
+    the key fetched into *keys_dir*; without *strict* a key that was not
+    fetched yet is listed with ``content`` None (it will be created).
+    """
+    files = []
+    for name, spec in selected:
+        if family == "apt" and spec.get("uris"):
+            keyring = spec.get("keyring")
+            if keyring and not os.path.exists(_under(root, keyring)):
+                key = _read(os.path.join(keys_dir, f"{name}.key"))
+                if key is None and strict:
+                    raise FileNotFoundError(f"{name}: signing key not found in {keys_dir}")
+                files.append({"repo": name, "path": keyring,
+                              "content": None if key is None else dearmor(key)})
+            files.append({"repo": name, "path": f"{APT_SOURCES_DIR}/{name}.sources",
+                          "content": deb822(spec).encode()})
+        elif family == "dnf" and spec.get("baseurl"):
+            files.append({"repo": name, "path": f"{DNF_REPOS_DIR}/{name}.repo",
+                          "content": dnf_repo(name, spec).encode()})
+    return files
+
+
+def diff(selected, family, files, root="/", releasever=""):
+    """Every change needed to reach *files* and the selected repositories."""
+    changes = []
+    for entry in files:
+        current = _read(_under(root, entry["path"]))
+        if current is None or current != entry["content"]:
+            changes.append({"repo": entry["repo"], "path": entry["path"],
+                            "action": "create" if current is None else "update"})
+    base = APT_SOURCES_DIR if family == "apt" else DNF_REPOS_DIR
+    for name, spec in selected:
+        for old in spec.get("replaces") or []:
+            path = f"{base}/{old}"
+            if os.path.exists(_under(root, path)):
+                changes.append({"repo": name, "path": path, "action": "remove"})
+        if family == "apt" and spec.get("ppa") and not ppa_present(spec["ppa"], root):
+            changes.append({"repo": name, "path": f"ppa:{spec['ppa']}", "action": "add-ppa"})
+        if family == "dnf" and spec.get("release_rpm") and not os.path.exists(
+                _under(root, f"{base}/{spec['repo_file']}")):
+            changes.append({"repo": name, "action": "install-release",
+                            "path": spec["release_rpm"].replace("{releasever}", str(releasever))})
+    return changes
+
+
+def needs_refresh(changes):
+    """One metadata refresh is due exactly when some source or key changed."""
+    return bool(changes)
+
+
+# ---------------------------------------------------------------------------
+# Apply
+# ---------------------------------------------------------------------------
+
+
+def _atomic_write(path, data, mode=0o644):
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "wb") as fh:
+            fh.write(data)
+        os.chmod(tmp, mode)
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+        raise
+
+
+def apply_changes(changes, files, root="/", ppa_cmd="add-apt-repository", dnf="dnf"):
+    contents = {entry["path"]: entry["content"] for entry in files}
+    releases = []
+    for change in changes:
+        action, path = change["action"], change["path"]
+        if action in ("create", "update"):
+            _atomic_write(_under(root, path), contents[path])
+        elif action == "remove":
+            os.unlink(_under(root, path))
+        elif action == "add-ppa":
+            subprocess.run([ppa_cmd, "--yes", "--no-update", path], check=True,
+                           stdout=subprocess.DEVNULL)
+        elif action == "install-release":
+            releases.append(path)
+    if releases:
+        # RPM Fusion and friends ship their keys inside the release package
+        subprocess.run([dnf, "install", "--assumeyes", "--nogpgcheck", *releases], check=True,
+                       stdout=subprocess.DEVNULL)
+
+
+# ---------------------------------------------------------------------------
+# Main
+# ---------------------------------------------------------------------------
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Third-party repository setup")
+    sub = parser.add_subparsers(dest="command", required=True)
+    plan_cmd = sub.add_parser("plan", help="Show the keys to fetch and the changes to make")
+    apply_cmd = sub.add_parser("apply", help="Write keyrings and source files")
+    apply_cmd.add_argument("--add-apt-repository", dest="ppa_cmd", default="add-apt-repository",
+                           help="add-apt-repository command (default: add-apt-repository)")
+    apply_cmd.add_argument("--dnf", default="dnf", help="dnf command (default: dnf)")
+    for cmd in (plan_cmd, apply_cmd):
+        cmd.add_argument("--family", required=True, choices=FAMILIES)
+        cmd.add_argument("--repos-json", required=True,
+                         help="The packages.yml repositories list as JSON")
+        cmd.add_argument("--distribution", default="", help="e.g. ubuntu, pop_os, fedora")
+        cmd.add_argument("--apps-json", default="[]", help="Selected gui app names as JSON")
+        cmd.add_argument("--flag", action="append", default=[],
+                         help="Play flag that is on (repeatable), e.g. install_nvidia")
+        cmd.add_argument("--releasever", default="", help="Substituted for {releasever}")
+        cmd.add_argument("--keys-dir", default=DEFAULT_KEYS_DIR,
+                         help=f"Fetched signing keys as <name>.key (default: {DEFAULT_KEYS_DIR})")
+        cmd.add_argument("--root", default="/", help="Filesystem root (default: /)")
+    args = parser.parse_args(argv)
+
+    try:
+        repos = json.loads(args.repos_json)
+        apps = json.loads(args.apps_json)
+    except ValueError as exc:
+        print(f"Error: invalid JSON argument: {exc}", file=sys.stderr)
+        return 1
+
+    selected = select_repositories(repos, args.family, args.distribution, apps, args.flag)
+    keys = missing_keys(selected, args.root)
+    result = {"family": args.family, "repositories": [name for name, _ in selected], "keys": keys}
+    try:
+        files = desired_files(selected, args.family, args.keys_dir, args.root,
+                              strict=args.command == "apply")
+        changes = diff(selected, args.family, files, args.root, args.releasever)
+        if args.command == "apply":
+            apply_changes(changes, files, args.root, args.ppa_cmd, args.dnf)
+    except (OSError, KeyError, ValueError, subprocess.CalledProcessError) as exc:
+        print(f"Error: {exc}", file=sys.stderr)
+        return 1
+
+    result["changes"] = changes
+    result["refresh"] = needs_refresh(changes)
+    result["changed"] = args.command == "apply" and bool(changes)
+    json.dump(result, sys.stdout, indent=2)
+    sys.stdout.write("\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
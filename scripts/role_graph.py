@@ -0,0 +1,474 @@
+#!/usr/bin/env python3
+"""Role dependency graph and parallel scheduler for CompSetup.
+
+Every role in site.yml declares its scheduling needs in
+``roles/<role>/meta/schedule.yml``:
+
+    systems:  [Debian]            - only scheduled on these systems: Darwin,
+                                    Linux, or the Linux family Debian/RedHat
+                                    (default: all)
+    provides: [zsh, oh-my-zsh]    - capabilities other roles can need
+    needs:    [oh-my-zsh]         - capabilities that must be in place first
+    locks:    [package_manager]   - held for the whole role
+    ``needs`` and ``locks`` also take a mapping such as
+    {Darwin: [...], Linux: [...]} to set them per system (or family)
+
+A role waits for every role on the same system that provides one of its
+needs, and roles holding the same lock never overlap. ``run`` starts one
+``ansible-playbook`` process per role (``compsetup_roles=[role]``, see
+site.yml), at most ``--jobs`` at a time. Among the startable roles it
+picks the one with the longest remaining path first, so the wall time
+approaches the critical path. apt/dnf tasks in roles without the
+package_manager lock wait for the dpkg/rpm lock (``compsetup_lock_timeout``)
+instead of failing.
+
+Role durations for the critical path come from the last ``run``
+(``graph/latest.json``), else from the last sequential timing run
+(scripts/timing_report.py), else 1 second per role.
+
+Output:
+    check -> nothing on success, errors on stderr
+    show  -> levels, locks, critical path and simulated wall time;
+             ``--json`` for the same as JSON, ``--dot`` for Graphviz
+    run   -> one line per role start/finish, then wall time vs. critical path;
+             logs and per-role timing in ~/.local/state/compsetup/graph/<stamp>/,
+             the merged timing run as the timing directory's latest.json
+
+Usage:
+    role_graph.py check [--system Darwin|Debian|RedHat]
+    role_graph.py show [--jobs 4] [--json | --dot]
+    role_graph.py run --jobs 4 -- --extra-vars @vars.json
+
+Exit codes:
+    0 - Graph is valid / every scheduled role succeeded
+    1 - Invalid graph, or a role failed (roles needing it are not started)
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+from manifest_resolver import load_yaml
+from timing_report import aggregate, load_run, merge_runs, timing_dir
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PLAYBOOK = os.path.join(REPO_DIR, "site.yml")
+SPEC_KEYS = ("systems", "provides", "needs", "locks")
+DEFAULT_GRAPH_DIR = os.path.join("~", ".local", "state", "compsetup", "graph")
+DEFAULT_LOCK_TIMEOUT = 3600
+LINUX_FAMILIES = {"debian": "Debian", "ubuntu": "Debian", "pop": "Debian",
+                  "fedora": "RedHat", "rhel": "RedHat", "centos": "RedHat"}
+
+# ---------------------------------------------------------------------------
+# Graph
+# ---------------------------------------------------------------------------
+
+
+def site_roles(playbook=PLAYBOOK):
+    """Role names of the first play in *playbook*, in order."""
+    plays = load_yaml(playbook) or []
+    names = []
+    for entry in (plays[0].get("roles") or []) if plays else []:
+        name = entry.get("role") if isinstance(entry, dict) else entry
+        if name and name not in names:
+            names.append(name)
+    return names
+
+
+def this_system():
+    """``Darwin``, or the Linux family (``Debian``/``RedHat``) from os-release."""
+    system = platform.system()
+    if system != "Linux":
+        return system
+    try:
+        with open("/etc/os-release", "r") as fh:
+            fields = dict(line.rstrip("\n").split("=", 1) for line in fh if "=" in line)
+    except OSError:
+        return system
+    for name in [fields.get("ID", "")] + fields.get("ID_LIKE", "").split():
+        family = LINUX_FAMILIES.get(name.strip('"'))
+        if family:
+            return family
+    return system
+
+
+def _names(system):
+    return {system, "Linux"} if system in ("Debian", "RedHat") else {system}
+
+
+def load_specs(roles, repo_dir=REPO_DIR):
+    """Return ``{role: schedule.yml mapping or None}``."""
+    specs = {}
+    for role in roles:
+        path = os.path.join(repo_dir, "roles", role, "meta", "schedule.yml")
+        specs[role] = (load_yaml(path) or {}) if os.path.isfile(path) else None
+    return specs
+
+
+def _per_system(spec, key, system):
+    """``spec[key]`` as a list; a mapping is resolved for *system* and its family."""
+    values = spec.get(key) or []
+    if isinstance(values, dict):
+        values = [value for name in sorted(_names(system)) for value in values.get(name) or []]
+    return sorted(set(values))
+
+
+def build_graph(specs, system):
+    """Resolve *specs* for *system* into dependencies and locks.
+
+    Returns ``{"system", "roles", "deps": {role: [...]}, "locks": {role: [...]},
+    "errors": [...]}``; ``roles`` keeps site.yml order.
+    """
+    graph = {"system": system, "roles": [], "deps": {}, "locks": {}, "errors": []}
+    providers = {}
+    for role, spec in specs.items():
+        if spec is None:
+            graph["errors"].append(f"{role}: missing roles/{role}/meta/schedule.yml")
+            continue
+        unknown = sorted(set(spec) - set(SPEC_KEYS))
+        if unknown:
+            graph["errors"].append(f"{role}: unknown key(s) {', '.join(unknown)}")
+        systems = spec.get("systems")
+        if systems and not _names(system) & set(systems):
+            continue
+        graph["roles"].append(role)
+        graph["locks"][role] = _per_system(spec, "locks", system)
+        for capability in spec.get("provides") or []:
+            providers.setdefault(capability, []).append(role)
+
+    for role in graph["roles"]:
+        deps = set()
+        for need in _per_system(specs[role], "needs", system):
+            found = [p for p in providers.get(need, []) if p != role]
+            if not found:
+                graph["errors"].append(f"{role}: nothing on {system} provides '{need}'")
+            deps.update(found)
+        graph["deps"][role] = [r for r in graph["roles"] if r in deps]
+
+    cycle = find_cycle(graph)
+    if cycle:
+        graph["errors"].append("dependency cycle: " + " -> ".join(cycle))
+    return graph
+
+
+def find_cycle(graph):
+    """Return one cycle as a list of roles, or ``None``."""
+    state = {}
+
+    def visit(role, path):
+        state[role] = "active"
+        for dep in graph["deps"].get(role, []):
+            if state.get(dep) == "active":
+                return path[path.index(dep):] + [dep] if dep in path else [role, dep]
+            if dep not in state:
+                found = visit(dep, path + [dep])
+                if found:
+                    return found
+        state[role] = "done"
+        return None
+
+    for role in graph["roles"]:
+        if role not in state:
+            found = visit(role, [role])
+            if found:
+                return found
+    return None
+
+
+def levels(graph):
+    """Group roles by the length of their longest dependency chain."""
+    depth = {}
+    for role in _topological(graph):
+        depth[role] = 1 + max((depth[d] for d in graph["deps"][role]), default=-1)
+    out = []
+    for role in graph["roles"]:
+        while len(out) <= depth[role]:
+            out.append([])
+        out[depth[role]].append(role)
+    return out
+
+
+def _topological(graph):
+    order, seen = [], set()
+
+    def visit(role):
+        if role in seen:
+            return
+        seen.add(role)
+        for dep in graph["deps"][role]:
+            visit(dep)
+        order.append(role)
+
+    for role in graph["roles"]:
+        visit(role)
+    return order
+
+
+def remaining(graph, durations):
+    """Longest path from each role to the end of the graph, its own time included."""
+    dependents = {role: [] for role in graph["roles"]}
+    for role, deps in graph["deps"].items():
+        for dep in deps:
+            dependents[dep].append(role)
+    tail = {}
+    for role in reversed(_topological(graph)):
+        tail[role] = durations.get(role, 1.0) + max((tail[d] for d in dependents[role]), default=0.0)
+    return tail
+
+
+def critical_path(graph, durations):
+    """Return ``(seconds, [roles])`` for the longest dependency chain."""
+    tail = remaining(graph, durations)
+    if not tail:
+        return 0.0, []
+    dependents = {role: [r for r in graph["roles"] if role in graph["deps"][r]] for role in graph["roles"]}
+    role = max(graph["roles"], key=lambda r: tail[r])
+    path = [role]
+    while dependents[role]:
+        role = max(dependents[role], key=lambda r: tail[r])
+        path.append(role)
+    return tail[path[0]], path
+
+
+# ---------------------------------------------------------------------------
+# Scheduling
+# ---------------------------------------------------------------------------
+
+def startable(graph, pending, done, running, jobs, priority):
+    """Roles from *pending* that can start now, best first."""
+    held = {lock for role in running for lock in graph["locks"][role]}
+    picked = []
+    for role in sorted(pending, key=lambda r: (-priority[r], graph["roles"].index(r))):
+        if len(running) + len(picked) >= jobs:
+            break
+        locks = set(graph["locks"][role])
+        if locks & held or not all(dep in done for dep in graph["deps"][role]):
+            continue
+        picked.append(role)
+        held |= locks
+    return picked
+
+
+def simulate(graph, durations, jobs):
+    """Estimated wall time of ``run`` with *jobs* slots and the declared locks."""
+    priority = remaining(graph, durations)
+    pending, done, running, clock = list(graph["roles"]), set(), {}, 0.0
+    while pending or running:
+        for role in startable(graph, pending, done, running, jobs, priority):
+            pending.remove(role)
+            running[role] = clock + durations.get(role, 1.0)
+        role = min(running, key=running.get)
+        clock = running.pop(role)
+        done.add(role)
+    return clock
+
+
+def load_durations(graph_dir=DEFAULT_GRAPH_DIR):
+    """Per-role seconds from the last graph run or, failing that, the last timing run."""
+    try:
+        with open(os.path.join(os.path.expanduser(graph_dir), "latest.json"), "r") as fh:
+            return {role: float(s) for role, s in json.load(fh)["roles"].items()}
+    except (OSError, ValueError, KeyError, TypeError, AttributeError):
+        pass
+    try:
+        summary = aggregate(load_run(os.path.join(timing_dir(), "latest.json")))
+    except (OSError, ValueError):
+        return {}
+    return {entry["role"]: entry["seconds"] for entry in summary["roles"]}
+
+
+def run(graph, jobs, extra, graph_dir=DEFAULT_GRAPH_DIR, lock_timeout=DEFAULT_LOCK_TIMEOUT,
+        durations=None, poll=0.2):
+    """Run every role of *graph* as its own playbook process; return per-role results."""
+    durations = durations or {}
+    priority = remaining(graph, durations)
+    log_dir = os.path.join(os.path.expanduser(graph_dir), time.strftime("%Y%m%dT%H%M%S"))
+    os.makedirs(log_dir, exist_ok=True)
+    pending, done, running, results = list(graph["roles"]), set(), {}, {}
+    t0 = time.monotonic()
+
+    def stamp():
+        return f"[{time.monotonic() - t0:7.1f}s]"
+
+    while pending or running:
+        for role in startable(graph, pending, done, running, jobs, priority):
+            pending.remove(role)
+            extra_vars = {"compsetup_roles": [role], "compsetup_lock_timeout": lock_timeout}
+            env = dict(os.environ, ANSIBLE_NOCOLOR="1",
+                       COMPSETUP_TIMING_DIR=os.path.join(log_dir, role))
+            log = open(os.path.join(log_dir, f"{role}.log"), "w")
+            proc = subprocess.Popen(["ansible-playbook", PLAYBOOK, "--extra-vars", json.dumps(extra_vars),
+                                     *extra], stdout=log, stderr=subprocess.STDOUT,
+                                    stdin=subprocess.DEVNULL, cwd=REPO_DIR, env=env)
+            running[role] = (proc, time.monotonic(), log)
+            print(f"{stamp()} start  {role}", flush=True)
+
+        if not running:
+            # Whatever is left needs a role that failed
+            for role in pending:
+                results[role] = {"status": "blocked", "seconds": 0.0}
+                print(f"{stamp()} skip   {role} (a role it needs failed)", flush=True)
+            break
+
+        time.sleep(poll)
+        for role, (proc, started, log) in list(running.items()):
+            if proc.poll() is None:
+                continue
+            log.close()
+            del running[role]
+            seconds = time.monotonic() - started
+            ok = proc.returncode == 0
+            results[role] = {"status": "ok" if ok else "failed", "seconds": round(seconds, 1),
+                             "log": log.name}
+            if ok:
+                done.add(role)
+                print(f"{stamp()} done   {role} ({seconds:.1f}s)", flush=True)
+            else:
+                print(f"{stamp()} FAILED {role} (exit {proc.returncode}, log: {log.name})", flush=True)
+
+    wall = time.monotonic() - t0
+    measured = {role: r["seconds"] for role, r in results.items() if r["status"] == "ok"}
+    path_s, path = critical_path(graph, dict(durations, **measured))
+    summary = {"wall_s": round(wall, 1), "critical_path_s": round(path_s, 1), "critical_path": path,
+               "roles": measured, "results": results}
+    _save(os.path.join(os.path.expanduser(graph_dir), "latest.json"), summary)
+    save_timing(log_dir, results)
+    return summary
+
+
+def save_timing(log_dir, results):
+    """Merge the per-role timing runs into the timing directory's latest.json.
+
+    Each role's playbook records its own run under ``<log_dir>/<role>/``;
+    the merged run is written as ``run-<stamp>.json`` and ``latest.json``
+    so ``timing_report.py summarize`` reports this run, not the last
+    sequential one. Returns the path written, or None without timing data.
+    """
+    runs = {}
+    for role in results:
+        try:
+            runs[role] = load_run(os.path.join(log_dir, role, "latest.json"))
+        except (OSError, ValueError):
+            continue
+    if not runs:
+        return None
+    merged = merge_runs(runs)
+    directory = timing_dir()
+    try:
+        os.makedirs(directory, exist_ok=True)
+        for name in (f"run-{os.path.basename(log_dir)}.json", "latest.json"):
+            _save(os.path.join(directory, name), merged)
+    except OSError as exc:
+        print(f"Warning: could not write the merged timing run: {exc}", file=sys.stderr)
+        return None
+    return os.path.join(directory, f"run-{os.path.basename(log_dir)}.json")
+
+
+def _save(path, data):
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+    with os.fdopen(fd, "w") as fh:
+        json.dump(data, fh, indent=2)
+    os.replace(tmp, path)
+
+
+# ---------------------------------------------------------------------------
+# Output
+# ---------------------------------------------------------------------------
+
+def describe(graph, durations, jobs):
+    path_s, path = critical_path(graph, durations)
+    return {"system": graph["system"], "levels": levels(graph), "deps": graph["deps"],
+            "locks": {r: l for r, l in graph["locks"].items() if l},
+            "critical_path": path, "critical_path_s": round(path_s, 1),
+            "sequential_s": round(sum(durations.get(r, 1.0) for r in graph["roles"]), 1),
+            "simulated_s": round(simulate(graph, durations, jobs), 1), "jobs": jobs}
+
+
+def print_graph(info):
+    print(f"Role graph for {info['system']} ({info['jobs']} jobs)")
+    for n, group in enumerate(info["levels"]):
+        print(f"  level {n}:")
+        for role in group:
+            deps = info["deps"][role]
+            locks = info["locks"].get(role)
+            after = f"  after {', '.join(deps)}" if deps else ""
+            held = f"  [{', '.join(locks)}]" if locks else ""
+            print(f"    {role}{after}{held}")
+    print(f"  critical path: {' -> '.join(info['critical_path'])} ({info['critical_path_s']}s)")
+    print(f"  sequential {info['sequential_s']}s, scheduled ~{info['simulated_s']}s")
+
+
+def to_dot(graph):
+    lines = ["digraph roles {", "  rankdir=LR;"]
+    for role in graph["roles"]:
+        locks = graph["locks"][role]
+        label = role + (f"\\n[{', '.join(locks)}]" if locks else "")
+        lines.append(f'  "{role}" [label="{label}"];')
+        for dep in graph["deps"][role]:
+            lines.append(f'  "{dep}" -> "{role}";')
+    lines.append("}")
+    return "\n".join(lines)
+
+
+# ---------------------------------------------------------------------------
+# Main
+# ---------------------------------------------------------------------------
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Role dependency graph and parallel scheduler")
+    sub = parser.add_subparsers(dest="command", required=True)
+    check_cmd = sub.add_parser("check", help="Validate the declared role graph")
+    show_cmd = sub.add_parser("show", help="Print the role graph and critical path")
+    run_cmd = sub.add_parser("run", help="Run independent roles as parallel playbook processes")
+    for cmd in (check_cmd, show_cmd):
+        cmd.add_argument("--system", default=this_system(), choices=("Darwin", "Debian", "RedHat", "Linux"),
+                         help="System to resolve the graph for (default: this machine)")
+    for cmd in (show_cmd, run_cmd):
+        cmd.add_argument("--jobs", type=int, default=4, help="Roles run at once (default: 4)")
+    output = show_cmd.add_mutually_exclusive_group()
+    output.add_argument("--json", action="store_true", help="Print JSON")
+    output.add_argument("--dot", action="store_true", help="Print a Graphviz digraph")
+    run_cmd.add_argument("--lock-timeout", type=int, default=DEFAULT_LOCK_TIMEOUT,
+                         help=f"Seconds apt/dnf tasks wait for the package lock (default: {DEFAULT_LOCK_TIMEOUT})")
+    run_cmd.add_argument("ansible_args", nargs=argparse.REMAINDER,
+                         help="Extra ansible-playbook arguments after '--'")
+    args = parser.parse_args(argv)
+
+    system = getattr(args, "system", None) or this_system()
+    try:
+        graph = build_graph(load_specs(site_roles()), system)
+    except (OSError, ValueError) as exc:
+        print(f"Error: {exc}", file=sys.stderr)
+        return 1
+    if graph["errors"]:
+        for error in graph["errors"]:
+            print(f"Error: {error}", file=sys.stderr)
+        return 1
+    if args.command == "check":
+        return 0
+
+    durations = load_durations()
+    if args.command == "show":
+        if args.dot:
+            print(to_dot(graph))
+        elif args.json:
+            json.dump(describe(graph, durations, max(1, args.jobs)), sys.stdout, indent=2)
+            sys.stdout.write("\n")
+        else:
+            print_graph(describe(graph, durations, max(1, args.jobs)))
+        return 0
+
+    extra = [a for a in args.ansible_args if a != "--"]
+    summary = run(graph, max(1, args.jobs), extra, lock_timeout=args.lock_timeout, durations=durations)
+    print(f"Wall time {summary['wall_s']}s; critical path {summary['critical_path_s']}s "
+          f"({' -> '.join(summary['critical_path'])})")
+    return 1 if any(r["status"] != "ok" for r in summary["results"].values()) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,349 @@
+#!/usr/bin/env python3
+"""Idempotence fast path for CompSetup roles.
+
+Records, per role, a fingerprint of everything that decides what the
+role does, plus a cheap verification of what it left behind. On the
+next run a role is skipped when its fingerprint is unchanged and the
+verification still passes; otherwise it runs in full.
+
+Fingerprint (computed on the controller, filter_plugins/compsetup.py):
+    sha256 over the role directory (tasks, templates, files, defaults),
+    packages.yml, site.yml, the scripts/*.py files the role calls (plus
+    the local modules they import) and the role's resolved inputs
+
+Verification (run on the host, recorded after a successful run):
+    paths    - files/directories that must exist
+    globs    - patterns that must match at least one path
+    dpkg     - packages that must be installed (one dpkg-query call)
+    rpm      - packages/capabilities that must be installed (one rpm call)
+    flatpak  - system app ids (checked under /var/lib/flatpak/app)
+    brew_formulae / brew_casks - Cellar/Caskroom entries (either prefix)
+    vscode   - extension ids (checked under ~/.vscode/extensions)
+
+State file (default ``~/.local/state/compsetup/roles.json``):
+    {"version": 1, "roles": {role: {"fingerprint", "recorded", "verify"}}}
+
+Output (stdout, JSON):
+    check  -> {role: {"skip": bool, "reason": str}}
+    record -> {"recorded": [...]}
+    show   -> the state file
+    clear  -> {"cleared": [...]}
+
+Usage:
+    role_state.py check --fingerprints-json '{"nvchad": "ab12..."}' [--verify-full] [--only nvchad]
+    role_state.py record --fingerprints-json '{...}' --verify-json '{"nvchad": {"paths": [...]}}'
+    role_state.py show
+    role_state.py clear [ROLE ...]
+
+Exit codes:
+    0 - Success
+    1 - Invalid arguments or the state file could not be written
+"""
+
+import argparse
+import ast
+import contextlib
+import fcntl
+import glob
+import hashlib
+import json
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import time
+
+STATE_VERSION = 1
+DEFAULT_STATE_FILE = os.path.join("~", ".local", "state", "compsetup", "roles.json")
+DEFAULT_MAX_AGE_HOURS = 24 * 7
+SHARED_INPUTS = ("packages.yml", "site.yml")
+# How tasks call a controller script: "{{ playbook_dir }}/scripts/<name>.py"
+SCRIPT_CALL_RE = re.compile(r"playbook_dir\s*}}/scripts/([A-Za-z0-9_]+\.py)\b")
+BREW_PREFIXES = ("/opt/homebrew", "/usr/local")
+
+# ---------------------------------------------------------------------------
+# Fingerprints (controller side)
+# ---------------------------------------------------------------------------
+
+
+def hash_tree(path, digest=None):
+    """Feed every file below *path* (or *path* itself) into *digest*."""
+    digest = digest or hashlib.sha256()
+    if os.path.isfile(path):
+        files = [path]
+        base = os.path.dirname(path)
+    else:
+        base = path
+        files = []
+        for root, dirs, names in os.walk(path):
+            dirs[:] = sorted(d for d in dirs if d != "__pycache__")
+            files.extend(os.path.join(root, n) for n in sorted(names) if not n.endswith(".pyc"))
+    for name in files:
+        digest.update(os.path.relpath(name, base).encode() + b"\0")
+        with open(name, "rb") as fh:
+            digest.update(hashlib.sha256(fh.read()).digest())
+    return digest
+
+
+def _local_imports(path, scripts_dir):
+    try:
+        with open(path, "rb") as fh:
+            tree = ast.parse(fh.read(), path)
+    except (OSError, SyntaxError, ValueError):
+        return set()
+    modules = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            modules.update(alias.name.split(".")[0] for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+            modules.add(node.module.split(".")[0])
+    return {f"{m}.py" for m in modules if os.path.isfile(os.path.join(scripts_dir, f"{m}.py"))}
+
+
+def role_scripts(repo_dir, role):
+    """Sorted scripts/*.py names that *role* calls, with their local imports."""
+    scripts_dir = os.path.join(repo_dir, "scripts")
+    found = set()
+    for root, dirs, names in os.walk(os.path.join(repo_dir, "roles", role)):
+        dirs[:] = [d for d in dirs if d != "__pycache__"]
+        for name in names:
+            try:
+                with open(os.path.join(root, name), "r", errors="replace") as fh:
+                    found.update(SCRIPT_CALL_RE.findall(fh.read()))
+            except OSError:
+                continue
+    found = {n for n in found if os.path.isfile(os.path.join(scripts_dir, n))}
+    pending = list(found)
+    while pending:
+        for name in _local_imports(os.path.join(scripts_dir, pending.pop()), scripts_dir) - found:
+            found.add(name)
+            pending.append(name)
+    return sorted(found)
+
+
+def fingerprints(repo_dir, inputs_by_role, common=None):
+    """Return ``{role: sha256}`` for every role named in *inputs_by_role*."""
+    shared = hashlib.sha256()
+    for name in SHARED_INPUTS:
+        path = os.path.join(repo_dir, name)
+        if os.path.exists(path):
+            hash_tree(path, shared)
+    shared.update(json.dumps(common or {}, sort_keys=True, default=str).encode())
+    shared_hex = shared.hexdigest()
+
+    out = {}
+    for role, inputs in inputs_by_role.items():
+        digest = hashlib.sha256(shared_hex.encode())
+        role_dir = os.path.join(repo_dir, "roles", role)
+        if os.path.isdir(role_dir):
+            hash_tree(role_dir, digest)
+        for name in role_scripts(repo_dir, role):
+            hash_tree(os.path.join(repo_dir, "scripts", name), digest)
+        digest.update(json.dumps(inputs, sort_keys=True, default=str).encode())
+        out[role] = digest.hexdigest()
+    return out
+
+
+# ---------------------------------------------------------------------------
+# Verification (host side)
+# ---------------------------------------------------------------------------
+
+def _quiet(cmd):
+    try:
+        return subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+    except OSError:
+        return None
+
+
+def _missing_dpkg(packages):
+    proc = _quiet(["dpkg-query", "-W", "-f", "${Package}:${Architecture}\t${db:Status-Abbrev}\n", *packages])
+    if proc is None:
+        return list(packages)
+    installed = set()
+    for line in proc.stdout.splitlines():
+        name, _, status = line.partition("\t")
+        if status.startswith("ii"):
+            installed.add(name)
+            installed.add(name.split(":", 1)[0])
+    return [p for p in packages if p not in installed]
+
+
+def _missing_rpm(packages):
+    proc = _quiet(["rpm", "-q", "--whatprovides", *packages])
+    if proc is None:
+        return list(packages)
+    if proc.returncode == 0:
+        return []
+    return [line.split()[-1] for line in proc.stdout.splitlines() if line.startswith("no package provides")] \
+        or list(packages)
+
+
+def _brew_present(kind, name):
+    short = name.rsplit("/", 1)[-1]
+    return any(os.path.isdir(os.path.join(prefix, kind, short)) for prefix in BREW_PREFIXES)
+
+
+def verify(spec):
+    """Return ``None`` when *spec* holds, else a short reason string."""
+    home = os.path.expanduser("~")
+    for path in spec.get("paths", []):
+        if not os.path.exists(os.path.expanduser(path)):
+            return f"missing {path}"
+    for pattern in spec.get("globs", []):
+        if not glob.glob(os.path.expanduser(pattern)):
+            return f"nothing matches {pattern}"
+    for app in spec.get("flatpak", []):
+        if not os.path.isdir(os.path.join("/var/lib/flatpak/app", app)):
+            return f"flatpak {app} not installed"
+    for ext in spec.get("vscode", []):
+        # Pinned entries are "publisher.name@version"; the directory is "<id>-<version>"
+        ext_id = ext.split("@", 1)[0].lower()
+        if not glob.glob(os.path.join(home, ".vscode", "extensions", f"{ext_id}-*")):
+            return f"vscode extension {ext} not installed"
+    for name in spec.get("brew_formulae", []):
+        if not _brew_present("Cellar", name):
+            return f"formula {name} not installed"
+    for name in spec.get("brew_casks", []):
+        if not _brew_present("Caskroom", name):
+            return f"cask {name} not installed"
+    if spec.get("dpkg"):
+        missing = _missing_dpkg(spec["dpkg"])
+        if missing:
+            return f"{len(missing)} apt package(s) not installed, e.g. {missing[0]}"
+    if spec.get("rpm"):
+        missing = _missing_rpm(spec["rpm"])
+        if missing:
+            return f"{len(missing)} rpm package(s) not installed, e.g. {missing[0]}"
+    return None
+
+
+# ---------------------------------------------------------------------------
+# State file
+# ---------------------------------------------------------------------------
+
+def load_state(path):
+    try:
+        with open(os.path.expanduser(path), "r") as fh:
+            state = json.load(fh)
+    except (OSError, ValueError):
+        return {"version": STATE_VERSION, "roles": {}}
+    if not isinstance(state, dict) or state.get("version") != STATE_VERSION:
+        return {"version": STATE_VERSION, "roles": {}}
+    return state
+
+
+def save_state(path, state):
+    path = os.path.expanduser(path)
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+    with os.fdopen(fd, "w") as fh:
+        json.dump(state, fh, indent=2, sort_keys=True)
+    os.replace(tmp, path)
+
+
+@contextlib.contextmanager
+def locked(path):
+    """Hold an exclusive lock next to the state file (parallel role runs)."""
+    path = os.path.expanduser(path)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path + ".lock", "w") as fh:
+        fcntl.flock(fh, fcntl.LOCK_EX)
+        yield
+
+
+def check(state, prints, verify_full=False, max_age_hours=DEFAULT_MAX_AGE_HOURS, now=None,
+          only=None):
+    """Decide per role whether the fast path applies.
+
+    Roles outside *only* (when given) are always skipped; scripts/role_graph.py
+    runs one role per playbook process this way.
+    """
+    now = time.time() if now is None else now
+    result = {}
+    for role, fingerprint in prints.items():
+        rec = state["roles"].get(role)
+        if only is not None and role not in only:
+            result[role] = {"skip": True, "reason": "not selected"}
+            continue
+        if verify_full:
+            reason = "--verify-full"
+        elif rec is None:
+            reason = "no previous run"
+        elif rec.get("fingerprint") != fingerprint:
+            reason = "inputs changed"
+        elif max_age_hours and now - rec.get("recorded", 0) > max_age_hours * 3600:
+            reason = f"last full run over {max_age_hours}h ago"
+        else:
+            reason = verify(rec.get("verify") or {})
+        result[role] = {"skip": reason is None, "reason": reason or "unchanged and verified"}
+    return result
+
+
+def record(state, prints, specs, now=None):
+    now = time.time() if now is None else now
+    for role, fingerprint in prints.items():
+        state["roles"][role] = {"fingerprint": fingerprint, "recorded": now,
+                                "verify": specs.get(role) or {}}
+    return sorted(prints)
+
+
+# ---------------------------------------------------------------------------
+# Main
+# ---------------------------------------------------------------------------
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Idempotence fast path for CompSetup roles")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    check_cmd = sub.add_parser("check", help="Decide which roles can be skipped")
+    check_cmd.add_argument("--fingerprints-json", required=True, help="JSON {role: fingerprint}")
+    check_cmd.add_argument("--verify-full", action="store_true", help="Never skip; run every role in full")
+    check_cmd.add_argument("--only", action="append", metavar="ROLE",
+                           help="Only consider these roles; skip the rest (repeatable)")
+    check_cmd.add_argument("--max-age-hours", type=float, default=DEFAULT_MAX_AGE_HOURS,
+                           help=f"Force a full run after this long, 0 = never (default: {DEFAULT_MAX_AGE_HOURS})")
+    record_cmd = sub.add_parser("record", help="Record roles that completed")
+    record_cmd.add_argument("--fingerprints-json", required=True, help="JSON {role: fingerprint}")
+    record_cmd.add_argument("--verify-json", default="{}", help="JSON {role: verification spec}")
+    show_cmd = sub.add_parser("show", help="Print the state file")
+    clear_cmd = sub.add_parser("clear", help="Forget roles (all when none given)")
+    clear_cmd.add_argument("roles", nargs="*")
+    for cmd in (check_cmd, record_cmd, show_cmd, clear_cmd):
+        cmd.add_argument("--state-file", default=DEFAULT_STATE_FILE,
+                         help=f"State file (default: {DEFAULT_STATE_FILE})")
+
+    args = parser.parse_args(argv)
+
+    try:
+        if args.command == "check":
+            result = check(load_state(args.state_file), json.loads(args.fingerprints_json),
+                           args.verify_full, args.max_age_hours, only=args.only)
+        elif args.command == "show":
+            result = load_state(args.state_file)
+        else:
+            # Re-read under the lock: other role processes may have recorded since
+            with locked(args.state_file):
+                state = load_state(args.state_file)
+                if args.command == "record":
+                    changed = record(state, json.loads(args.fingerprints_json),
+                                     json.loads(args.verify_json))
+                    result = {"recorded": changed}
+                else:
+                    changed = args.roles or sorted(state["roles"])
+                    for role in changed:
+                        state["roles"].pop(role, None)
+                    result = {"cleared": changed}
+                save_state(args.state_file, state)
+    except (OSError, ValueError) as exc:
+        print(f"Error: {exc}", file=sys.stderr)
+        return 1
+
+    json.dump(result, sys.stdout)
+    sys.stdout.write("\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
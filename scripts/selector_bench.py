@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+"""Benchmarks for the CompSetup package selector.
+
+Kept out of package_selector.py so the selector users run stays small.
+Every benchmark drives the real selector code: ``render`` replays a
+scripted session through ``run_selector`` once with full redraws and
+once with diff rendering, ``search`` times ``SearchIndex`` per
+keystroke, and ``startup`` compares the old per-item dict startup path
+with the per-view index on a synthetic manifest.
+
+Usage:
+    selector_bench.py render --packages-file packages.yml --os ubuntu
+    selector_bench.py search --packages-file packages.yml --os ubuntu --items 5000
+    selector_bench.py startup --items 10000 --os ubuntu
+
+Output (stdout, JSON):
+    render  -> {"full_bytes", "diff_bytes", "interactions": [{"input", "full_bytes", "diff_bytes"}]}
+    search  -> {"items", "index_build_ms", "keystrokes", "mean_ms", "max_ms"}
+    startup -> {"items", "index_build_ms", "dicts": {...}, "index": {...}}
+               each with "median_ms", "retained_kib", "peak_kib"
+
+Exit codes:
+    0 - Benchmark printed
+    1 - The packages file could not be read
+"""
+
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from manifest_index import Item, items_from_view, load_view, synthetic_manifest
+from manifest_resolver import load_compiled, select_categories
+from package_selector import (FRAME_CHROME, OS_LABELS, FrameRenderer, SearchIndex, _build_frame,
+                              page_starts, run_selector)
+
+# ---------------------------------------------------------------------------
+# Rendering
+# ---------------------------------------------------------------------------
+
+class _NullStream:
+    """Stand-in for stderr that discards output; FrameRenderer counts the bytes."""
+
+    def write(self, text):
+        return len(text)
+
+    def flush(self):
+        pass
+
+
+RENDER_BENCH_SCRIPT = ("3", "5-8", "1,3,9", "n", "22", "p", "j", " ", "a", "d", "r", "4", "q")
+RENDER_BENCH_ROWS = 40
+
+
+def _script_keys(text):
+    """Keystrokes for one bench interaction: numbers are typed and confirmed."""
+    return list(text) + ["enter"] if text[0].isdigit() else [text]
+
+
+def render_bench(view, os_label, script=RENDER_BENCH_SCRIPT, rows=RENDER_BENCH_ROWS):
+    """Measure bytes written per interaction, full redraw vs. diff rendering."""
+    report = {"interactions": []}
+    for mode in ("full", "diff"):
+        renderer = FrameRenderer(out=_NullStream(), diff=(mode == "diff"))
+        keys = iter([(key, n == 0) for text in script for n, key in enumerate(_script_keys(text))])
+        sizes = []
+
+        def read_key():
+            key, first = next(keys)
+            if first:
+                sizes.append(renderer.bytes_written - sum(sizes))
+            return key
+
+        run_selector(items_from_view(view), os_label, renderer=renderer, read_key=read_key, rows=rows)
+        report[f"{mode}_bytes"] = renderer.bytes_written
+        report[mode] = sizes
+    # sizes[0] is the initial frame; sizes[n] is the frames drawn for script[n-1]
+    for n, text in enumerate(script[:-1], 1):
+        report["interactions"].append({"input": text, "full_bytes": report["full"][n],
+                                       "diff_bytes": report["diff"][n]})
+    del report["full"], report["diff"]
+    return report
+
+
+# ---------------------------------------------------------------------------
+# Search and startup
+# ---------------------------------------------------------------------------
+
+def search_bench(base, min_items=5000, queries=("docker", "vscode", "flatpak", "zzq")):
+    """Time SearchIndex per keystroke on the *base* items replicated to *min_items*."""
+    items = []
+    while base and len(items) < min_items:
+        copy_no = len(items) // len(base)
+        items.extend(Item(it.cat, f"{it.display} {copy_no}", f"{it.id}-{copy_no}", it.details)
+                     for it in base)
+    start = time.perf_counter()
+    index = SearchIndex(items)
+    build_ms = (time.perf_counter() - start) * 1000
+    timings = []
+    for query in queries:
+        for end in range(1, len(query) + 1):
+            start = time.perf_counter()
+            index.search(query[:end])
+            timings.append((time.perf_counter() - start) * 1000)
+        index.search("")
+    return {"items": len(items), "index_build_ms": round(build_ms, 2),
+            "keystrokes": len(timings), "mean_ms": round(sum(timings) / len(timings), 4),
+            "max_ms": round(max(timings), 4)}
+
+
+def startup_bench(n, os_name="ubuntu", arch="x86_64", runs=5):
+    """Time and measure selector startup on a synthetic manifest of *n* items.
+
+    ``dicts`` is the old startup path (compiled manifest -> categories ->
+    one dict per item with its details dict); ``index`` loads the
+    per-view index into ``Item`` records and builds the first frame.
+    Both run against warm caches; ``index_build_ms`` is the one-off
+    cost after the manifest changes.
+    """
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "packages.yml")
+        with open(path, "w") as fh:
+            json.dump(synthetic_manifest(n), fh)  # JSON is valid YAML
+        cache = os.path.join(tmp, "cache")
+        start = time.perf_counter()
+        load_view(path, os_name, arch, cache)
+        build_ms = (time.perf_counter() - start) * 1000
+
+        def dicts():
+            return [{"cat": cat, "display": display, "id": ident, "sel": True, "bl": False,
+                     "details": details, "na": False}
+                    for cat, rows in select_categories(load_compiled(path, cache), os_name, arch)
+                    for display, ident, details in rows]
+
+        def index():
+            items = items_from_view(load_view(path, os_name, arch, cache))
+            view = range(len(items))
+            _build_frame(items, view, page_starts(items, view, 24 - FRAME_CHROME), 0,
+                         OS_LABELS[os_name], len(items), 0)
+            return items
+
+        report = {"items": 0, "index_build_ms": round(build_ms, 2)}
+        for name, fn in (("dicts", dicts), ("index", index)):
+            timings = []
+            for _ in range(runs):
+                start = time.perf_counter()
+                fn()
+                timings.append((time.perf_counter() - start) * 1000)
+            tracemalloc.start()
+            items = fn()
+            retained, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            report["items"] = len(items)
+            report[name] = {"median_ms": round(sorted(timings)[len(timings) // 2], 2),
+                            "retained_kib": retained // 1024, "peak_kib": peak // 1024}
+    return report
+
+
+# ---------------------------------------------------------------------------
+# Main
+# ---------------------------------------------------------------------------
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Package selector benchmarks")
+    sub = parser.add_subparsers(dest="command", required=True)
+    render_cmd = sub.add_parser("render", help="Bytes written per interaction, full redraw vs. diff")
+    search_cmd = sub.add_parser("search", help="Search keystroke timings on the replicated manifest")
+    search_cmd.add_argument("--items", type=int, default=5000,
+                            help="Replicate the manifest to at least N items (default: 5000)")
+    startup_cmd = sub.add_parser("startup", help="Startup time and memory on a synthetic manifest")
+    startup_cmd.add_argument("--items", type=int, default=10000,
+                             help="Synthetic manifest size (default: 10000)")
+    startup_cmd.add_argument("--runs", type=int, default=5, help="Timed runs per path (default: 5)")
+    for cmd in (render_cmd, search_cmd):
+        cmd.add_argument("--packages-file", required=True, help="Path to packages.yml")
+    for cmd in (render_cmd, search_cmd, startup_cmd):
+        cmd.add_argument("--os", choices=list(OS_LABELS), default="ubuntu", help="Target OS (default: ubuntu)")
+        cmd.add_argument("--arch", default=platform.machine(),
+                         help="System architecture (default: auto-detected via platform.machine())")
+    args = parser.parse_args(argv)
+
+    if args.command == "startup":
+        result = startup_bench(args.items, args.os, args.arch, max(1, args.runs))
+    else:
+        try:
+            view = load_view(args.packages_file, args.os, args.arch)
+        except (OSError, ValueError) as exc:
+            print(f"Error: cannot read {args.packages_file}: {exc}", file=sys.stderr)
+            return 1
+        if args.command == "render":
+            result = render_bench(view, OS_LABELS[args.os])
+        else:
+            result = search_bench(items_from_view(view), args.items)
+    json.dump(result, sys.stdout, indent=2)
+    sys.stdout.write("\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,375 @@
+#!/usr/bin/env python3
+"""Timing report for CompSetup playbook runs.
+
+Reads the event files written by callback_plugins/compsetup_timing.py
+(enabled in ansible.cfg) and reports wall time per role, per task and per
+loop item. Works entirely offline on recorded files, so an event file
+from any machine can be summarized or compared anywhere.
+
+Event file (JSON):
+    {"version": 1, "playbook": "site.yml", "started": ts, "finished": ts,
+     "events": [{"type": "task_start", "ts", "uuid", "task", "role", "action"},
+                {"type": "item", "ts", "uuid", "host", "item", "status"},
+                {"type": "task_end", "ts", "uuid", "host", "status"}]}
+
+Usage:
+    timing_report.py summarize                    # latest run, top 10
+    timing_report.py summarize run.json --top 25 --json
+    timing_report.py compare                      # two most recent runs
+    timing_report.py compare old.json new.json
+    timing_report.py hosts                        # per-host recap (fleet runs)
+
+Runs are looked up in ``$COMPSETUP_TIMING_DIR`` or
+``~/.local/state/compsetup/timing``.
+
+Exit codes:
+    0 - Report printed
+    1 - No run found or an event file could not be read
+"""
+
+import argparse
+import glob
+import json
+import os
+import sys
+
+DEFAULT_TIMING_DIR = os.path.join("~", ".local", "state", "compsetup", "timing")
+NO_ROLE = "(play)"
+
+# ---------------------------------------------------------------------------
+# Loading
+# ---------------------------------------------------------------------------
+
+
+def timing_dir():
+    return os.path.expanduser(os.environ.get("COMPSETUP_TIMING_DIR") or DEFAULT_TIMING_DIR)
+
+
+def recent_runs(directory, count):
+    """Return the *count* most recent ``run-*.json`` files, oldest first."""
+    runs = sorted(glob.glob(os.path.join(directory, "run-*.json")))
+    return runs[-count:]
+
+
+def load_run(path):
+    with open(path, "r") as fh:
+        run = json.load(fh)
+    if not isinstance(run, dict) or not isinstance(run.get("events"), list):
+        raise ValueError(f"{path} is not a compsetup timing file")
+    return run
+
+
+def merge_runs(runs, playbook="site.yml"):
+    """Merge event files recorded side by side (one per label) into one run.
+
+    ``runs`` maps a label, such as the role a parallel playbook ran, to its
+    event file. Task uuids are prefixed with the label so tasks from
+    different processes never collide, and events are ordered by time.
+    """
+    events = []
+    for label, run in runs.items():
+        for event in run["events"]:
+            if "uuid" in event:
+                event = dict(event, uuid=f"{label}:{event['uuid']}")
+            events.append(event)
+    events.sort(key=lambda e: e.get("ts", 0.0))
+    started = [run["started"] for run in runs.values() if run.get("started") is not None]
+    finished = [run["finished"] for run in runs.values() if run.get("finished") is not None]
+    return {"version": 1, "playbook": playbook, "started": min(started, default=None),
+            "finished": max(finished, default=None), "events": events}
+
+
+# ---------------------------------------------------------------------------
+# Aggregation
+# ---------------------------------------------------------------------------
+
+def aggregate(run):
+    """Turn a run's event stream into task, item and role timings.
+
+    Tasks are keyed by uuid, a host's run of a task by ``(uuid, host)``
+    and loop items by ``(uuid, host, item)``. Under the free strategy a
+    task is announced once per host, so a repeated start for a known
+    uuid is not a new task, and a host's run is timed from its own
+    previous result (as in ``host_summary``) or the task start, whichever
+    is later. A task lasts from its first start to its last result on any
+    host; a task with no results at all ends when the next task starts.
+    Loop items run sequentially per host, so each item is timed from the
+    previous item (or the start of the run) on the same host. A role's
+    time is the wall time its tasks cover, so tasks that overlap on
+    different hosts are not counted twice.
+    """
+    tasks = {}
+    runs = {}
+    items = {}
+    item_marks = {}
+    host_marks = {}
+    last = None
+    for event in run["events"]:
+        kind, ts, uuid = event.get("type"), event.get("ts", 0.0), event.get("uuid")
+        if kind == "task_start":
+            if uuid in tasks:
+                continue
+            if last is not None and last["end"] is None:
+                last["end"] = ts
+            last = tasks[uuid] = {"uuid": uuid, "task": event.get("task") or "(unnamed)",
+                                  "role": event.get("role") or NO_ROLE, "start": ts, "end": None}
+            continue
+        rec = tasks.get(uuid)
+        if rec is None:
+            continue
+        host = event.get("host", "")
+        host_run = runs.get((uuid, host))
+        if host_run is None:
+            host_run = runs[(uuid, host)] = {"start": max(rec["start"], host_marks.get(host, rec["start"])),
+                                             "end": ts, "status": None}
+        if kind == "item":
+            label = event.get("item", "")
+            prev = item_marks.get((uuid, host), host_run["start"])
+            entry = items.setdefault((uuid, host, label), {"item": label, "host": host, "seconds": 0.0})
+            entry["status"] = event.get("status", "")
+            entry["seconds"] += max(0.0, ts - prev)
+            item_marks[(uuid, host)] = ts
+        elif kind == "task_end":
+            host_run["status"] = event.get("status", "")
+            host_marks[host] = ts
+        host_run["end"] = max(host_run["end"], ts)
+        rec["end"] = ts if rec["end"] is None else max(rec["end"], ts)
+
+    finished = run.get("finished")
+    for rec in tasks.values():
+        if rec["end"] is None:
+            rec["end"] = finished if finished is not None else rec["start"]
+        rec["seconds"] = max(0.0, rec["end"] - rec["start"])
+        rec["items"] = 0
+        rec["status"] = set()
+        rec["slowest_host"] = None
+    for (uuid, host), host_run in runs.items():
+        rec = tasks[uuid]
+        if host_run["status"] is not None:
+            rec["status"].add(host_run["status"])
+        spent = max(0.0, host_run["end"] - host_run["start"])
+        if rec["slowest_host"] is None or spent > rec["slowest_host"]["seconds"]:
+            rec["slowest_host"] = {"host": host, "seconds": spent}
+    for uuid, _, _ in items:
+        tasks[uuid]["items"] += 1
+
+    roles = {}
+    for rec in tasks.values():
+        entry = roles.setdefault(rec["role"], {"role": rec["role"], "tasks": 0, "spans": []})
+        entry["tasks"] += 1
+        entry["spans"].append((rec["start"], rec["end"]))
+    for entry in roles.values():
+        entry["seconds"] = _covered(entry.pop("spans"))
+
+    started = run.get("started")
+    if started is not None and finished is not None:
+        total = finished - started
+    else:
+        total = _covered([(rec["start"], rec["end"]) for rec in tasks.values()])
+
+    return {
+        "playbook": run.get("playbook"),
+        "total_s": round(total, 3),
+        "roles": sorted(roles.values(), key=lambda r: -r["seconds"]),
+        "tasks": sorted(({"task": r["task"], "role": r["role"], "seconds": r["seconds"],
+                          "items": r["items"], "status": sorted(r["status"]),
+                          "slowest_host": r["slowest_host"] and dict(
+                              r["slowest_host"], seconds=round(r["slowest_host"]["seconds"], 3))}
+                         for r in tasks.values()),
+                        key=lambda r: -r["seconds"]),
+        "items": sorted((dict(item, task=tasks[key[0]]["task"], role=tasks[key[0]]["role"])
+                         for key, item in items.items()), key=lambda i: -i["seconds"]),
+    }
+
+
+def _covered(spans):
+    """Seconds covered by the union of ``(start, end)`` spans."""
+    total = 0.0
+    reach = None
+    for start, end in sorted(spans):
+        if reach is None or start > reach:
+            total += end - start
+            reach = end
+        elif end > reach:
+            total += end - reach
+            reach = end
+    return total
+
+
+def compare(old, new):
+    """Diff two aggregated runs by ``(role, task)``, largest change first."""
+    def totals(summary):
+        out = {}
+        for rec in summary["tasks"]:
+            key = (rec["role"], rec["task"])
+            out[key] = out.get(key, 0.0) + rec["seconds"]
+        return out
+
+    before, after = totals(old), totals(new)
+    rows = []
+    for key in set(before) | set(after):
+        old_s, new_s = before.get(key), after.get(key)
+        rows.append({"role": key[0], "task": key[1], "old_s": old_s, "new_s": new_s,
+                     "delta_s": (new_s or 0.0) - (old_s or 0.0)})
+    rows.sort(key=lambda r: -abs(r["delta_s"]))
+    return {"old_total_s": old["total_s"], "new_total_s": new["total_s"],
+            "delta_s": round(new["total_s"] - old["total_s"], 3), "tasks": rows}
+
+
+def host_summary(run):
+    """Per-host status counts, finish time and slowest task.
+
+    Under the free strategy hosts move through the play independently,
+    so a task's time on a host is measured from that host's previous
+    result rather than from the (shared) task start event.
+    """
+    names = {}
+    hosts = {}
+    started = run.get("started")
+    for event in run["events"]:
+        kind, ts = event.get("type"), event.get("ts", 0.0)
+        if kind == "task_start":
+            names[event.get("uuid")] = (event.get("role") or NO_ROLE, event.get("task") or "(unnamed)")
+            if started is None:
+                started = ts
+            continue
+        if kind != "task_end":
+            continue
+        host = event.get("host", "")
+        rec = hosts.setdefault(host, {"host": host, "ok": 0, "changed": 0, "failed": 0, "skipped": 0,
+                                      "unreachable": 0, "ignored": 0, "seconds": 0.0,
+                                      "slowest": None, "_mark": started if started is not None else ts})
+        status = event.get("status", "ok")
+        rec[status] = rec.get(status, 0) + 1
+        spent = max(0.0, ts - rec["_mark"])
+        rec["_mark"] = ts
+        if rec["slowest"] is None or spent > rec["slowest"]["seconds"]:
+            role, task = names.get(event.get("uuid"), (NO_ROLE, "(unnamed)"))
+            rec["slowest"] = {"role": role, "task": task, "seconds": round(spent, 3)}
+        if started is not None:
+            rec["seconds"] = round(ts - started, 3)
+    out = []
+    for rec in sorted(hosts.values(), key=lambda r: r["host"]):
+        rec.pop("_mark")
+        out.append(rec)
+    return out
+
+
+# ---------------------------------------------------------------------------
+# Output
+# ---------------------------------------------------------------------------
+
+def _fmt(seconds):
+    if seconds is None:
+        return "-"
+    if seconds >= 60:
+        return f"{int(seconds // 60)}m{seconds % 60:04.1f}s"
+    return f"{seconds:.1f}s"
+
+
+def _round(summary, top):
+    """Limit and round a summary for JSON output."""
+    out = dict(summary)
+    for key in ("roles", "tasks", "items"):
+        out[key] = [dict(r, seconds=round(r["seconds"], 3)) for r in summary[key][:top]]
+    return out
+
+
+def print_summary(summary, top):
+    print(f"Run: {summary['playbook'] or '?'}  total {_fmt(summary['total_s'])}  "
+          f"({len(summary['tasks'])} tasks, {len(summary['items'])} loop items)")
+    print("\nSlowest roles:")
+    for rec in summary["roles"][:top]:
+        print(f"  {_fmt(rec['seconds']):>9}  {rec['role']} ({rec['tasks']} tasks)")
+    print("\nSlowest tasks:")
+    for rec in summary["tasks"][:top]:
+        items = f"  [{rec['items']} items]" if rec["items"] else ""
+        print(f"  {_fmt(rec['seconds']):>9}  {rec['role']} : {rec['task']}{items}")
+    if summary["items"]:
+        print("\nSlowest loop items:")
+        for rec in summary["items"][:top]:
+            print(f"  {_fmt(rec['seconds']):>9}  {rec['role']} : {rec['task']} [{rec['item']}]")
+
+
+def print_compare(diff, top):
+    sign = "+" if diff["delta_s"] >= 0 else "-"
+    print(f"Total: {_fmt(diff['old_total_s'])} -> {_fmt(diff['new_total_s'])} "
+          f"({sign}{_fmt(abs(diff['delta_s']))})")
+    print("\nLargest changes:")
+    for rec in diff["tasks"][:top]:
+        sign = "+" if rec["delta_s"] >= 0 else "-"
+        note = " (new)" if rec["old_s"] is None else " (gone)" if rec["new_s"] is None else ""
+        print(f"  {sign}{_fmt(abs(rec['delta_s'])):>8}  {_fmt(rec['old_s']):>9} -> {_fmt(rec['new_s']):<9}"
+              f"  {rec['role']} : {rec['task']}{note}")
+
+
+def print_hosts(rows):
+    print(f"{'HOST':<24} {'TIME':>9} {'OK':>4} {'CHG':>4} {'FAIL':>4} {'SKIP':>4} {'UNR':>4}  SLOWEST TASK")
+    for rec in rows:
+        slowest = rec["slowest"] or {}
+        note = f"{_fmt(slowest.get('seconds'))} {slowest.get('role')} : {slowest.get('task')}" if slowest else "-"
+        print(f"{rec['host']:<24} {_fmt(rec['seconds']):>9} {rec['ok']:>4} {rec['changed']:>4} "
+              f"{rec['failed']:>4} {rec['skipped']:>4} {rec['unreachable']:>4}  {note}")
+
+
+# ---------------------------------------------------------------------------
+# Main
+# ---------------------------------------------------------------------------
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Timing report for CompSetup playbook runs")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    summarize_cmd = sub.add_parser("summarize", help="Show the slowest roles, tasks and loop items")
+    summarize_cmd.add_argument("run", nargs="?", help="Event file (default: latest run)")
+    compare_cmd = sub.add_parser("compare", help="Compare two runs task by task")
+    compare_cmd.add_argument("runs", nargs="*", metavar="RUN",
+                             help="OLD NEW event files (default: the two most recent runs)")
+    hosts_cmd = sub.add_parser("hosts", help="Per-host status counts and finish times")
+    hosts_cmd.add_argument("run", nargs="?", help="Event file (default: latest run)")
+    hosts_cmd.add_argument("--json", action="store_true", help="Print JSON instead of a table")
+    for cmd in (summarize_cmd, compare_cmd):
+        cmd.add_argument("--top", type=int, default=10, help="Rows per section (default: 10)")
+        cmd.add_argument("--json", action="store_true", help="Print JSON instead of a table")
+
+    args = parser.parse_args(argv)
+
+    try:
+        if args.command == "hosts":
+            rows = host_summary(load_run(args.run or os.path.join(timing_dir(), "latest.json")))
+            if args.json:
+                json.dump(rows, sys.stdout, indent=2)
+                sys.stdout.write("\n")
+            else:
+                print_hosts(rows)
+            return 0
+        if args.command == "summarize":
+            path = args.run or os.path.join(timing_dir(), "latest.json")
+            summary = aggregate(load_run(path))
+            if args.json:
+                json.dump(_round(summary, args.top), sys.stdout, indent=2)
+                sys.stdout.write("\n")
+            else:
+                print_summary(summary, args.top)
+            return 0
+
+        paths = args.runs or recent_runs(timing_dir(), 2)
+        if len(paths) != 2:
+            print("Error: compare needs two runs (OLD NEW)", file=sys.stderr)
+            return 1
+        diff = compare(aggregate(load_run(paths[0])), aggregate(load_run(paths[1])))
+    except (OSError, ValueError) as exc:
+        print(f"Error: {exc}", file=sys.stderr)
+        return 1
+
+    if args.json:
+        diff["tasks"] = diff["tasks"][:args.top]
+        json.dump(diff, sys.stdout, indent=2)
+        sys.stdout.write("\n")
+    else:
+        print_compare(diff, args.top)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
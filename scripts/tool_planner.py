@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+"""Batched npm and gem global installs for CompSetup.
+
+Takes the ``linux`` entries of the npm/gem CLI tools in packages.yml,
+reads what is installed once per manager (``npm ls -g --json``,
+``gem list --local``) and installs only what is missing or does not
+match a pinned version, with one ``npm install -g`` and one
+``gem install`` call. Items of a failed batch are retried one by one so
+a single bad package does not hold back the rest. Gem executables are
+then linked into ``--link-dir`` in one pass.
+
+Tool entries (``linux`` mapping of a cli_tools item):
+    {"type": "npm" | "gem", "package": NAME,
+     "version": "1.2" (optional; exact or prefix match),
+     "executable": NAME (optional; gem binary name, default: package)}
+
+Output (stdout, JSON):
+    {"npm": {"present", "missing", "outdated": {name: [installed]},
+             "install": [specs], "installed", "failed"},
+     "gem": {... same ...},
+     "gem_bindir": str, "links": {"created", "unchanged", "missing"},
+     "changed": bool}
+
+    ``plan`` prints the same document without installing or linking.
+
+Usage:
+    tool_planner.py plan --tools-json '[{"type": "npm", "package": "@google/gemini-cli"}]'
+    tool_planner.py apply --tools-json '[...]' --link-dir /usr/local/bin
+    tool_planner.py apply --tools-json '[...]' --npm ./stub-npm --gem ./stub-gem --gem-bindir /tmp/bin
+
+Exit codes:
+    0 - Everything planned is installed and linked
+    1 - Invalid arguments, a manager could not be queried, or an install failed
+"""
+
+import argparse
+import json
+import os
+import shlex
+import subprocess
+import sys
+
+MANAGERS = ("npm", "gem")
+DEFAULT_LINK_DIR = "/usr/local/bin"
+
+# ---------------------------------------------------------------------------
+# Snapshots
+# ---------------------------------------------------------------------------
+
+
+def _run(cmd):
+    return subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+
+
+def npm_installed(npm):
+    """Return ``{name: [version]}`` from one ``npm ls -g`` call."""
+    proc = _run([*npm, "ls", "-g", "--depth=0", "--json"])
+    # npm ls exits non-zero for extraneous/invalid trees but still prints JSON
+    try:
+        tree = json.loads(proc.stdout or "{}")
+    except ValueError:
+        raise RuntimeError(proc.stderr.strip() or "npm ls printed no JSON")
+    return {name: [info.get("version", "")]
+            for name, info in (tree.get("dependencies") or {}).items()}
+
+
+def parse_gem_list(text):
+    """Parse ``gem list --local`` lines such as ``rake (default: 13.0.6, 12.3.3)``."""
+    gems = {}
+    for line in text.splitlines():
+        name, sep, rest = line.strip().partition(" (")
+        if not sep or not rest.endswith(")"):
+            continue
+        versions = []
+        for part in rest[:-1].split(","):
+            part = part.strip()
+            if part.startswith("default:"):
+                part = part[len("default:"):].strip()
+            if part:
+                versions.append(part.split()[0])
+        gems[name] = versions
+    return gems
+
+
+def gem_installed(gem):
+    """Return ``{name: [versions]}`` from one ``gem list`` call."""
+    proc = _run([*gem, "list", "--local"])
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.strip() or "gem list failed")
+    return parse_gem_list(proc.stdout)
+
+
+# ---------------------------------------------------------------------------
+# Planning
+# ---------------------------------------------------------------------------
+
+def version_matches(installed, wanted):
+    return any(v == wanted or v.startswith(wanted + ".") for v in installed)
+
+
+def spec(manager, name, version):
+    if not version:
+        return name
+    return f"{name}@{version}" if manager == "npm" else f"{name}:{version}"
+
+
+def plan(tools, snapshots):
+    """Split *tools* per manager into present, missing and outdated."""
+    result = {}
+    for manager in MANAGERS:
+        entry = {"present": [], "missing": [], "outdated": {}, "install": []}
+        installed = snapshots.get(manager) or {}
+        seen = set()
+        for tool in tools:
+            name = tool.get("package")
+            if tool.get("type") != manager or not name or name in seen:
+                continue
+            seen.add(name)
+            version = str(tool.get("version") or "")
+            have = installed.get(name)
+            if have is None:
+                entry["missing"].append(name)
+            elif version and not version_matches(have, version):
+                entry["outdated"][name] = have
+            else:
+                entry["present"].append(name)
+                continue
+            entry["install"].append(spec(manager, name, version))
+        result[manager] = entry
+    return result
+
+
+# ---------------------------------------------------------------------------
+# Installing and linking
+# ---------------------------------------------------------------------------
+
+def install(cmd, specs):
+    """Install *specs* in one call; retry one by one if the batch fails."""
+    if not specs:
+        return [], []
+    if _run([*cmd, *specs]).returncode == 0:
+        return list(specs), []
+    installed, failed = [], []
+    for item in specs:
+        (installed if _run([*cmd, item]).returncode == 0 else failed).append(item)
+    return installed, failed
+
+
+def gem_bindir(ruby):
+    proc = _run([*ruby, "-e", 'require "rubygems"; print Gem.bindir'])
+    if proc.returncode != 0 or not proc.stdout.strip():
+        raise RuntimeError(proc.stderr.strip() or "could not determine Gem.bindir")
+    return proc.stdout.strip()
+
+
+def link_executables(tools, bindir, link_dir):
+    """Symlink every gem executable from *bindir* into *link_dir*."""
+    links = {"created": [], "unchanged": [], "missing": []}
+    for tool in tools:
+        if tool.get("type") != "gem" or not tool.get("package"):
+            continue
+        exe = tool.get("executable") or tool["package"]
+        src = os.path.join(bindir, exe)
+        dest = os.path.join(link_dir, exe)
+        if not os.path.isfile(src):
+            links["missing"].append(src)
+        elif os.path.islink(dest) and os.readlink(dest) == src:
+            links["unchanged"].append(dest)
+        else:
+            tmp = f"{dest}.compsetup-tmp"
+            if os.path.lexists(tmp):
+                os.unlink(tmp)
+            os.symlink(src, tmp)
+            os.replace(tmp, dest)
+            links["created"].append(dest)
+    return links
+
+
+# ---------------------------------------------------------------------------
+# Main
+# ---------------------------------------------------------------------------
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Batched npm and gem global installs")
+    sub = parser.add_subparsers(dest="command", required=True)
+    plan_cmd = sub.add_parser("plan", help="Show what would be installed")
+    apply_cmd = sub.add_parser("apply", help="Install missing/outdated tools and link gem executables")
+    for cmd in (plan_cmd, apply_cmd):
+        cmd.add_argument("--tools-json", required=True, help="JSON list of cli_tools 'linux' entries")
+        cmd.add_argument("--npm", default="npm", help="npm command (default: npm)")
+        cmd.add_argument("--gem", default="gem", help="gem command (default: gem)")
+        cmd.add_argument("--skip", action="append", choices=MANAGERS, default=[],
+                         help="Leave this manager alone (repeatable)")
+    apply_cmd.add_argument("--ruby", default="ruby", help="ruby command used to find Gem.bindir")
+    apply_cmd.add_argument("--gem-bindir", help="Gem executable directory (default: Gem.bindir)")
+    apply_cmd.add_argument("--link-dir", default=DEFAULT_LINK_DIR,
+                           help=f"Where gem executables are linked (default: {DEFAULT_LINK_DIR})")
+
+    args = parser.parse_args(argv)
+
+    try:
+        tools = json.loads(args.tools_json)
+        if not isinstance(tools, list):
+            raise ValueError("--tools-json must be a JSON list")
+        commands = {"npm": shlex.split(args.npm), "gem": shlex.split(args.gem)}
+        wanted = [m for m in MANAGERS if m not in args.skip and any(t.get("type") == m for t in tools)]
+        readers = {"npm": npm_installed, "gem": gem_installed}
+        snapshots = {m: readers[m](commands[m]) for m in wanted}
+    except (OSError, ValueError, RuntimeError) as exc:
+        print(f"Error: {exc}", file=sys.stderr)
+        return 1
+
+    result = plan([t for t in tools if t.get("type") in wanted], snapshots)
+    result.update(gem_bindir=None, links={"created": [], "unchanged": [], "missing": []}, changed=False)
+
+    if args.command == "apply":
+        install_cmds = {"npm": [*commands["npm"], "install", "-g", "--no-audit", "--no-fund"],
+                        "gem": [*commands["gem"], "install", "--no-document"]}
+        try:
+            for manager in wanted:
+                entry = result[manager]
+                entry["installed"], entry["failed"] = install(install_cmds[manager], entry["install"])
+            if "gem" in wanted:
+                bindir = args.gem_bindir or gem_bindir(shlex.split(args.ruby))
+                result["gem_bindir"] = bindir
+                result["links"] = link_executables(tools, bindir, args.link_dir)
+        except (OSError, RuntimeError) as exc:
+            print(f"Error: {exc}", file=sys.stderr)
+            return 1
+        result["changed"] = bool(result["links"]["created"]) or any(
+            result[m].get("installed") for m in MANAGERS)
+
+    json.dump(result, sys.stdout, indent=2)
+    sys.stdout.write("\n")
+    return 1 if any(result[m].get("failed") for m in MANAGERS) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""Batched VS Code extension installer for CompSetup.
+
+Reads the installed extensions once with
+``code --list-extensions --show-versions`` and installs everything that
+is missing in a single ``code`` invocation carrying one
+``--install-extension`` flag per extension. If that batch fails, the
+remaining extensions are installed by a small bounded worker pool so one
+bad extension does not block the rest.
+
+Extensions may be pinned as ``publisher.name@1.2.3``. ``--force`` is
+only passed for pinned extensions whose installed version differs,
+i.e. when an upgrade (or downgrade) is actually required.
+
+Output (stdout, JSON):
+    {"extensions": [{"id", "status", "version"}], "changed": bool}
+
+    status is one of: present, installed, upgraded, failed
+
+Usage:
+    vscode_ext_installer.py --code code golang.go ms-python.python
+    vscode_ext_installer.py --code ./stub-code redhat.ansible@24.1.0
+
+Exit codes:
+    0 - Every requested extension is present at the end of the run
+    1 - The CLI could not be run or at least one extension failed
+"""
+
+import argparse
+import concurrent.futures
+import json
+import subprocess
+import sys
+
+# ---------------------------------------------------------------------------
+# Inventory
+# ---------------------------------------------------------------------------
+
+
+def parse_spec(spec):
+    """Split ``publisher.name[@version]`` into ``(id, version or None)``."""
+    ext_id, _, version = spec.strip().partition("@")
+    return ext_id, (version or None)
+
+
+def parse_installed(text):
+    """Map lower-cased extension IDs to versions from ``--show-versions`` output."""
+    installed = {}
+    for line in text.splitlines():
+        ext_id, version = parse_spec(line)
+        if ext_id and "." in ext_id:
+            installed[ext_id.lower()] = version
+    return installed
+
+
+def installed_extensions(code):
+    proc = subprocess.run(
+        [code, "--list-extensions", "--show-versions"],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        text=True,
+        check=True,
+    )
+    return parse_installed(proc.stdout)
+
+
+def plan(specs, installed):
+    """Return ``(present, new, upgrades)`` lists of ``(id, version)`` tuples."""
+    present, new, upgrades = [], [], []
+    seen = set()
+    for spec in specs:
+        ext_id, version = parse_spec(spec)
+        key = ext_id.lower()
+        if not ext_id or key in seen:
+            continue
+        seen.add(key)
+        if key not in installed:
+            new.append((ext_id, version))
+        elif version and installed[key] != version:
+            upgrades.append((ext_id, version))
+        else:
+            present.append((ext_id, installed[key]))
+    return present, new, upgrades
+
+
+# ---------------------------------------------------------------------------
+# Install
+# ---------------------------------------------------------------------------
+
+def _install_args(exts, force):
+    args = []
+    for ext_id, version in exts:
+        args += ["--install-extension", f"{ext_id}@{version}" if version else ext_id]
+    if force:
+        args.append("--force")
+    return args
+
+
+def _run(code, exts, force):
+    proc = subprocess.run(
+        [code, *_install_args(exts, force)],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+        text=True,
+    )
+    return proc.returncode == 0
+
+
+def install_batch(code, exts, force, jobs):
+    """Install *exts* in one call, falling back to a worker pool on failure."""
+    if not exts:
+        return
+    if _run(code, exts, force):
+        return
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max(1, jobs)) as pool:
+        list(pool.map(lambda ext: _run(code, [ext], force), exts))
+
+
+def install(code, specs, jobs=2):
+    """Install *specs* and return the per-extension JSON-ready summary."""
+    present, new, upgrades = plan(specs, installed_extensions(code))
+    install_batch(code, new, False, jobs)
+    install_batch(code, upgrades, True, jobs)
+
+    # Re-list once to report what actually landed
+    after = installed_extensions(code) if (new or upgrades) else {}
+    results = [{"id": ext_id, "status": "present", "version": version}
+               for ext_id, version in present]
+    for exts, done_status in ((new, "installed"), (upgrades, "upgraded")):
+        for ext_id, wanted in exts:
+            version = after.get(ext_id.lower())
+            ok = version is not None and (wanted is None or version == wanted)
+            results.append({"id": ext_id, "status": done_status if ok else "failed",
+                            "version": version})
+    changed = any(r["status"] in ("installed", "upgraded") for r in results)
+    return {"extensions": results, "changed": changed}
+
+
+# ---------------------------------------------------------------------------
+# Main
+# ---------------------------------------------------------------------------
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Batched VS Code extension installer for CompSetup")
+    parser.add_argument("extensions", nargs="*", help="Extension IDs, optionally pinned as id@version")
+    parser.add_argument("--code", default="code", help="VS Code CLI to use (default: code)")
+    parser.add_argument("--jobs", type=int, default=2,
+                        help="Worker pool size when the batched install fails (default: 2)")
+    args = parser.parse_args(argv)
+
+    try:
+        result = install(args.code, args.extensions, args.jobs)
+    except (OSError, subprocess.CalledProcessError) as exc:
+        print(f"Error: {exc}", file=sys.stderr)
+        return 1
+
+    json.dump(result, sys.stdout)
+    sys.stdout.write("\n")
+    return 1 if any(r["status"] == "failed" for r in result["extensions"]) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""zsh startup benchmark for CompSetup's ohmyzsh/powerlevel10k setup.
+
+Times ``zsh -i -c exit`` over N runs. ``--zshrc`` points ``ZDOTDIR`` at a
+temporary directory holding a copy of another .zshrc (for example the
+backup the ohmyzsh role keeps when it replaces ~/.zshrc), so two
+versions can be measured on the same machine. With ``--zprof``, one more
+start runs with ``COMPSETUP_ZPROF=1``. That makes the deployed .zshrc
+load ``zsh/zprof`` and print its profile, and the top entries are
+returned.
+
+``compare`` runs the before and after files alternately, so background
+load affects both equally.
+
+Output (stdout, JSON):
+    run     -> {"zshrc", "runs", "mean_ms", "median_ms", "min_ms", "max_ms",
+                "zprof": [{"calls", "total_ms", "self_ms", "name"}]}
+    compare -> {"before": {...run...}, "after": {...run...},
+                "saved_ms": float, "speedup": float}
+
+Usage:
+    zsh_startup.py run --runs 20 --zprof
+    zsh_startup.py compare --before ~/.zshrc.1234.2024-05-01@10:00:00~ --runs 20
+    zsh_startup.py run --zsh ./stub-zsh --runs 3         # any shell taking -i -c
+
+Exit codes:
+    0 - Timings printed
+    1 - Invalid arguments, zsh not found, or a start failed
+"""
+
+import argparse
+import json
+import os
+import re
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+DEFAULT_RUNS = 10
+# zprof rows: "num  calls  time  self  name" with times as "12.34   45.67%"
+ZPROF_ROW_RE = re.compile(r"^\s*\d+\)\s+(\d+)\s+([\d.]+)\s+[\d.]+\s+[\d.]+%\s+([\d.]+)\s+[\d.]+\s+[\d.]+%\s+(\S+)")
+
+# ---------------------------------------------------------------------------
+# Timing
+# ---------------------------------------------------------------------------
+
+
+def _start(zsh, env):
+    """One interactive start; return its wall time in ms and its output."""
+    begin = time.perf_counter()
+    proc = subprocess.run([zsh, "-i", "-c", "exit"], stdin=subprocess.DEVNULL,
+                          stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True,
+                          errors="replace", env=env, timeout=60)
+    elapsed = (time.perf_counter() - begin) * 1000
+    if proc.returncode != 0:
+        raise RuntimeError(f"{zsh} -i -c exit failed ({proc.returncode}): {proc.stdout.strip()[-300:]}")
+    return elapsed, proc.stdout
+
+
+def _environment(zdotdir):
+    env = dict(os.environ)
+    env.pop("COMPSETUP_ZPROF", None)
+    if zdotdir:
+        env["ZDOTDIR"] = zdotdir
+    return env
+
+
+def parse_zprof(text, top=15):
+    rows = []
+    for line in text.splitlines():
+        match = ZPROF_ROW_RE.match(line)
+        if match:
+            calls, total, self_ms, name = match.groups()
+            rows.append({"calls": int(calls), "total_ms": float(total),
+                         "self_ms": float(self_ms), "name": name})
+        elif rows and not line.strip():
+            break  # the first table ends at a blank line; call graphs follow
+    return rows[:top]
+
+
+def summarize(zshrc, timings):
+    return {"zshrc": zshrc, "runs": len(timings),
+            "mean_ms": round(statistics.mean(timings), 2),
+            "median_ms": round(statistics.median(timings), 2),
+            "min_ms": round(min(timings), 2), "max_ms": round(max(timings), 2)}
+
+
+class Subject:
+    """A .zshrc to time: the real one (``None``) or a copy under a temporary ZDOTDIR."""
+
+    def __init__(self, zshrc):
+        self.zshrc = zshrc
+        self.tmp = None
+        self.timings = []
+
+    def __enter__(self):
+        if self.zshrc:
+            self.tmp = tempfile.mkdtemp(prefix="compsetup-zsh-")
+            shutil.copyfile(os.path.expanduser(self.zshrc), os.path.join(self.tmp, ".zshrc"))
+        self.env = _environment(self.tmp)
+        return self
+
+    def __exit__(self, *exc):
+        if self.tmp:
+            shutil.rmtree(self.tmp, ignore_errors=True)
+        return False
+
+    def time_once(self, zsh):
+        self.timings.append(_start(zsh, self.env)[0])
+
+    def zprof(self, zsh):
+        return parse_zprof(_start(zsh, dict(self.env, COMPSETUP_ZPROF="1"))[1])
+
+    def report(self):
+        return summarize(self.zshrc or "~/.zshrc", self.timings)
+
+
+def run(zsh, zshrc, runs, zprof=False, warmup=1):
+    with Subject(zshrc) as subject:
+        for _ in range(warmup):
+            _start(zsh, subject.env)  # fills caches (brew shellenv, compdump, .zwc)
+        for _ in range(runs):
+            subject.time_once(zsh)
+        result = subject.report()
+        if zprof:
+            result["zprof"] = subject.zprof(zsh)
+    return result
+
+
+def compare(zsh, before, after, runs, warmup=1):
+    with Subject(before) as old, Subject(after) as new:
+        for subject in (old, new):
+            for _ in range(warmup):
+                _start(zsh, subject.env)
+        for _ in range(runs):
+            old.time_once(zsh)
+            new.time_once(zsh)
+        result = {"before": old.report(), "after": new.report()}
+    saved = result["before"]["median_ms"] - result["after"]["median_ms"]
+    result["saved_ms"] = round(saved, 2)
+    result["speedup"] = round(result["before"]["median_ms"] / max(result["after"]["median_ms"], 0.01), 2)
+    return result
+
+
+# ---------------------------------------------------------------------------
+# Main
+# ---------------------------------------------------------------------------
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="zsh startup benchmark")
+    sub = parser.add_subparsers(dest="command", required=True)
+    run_cmd = sub.add_parser("run", help="Time interactive zsh starts")
+    run_cmd.add_argument("--zshrc", help="Time this file instead of ~/.zshrc (via ZDOTDIR)")
+    run_cmd.add_argument("--zprof", action="store_true", help="Add a zprof profile of one start")
+    cmp_cmd = sub.add_parser("compare", help="Time two .zshrc files alternately")
+    cmp_cmd.add_argument("--before", required=True, help="The old .zshrc (e.g. the role's backup)")
+    cmp_cmd.add_argument("--after", help="The new .zshrc (default: ~/.zshrc)")
+    for cmd in (run_cmd, cmp_cmd):
+        cmd.add_argument("--runs", type=int, default=DEFAULT_RUNS,
+                         help=f"Timed starts (default: {DEFAULT_RUNS})")
+        cmd.add_argument("--zsh", default="zsh", help="zsh command (default: zsh)")
+    args = parser.parse_args(argv)
+
+    zsh = shutil.which(args.zsh)
+    if not zsh:
+        print(f"Error: {args.zsh} not found", file=sys.stderr)
+        return 1
+    if args.runs < 1:
+        print("Error: --runs must be at least 1", file=sys.stderr)
+        return 1
+    try:
+        if args.command == "run":
+            result = run(zsh, args.zshrc, args.runs, args.zprof)
+        else:
+            result = compare(zsh, args.before, args.after, args.runs)
+    except (OSError, RuntimeError, subprocess.SubprocessError) as exc:
+        print(f"Error: {exc}", file=sys.stderr)
+        return 1
+
+    json.dump(result, sys.stdout, indent=2)
+    sys.stdout.write("\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
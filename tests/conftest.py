@@ -0,0 +1,78 @@
+"""Shared pytest setup: the helpers under scripts/ are plain modules."""
+
+import hashlib
+import http.server
+import os
+import sys
+import threading
+
+import pytest
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCRIPTS_DIR = os.path.join(REPO_ROOT, "scripts")
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+if SCRIPTS_DIR not in sys.path:
+    sys.path.insert(0, SCRIPTS_DIR)
+
+
+def fixture_path(*parts):
+    return os.path.join(FIXTURES_DIR, *parts)
+
+
+def write_stub(directory, name, source):
+    """Write an executable Python stand-in for a command such as flatpak or dnf."""
+    path = os.path.join(str(directory), name)
+    with open(path, "w") as fh:
+        fh.write(f"#!{sys.executable}\n{source}")
+    os.chmod(path, 0o755)
+    return path
+
+
+class Upstream:
+    """Local HTTP upstream: serves ``files`` ({path: bytes}) with ETags and logs requests."""
+
+    def __init__(self):
+        self.files = {}
+        self.requests = []
+        upstream = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            def do_GET(self):
+                upstream.requests.append((self.path, self.headers.get("If-None-Match")))
+                data = upstream.files.get(self.path)
+                if data is None:
+                    self.send_error(404)
+                    return
+                etag = '"%s"' % hashlib.sha256(data).hexdigest()[:16]
+                if self.headers.get("If-None-Match") == etag:
+                    self.send_response(304)
+                    self.end_headers()
+                    return
+                self.send_response(200)
+                self.send_header("ETag", etag)
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = "http://127.0.0.1:%d" % self.server.server_address[1]
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+
+    def hits(self, path):
+        return [r for r in self.requests if r[0] == path]
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def upstream():
+    server = Upstream()
+    yield server
+    server.close()
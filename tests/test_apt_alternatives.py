@@ -0,0 +1,124 @@
+import functools
+import json
+import textwrap
+
+import pytest
+
+import apt_resolver
+from conftest import fixture_path, write_stub
+
+# Answers "apt-cache policy NAME..." from the recorded policy.txt, like
+# apt-cache it prints nothing for names it does not know
+APT_CACHE_STUB = textwrap.dedent("""
+    import json, os, sys
+    here = os.path.dirname(os.path.abspath(__file__))
+    with open(os.path.join(here, "calls.log"), "a") as fh:
+        fh.write(json.dumps(sys.argv[1:]) + "\\n")
+    stanzas, name = {}, None
+    with open(os.environ["APT_POLICY_FIXTURE"]) as fh:
+        for line in fh:
+            if not line.startswith(" ") and line.rstrip().endswith(":"):
+                name = line.rstrip()[:-1]
+            stanzas[name] = stanzas.get(name, "") + line
+    for name in sys.argv[2:]:
+        sys.stdout.write(stanzas.get(name, ""))
+""")
+
+GROUPS = [["libasound2t64", "libasound2"], ["libc6:i386"], ["libfoo:arm64", "mail-transport-agent"],
+          ["neovim", "git"]]
+
+
+@pytest.fixture
+def apt_cache(tmp_path, monkeypatch):
+    monkeypatch.setenv("APT_POLICY_FIXTURE", fixture_path("apt", "policy.txt"))
+    return write_stub(tmp_path, "apt-cache", APT_CACHE_STUB)
+
+
+@pytest.fixture
+def apt_state(tmp_path, monkeypatch):
+    """A stand-in apt list file; touching it changes the fingerprint."""
+    state = tmp_path / "lists"
+    state.write_text("Package: git\n")
+    monkeypatch.setattr(apt_resolver, "apt_state_fingerprint",
+                        functools.partial(apt_resolver.apt_state_fingerprint, [str(state)]))
+    return state
+
+
+def _calls(tmp_path):
+    path = tmp_path / "calls.log"
+    return [json.loads(line) for line in path.read_text().splitlines()] if path.exists() else []
+
+
+def test_alternatives_use_one_policy_call_for_every_group(tmp_path, apt_cache, capsys):
+    rc = apt_resolver.main(["alternatives", "--apt-cache", apt_cache, "--cache-dir", "",
+                            "--groups-json", json.dumps(GROUPS)])
+    result = json.loads(capsys.readouterr().out)
+    assert rc == 0
+    assert _calls(tmp_path) == [["policy", "libasound2t64", "libasound2", "libc6:i386", "libfoo:arm64",
+                                 "mail-transport-agent", "neovim", "git"]]
+    assert result["chosen"] == ["libc6:i386", "neovim"]
+    assert [g["chosen"] for g in result["groups"]] == [None, "libc6:i386", None, "neovim"]
+    first, second = result["unresolved"]
+    assert first["reason"] == ("libasound2t64: not in the package index; "
+                               "libasound2: virtual package with no installation candidate")
+    assert "libfoo:arm64: not in the package index (is the arm64 architecture enabled?)" in second["reason"]
+    assert "mail-transport-agent: virtual package" in second["reason"]
+
+
+def test_policy_answers_are_cached_per_apt_state(tmp_path, apt_cache, apt_state):
+    cache_dir = str(tmp_path / "cache")
+    first = apt_resolver.resolve(["git", "cosmic-term"], apt_cache=apt_cache, cache_dir=cache_dir)
+    assert first == {"available": ["git"], "virtual": [], "missing": ["cosmic-term"]}
+
+    # Known answers, missing ones included, are not queried again
+    again = apt_resolver.resolve(["cosmic-term", "git", "libasound2"], apt_cache=apt_cache,
+                                 cache_dir=cache_dir)
+    assert again == {"available": ["git"], "virtual": ["libasound2"], "missing": ["cosmic-term"]}
+    assert _calls(tmp_path) == [["policy", "git", "cosmic-term"], ["policy", "libasound2"]]
+
+    apt_state.write_text("Package: git\nPackage: cosmic-term\n")
+    apt_resolver.resolve(["git"], apt_cache=apt_cache, cache_dir=cache_dir)
+    assert _calls(tmp_path)[-1] == ["policy", "git"]
+
+
+def test_installs_between_roles_keep_the_cache(tmp_path, monkeypatch, apt_cache):
+    # aptPackages resolves, installs (rewriting dpkg/status), then davinci_resolve
+    # resolves its alternatives against the same lists
+    root = tmp_path / "root"
+    lists = root / "var/lib/apt/lists"
+    lists.mkdir(parents=True)
+    (lists / "archive_dists_noble_main_binary-amd64_Packages").write_text("Package: git\n")
+    (root / "var/lib/dpkg").mkdir(parents=True)
+    (root / "var/lib/dpkg/arch").write_text("amd64\n")
+    status = root / "var/lib/dpkg/status"
+    status.write_text("")
+    paths = [str(root) + path for path in apt_resolver.APT_STATE_PATHS]
+    monkeypatch.setattr(apt_resolver, "apt_state_fingerprint",
+                        functools.partial(apt_resolver.apt_state_fingerprint, paths))
+    cache_dir = str(tmp_path / "cache")
+
+    apt_resolver.resolve(["libasound2t64", "libasound2", "neovim", "git"], apt_cache=apt_cache,
+                         cache_dir=cache_dir)
+    status.write_text("Package: git\nStatus: install ok installed\n")
+    result = apt_resolver.resolve_alternatives([["libasound2t64", "libasound2"], ["neovim", "git"]],
+                                               apt_cache=apt_cache, cache_dir=cache_dir)
+    assert result["chosen"] == ["neovim"]
+    assert len(_calls(tmp_path)) == 1
+
+    # Enabling i386 adds name:i386 candidates, so the cache starts over
+    (root / "var/lib/dpkg/arch").write_text("amd64\ni386\n")
+    apt_resolver.resolve_alternatives([["libc6:i386"]], apt_cache=apt_cache, cache_dir=cache_dir)
+    apt_resolver.resolve(["git"], apt_cache=apt_cache, cache_dir=cache_dir)
+    assert _calls(tmp_path)[1:] == [["policy", "libc6:i386"], ["policy", "git"]]
+
+
+def test_invalid_groups_json_exits_1(apt_cache, capsys):
+    assert apt_resolver.main(["alternatives", "--apt-cache", apt_cache,
+                              "--groups-json", '["not-a-list"]']) == 1
+    assert "list of lists" in capsys.readouterr().err
+
+
+def test_failing_apt_cache_exits_1(tmp_path, capsys):
+    apt_cache = write_stub(tmp_path, "apt-cache", "import sys\nsys.exit(100)\n")
+    assert apt_resolver.main(["alternatives", "--apt-cache", apt_cache, "--cache-dir", "",
+                              "--groups-json", '[["git"]]']) == 1
@@ -0,0 +1,206 @@
+import gzip
+import io
+import json
+import os
+import shutil
+import sys
+import textwrap
+
+import pytest
+
+from conftest import REPO_ROOT, fixture_path, write_stub
+
+sys.path.insert(0, os.path.join(REPO_ROOT, "roles", "apt_upgrade_report", "files"))
+import apt_history  # noqa: E402
+
+# Stand-in for ``apt-get changelog``: prints tests/fixtures/apt/changelogs/
+# <package>.txt for "pkg" or "pkg=version" and fails for unknown packages
+CHANGELOG_STUB = textwrap.dedent("""
+    import json, os, sys
+    here = os.path.dirname(os.path.abspath(__file__))
+    with open(os.path.join(here, "calls.log"), "a") as fh:
+        fh.write(json.dumps(sys.argv[1:]) + "\\n")
+    package = sys.argv[-1].split("=")[0]
+    try:
+        with open(os.path.join(os.environ["CHANGELOG_FIXTURES"], package + ".txt")) as fh:
+            sys.stdout.write(fh.read())
+    except OSError:
+        sys.stderr.write(f"E: No changelogs available for {package}\\n")
+        sys.exit(100)
+""")
+
+NOW = "2024-05-03T12:00:00"
+FINISH = b"End-Date: 2024-05-03  11:58:52\n"
+
+
+@pytest.fixture
+def logs(tmp_path, monkeypatch):
+    """history.log and history.log.1 as apt leaves them, the last entry still running."""
+    log_dir = tmp_path / "log"
+    log_dir.mkdir()
+    for name in ("history.log", "history.log.1"):
+        shutil.copy(fixture_path("apt", "history", name), log_dir)
+    monkeypatch.setenv("CHANGELOG_FIXTURES", fixture_path("apt", "changelogs"))
+    write_stub(tmp_path, "apt-get-changelog", CHANGELOG_STUB)
+    return log_dir
+
+
+def _index(log_dir, **kwargs):
+    index = apt_history.load_index(str(log_dir.parent / "cache"))
+    summary = apt_history.update_index(index, str(log_dir), now=apt_history.datetime.datetime(2024, 5, 3),
+                                       **kwargs)
+    apt_history._write_json(str(log_dir.parent / "cache" / "index.json"), index)
+    return index, summary
+
+
+def _packages(index):
+    return sorted(name for record in index["entries"].values() for name, _, _ in record["upgrades"])
+
+
+def _rotate(log_dir, new_entry):
+    """logrotate: .1 is compressed to .2.gz, history.log becomes .1, a new log starts."""
+    with open(log_dir / "history.log.1", "rb") as src, gzip.open(log_dir / "history.log.2.gz", "wb") as dst:
+        dst.write(src.read())
+    os.rename(log_dir / "history.log", log_dir / "history.log.1")
+    (log_dir / "history.log").write_bytes(new_entry)
+
+
+def test_parse_upgrades_drops_architecture_and_installs():
+    assert apt_history.parse_upgrades(
+        "git:amd64 (1:2.34.1-1ubuntu1.10, 1:2.34.1-1ubuntu1.11), ripgrep:amd64 (13.0.0-2ubuntu0.1)"
+    ) == [["git", "1:2.34.1-1ubuntu1.10", "1:2.34.1-1ubuntu1.11"]]
+
+
+def test_incomplete_entry_is_not_yielded():
+    with open(fixture_path("apt", "history", "history.log"), "rb") as fh:
+        data = fh.read()
+    entries = list(apt_history.iter_entries(io.BytesIO(data)))
+    assert len(entries) == 1
+    fields, end = entries[0]
+    assert fields["End-Date"] == "2024-05-02  07:00:09"
+    assert data[end:].lstrip().startswith(b"Start-Date: 2024-05-03")
+
+    # A Start-Date before the previous End-Date: the cut-short entry ends there
+    cut = b"Start-Date: 2024-05-01  10:00:00\nUpgrade: a (1, 2)\n" + data.lstrip()
+    first, end = next(apt_history.iter_entries(io.BytesIO(cut)))
+    assert first["Upgrade"] == "a (1, 2)" and cut[end:].startswith(b"Start-Date: 2024-05-02")
+
+
+def test_index_resumes_and_survives_rotation(logs):
+    index, summary = _index(logs)
+    assert summary["new_entries"] == 3
+    assert "git" not in _packages(index)
+
+    # Nothing new: history.log.1 is skipped, only the running entry is read again
+    _, summary = _index(logs)
+    assert summary["new_entries"] == 0
+    assert summary["files_read"] == [str(logs / "history.log")]
+    assert summary["files_skipped"] == [str(logs / "history.log.1")]
+
+    # apt finishes the running entry; only the tail of history.log is read
+    with open(logs / "history.log", "ab") as fh:
+        fh.write(FINISH)
+    index, summary = _index(logs)
+    assert summary["new_entries"] == 1
+    assert summary["files_read"] == [str(logs / "history.log")]
+    assert _packages(index).count("git") == 1
+
+    # Rotation: .2.gz repeats known entries, .1 keeps its inode and offset
+    _rotate(logs, b"Start-Date: 2024-05-03  11:59:30\nCommandline: apt-get -y upgrade\n"
+                  b"Upgrade: vim:amd64 (2:8.2.3995-1ubuntu2.15, 2:8.2.3995-1ubuntu2.16)\n"
+                  b"End-Date: 2024-05-03  11:59:35\n")
+    index, summary = _index(logs)
+    assert summary["new_entries"] == 1
+    assert summary["files_read"] == [str(logs / "history.log.2.gz"), str(logs / "history.log")]
+    assert summary["files_skipped"] == [str(logs / "history.log.1")]
+    assert summary["entries"] == 5
+    assert {f["name"] for f in index["files"].values()} == {"history.log.2.gz", "history.log.1", "history.log"}
+
+    # The compressed file is read once
+    _, summary = _index(logs)
+    assert summary["files_read"] == [] and summary["new_entries"] == 0
+
+
+def test_truncated_log_is_read_from_the_start(logs):
+    _index(logs)
+    (logs / "history.log").write_bytes(b"Start-Date: 2024-05-03  11:59:30\n"
+                                       b"Upgrade: vim:amd64 (1, 2)\nEnd-Date: 2024-05-03  11:59:35\n")
+    index, summary = _index(logs)
+    assert summary["new_entries"] == 1 and "vim" in _packages(index)
+
+
+def test_old_entries_are_dropped(logs):
+    with gzip.open(logs / "history.log.2.gz", "wb") as fh:
+        fh.write(open(fixture_path("apt", "history", "history.log.2"), "rb").read())
+    index, _ = _index(logs)
+    assert "tzdata" in _packages(index)
+    index, summary = _index(logs, keep_days=10)
+    assert "tzdata" not in _packages(index)
+    assert summary["entries"] == 3
+
+
+def test_upgrades_since_spans_the_window(logs):
+    with open(logs / "history.log", "ab") as fh:
+        fh.write(FINISH)
+    index, _ = _index(logs)
+    assert apt_history.upgrades_since(index, "2024-05-02") == {
+        "git": ["1:2.34.1-1ubuntu1.10", "1:2.34.1-1ubuntu1.11"],
+        "git-man": ["1:2.34.1-1ubuntu1.10", "1:2.34.1-1ubuntu1.11"],
+        "libssl3": ["3.0.2-0ubuntu1.15", "3.0.2-0ubuntu1.16"],
+        "openssl": ["3.0.2-0ubuntu1.15", "3.0.2-0ubuntu1.16"],
+    }
+    # Two upgrades in the window: earliest old, latest new
+    assert apt_history.upgrades_since(index, "2024-04-28")["openssl"] == [
+        "3.0.2-0ubuntu1.14", "3.0.2-0ubuntu1.16"]
+
+
+def test_excerpt_stops_at_the_replaced_version():
+    with open(fixture_path("apt", "changelogs", "openssl.txt")) as fh:
+        text = fh.read()
+    one = apt_history.excerpt(text, "3.0.2-0ubuntu1.15", "3.0.2-0ubuntu1.16")
+    assert one.startswith("openssl (3.0.2-0ubuntu1.16)") and one.endswith("-0400")
+    assert "CVE-2024-2511" not in one
+    two = apt_history.excerpt(text, "3.0.2-0ubuntu1.14", "3.0.2-0ubuntu1.16")
+    assert "CVE-2024-2511" in two and "CVE-2023-6129" not in two
+
+
+def _report(logs, capsys, *extra):
+    tmp = logs.parent
+    code = apt_history.main(["report", "--log-dir", str(logs), "--cache-dir", str(tmp / "cache"),
+                             "--changelog-cmd", str(tmp / "apt-get-changelog"), "--now", NOW, *extra])
+    return code, capsys.readouterr().out
+
+
+def test_report_fetches_each_changelog_once(logs, capsys):
+    code, out = _report(logs, capsys, "--days", "2", "--json")
+    assert code == 0
+    result = json.loads(out)
+    assert [p["package"] for p in result["packages"]] == ["libssl3", "openssl"]
+    assert result["changelogs"] == {"cached": 0, "fetched": 2, "failed": 0}
+
+    calls = logs.parent / "calls.log"
+    calls.unlink()
+    with open(logs / "history.log", "ab") as fh:
+        fh.write(FINISH)
+    code, out = _report(logs, capsys, "--days", "2", "--json")
+    assert json.loads(out)["changelogs"] == {"cached": 2, "fetched": 0, "failed": 2}
+    # git has no changelog: the exact version, then the candidate, every run
+    assert sorted(json.loads(line) for line in calls.read_text().splitlines()) == [
+        ["git"], ["git-man"], ["git-man=1:2.34.1-1ubuntu1.11"], ["git=1:2.34.1-1ubuntu1.11"]]
+    assert not (logs.parent / "cache" / "changelogs" / "git").exists()
+
+
+def test_report_writes_text_and_markdown(logs, capsys, tmp_path):
+    code, out = _report(logs, capsys, "--days", "2", "--txt", str(tmp_path / "r.txt"), "--md", str(tmp_path / "r.md"))
+    assert code == 0
+    assert "📦 openssl (3.0.2-0ubuntu1.15 → 3.0.2-0ubuntu1.16)" in out
+    assert "CVE-2024-4603" in out
+    assert (tmp_path / "r.txt").read_text() == out
+    markdown = (tmp_path / "r.md").read_text()
+    assert "## libssl3" in markdown and "`3.0.2-0ubuntu1.15` → `3.0.2-0ubuntu1.16`" in markdown
+
+
+def test_report_with_nothing_upgraded(logs, capsys):
+    code, out = _report(logs, capsys, "--now", "2024-06-01T12:00:00")
+    assert code == 0
+    assert out == "No packages upgraded in the last 1 day(s).\n"
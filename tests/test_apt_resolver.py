@@ -0,0 +1,74 @@
+import gzip
+import shutil
+
+import apt_resolver
+from conftest import fixture_path
+
+
+def _packages_index():
+    with open(fixture_path("apt", "Packages")) as fh:
+        return apt_resolver.parse_packages(fh)
+
+
+def test_parse_packages_records_names_and_arch_qualified_names():
+    index = _packages_index()
+    assert index.candidates["git"] == "1:2.43.0-1ubuntu7"
+    assert index.candidates["git:amd64"] == "1:2.43.0-1ubuntu7"
+    # Architecture: all has no name:arch entry
+    assert "git-man" in index.candidates
+    assert "git-man:all" not in index.candidates
+
+
+def test_parse_packages_multi_arch_stanzas():
+    index = _packages_index()
+    assert index.status("libc6") == "available"
+    assert index.status("libc6:amd64") == "available"
+    assert index.status("libc6:i386") == "available"
+    assert index.status("libc6:arm64") == "missing"
+
+
+def test_parse_packages_provides_only_names_are_virtual():
+    index = _packages_index()
+    assert index.virtual == {"libasound2", "default-mta", "mail-transport-agent", "editor"}
+    # Continuation lines are never read as fields
+    assert "this-is-a-continuation-line-not-a-field" not in index.virtual
+
+
+def test_parse_policy_pinned_candidate_and_virtual_names():
+    with open(fixture_path("apt", "policy.txt")) as fh:
+        index = apt_resolver.parse_policy(fh)
+    # The pin wins over the higher PPA version
+    assert index.candidates["neovim"] == "0.9.5-6ubuntu2"
+    assert index.candidates["git"] == "1:2.43.0-1ubuntu7"
+    assert index.candidates["libc6:i386"] == "2.39-0ubuntu8"
+    assert index.virtual == {"mail-transport-agent", "libasound2"}
+
+
+def test_resolve_from_policy_and_index_agree():
+    names = ["git", "libc6:i386", "mail-transport-agent", "cosmic-term", "git"]
+    with open(fixture_path("apt", "policy.txt")) as fh:
+        from_policy = apt_resolver.parse_policy(fh).resolve(names)
+    from_index = apt_resolver.resolve(names, [fixture_path("apt", "Packages")])
+    expected = {"available": ["git", "libc6:i386"], "virtual": ["mail-transport-agent"],
+                "missing": ["cosmic-term"]}
+    assert from_policy == expected
+    assert from_index == expected
+
+
+def test_snapshot_reads_gzipped_index(tmp_path):
+    packed = tmp_path / "Packages.gz"
+    with open(fixture_path("apt", "Packages"), "rb") as src, gzip.open(packed, "wb") as dst:
+        shutil.copyfileobj(src, dst)
+    index = apt_resolver.snapshot_from_index([str(packed)])
+    assert index.status("vim") == "available"
+    assert index.status("editor") == "virtual"
+
+
+def test_alternatives_pick_first_available_and_explain_the_rest():
+    index = apt_resolver.snapshot_from_index([fixture_path("apt", "Packages")])
+    result = apt_resolver.choose_alternatives(
+        [["libasound2t64", "libasound2"], ["libasound2", "libfoo:arm64"]], index)
+    assert result["chosen"] == ["libasound2t64"]
+    reason = result["unresolved"][0]["reason"]
+    assert "libasound2: virtual package" in reason
+    assert "is the arm64 architecture enabled?" in reason
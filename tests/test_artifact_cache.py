@@ -0,0 +1,206 @@
+import hashlib
+import json
+import os
+
+import pytest
+
+import artifact_cache
+from conftest import REPO_ROOT
+from manifest_resolver import load_yaml
+
+KEY_URL = "https://deb.nodesource.com/gpgkey/nodesource-repo.gpg.key"
+DEB_URL = "https://update.code.visualstudio.com/latest/linux-deb-x64/stable"
+FLATHUB_URL = "https://flathub.org/repo/flathub.flatpakrepo"
+TARBALL_URL = "https://registry.npmjs.org/@google/gemini-cli/-/gemini-cli-1.0.0.tgz"
+
+MANIFEST = {
+    "repositories": [
+        {"name": "nodesource", "apt": {"key_url": KEY_URL}},
+        {"name": "signal-desktop", "app": "signal-desktop",
+         "apt": {"key_url": "https://updates.signal.org/desktop/apt/keys.asc"}},
+    ],
+    "gui_apps": [{"name": "vscode", "linux": {"type": "deb", "url": DEB_URL,
+                                              "architectures": ["amd64"]}}],
+    "cli_tools": [{"name": "gemini-cli", "linux": {"type": "npm", "package": "@google/gemini-cli"}}],
+}
+
+
+def _path(url):
+    return "/" + url.split("://", 1)[1]
+
+
+@pytest.fixture
+def served(upstream):
+    tarball = b"tarball bytes"
+    upstream.files.update({
+        _path(KEY_URL): b"-----BEGIN PGP PUBLIC KEY BLOCK-----\n",
+        _path(DEB_URL): b"deb bytes",
+        _path(FLATHUB_URL): b"[Flatpak Repo]\n",
+        _path(TARBALL_URL): tarball,
+        "/npm/@google/gemini-cli/latest": json.dumps(
+            {"dist": {"tarball": TARBALL_URL, "shasum": hashlib.sha1(tarball).hexdigest()}}).encode(),
+    })
+    upstream.rewrites = [("https://", upstream.url + "/")]
+    upstream.registry = upstream.url + "/npm"
+    return upstream
+
+
+def _prefetch(served, store):
+    return artifact_cache.prefetch(MANIFEST, "ubuntu", "x86_64", store, jobs=4,
+                                   rewrites=served.rewrites, registry=served.registry)
+
+
+def test_collect_artifacts_per_os():
+    ubuntu = artifact_cache.collect_artifacts(MANIFEST, "ubuntu")
+    assert [a["key"] for a in ubuntu] == [FLATHUB_URL, KEY_URL, DEB_URL, "npm:@google/gemini-cli"]
+    # The Signal key is only needed when the Signal app is selected
+    with_signal = dict(MANIFEST, gui_apps=MANIFEST["gui_apps"] + [{"name": "signal-desktop",
+                                                                    "linux": {"type": "apt"}}])
+    assert any("signal" in a["key"] for a in artifact_cache.collect_artifacts(with_signal, "ubuntu"))
+    fedora = artifact_cache.collect_artifacts(MANIFEST, "fedora")
+    assert [a["key"] for a in fedora] == [FLATHUB_URL, "npm:@google/gemini-cli"]
+    assert artifact_cache.collect_artifacts(MANIFEST, "macos") == []
+
+
+@pytest.mark.parametrize("os_name", ["ubuntu", "pop_os", "debian"])
+def test_collect_artifacts_covers_every_apt_distribution(os_name):
+    keys = [a["key"] for a in artifact_cache.collect_artifacts(MANIFEST, os_name)]
+    assert keys == [FLATHUB_URL, KEY_URL, DEB_URL, "npm:@google/gemini-cli"]
+
+
+def test_collect_artifacts_honours_distributions():
+    manifest = dict(MANIFEST, repositories=MANIFEST["repositories"] + [
+        {"name": "pop-only", "apt": {"key_url": "https://example.invalid/pop.key",
+                                     "distributions": ["pop_os"]}}])
+    assert "https://example.invalid/pop.key" in [
+        a["key"] for a in artifact_cache.collect_artifacts(manifest, "pop_os")]
+    assert "https://example.invalid/pop.key" not in [
+        a["key"] for a in artifact_cache.collect_artifacts(manifest, "debian")]
+
+
+@pytest.mark.parametrize("arch", ["aarch64", "arm64"])
+def test_collect_artifacts_skips_other_architectures(arch):
+    arm_url = "https://update.code.visualstudio.com/latest/linux-deb-arm64/stable"
+    manifest = dict(MANIFEST, gui_apps=MANIFEST["gui_apps"] + [
+        {"name": "vscode-arm", "linux": {"type": "deb", "url": arm_url, "architectures": "arm64"}}])
+    manifest["repositories"] = [dict(r, apt=dict(r["apt"], architectures="amd64"))
+                                for r in MANIFEST["repositories"]]
+    keys = [a["key"] for a in artifact_cache.collect_artifacts(manifest, "ubuntu", arch)]
+    assert keys == [FLATHUB_URL, arm_url, "npm:@google/gemini-cli"]
+    keys = [a["key"] for a in artifact_cache.collect_artifacts(manifest, "ubuntu", "amd64")]
+    assert keys == [FLATHUB_URL, KEY_URL, DEB_URL, "npm:@google/gemini-cli"]
+
+
+def test_repo_manifest_limits_the_vscode_deb_to_amd64():
+    manifest = load_yaml(os.path.join(REPO_ROOT, "packages.yml"))["package_manifest"]
+
+    def debs(arch):
+        return [a["name"] for a in artifact_cache.collect_artifacts(manifest, "debian", arch)
+                if a["kind"] == "deb"]
+
+    assert "visual-studio-code" in debs("x86_64")
+    assert "visual-studio-code" not in debs("aarch64")
+
+
+def test_prefetch_downloads_once_then_revalidates(served, tmp_path):
+    store = artifact_cache.ArtifactStore(str(tmp_path / "store"))
+    first = _prefetch(served, store)
+    assert first["changed"] is True
+    assert {a["status"] for a in first["artifacts"]} == {"downloaded"}
+
+    served.requests.clear()
+    second = _prefetch(served, artifact_cache.ArtifactStore(str(tmp_path / "store")))
+    assert second["changed"] is False
+    assert {a["status"] for a in second["artifacts"]} == {"stored"}
+    # URLs are revalidated with their ETag; a stored npm tarball is never fetched again
+    assert all(etag for path, etag in served.requests if path != "/npm/@google/gemini-cli/latest")
+    assert served.hits(_path(TARBALL_URL)) == []
+
+    served.files[_path(DEB_URL)] = b"new deb bytes"
+    third = _prefetch(served, artifact_cache.ArtifactStore(str(tmp_path / "store")))
+    assert [a["key"] for a in third["artifacts"] if a["status"] == "downloaded"] == [DEB_URL]
+
+
+def test_prefetch_reports_errors_per_artifact(served, tmp_path):
+    del served.files[_path(DEB_URL)]
+    result = _prefetch(served, artifact_cache.ArtifactStore(str(tmp_path / "store")))
+    status = {a["key"]: a["status"] for a in result["artifacts"]}
+    assert status[DEB_URL] == "error"
+    assert status[KEY_URL] == "downloaded"
+
+
+def test_npm_tarball_must_match_the_registry_shasum(served, tmp_path):
+    served.files[_path(TARBALL_URL)] = b"tampered"
+    store = artifact_cache.ArtifactStore(str(tmp_path / "store"))
+    with pytest.raises(ValueError, match="shasum"):
+        artifact_cache.fetch_npm(store, "@google/gemini-cli", served.registry, served.rewrites)
+
+
+def test_fetch_copies_from_the_store_and_works_offline(served, tmp_path, capsys):
+    store_dir = str(tmp_path / "store")
+    dest = tmp_path / "out" / "nodesource.key"
+    base = ["fetch", KEY_URL, "--store", store_dir, "--dest", str(dest)]
+    rewrite = ["--rewrite", f"https://={served.url}/"]
+
+    assert artifact_cache.main(base + rewrite) == 0
+    assert json.loads(capsys.readouterr().out)["source"] == "network"
+    assert dest.read_bytes() == served.files[_path(KEY_URL)]
+
+    served.server.shutdown()  # nothing below may touch the network
+    assert artifact_cache.main(base + ["--offline"]) == 0
+    result = json.loads(capsys.readouterr().out)
+    assert result == {"key": KEY_URL, "path": str(dest), "source": "store", "changed": False}
+
+    npm_dir = tmp_path / "npm"
+    assert artifact_cache.main(["fetch", "npm:@google/gemini-cli", "--store", store_dir,
+                                "--dest", f"{npm_dir}/", "--offline"]) == 1
+    assert "offline mode is on" in capsys.readouterr().err
+
+
+def test_fetch_revalidates_stored_artifacts_when_online(served, tmp_path):
+    store = artifact_cache.ArtifactStore(str(tmp_path / "store"))
+    dest = str(tmp_path / "deb" / "vscode.deb")
+    first = artifact_cache.copy_out(store, DEB_URL, dest, rewrites=served.rewrites)
+    assert (first["source"], first["changed"]) == ("network", True)
+
+    served.requests.clear()
+    second = artifact_cache.copy_out(store, DEB_URL, dest, rewrites=served.rewrites)
+    assert (second["source"], second["changed"]) == ("store", False)
+    assert served.requests == [(_path(DEB_URL), store.lookup(DEB_URL)["etag"])]
+
+    served.files[_path(DEB_URL)] = b"new deb bytes"
+    third = artifact_cache.copy_out(store, DEB_URL, dest, rewrites=served.rewrites)
+    assert (third["source"], third["changed"]) == ("network", True)
+    with open(dest, "rb") as fh:
+        assert fh.read() == b"new deb bytes"
+
+    # npm keys re-read ``latest`` but keep the stored tarball of that version
+    artifact_cache.copy_out(store, "npm:@google/gemini-cli", f"{tmp_path}/npm/",
+                            rewrites=served.rewrites, registry=served.registry)
+    served.requests.clear()
+    again = artifact_cache.copy_out(store, "npm:@google/gemini-cli", f"{tmp_path}/npm/",
+                                    rewrites=served.rewrites, registry=served.registry)
+    assert again["source"] == "store"
+    assert [path for path, _ in served.requests] == ["/npm/@google/gemini-cli/latest"]
+
+
+def test_fetch_into_a_directory_uses_the_url_name(served, tmp_path, capsys):
+    store = artifact_cache.ArtifactStore(str(tmp_path / "store"))
+    result = artifact_cache.copy_out(store, "npm:@google/gemini-cli", f"{tmp_path}/npm/",
+                                     rewrites=served.rewrites, registry=served.registry)
+    assert result["path"] == f"{tmp_path}/npm/gemini-cli-1.0.0.tgz"
+    assert result["changed"] is True
+
+
+def test_verify_flags_corrupt_and_missing_blobs(served, tmp_path, capsys):
+    store = artifact_cache.ArtifactStore(str(tmp_path / "store"))
+    _prefetch(served, store)
+    with open(store.blob_path(store.lookup(DEB_URL)["sha256"]), "wb") as fh:
+        fh.write(b"bit rot")
+    key_blob = store.blob_path(store.lookup(KEY_URL)["sha256"])
+    (tmp_path / "store" / "blobs" / key_blob.rsplit("/", 1)[1]).unlink()
+
+    assert artifact_cache.main(["verify", "--store", str(tmp_path / "store")]) == 1
+    result = json.loads(capsys.readouterr().out)
+    assert result["corrupt"] == [DEB_URL]
+    assert result["missing"] == [KEY_URL]
@@ -0,0 +1,141 @@
+import json
+import textwrap
+
+import pytest
+
+import brew_planner
+from conftest import fixture_path, write_stub
+
+# One stub serves as ARM brew, Intel brew and the Rosetta installer (by
+# file name). Installs of names listed in broken-<stub>.txt fail.
+BREW_STUB = textwrap.dedent("""
+    import json, os, sys
+    here = os.path.dirname(os.path.abspath(__file__))
+    me = os.path.basename(sys.argv[0])
+    args = sys.argv[1:]
+    with open(os.path.join(here, "calls.log"), "a") as fh:
+        fh.write(json.dumps([me, *args]) + "\\n")
+    if args[:2] == ["info", "--json=v2"]:
+        name = "installed.json" if "--installed" in args else "cask-info.json"
+        with open(os.path.join(os.environ["BREW_FIXTURES"], name)) as fh:
+            sys.stdout.write(fh.read())
+    elif args and args[0] == "install":
+        try:
+            with open(os.path.join(here, f"broken-{me}.txt")) as fh:
+                broken = set(fh.read().split())
+        except OSError:
+            broken = set()
+        if broken & set(args[1:]):
+            sys.exit(1)
+""")
+
+FORMULAE = ["git", "gpg", "gnupg2", "someone/tap/font-tool", "ripgrep", "jq", "visual-studio-code"]
+CASKS = ["iterm", "homebrew/cask/docker", "visual-studio-code", "firefox", "obsidian", "slack"]
+
+
+@pytest.fixture
+def brew(tmp_path, monkeypatch):
+    monkeypatch.setenv("BREW_FIXTURES", fixture_path("brew"))
+    for name in ("brew", "brew-intel", "rosetta"):
+        write_stub(tmp_path, name, BREW_STUB)
+    apps = tmp_path / "Applications"
+    apps.mkdir()
+    (apps / "Obsidian.app").mkdir()
+    (apps / "Slack.app").mkdir()
+    return tmp_path
+
+
+def _run(tmp_path, command, formulae=FORMULAE, casks=CASKS, *extra):
+    return brew_planner.main([
+        command, "--formulae-json", json.dumps(formulae), "--casks-json", json.dumps(casks),
+        "--brew", str(tmp_path / "brew"), "--intel-brew", str(tmp_path / "brew-intel"),
+        "--rosetta-cmd", str(tmp_path / "rosetta"), "--apps-dir", str(tmp_path / "Applications"),
+        *extra])
+
+
+def _calls(tmp_path):
+    return [json.loads(line) for line in (tmp_path / "calls.log").read_text().splitlines()]
+
+
+def _installs(tmp_path):
+    return [c for c in _calls(tmp_path) if c[0] == "rosetta" or c[1] in ("install", "uninstall")]
+
+
+def test_plan_from_recorded_snapshots():
+    with open(fixture_path("brew", "installed.json")) as fh:
+        snapshot = json.load(fh)
+    with open(fixture_path("brew", "cask-info.json")) as fh:
+        cask_info = json.load(fh)
+    result = brew_planner.plan(FORMULAE, CASKS, snapshot, cask_info,
+                               bundles=["Obsidian.app", "Slack.app", "Safari.app"])
+    assert result["formulae"] == {
+        # alias, old name and tap-qualified names all count as installed
+        "present": ["git", "gpg", "gnupg2", "someone/tap/font-tool"],
+        "pending": ["ripgrep", "jq"],
+        "skipped_for_cask": ["visual-studio-code"],
+    }
+    assert result["casks"] == {
+        "present": ["iterm", "homebrew/cask/docker"],
+        "pending": ["visual-studio-code", "firefox"],
+        # obsidian from its artifacts, slack by the name heuristic
+        "preexisting_app": {"obsidian": "Obsidian.app", "slack": "Slack.app"},
+    }
+    assert result["duplicates"] == ["docker"]
+
+
+def test_apply_batches_installs_and_removes_duplicates(brew, capsys):
+    assert _run(brew, "apply") == 0
+    result = json.loads(capsys.readouterr().out)
+    assert _installs(brew) == [
+        ["brew", "install", "--cask", "visual-studio-code", "firefox"],
+        ["brew", "install", "ripgrep", "jq"],
+        ["brew", "uninstall", "--formula", "docker"],
+    ]
+    assert result["installed"] == {"formulae": ["ripgrep", "jq"], "casks": ["visual-studio-code", "firefox"]}
+    assert result["uninstalled_duplicates"] == ["docker"]
+    assert result["changed"] is True
+    # One snapshot of installed items and one artifact lookup for the missing casks
+    infos = [c for c in _calls(brew) if c[1] == "info"]
+    assert infos == [["brew", "info", "--json=v2", "--installed"],
+                     ["brew", "info", "--json=v2", "--cask", "visual-studio-code", "firefox",
+                      "obsidian", "slack"]]
+
+
+def test_failures_are_retried_singly_then_on_the_intel_brew(brew, capsys):
+    (brew / "broken-brew.txt").write_text("jq\n")
+    assert _run(brew, "apply", ["ripgrep", "jq"], []) == 0
+    result = json.loads(capsys.readouterr().out)
+    assert _installs(brew) == [
+        ["brew", "install", "ripgrep", "jq"],
+        ["brew", "install", "ripgrep"],
+        ["brew", "install", "jq"],
+        ["rosetta"],
+        ["brew-intel", "install", "jq"],
+        ["brew", "uninstall", "--formula", "docker"],
+    ]
+    assert result["installed"]["formulae"] == ["ripgrep"]
+    assert result["intel"]["formulae"] == ["jq"]
+    assert result["failed"] == {"formulae": [], "casks": []}
+
+
+def test_item_failing_on_both_brews_exits_1(brew, capsys):
+    (brew / "broken-brew.txt").write_text("firefox\n")
+    (brew / "broken-brew-intel.txt").write_text("firefox\n")
+    assert _run(brew, "apply", formulae=[], casks=["firefox", "visual-studio-code"]) == 1
+    result = json.loads(capsys.readouterr().out)
+    assert result["failed"]["casks"] == ["firefox"]
+    assert result["installed"]["casks"] == ["visual-studio-code"]
+    assert result["changed"] is True
+
+
+def test_nothing_pending_is_unchanged(brew, capsys):
+    with open(fixture_path("brew", "installed.json")) as fh:
+        snapshot = json.load(fh)
+    snapshot["formulae"] = [f for f in snapshot["formulae"] if f["name"] != "docker"]
+    recorded = brew / "installed.json"
+    recorded.write_text(json.dumps(snapshot))
+    assert _run(brew, "apply", ["git"], ["iterm2", "obsidian"], "--installed-json", str(recorded)) == 0
+    result = json.loads(capsys.readouterr().out)
+    assert result["changed"] is False
+    assert result["casks"]["preexisting_app"] == {"obsidian": "Obsidian.app"}
+    assert _installs(brew) == []
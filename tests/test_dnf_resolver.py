@@ -0,0 +1,108 @@
+import json
+import textwrap
+
+import pytest
+
+import dnf_resolver
+from conftest import fixture_path, write_stub
+
+# Replays the recorded fixtures. "--cacheonly" fails while nocache
+# exists (no metadata yet); with dnf5 present the dnf4-only "--ids"
+# option is rejected like dnf5 does
+DNF_STUB = textwrap.dedent("""
+    import json, os, sys
+    here = os.path.dirname(os.path.abspath(__file__))
+    args = sys.argv[1:]
+    with open(os.path.join(here, "calls.log"), "a") as fh:
+        fh.write(json.dumps(args) + "\\n")
+    if "--cacheonly" in args and os.path.exists(os.path.join(here, "nocache")):
+        sys.exit(1)
+    dnf5 = os.path.exists(os.path.join(here, "dnf5"))
+    if "repoquery" in args:
+        fixture = "repoquery.txt"
+    elif "--ids" in args and dnf5:
+        print("Unknown argument \\"--ids\\" for command \\"list\\".", file=sys.stderr)
+        sys.exit(2)
+    else:
+        fixture = "groups-dnf5.txt" if dnf5 else "groups-dnf4.txt"
+    with open(os.path.join(os.environ["DNF_FIXTURES"], fixture)) as fh:
+        sys.stdout.write(fh.read())
+""")
+
+
+@pytest.fixture
+def dnf(tmp_path, monkeypatch):
+    monkeypatch.setenv("DNF_FIXTURES", fixture_path("dnf"))
+    return write_stub(tmp_path, "dnf", DNF_STUB)
+
+
+def _calls(tmp_path):
+    return [json.loads(line) for line in (tmp_path / "calls.log").read_text().splitlines()]
+
+
+def test_parse_repoquery_drops_versions():
+    with open(fixture_path("dnf", "repoquery.txt")) as fh:
+        providers = dnf_resolver.parse_repoquery(fh)
+    assert providers["bash"] == {"bash", "/bin/bash", "/bin/sh", "bash(x86-64)", "config(bash)"}
+    assert "gnupg" in providers["gnupg2"]
+
+
+@pytest.mark.parametrize("name", ["groups-dnf4.txt", "groups-dnf5.txt"])
+def test_parse_group_ids_skips_headers(name):
+    with open(fixture_path("dnf", name)) as fh:
+        ids = dnf_resolver.parse_group_ids(fh)
+    expected = {"c-development", "container-management", "development-tools", "sound-and-video"}
+    if name == "groups-dnf4.txt":
+        expected |= {"custom-environment", "kde-desktop-environment"}
+    assert ids == expected
+
+
+def test_resolve_from_recorded_output():
+    result = dnf_resolver.resolve(
+        ["bash", "gnupg", "java", "nope", "bash", "", "@development-tools", "@^custom-environment",
+         "@no-such-group"],
+        repoquery_output=fixture_path("dnf", "repoquery.txt"),
+        group_output=fixture_path("dnf", "groups-dnf4.txt"))
+    assert result == {
+        "available": ["bash"],
+        "provides": {"gnupg": ["gnupg2"], "java": ["java-17-openjdk", "java-21-openjdk"]},
+        "missing": ["nope"],
+        "groups": {"valid": ["@development-tools", "@^custom-environment"],
+                   "missing": ["@no-such-group"]},
+    }
+
+
+def test_one_repoquery_and_one_group_list_from_the_cache(tmp_path, dnf, capsys):
+    rc = dnf_resolver.main(["resolve", "--dnf", dnf, "bash", "ripgrep", "gnupg", "@c-development"])
+    result = json.loads(capsys.readouterr().out)
+    assert rc == 0
+    assert result["available"] == ["bash", "ripgrep"]
+    assert result["groups"]["valid"] == ["@c-development"]
+    assert _calls(tmp_path) == [
+        ["--quiet", "--cacheonly", "repoquery", "--whatprovides=bash,ripgrep,gnupg",
+         "--qf", dnf_resolver.REPOQUERY_FORMAT],
+        ["--quiet", "--cacheonly", "group", "list", "--hidden", "--ids"],
+    ]
+
+
+def test_falls_back_to_a_refresh_and_to_the_dnf5_group_table(tmp_path, dnf, capsys):
+    (tmp_path / "nocache").write_text("")
+    (tmp_path / "dnf5").write_text("")
+    rc = dnf_resolver.main(["resolve", "--dnf", dnf, "ripgrep", "@sound-and-video", "@^kde"])
+    result = json.loads(capsys.readouterr().out)
+    assert rc == 0
+    assert result["groups"] == {"valid": ["@sound-and-video"], "missing": ["@^kde"]}
+    groups = [" ".join(c) for c in _calls(tmp_path) if "group" in c]
+    assert groups == ["--quiet --cacheonly group list --hidden --ids", "--quiet group list --hidden --ids",
+                      "--quiet --cacheonly group list --hidden", "--quiet group list --hidden"]
+
+
+def test_no_groups_means_no_group_query(tmp_path, dnf, capsys):
+    assert dnf_resolver.main(["resolve", "--dnf", dnf, "bash"]) == 0
+    assert all("group" not in call for call in _calls(tmp_path))
+
+
+def test_dnf_failure_exits_1(tmp_path, capsys):
+    dnf = write_stub(tmp_path, "dnf", "import sys\nsys.exit(1)\n")
+    assert dnf_resolver.main(["resolve", "--dnf", dnf, "bash"]) == 1
+    assert "Error" in capsys.readouterr().err
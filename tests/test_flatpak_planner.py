@@ -0,0 +1,79 @@
+import json
+import textwrap
+
+import flatpak_planner
+from conftest import write_stub
+
+# installed.txt holds the installed apps; installs of ids listed in
+# broken.txt fail (the whole transaction when batched)
+FLATPAK_STUB = textwrap.dedent("""
+    import os, sys
+    here = os.path.dirname(os.path.abspath(__file__))
+    def read(name):
+        try:
+            with open(os.path.join(here, name)) as fh:
+                return fh.read().split()
+        except OSError:
+            return []
+    with open(os.path.join(here, "calls.log"), "a") as fh:
+        fh.write(" ".join(sys.argv[1:]) + "\\n")
+    if sys.argv[1] == "list":
+        print("Application ID")
+        print("\\n".join(read("installed.txt")))
+    elif sys.argv[1] == "install":
+        apps = [a for a in sys.argv[2:] if not a.startswith("-")][1:]
+        if set(apps) & set(read("broken.txt")):
+            sys.exit(1)
+        with open(os.path.join(here, "installed.txt"), "a") as fh:
+            fh.write("\\n".join(apps) + "\\n")
+""")
+
+
+def _stub(tmp_path, installed=(), broken=()):
+    (tmp_path / "installed.txt").write_text("\n".join(installed) + "\n")
+    (tmp_path / "broken.txt").write_text("\n".join(broken) + "\n")
+    return write_stub(tmp_path, "flatpak", FLATPAK_STUB)
+
+
+def _calls(tmp_path):
+    return (tmp_path / "calls.log").read_text().splitlines()
+
+
+def test_parse_app_list_drops_header_and_blanks():
+    assert flatpak_planner.parse_app_list("Application ID\norg.gimp.GIMP\n\n  com.slack.Slack \n") == {
+        "org.gimp.GIMP", "com.slack.Slack"}
+
+
+def test_plan_keeps_order_and_drops_duplicates():
+    result = flatpak_planner.plan(["b", "a", "b", "", "c"], {"a"})
+    assert result == {"present": ["a"], "missing": ["b", "c"]}
+
+
+def test_apply_installs_missing_apps_in_one_transaction(tmp_path, capsys):
+    flatpak = _stub(tmp_path, installed=["org.gimp.GIMP"])
+    rc = flatpak_planner.main(["apply", "--flatpak", flatpak,
+                               "org.gimp.GIMP", "com.slack.Slack", "md.obsidian.Obsidian"])
+    result = json.loads(capsys.readouterr().out)
+    assert rc == 0
+    assert result["installed"] == ["com.slack.Slack", "md.obsidian.Obsidian"]
+    assert result["changed"] is True
+    installs = [c for c in _calls(tmp_path) if c.startswith("install")]
+    assert installs == ["install --system --assumeyes --noninteractive flathub "
+                        "com.slack.Slack md.obsidian.Obsidian"]
+
+
+def test_apply_retries_singly_and_names_the_broken_ref(tmp_path, capsys):
+    flatpak = _stub(tmp_path, broken=["com.broken.App"])
+    rc = flatpak_planner.main(["apply", "--flatpak", flatpak, "com.slack.Slack", "com.broken.App"])
+    result = json.loads(capsys.readouterr().out)
+    assert rc == 1
+    assert result["installed"] == ["com.slack.Slack"]
+    assert result["failed"] == ["com.broken.App"]
+    assert len([c for c in _calls(tmp_path) if c.startswith("install")]) == 3
+
+
+def test_apply_with_nothing_missing_is_unchanged(tmp_path, capsys):
+    flatpak = _stub(tmp_path, installed=["org.gimp.GIMP"])
+    assert flatpak_planner.main(["apply", "--flatpak", flatpak, "org.gimp.GIMP"]) == 0
+    assert json.loads(capsys.readouterr().out)["changed"] is False
+    assert not [c for c in _calls(tmp_path) if c.startswith("install")]
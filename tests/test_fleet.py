@@ -0,0 +1,169 @@
+import json
+import os
+import textwrap
+
+import pytest
+
+import fleet
+from conftest import fixture_path, write_stub
+from manifest_resolver import load_compiled, select_targets
+
+INVENTORY_JSON = fixture_path("fleet", "inventory.json")
+
+# Stand-in for ansible-playbook: logs argv, the strategy env and cwd, writes
+# run.json (next to the stub) as the timing latest.json and exits with rc.txt
+PLAYBOOK_STUB = textwrap.dedent("""
+    import json, os, shutil, sys
+    here = os.path.dirname(os.path.abspath(__file__))
+    with open(os.path.join(here, "calls.log"), "a") as fh:
+        fh.write(json.dumps({"argv": sys.argv[1:], "cwd": os.getcwd(),
+                             "forks": os.environ.get("ANSIBLE_FORKS"),
+                             "strategy": os.environ.get("ANSIBLE_STRATEGY")}) + "\\n")
+    timing = os.environ["COMPSETUP_TIMING_DIR"]
+    os.makedirs(timing, exist_ok=True)
+    shutil.copy(os.path.join(here, "run.json"), os.path.join(timing, "latest.json"))
+    with open(os.path.join(here, "rc.txt")) as fh:
+        sys.exit(int(fh.read()))
+""")
+
+
+@pytest.fixture(scope="module")
+def listing():
+    with open(INVENTORY_JSON) as fh:
+        return json.load(fh)
+
+
+@pytest.fixture(scope="module")
+def compiled():
+    return load_compiled(fleet.PACKAGES_FILE, "")
+
+
+def test_group_hosts_follows_nested_children(listing):
+    assert sorted(fleet.group_hosts(listing, "fleet")) == ["desk-01", "desk-02", "lab-arm", "mac-01"]
+    # desk-01 sits in two groups and lab <-> desks nest each other; each host appears once
+    assert sorted(fleet.group_hosts(listing, "lab")) == ["desk-01", "desk-02", "lab-arm", "mac-01"]
+    assert fleet.group_hosts(listing, "macs") == ["mac-01"]
+    assert fleet.group_hosts(listing, "spare") == []
+    assert fleet.group_hosts(listing, "missing") == []
+
+
+def _counts(compiled, distribution, arch, omit, keys):
+    targets = select_targets(compiled, distribution, (), arch, omit)
+    return {key: len(targets[key]) for key in keys}
+
+
+def test_plan_counts_targets_per_host(listing, compiled):
+    result = fleet.plan(listing, "fleet", compiled)
+    assert result["errors"] == []
+    hosts = {rec["host"]: rec for rec in result["hosts"]}
+    assert list(hosts) == ["desk-01", "desk-02", "lab-arm", "mac-01"]
+
+    linux = ("apt_packages", "flatpak_apps", "vscode_extensions")
+    assert hosts["desk-01"]["targets"] == _counts(compiled, "ubuntu", "x86_64", [], linux)
+    assert (hosts["desk-02"]["os"], hosts["desk-02"]["arch"], hosts["desk-02"]["omit"]) == (
+        "pop_os", "x86_64", ["gh", "slack"])
+    assert hosts["desk-02"]["targets"] == _counts(compiled, "pop_os", "x86_64", ["gh", "slack"], linux)
+    assert hosts["lab-arm"]["targets"] == _counts(
+        compiled, "fedora", "aarch64", ["docker-compose", "gemini-cli"],
+        ("rpm_packages", "flatpak_apps", "vscode_extensions"))
+    assert hosts["mac-01"]["targets"] == _counts(
+        compiled, "", "aarch64", [], ("brew_formulae", "brew_casks", "vscode_extensions"))
+
+    # The omit list and the architecture really change the counts
+    assert hosts["desk-02"]["targets"]["apt_packages"] < hosts["desk-01"]["targets"]["apt_packages"]
+    assert hosts["lab-arm"]["targets"]["flatpak_apps"] < hosts["desk-01"]["targets"]["flatpak_apps"]
+
+
+def test_plan_reports_invalid_declarations(listing, compiled):
+    result = fleet.plan(listing, "infra", compiled)
+    assert result["errors"] == [
+        "kiosk: compsetup_os must be one of " + ", ".join(sorted(fleet.OS_BACKENDS)),
+        "nas: compsetup_arch must be one of " + ", ".join(sorted(fleet.ARCHES)),
+        "printer: compsetup_os must be one of " + ", ".join(sorted(fleet.OS_BACKENDS)),
+    ]
+    assert all(rec["targets"] == {} for rec in result["hosts"])
+    assert fleet.plan(listing, "spare", compiled)["errors"] == ["group 'spare' has no hosts"]
+
+
+@pytest.fixture
+def cli_env(tmp_path, monkeypatch):
+    monkeypatch.setenv("HOME", str(tmp_path / "home"))  # manifest cache
+    monkeypatch.setenv("COMPSETUP_TIMING_DIR", str(tmp_path / "timing"))
+    return tmp_path
+
+
+def test_plan_cli(cli_env, capsys):
+    assert fleet.main(["plan", "-i", "fleet.yml", "--inventory-json", INVENTORY_JSON]) == 0
+    assert [h["host"] for h in json.loads(capsys.readouterr().out)["hosts"]] == [
+        "desk-01", "desk-02", "lab-arm", "mac-01"]
+    assert fleet.main(["plan", "-i", "fleet.yml", "--inventory-json", INVENTORY_JSON,
+                       "--group", "infra"]) == 1
+    assert len(json.loads(capsys.readouterr().out)["errors"]) == 3
+
+
+def _run_json(failed_host=None):
+    events = [{"type": "task_start", "ts": 0.0, "uuid": "t1", "role": "aptPackages",
+               "task": "Install packages"}]
+    for n, host in enumerate(("desk-01", "desk-02", "lab-arm", "mac-01"), 1):
+        events.append({"type": "task_end", "ts": float(n), "uuid": "t1", "host": host,
+                       "status": "failed" if host == failed_host else "ok"})
+    return {"playbook": "site.yml", "started": 0.0, "finished": 4.0, "events": events}
+
+
+@pytest.fixture
+def playbook(cli_env, monkeypatch):
+    bin_dir = cli_env / "bin"
+    bin_dir.mkdir()
+    write_stub(bin_dir, "ansible-playbook", PLAYBOOK_STUB)
+    (bin_dir / "run.json").write_text(json.dumps(_run_json()))
+    (bin_dir / "rc.txt").write_text("0")
+    monkeypatch.setenv("PATH", f"{bin_dir}{os.pathsep}{os.environ['PATH']}")
+    return bin_dir
+
+
+def _calls(bin_dir):
+    return [json.loads(line) for line in (bin_dir / "calls.log").read_text().splitlines()]
+
+
+def _run(cli_env, *extra):
+    return fleet.main(["run", "-i", "fleet.yml", "--inventory-json", INVENTORY_JSON, "--no-prefetch",
+                       "--shared-cache", str(cli_env / "shared"), *extra])
+
+
+def test_run_passes_forks_strategy_and_extra_vars(cli_env, playbook, capsys):
+    assert _run(cli_env, "--forks", "3", "--package-proxy", "http://cache.lan:3142",
+                "--", "--limit", "desks", "--extra-vars", "skip_ai_tools=true") == 0
+    (call,) = _calls(playbook)
+    assert (call["forks"], call["strategy"], call["cwd"]) == ("3", "free", fleet.REPO_DIR)
+    argv = call["argv"]
+    assert argv[:3] == ["-i", "fleet.yml", fleet.PLAYBOOK]
+    assert json.loads(argv[argv.index("--extra-vars") + 1]) == {
+        "compsetup_hosts": "fleet", "compsetup_shared_cache": str(cli_env / "shared"),
+        "compsetup_package_proxy": "http://cache.lan:3142"}
+    assert argv[-4:] == ["--limit", "desks", "--extra-vars", "skip_ai_tools=true"]
+    out = capsys.readouterr().out
+    assert [line.split()[0] for line in out.strip().splitlines()[1:]] == [
+        "desk-01", "desk-02", "lab-arm", "mac-01"]
+
+
+def test_run_defaults_and_group(cli_env, playbook):
+    assert _run(cli_env, "--group", "macs", "--forks", "0") == 0
+    (call,) = _calls(playbook)
+    assert call["forks"] == "1"
+    extra_vars = json.loads(call["argv"][call["argv"].index("--extra-vars") + 1])
+    assert extra_vars == {"compsetup_hosts": "macs", "compsetup_shared_cache": str(cli_env / "shared")}
+
+
+def test_run_fails_when_a_host_fails_or_the_playbook_does(cli_env, playbook, capsys):
+    (playbook / "run.json").write_text(json.dumps(_run_json(failed_host="lab-arm")))
+    assert _run(cli_env) == 1
+
+    (playbook / "run.json").write_text(json.dumps(_run_json()))
+    (playbook / "rc.txt").write_text("2")
+    assert _run(cli_env) == 1
+
+
+def test_run_refuses_an_invalid_inventory(cli_env, playbook, capsys):
+    assert _run(cli_env, "--group", "infra") == 1
+    assert "Error: kiosk: compsetup_os must be one of" in capsys.readouterr().err
+    assert not (playbook / "calls.log").exists()
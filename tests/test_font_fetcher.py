@@ -0,0 +1,96 @@
+import io
+import json
+import zipfile
+
+import font_fetcher
+
+
+def _zip(members):
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w") as archive:
+        for name, data in members.items():
+            archive.writestr(name, data)
+    return buf.getvalue()
+
+
+ARCHIVE = _zip({
+    "0xProtoNerdFont-Regular.ttf": b"regular",
+    "nested/0xProtoNerdFontMono-Bold.otf": b"bold",
+    "README.md": b"not a font",
+    "LICENSE.ttf.txt": b"not a font either",
+    "OtherFont-Regular.ttf": b"wrong family",
+})
+
+
+def _font(upstream, dest, name="font-0xproto-nerd-font", path="/0xProto.zip"):
+    return {"name": name, "linux": {"url": upstream.url + path, "dest": str(dest),
+                                    "pattern": "0xProto*"}}
+
+
+def test_extract_fonts_flattens_matching_font_members(tmp_path):
+    assert font_fetcher.extract_fonts(ARCHIVE, str(tmp_path), "0xProto*") == 2
+    assert sorted(p.name for p in tmp_path.iterdir()) == [
+        "0xProtoNerdFont-Regular.ttf", "0xProtoNerdFontMono-Bold.otf"]
+
+
+def test_install_downloads_then_skips_present_fonts(upstream, tmp_path):
+    upstream.files["/0xProto.zip"] = ARCHIVE
+    font = _font(upstream, tmp_path / "fonts")
+    cache = tmp_path / "cache"
+
+    first = font_fetcher.install_fonts([font], str(cache))
+    assert first["changed"] is True
+    assert first["fonts"][0]["status"] == "downloaded"
+    assert first["fonts"][0]["files"] == 2
+
+    second = font_fetcher.install_fonts([font], str(cache))
+    assert second == {"fonts": [{"name": font["name"], "status": "present", "files": 0}],
+                      "changed": False}
+    assert len(upstream.hits("/0xProto.zip")) == 1
+
+
+def test_warm_cache_revalidates_with_etag(upstream, tmp_path):
+    upstream.files["/0xProto.zip"] = ARCHIVE
+    font = _font(upstream, tmp_path / "fonts")
+    cache = str(tmp_path / "cache")
+    font_fetcher.install_fonts([font], cache)
+
+    result = font_fetcher.install_fonts([font], cache, force=True)
+    assert result["fonts"][0]["status"] == "cached"
+    conditional = upstream.hits("/0xProto.zip")[-1][1]
+    assert conditional and conditional.startswith('"')
+
+
+def test_offline_uses_cache_and_reports_uncached_fonts(upstream, tmp_path):
+    upstream.files["/0xProto.zip"] = ARCHIVE
+    cache = str(tmp_path / "cache")
+    font_fetcher.prefetch_fonts([_font(upstream, tmp_path / "unused")], cache)
+    before = len(upstream.requests)
+
+    result = font_fetcher.install_fonts(
+        [_font(upstream, tmp_path / "fonts"),
+         _font(upstream, tmp_path / "fonts2", name="font-missing", path="/Missing.zip")],
+        cache, offline=True)
+    statuses = {r["name"]: r["status"] for r in result["fonts"]}
+    assert statuses == {"font-0xproto-nerd-font": "cached", "font-missing": "error"}
+    assert len(upstream.requests) == before
+
+
+def test_corrupt_blob_is_an_error_not_a_bad_install(upstream, tmp_path):
+    upstream.files["/0xProto.zip"] = ARCHIVE
+    cache = tmp_path / "cache"
+    font_fetcher.prefetch_fonts([_font(upstream, tmp_path / "unused")], str(cache))
+    blob = next((cache / "blobs").iterdir())
+    blob.write_bytes(b"garbage")
+
+    result = font_fetcher.install_fonts([_font(upstream, tmp_path / "fonts")], str(cache),
+                                        offline=True)
+    assert result["fonts"][0]["status"] == "error"
+    assert not (tmp_path / "fonts").exists() or not list((tmp_path / "fonts").iterdir())
+
+
+def test_main_prints_json(upstream, tmp_path, capsys):
+    upstream.files["/0xProto.zip"] = ARCHIVE
+    fonts = json.dumps([_font(upstream, tmp_path / "fonts")])
+    assert font_fetcher.main(["--fonts-json", fonts, "--cache-dir", str(tmp_path / "c")]) == 0
+    assert json.loads(capsys.readouterr().out)["changed"] is True
@@ -0,0 +1,142 @@
+import json
+import os
+
+import pytest
+
+import manifest_index
+from conftest import REPO_ROOT
+from manifest_index import Descriptions, Item
+from manifest_resolver import load_compiled, select_categories
+
+PACKAGES_FILE = os.path.join(REPO_ROOT, "packages.yml")
+
+
+@pytest.fixture
+def builds(monkeypatch):
+    """Count index rebuilds (each one asks manifest_resolver for the compiled manifest)."""
+    calls = []
+    real = manifest_index.load_compiled
+
+    def counting(path, cache_dir):
+        calls.append(path)
+        return real(path, cache_dir)
+
+    monkeypatch.setattr(manifest_index, "load_compiled", counting)
+    return calls
+
+
+@pytest.fixture
+def packages(tmp_path):
+    path = tmp_path / "packages.yml"
+    path.write_text(json.dumps(manifest_index.synthetic_manifest(40)))
+    return path
+
+
+def _view(packages, tmp_path, os_name="ubuntu", arch="x86_64"):
+    return manifest_index.load_view(str(packages), os_name, arch, str(tmp_path / "cache"))
+
+
+def _index_files(tmp_path):
+    return sorted(n for n in os.listdir(tmp_path / "cache") if n.count(".") == 3)
+
+
+def test_index_is_reused_until_the_manifest_changes(packages, tmp_path, builds):
+    first = _view(packages, tmp_path)
+    assert len(builds) == 1
+    assert _view(packages, tmp_path) == first
+    assert len(builds) == 1
+
+    manifest = manifest_index.synthetic_manifest(40)
+    manifest["package_manifest"]["flatpak_apps"].append("org.example.Extra")
+    packages.write_text(json.dumps(manifest))
+    rebuilt = _view(packages, tmp_path)
+    assert len(builds) == 2
+    assert rebuilt["ids"][rebuilt["ids"].index("org.example.App9") + 1] == "org.example.Extra"
+
+    # A touched but unchanged manifest rebuilds the index from the compiled cache
+    os.utime(packages, ns=(1_800_000_000_000_000_000, 1_800_000_000_000_000_000))
+    assert _view(packages, tmp_path)["ids"] == rebuilt["ids"]
+    assert len(builds) == 3
+
+
+@pytest.mark.parametrize("damage", [
+    lambda view: dict(view, index_version=manifest_index.INDEX_VERSION + 1),
+    lambda view: dict(view, compiler_version=view["compiler_version"] - 1),
+    lambda view: "not json",
+])
+def test_stale_or_broken_index_is_rebuilt(packages, tmp_path, builds, damage):
+    view = _view(packages, tmp_path)
+    (name,) = _index_files(tmp_path)
+    damaged = damage(view)
+    (tmp_path / "cache" / name).write_text(damaged if isinstance(damaged, str) else json.dumps(damaged))
+    assert _view(packages, tmp_path)["ids"] == view["ids"]
+    assert len(builds) == 2
+
+
+def test_one_index_file_per_view(packages, tmp_path):
+    views = {
+        ("ubuntu", "x86_64"): _view(packages, tmp_path, "ubuntu", "x86_64"),
+        ("ubuntu", "amd64"): _view(packages, tmp_path, "ubuntu", "amd64"),
+        ("ubuntu", "aarch64"): _view(packages, tmp_path, "ubuntu", "aarch64"),
+        ("fedora", "arm64"): _view(packages, tmp_path, "fedora", "arm64"),
+        ("macos", "arm64"): _view(packages, tmp_path, "macos", "arm64"),
+    }
+    names = _index_files(tmp_path)
+    assert [n.split(".", 1)[1] for n in names] == [
+        "fedora.other.json", "macos.other.json", "ubuntu.other.json", "ubuntu.x86_64.json"]
+    assert len({n.split(".", 1)[0] for n in names}) == 1  # keyed like the compiled cache
+    assert views[("ubuntu", "x86_64")] == views[("ubuntu", "amd64")]
+    assert "Flatpak Apps" not in views[("macos", "arm64")]["cats"]
+
+
+def _old_dicts(compiled, os_name, arch, blacklist=()):
+    """The selector's item dicts before the index (one dict per row)."""
+    return [{"cat": cat, "display": display, "id": ident, "sel": ident not in blacklist,
+             "bl": ident in blacklist, "details": details, "na": False}
+            for cat, rows in select_categories(compiled, os_name, arch)
+            for display, ident, details in rows]
+
+
+@pytest.mark.parametrize("os_name, arch", [("ubuntu", "x86_64"), ("fedora", "aarch64"), ("macos", "arm64")])
+def test_items_match_the_old_dicts(tmp_path, os_name, arch):
+    blacklist = {"git", "com.slack.Slack", "ms-python.python"}
+    cache = str(tmp_path / "cache")
+    items = manifest_index.load_items(PACKAGES_FILE, os_name, arch, blacklist, cache)
+    old = _old_dicts(load_compiled(PACKAGES_FILE, cache), os_name, arch, blacklist)
+    assert [{"cat": it.cat, "display": it.display, "id": it.id, "sel": it.sel, "bl": it.bl,
+             "details": it.details, "na": it.na} for it in items] == old
+    assert any(it.bl and not it.sel for it in items)
+
+
+def test_item_details_are_decoded_on_first_use():
+    item = Item("Tools", "Git", "git", '{"apt":"git"}')
+    assert item._details == '{"apt":"git"}'
+    assert item.details == {"apt": "git"}
+    assert item.details is item.details
+    assert Item("Tools", "x", "x").details == {}
+    assert Item("Tools", "x", "x", {"dnf": "x"}).details == {"dnf": "x"}
+    assert not hasattr(item, "__dict__")
+
+
+def test_descriptions_are_read_on_first_lookup(tmp_path):
+    path = tmp_path / "descriptions.json"
+    descriptions = Descriptions(str(path))
+    path.write_text(json.dumps({"git": "Distributed version control"}))  # after construction
+    assert descriptions.get("git") == "Distributed version control"
+    path.write_text(json.dumps({"git": "changed"}))  # read once per process
+    assert descriptions.get("git") == "Distributed version control"
+    assert descriptions.get("missing", "-") == "-"
+    assert Descriptions(str(tmp_path / "none.json")).get("git") == ""
+
+
+def test_build_cli(tmp_path, capsys):
+    cache = str(tmp_path / "cache")
+    assert manifest_index.main(["build", "--packages-file", PACKAGES_FILE, "--os", "fedora",
+                                "--arch", "aarch64", "--cache-dir", cache]) == 0
+    result = json.loads(capsys.readouterr().out)
+    assert result["path"].endswith(".fedora.other.json") and os.path.isfile(result["path"])
+    assert result["items"] == sum(result["categories"].values())
+
+    assert manifest_index.main(["synthetic", "8"]) == 0
+    synthetic = json.loads(capsys.readouterr().out)["package_manifest"]
+    assert len(synthetic["cli_tools"]) == 2 and len(synthetic["vscode_extensions"]) == 2
@@ -0,0 +1,237 @@
+import json
+import os
+import sys
+
+import pytest
+
+import manifest_resolver
+from conftest import REPO_ROOT
+
+sys.path.insert(0, os.path.join(REPO_ROOT, "filter_plugins"))
+
+import compsetup  # noqa: E402
+
+PACKAGES_FILE = os.path.join(REPO_ROOT, "packages.yml")
+
+
+def _unique(values):
+    out = []
+    for value in values:
+        if value not in out:
+            out.append(value)
+    return out
+
+
+def jinja_reference(manifest, distribution, desktops, arch, omit, skip_ai_tools):
+    """The set_fact chain site.yml used before manifest_resolver, step by step."""
+    m = dict(manifest)
+    if skip_ai_tools:
+        m["cli_tools"] = [t for t in m.get("cli_tools", []) if t["name"] not in ("gemini-cli", "claude-code")]
+        m["gui_apps"] = [a for a in m.get("gui_apps", []) if a["name"] != "antigravity"]
+    if omit:
+        for section in ("cli_tools", "gui_apps", "fonts"):
+            m[section] = [e for e in m.get(section, []) if e["name"] not in omit]
+        for section in ("flatpak_apps", "vscode_extensions"):
+            m[section] = [e for e in m.get(section, []) if e not in omit]
+        for section in ("apt_only", "dnf_only"):
+            m[section] = dict(m[section], common=[e for e in m[section]["common"] if e not in omit])
+    if arch not in ("x86_64", "amd64"):
+        x86_only = m.get("x86_64_only_flatpak_apps", [])
+        m["flatpak_apps"] = [e for e in m["flatpak_apps"] if e not in x86_only]
+
+    def attr(section, field):
+        return [e[field] for e in m.get(section, []) if field in e]
+
+    def system(section, field):
+        only = m.get(section) or {}
+        by_desktop = only.get("by_desktop") or {}
+        return _unique(attr("cli_tools", field) + only.get("common", [])
+                       + (only.get("by_distribution") or {}).get(distribution, [])
+                       + sum([by_desktop[d] for d in desktops if d in by_desktop], []))
+
+    return {
+        "brew_taps": m.get("brew_taps", []),
+        "brew_formulae": _unique(attr("cli_tools", "brew_formula")),
+        "brew_casks": _unique(attr("gui_apps", "brew_cask") + attr("cli_tools", "brew_cask")
+                              + attr("fonts", "brew_cask")),
+        "apt_packages": system("apt_only", "apt"),
+        "rpm_packages": system("dnf_only", "dnf"),
+        "flatpak_apps": m.get("flatpak_apps", []),
+        "vscode_extensions": m.get("vscode_extensions", []),
+    }
+
+
+COMBINATIONS = [
+    ("ubuntu", [], "x86_64", [], False),
+    ("pop_os", ["cosmic"], "x86_64", ["slack", "gh"], False),
+    ("pop_os", ["cosmic", "gnome"], "aarch64", [], True),
+    ("debian", ["kde"], "amd64", ["bat", "com.slack.Slack", "golang.go"], False),
+    ("fedora", ["kde"], "aarch64", ["docker-compose", "visual-studio-code"], True),
+    ("fedora", [], "arm64", ["gemini-cli"], False),
+    ("darwin", [], "arm64", ["cyberduck", "neovim"], False),
+]
+
+
+@pytest.fixture(scope="module")
+def manifest():
+    return manifest_resolver.load_yaml(PACKAGES_FILE)["package_manifest"]
+
+
+@pytest.mark.parametrize("distribution, desktops, arch, omit, skip_ai", COMBINATIONS)
+def test_select_targets_matches_the_old_jinja_resolution(manifest, distribution, desktops, arch,
+                                                         omit, skip_ai):
+    compiled = manifest_resolver.compile_manifest({"package_manifest": manifest})
+    targets = manifest_resolver.select_targets(compiled, distribution, desktops, arch, omit, skip_ai)
+    assert targets == jinja_reference(manifest, distribution, desktops, arch, omit, skip_ai)
+
+
+def test_select_targets_omits_by_name_and_keeps_extras(manifest):
+    compiled = manifest_resolver.compile_manifest({"package_manifest": manifest})
+    targets = manifest_resolver.select_targets(compiled, "pop_os", ["cosmic"], "x86_64",
+                                               ["gh", "tree"], skip_ai_tools=True)
+    assert "gh" not in targets["apt_packages"] and "tree" not in targets["apt_packages"]
+    assert targets["apt_packages"][-2:] == ["software-properties-common", "cosmic-term"]
+    assert "gemini-cli" not in targets["brew_formulae"]
+    assert len(targets["apt_packages"]) == len(set(targets["apt_packages"]))
+    arm = manifest_resolver.select_targets(compiled, "pop_os", arch="aarch64")
+    assert "com.slack.Slack" in targets["flatpak_apps"] and "com.slack.Slack" not in arm["flatpak_apps"]
+
+
+def test_filter_manifest_matches_the_old_set_fact_filters(manifest):
+    for distribution, desktops, arch, omit, skip_ai in COMBINATIONS:
+        filtered = compsetup.compsetup_filter_manifest(manifest, omit, skip_ai, arch)
+        reference = jinja_reference(manifest, distribution, desktops, arch, omit, skip_ai)
+        assert filtered["flatpak_apps"] == reference["flatpak_apps"]
+        assert filtered["vscode_extensions"] == reference["vscode_extensions"]
+    assert manifest["flatpak_apps"][0] == "com.brave.Browser"  # the input is not modified
+    assert "gh" in manifest["apt_only"]["common"]
+
+
+def test_filter_plugin_resolves_through_the_cache(tmp_path):
+    filters = compsetup.FilterModule().filters()
+    assert sorted(filters) == ["compsetup_filter_manifest", "compsetup_role_fingerprints",
+                               "compsetup_targets"]
+    cache_dir = str(tmp_path / "cache")
+    targets = filters["compsetup_targets"](PACKAGES_FILE, distribution="pop_os", desktops=["cosmic"],
+                                           arch="x86_64", omit=["gh"], cache_dir=cache_dir)
+    compiled = manifest_resolver.load_compiled(PACKAGES_FILE, "")
+    assert targets == manifest_resolver.select_targets(compiled, "pop_os", ["cosmic"], "x86_64", ["gh"])
+    assert len(os.listdir(cache_dir)) == 1
+    # desktops=None (desktop_identifiers undefined) is an empty list
+    assert filters["compsetup_targets"](PACKAGES_FILE, cache_dir=cache_dir)["apt_packages"] == \
+        manifest_resolver.select_targets(compiled)["apt_packages"]
+
+
+# ---------------------------------------------------------------------------
+# load_compiled cache
+# ---------------------------------------------------------------------------
+
+MANIFEST_TEXT = """\
+package_manifest:
+  cli_tools:
+    - name: ripgrep
+      apt: ripgrep
+      brew_formula: ripgrep
+  apt_only:
+    common: [tree]
+"""
+
+
+@pytest.fixture
+def compiles(monkeypatch):
+    calls = []
+    real = manifest_resolver.compile_manifest
+
+    def counting(data):
+        calls.append(data)
+        return real(data)
+
+    monkeypatch.setattr(manifest_resolver, "compile_manifest", counting)
+    return calls
+
+
+@pytest.fixture
+def packages(tmp_path):
+    path = tmp_path / "packages.yml"
+    path.write_text(MANIFEST_TEXT)
+    os.utime(path, ns=(1_700_000_000_000_000_000, 1_700_000_000_000_000_000))
+    return path
+
+
+def _load(packages, tmp_path):
+    return manifest_resolver.load_compiled(str(packages), str(tmp_path / "cache"))
+
+
+def _cache_entry(tmp_path):
+    (name,) = os.listdir(tmp_path / "cache")
+    with open(tmp_path / "cache" / name) as fh:
+        return json.load(fh)
+
+
+def test_load_compiled_reuses_the_cache(packages, tmp_path, compiles):
+    first = _load(packages, tmp_path)
+    assert len(compiles) == 1
+    again = _load(packages, tmp_path)
+    assert len(compiles) == 1
+    assert manifest_resolver.select_targets(again) == manifest_resolver.select_targets(first)
+    assert manifest_resolver.select_categories(again, "ubuntu") == \
+        manifest_resolver.select_categories(first, "ubuntu")
+    entry = _cache_entry(tmp_path)
+    assert entry["size"] == len(MANIFEST_TEXT)
+    assert entry["compiler_version"] == manifest_resolver.COMPILER_VERSION
+
+
+def test_load_compiled_rehashes_on_mtime_change_but_keeps_unchanged_content(packages, tmp_path,
+                                                                             compiles):
+    _load(packages, tmp_path)
+    os.utime(packages, ns=(1_800_000_000_000_000_000, 1_800_000_000_000_000_000))
+    _load(packages, tmp_path)
+    assert len(compiles) == 1
+    # The new mtime is recorded, so the next run trusts the stat check again
+    assert _cache_entry(tmp_path)["mtime_ns"] == 1_800_000_000_000_000_000
+
+
+def test_load_compiled_recompiles_changed_content(packages, tmp_path, compiles):
+    _load(packages, tmp_path)
+    packages.write_text(MANIFEST_TEXT.replace("[tree]", "[tree, bat]"))  # new size and mtime
+    assert manifest_resolver.select_targets(_load(packages, tmp_path))["apt_packages"] == [
+        "ripgrep", "tree", "bat"]
+    assert len(compiles) == 2
+
+    # Same size, new mtime: the sha256 decides
+    packages.write_text(MANIFEST_TEXT.replace("[tree]", "[tree, fzf]"))
+    os.utime(packages, ns=(1_900_000_000_000_000_000, 1_900_000_000_000_000_000))
+    assert manifest_resolver.select_targets(_load(packages, tmp_path))["apt_packages"] == [
+        "ripgrep", "tree", "fzf"]
+    assert len(compiles) == 3
+
+
+def test_load_compiled_trusts_matching_mtime_and_size(packages, tmp_path, compiles):
+    _load(packages, tmp_path)
+    packages.write_text(MANIFEST_TEXT.replace("ripgrep", "rg-tool"))  # same size
+    os.utime(packages, ns=(1_700_000_000_000_000_000, 1_700_000_000_000_000_000))
+    assert manifest_resolver.select_targets(_load(packages, tmp_path))["apt_packages"] == ["ripgrep", "tree"]
+    assert len(compiles) == 1
+
+
+@pytest.mark.parametrize("damage", [
+    lambda entry: dict(entry, compiler_version=entry["compiler_version"] - 1),
+    lambda entry: "{truncated",
+])
+def test_load_compiled_discards_stale_or_broken_caches(packages, tmp_path, compiles, damage):
+    _load(packages, tmp_path)
+    (name,) = os.listdir(tmp_path / "cache")
+    damaged = damage(_cache_entry(tmp_path))
+    (tmp_path / "cache" / name).write_text(damaged if isinstance(damaged, str) else json.dumps(damaged))
+    _load(packages, tmp_path)
+    assert len(compiles) == 2
+
+
+def test_load_compiled_without_a_usable_cache(packages, tmp_path, compiles):
+    assert manifest_resolver.load_compiled(str(packages), "") == \
+        manifest_resolver.load_compiled(str(packages), "")
+    assert len(compiles) == 2
+    blocker = tmp_path / "not-a-dir"
+    blocker.write_text("")
+    manifest_resolver.load_compiled(str(packages), str(blocker / "cache"))
+    assert len(compiles) == 3
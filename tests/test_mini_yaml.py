@@ -0,0 +1,192 @@
+"""Differential tests: mini_yaml must load what PyYAML loads, or refuse it.
+
+The invariant for every input is that ``mini_yaml.load`` either returns
+exactly what ``yaml.safe_load`` returns or raises ``YAMLSubsetError``.
+It never returns something different. The corpora below also pin down
+which forms the subset must accept and which it must reject.
+"""
+
+import datetime
+import random
+
+import pytest
+
+import mini_yaml
+from conftest import REPO_ROOT
+
+yaml = pytest.importorskip("yaml")
+
+SCALARS = [
+    # null / bool
+    "", "~", "null", "Null", "NULL", "nul", "yes", "No", "ON", "off", "y", "n", "TRUE", "tRUE",
+    # ints
+    "0", "-0", "+0", "7", "-12", "+12", "1_000", "0x1F", "-0x1f", "0x_1F", "010", "0_7", "08",
+    "0b101", "-0b1_0", "0o17", "1:20", "-1:20:30", "190:20:30", "1:60", "1:5",
+    # floats
+    "1.5", "-1.", ".5", "1_000.5", "1.5e+3", "1.5E-3", "1.5e3", "1e3", "1:30.5", ".inf", "-.Inf",
+    "+.INF", ".nan", ".NaN", ".", "-.", "1.2.3",
+    # timestamps
+    "2001-12-14", "2001-12-14t21:59:43.10-05:00", "2001-12-14 21:59:43.10 -5",
+    "2001-12-15T02:59:43.1Z", "2001-12-15 2:59:43.10", "2002-12-14T21:59:43.1234567+01:30",
+    "2024-5-1", "20240501",
+    # strings
+    "hello world", "a:b", "http://example.com/a#b", "it's", "a 'b", 'say "hi"', "x-y", "-x",
+    "?x", ":x", "a,b", "a[b", "@scope/pkg", "1.2.3-beta", "3.11", "v1", "0.0.0.0",
+]
+
+RESERVED = {"@scope/pkg"}
+
+QUOTED = ["'a # b'", "'it''s'", '"tab\\there"', '"\\x41\\u00e9\\U0001F600"', '"a: b"',
+          "'yes'", '"123"', "''", '""', '"\\L\\P\\N\\_"']
+
+FLOWS = ["[]", "{}", "[a, b]", "[a, [b, c], {d: e}]", "{k: v, l: [x, 'y # z']}",
+         "[1, 0x10, 1:20, 2001-12-14]", "{a, b: }", "[a, b, ]", "{'a':1}", '{"a": [ ]}',
+         "{a:b}", "[a'b, c\"d]", "{a: , b: [], c: {}}", "[a:b, http://x/y]"]
+
+SUPPORTED_DOCS = [
+    "package_manifest:\n  cli_tools:\n    - name: git\n      apt: git\n",
+    "a:\n- 1\n- 2\nb: {}\n",
+    "# comment\n---\nk: v  # trailing\n...\n# after end\n",
+    "--- {a: 1}\n",
+    "- - a\n  - b\n- c: d\n  e: f\n",
+    "k: a 'b # c\n",
+    "k: it's # c\n",
+    "k: 'a # b' # c\n",
+    "k: a, 'b # c\n",
+    "k: [a, 'b # c'] # d\n",
+    "'quoted key': 1\n\"x\": [y]\n",
+    "1: one\n2001-12-14: date\nnull: n\nyes: y\n",
+    "plain scalar document\n",
+    "when: 2024-05-01 10:00:00\nretries: 010\nwindow: 1:30\n",
+]
+
+# Forms outside the subset (PyYAML accepts them) or invalid YAML (PyYAML
+# rejects them too); either way mini_yaml must raise
+REJECTED_DOCS = [
+    "k: a: b\n", "k: a:\n", "k: =\n", "<<: {a: 1}\n", "k: - a\n", "k: ? a\n",
+    "a: 1\n---\nb: 2\n", "---\n---\na: 1\n", "a: 1\n...\nb: 2\n",
+    "k: [a, , b]\n", "k: {: a}\n", "k: [a: b]\n", "k: ,a\n", "k: ]\n",
+    "k: &x 1\nl: *x\n", "k: !!str 1\n", "k: |\n  text\n", "k: >\n  text\n",
+    "? complex\n: key\n", "k: 'multi\n  line'\n", "k: [a,\n  b]\n", "k:\n  plain\n  words\n",
+    "%YAML 1.1\n---\na: 1\n", "k: 0x_\n", "k: 2001-13-45\n", "&a k: v\n",
+    "k:\n\t- a\n", "k: 'a' b\n",
+]
+
+
+def _pyyaml(text):
+    try:
+        return True, yaml.safe_load(text)
+    except Exception:  # any PyYAML scanner, parser or constructor error
+        return False, None
+
+
+def _mini(text):
+    try:
+        return True, mini_yaml.load(text)
+    except mini_yaml.YAMLSubsetError:
+        return False, None
+
+
+def assert_never_differs(text):
+    mini_ok, mini_value = _mini(text)
+    if not mini_ok:
+        return False
+    py_ok, py_value = _pyyaml(text)
+    assert py_ok, f"mini_yaml accepted what PyYAML rejects: {text!r} -> {mini_value!r}"
+    assert mini_yaml.same(mini_value, py_value), \
+        f"{text!r}: mini_yaml {mini_value!r} != PyYAML {py_value!r}"
+    return True
+
+
+@pytest.mark.parametrize("scalar", SCALARS + QUOTED + FLOWS)
+def test_scalar_and_flow_values_match_pyyaml(scalar):
+    for text in (f"k: {scalar}\n", f"- {scalar}\n", f"k: {scalar}  # note\n", f"[{scalar}]\n"):
+        assert_never_differs(text)
+    # Reserved indicators are the only values in the corpus the subset refuses
+    assert _mini(f"k: {scalar}\n")[0] == (scalar not in RESERVED), scalar
+
+
+def test_yaml11_resolvers():
+    load = mini_yaml.load
+    assert load("[0x1F, 010, 0b101, 1:20, -1:20:30, 1_000]\n") == [31, 8, 5, 80, -4830, 1000]
+    assert load("[1:30.5, .5, -.inf]\n") == [90.5, 0.5, float("-inf")]
+    assert load("d: 2001-12-14\n") == {"d": datetime.date(2001, 12, 14)}
+    stamp = load("t: 2001-12-14t21:59:43.10-05:00\n")["t"]
+    assert stamp == datetime.datetime(2001, 12, 15, 2, 59, 43, 100000, tzinfo=datetime.timezone.utc)
+    assert load("[08, 0o17, 1e3, 2024-5-1]\n") == ["08", "0o17", "1e3", "2024-5-1"]
+
+
+@pytest.mark.parametrize("text", SUPPORTED_DOCS)
+def test_supported_documents_load_like_pyyaml(text):
+    assert assert_never_differs(text), f"mini_yaml rejected a supported document: {text!r}"
+
+
+@pytest.mark.parametrize("text", REJECTED_DOCS)
+def test_unsupported_or_invalid_documents_raise(text):
+    with pytest.raises(mini_yaml.YAMLSubsetError) as excinfo:
+        mini_yaml.load(text)
+    assert excinfo.value.lineno >= 1
+
+
+def test_error_names_the_line():
+    with pytest.raises(mini_yaml.YAMLSubsetError, match="line 3"):
+        mini_yaml.load("a: 1\nb: 2\nc: d: e\n")
+
+
+def _random_value(rng, depth):
+    roll = rng.random()
+    if depth < 2 and roll < 0.15:
+        return "[" + ", ".join(_random_value(rng, depth + 1) for _ in range(rng.randint(0, 3))) + "]"
+    if depth < 2 and roll < 0.25:
+        pairs = [f"{rng.choice(KEYS)}: {_random_value(rng, depth + 1)}" for _ in range(rng.randint(0, 3))]
+        return "{" + ", ".join(pairs) + "}"
+    if roll < 0.4:
+        return rng.choice(QUOTED)
+    return rng.choice(SCALARS)
+
+
+KEYS = ["name", "apt", "dnf", "linux", "1", "yes", "'q # k'", '"d"', "a b", "x-y", "2001-12-14"]
+COMMENTS = ["", "", "  # c", " # 'x' \"y\"", "  #"]
+
+
+def _random_block(rng, indent, depth):
+    lines = []
+    pad = " " * indent
+    if rng.random() < 0.3 and depth < 3:
+        for _ in range(rng.randint(1, 3)):
+            if rng.random() < 0.4 and depth < 2:
+                lines.append(f"{pad}-{rng.choice(COMMENTS)}")
+                lines += _random_block(rng, indent + 2, depth + 1)
+            else:
+                lines.append(f"{pad}- {_random_value(rng, 0)}{rng.choice(COMMENTS)}")
+        return lines
+    for key in rng.sample(KEYS, rng.randint(1, 4)):
+        if rng.random() < 0.3 and depth < 3:
+            lines.append(f"{pad}{key}:{rng.choice(COMMENTS)}")
+            lines += _random_block(rng, indent + rng.choice((0, 2, 4)), depth + 1)
+        else:
+            lines.append(f"{pad}{key}: {_random_value(rng, 0)}{rng.choice(COMMENTS)}")
+    return lines
+
+
+def test_random_documents_never_differ_from_pyyaml():
+    rng = random.Random(20240501)
+    accepted = 0
+    for _ in range(3000):
+        text = "\n".join(_random_block(rng, 0, 0)) + "\n"
+        accepted += assert_never_differs(text)
+    # The generator mostly produces valid manifest-like YAML; most of it must load
+    assert accepted > 1500
+
+
+@pytest.mark.parametrize("entries", [10, 3000])
+def test_generated_manifest_matches_pyyaml(entries):
+    text = mini_yaml.generate_manifest(entries)
+    assert mini_yaml.same(mini_yaml.load(text), yaml.safe_load(text))
+
+
+def test_repository_manifest_matches_pyyaml():
+    path = f"{REPO_ROOT}/packages.yml"
+    with open(path) as fh:
+        expected = yaml.safe_load(fh)
+    assert mini_yaml.same(mini_yaml.load_path(path), expected)
@@ -0,0 +1,189 @@
+import io
+import json
+import os
+import tarfile
+import textwrap
+
+import pytest
+
+import nvim_bundle
+from conftest import write_stub
+
+# Stand-in for nvim: reports its version and, for the headless verify
+# start, checks $NVIM_STUB_DATA the way the Lua snippet would: every
+# plugin in lazy-lock.json under lazy/, every parser on the runtimepath.
+NVIM_STUB = textwrap.dedent("""
+    import glob, json, os, sys
+    if sys.argv[1:] == ["--version"]:
+        print(os.environ.get("NVIM_STUB_VERSION", "NVIM v0.10.2\\nBuild type: Release"))
+        sys.exit(0)
+    data, config = os.environ["NVIM_STUB_DATA"], os.environ["NVIM_STUB_CONFIG"]
+    if not os.path.isdir(os.path.join(data, "lazy", "lazy.nvim")):
+        sys.stderr.write("E5113: module 'lazy' not found\\n")
+        sys.exit(1)
+    with open(os.path.join(config, "lazy-lock.json")) as fh:
+        plugins = json.load(fh)
+    report = {"lazy": True, "missing_plugins": {}, "missing_parsers": {}}
+    missing = [p for p in plugins if not os.path.isdir(os.path.join(data, "lazy", p))]
+    parsers = [lang for lang in os.environ["COMPSETUP_PARSERS"].split(",") if lang and not (
+        glob.glob(os.path.join(data, "lazy", "*", "parser", lang + ".*"))
+        or glob.glob(os.path.join(data, "site", "parser", lang + ".*")))]
+    report["missing_plugins"] = missing or {}
+    report["missing_parsers"] = parsers or {}
+    sys.stderr.write("Lazy: 3 plugins loaded\\n")
+    print("\\n" + json.dumps(report))
+""")
+
+LOCK = {"lazy.nvim": {"branch": "main", "commit": "aaa"},
+        "nvim-treesitter": {"branch": "master", "commit": "bbb"},
+        "nvchad": {"branch": "v2.5", "commit": "ccc"}}
+
+
+def _write(path, data=b""):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as fh:
+        fh.write(data)
+
+
+@pytest.fixture
+def nvim(tmp_path, monkeypatch):
+    """A synced NVChad install: config with lazy-lock.json, data with plugins and parsers."""
+    config, data = tmp_path / "config", tmp_path / "data"
+    _write(str(config / "lazy-lock.json"), json.dumps(LOCK).encode())
+    for plugin in LOCK:
+        _write(str(data / "lazy" / plugin / "README.md"), plugin.encode())
+    _write(str(data / "lazy" / "nvim-treesitter" / "parser" / "lua.so"), b"\x7fELF lua")
+    _write(str(data / "site" / "parser" / "bash.so"), b"\x7fELF bash")
+    monkeypatch.setenv("NVIM_STUB_DATA", str(data))
+    monkeypatch.setenv("NVIM_STUB_CONFIG", str(config))
+    write_stub(tmp_path, "nvim", NVIM_STUB)
+    return tmp_path
+
+
+def _run(tmp_path, command, *extra, data="data", config="config"):
+    argv = [command, "--nvim", str(tmp_path / "nvim"), *extra]
+    if command != "verify":
+        argv += ["--config-dir", str(tmp_path / config), "--data-dir", str(tmp_path / data),
+                 "--bundle-dir", str(tmp_path / "bundles")]
+    return nvim_bundle.main(argv)
+
+
+def _output(capsys):
+    return json.loads(capsys.readouterr().out)
+
+
+def test_version_comes_from_nvim(nvim, monkeypatch):
+    assert nvim_bundle.nvim_version(str(nvim / "nvim")) == "0.10"
+    monkeypatch.setenv("NVIM_STUB_VERSION", "vim 9.1")
+    with pytest.raises(RuntimeError):
+        nvim_bundle.nvim_version(str(nvim / "nvim"))
+
+
+def test_build_packs_plugins_parsers_and_lock(nvim, capsys):
+    assert _run(nvim, "build") == 0
+    result = _output(capsys)
+    lock_hash = nvim_bundle.lock_sha256(str(nvim / "config" / "lazy-lock.json"))
+    assert result["key"] == f"{nvim_bundle.bundle_prefix('0.10')}{lock_hash[:16]}"
+    assert (result["plugins"], result["parsers"], result["changed"]) == (3, 2, True)
+
+    with tarfile.open(result["path"], "r:gz") as tar:
+        names = set(tar.getnames())
+        meta = json.load(tar.extractfile("bundle.json"))
+    assert {"bundle.json", "lazy-lock.json", "lazy/nvim-treesitter/parser/lua.so",
+            "site/parser/bash.so", "lazy/nvchad/README.md"} <= names
+    assert meta["plugins"] == sorted(LOCK) and meta["lock_sha256"] == lock_hash
+
+    # An existing bundle is reused unless --force
+    assert _run(nvim, "build") == 0
+    assert _output(capsys)["changed"] is False
+    assert _run(nvim, "build", "--force") == 0
+    assert _output(capsys)["changed"] is True
+
+
+def test_build_needs_a_synced_install(nvim, capsys):
+    assert _run(nvim, "build", data="empty") == 1
+    assert "run a Lazy sync first" in capsys.readouterr().err
+
+
+def test_install_onto_a_fresh_machine_then_current(nvim, capsys):
+    assert _run(nvim, "build") == 0
+    key = _output(capsys)["key"]
+    os.makedirs(nvim / "fresh" / "lazy" / "stale-plugin")
+
+    assert _run(nvim, "install", data="fresh") == 0
+    result = _output(capsys)
+    assert (result["key"], result["status"], result["changed"]) == (key, "installed", True)
+    fresh = nvim / "fresh"
+    assert sorted(os.listdir(fresh / "lazy")) == sorted(LOCK)
+    assert (fresh / "site" / "parser" / "bash.so").read_bytes() == b"\x7fELF bash"
+    assert json.loads((fresh / nvim_bundle.MARKER).read_text())["key"] == key
+    assert not [n for n in os.listdir(fresh) if n.startswith(".")]
+
+    assert _run(nvim, "install", data="fresh") == 0
+    assert _output(capsys)["status"] == "current"
+
+
+def test_install_without_a_lock_takes_the_newest_bundle(nvim, capsys):
+    assert _run(nvim, "build") == 0
+    key = _output(capsys)["key"]
+    assert _run(nvim, "install", data="fresh", config="fresh-config") == 0
+    assert _output(capsys)["key"] == key
+    assert json.loads((nvim / "fresh-config" / "lazy-lock.json").read_text()) == LOCK
+
+
+def test_install_reports_a_missing_bundle(nvim, capsys):
+    assert _run(nvim, "build") == 0
+    capsys.readouterr()
+    (nvim / "config" / "lazy-lock.json").write_text(json.dumps(dict(LOCK, extra={"commit": "d"})))
+    assert _run(nvim, "install", data="fresh") == 0
+    result = _output(capsys)
+    assert (result["status"], result["path"], result["changed"]) == ("missing", None, False)
+    assert not (nvim / "fresh" / "lazy").exists()
+
+
+def _tamper(path, **members):
+    """Rewrite the bundle at *path* with *members* ({name: bytes}) added or replaced."""
+    with tarfile.open(path, "r:gz") as tar:
+        kept = [(m, tar.extractfile(m).read() if m.isfile() else None)
+                for m in tar.getmembers() if m.name not in members]
+    with tarfile.open(path, "w:gz") as tar:
+        for member, data in kept:
+            tar.addfile(member, io.BytesIO(data) if data is not None else None)
+        for name, data in members.items():
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            tar.addfile(info, io.BytesIO(data))
+
+
+@pytest.mark.parametrize("members", [
+    {"bundle.json": json.dumps({"bundle_version": 1, "key": "someone-else"}).encode()},
+    {"../escaped.txt": b"outside"},
+])
+def test_install_rejects_foreign_or_unsafe_bundles(nvim, capsys, members):
+    assert _run(nvim, "build") == 0
+    _tamper(_output(capsys)["path"], **members)
+    os.makedirs(nvim / "fresh" / "lazy" / "kept")
+
+    assert _run(nvim, "install", data="fresh") == 1
+    assert capsys.readouterr().err.startswith("Error:")
+    assert os.listdir(nvim / "fresh" / "lazy") == ["kept"]
+    assert not (nvim / "escaped.txt").exists()
+    assert not [n for n in os.listdir(nvim / "fresh") if n.startswith(".")]
+
+
+def test_verify_checks_plugins_and_parsers(nvim, capsys, monkeypatch):
+    assert _run(nvim, "verify", "--parsers", "lua,bash") == 0
+    assert _output(capsys)["ok"] is True
+
+    assert _run(nvim, "verify", "--parsers", "lua,python") == 1
+    result = _output(capsys)
+    assert (result["missing_plugins"], result["missing_parsers"]) == ([], ["python"])
+
+    os.rename(nvim / "data" / "lazy" / "nvchad", nvim / "nvchad")
+    assert _run(nvim, "verify") == 1
+    assert _output(capsys)["missing_plugins"] == ["nvchad"]
+
+    monkeypatch.setenv("NVIM_STUB_DATA", str(nvim / "empty"))
+    assert _run(nvim, "verify", "--parsers", "lua") == 1
+    result = _output(capsys)
+    assert result["missing_parsers"] == ["lua"] and "module 'lazy' not found" in result["error"]
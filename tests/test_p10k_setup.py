@@ -0,0 +1,101 @@
+import os
+import re
+import sys
+
+import pytest
+
+from conftest import REPO_ROOT
+
+sys.path.insert(0, os.path.join(REPO_ROOT, "roles", "powerlevel10k", "files"))
+import p10k_setup  # noqa: E402
+
+GUARDED = "[[ ! -f ~/.p10k.zsh ]] || source ~/.p10k.zsh"
+OH_MY_ZSH = "source $ZSH/oh-my-zsh.sh"
+
+
+@pytest.fixture
+def zshrc(tmp_path, monkeypatch):
+    path = tmp_path / "home" / ".zshrc"
+    monkeypatch.setattr(p10k_setup, "ZSHRC", path)
+    return path
+
+
+@pytest.mark.parametrize("line", [
+    GUARDED,
+    "  [[ -f ~/.p10k.zsh ]] && source ~/.p10k.zsh",
+    "[ -f $HOME/.p10k.zsh ] && . $HOME/.p10k.zsh",
+    'source "$HOME/.p10k.zsh"',
+    'source "$HOME"/.p10k.zsh',
+    '[[ -r "${HOME}/.p10k.zsh" ]] && source "${HOME}/.p10k.zsh"',
+    "source ~/.p10k.zsh  ",
+    ". ~/.p10k.zsh",
+])
+def test_source_lines_are_recognised(line):
+    assert p10k_setup.SOURCE_P10K_RE.match(line)
+
+
+@pytest.mark.parametrize("line", [
+    "# To customize prompt, run `p10k configure` or edit ~/.p10k.zsh.",
+    "  # restarting zsh. Edit ~/.p10k.zsh and type `source ~/.p10k.zsh`.",
+    "source ~/.p10k.zsh.bak",
+    "source ~/other/.p10k.zsh",
+    "source ~/.p10k.zsh; echo loaded",
+    "cp ~/.p10k.zsh ~/.p10k.zsh.bak",
+])
+def test_other_lines_are_left_alone(line):
+    assert not p10k_setup.SOURCE_P10K_RE.match(line)
+
+
+def test_the_zshrc_template_sources_p10k_once():
+    with open(os.path.join(REPO_ROOT, "roles", "ohmyzsh", "templates", "zshrc.j2")) as fh:
+        hits = [line for line in fh.read().splitlines() if p10k_setup.SOURCE_P10K_RE.match(line)]
+    assert hits == [GUARDED]
+
+
+def test_missing_source_line_is_appended(zshrc, capsys):
+    assert p10k_setup.ensure_zshrc_sources_p10k() is True  # creates ~/.zshrc
+    assert zshrc.read_text() == GUARDED + "\n"
+
+    zshrc.write_text(f"export ZSH=~/.oh-my-zsh\n{OH_MY_ZSH}")
+    assert p10k_setup.ensure_zshrc_sources_p10k() is True
+    assert zshrc.read_text() == f"export ZSH=~/.oh-my-zsh\n{OH_MY_ZSH}\n{GUARDED}\n"
+    assert "Added source line" in capsys.readouterr().out
+
+
+@pytest.mark.parametrize("line", [GUARDED, "source ~/.p10k.zsh"])
+def test_a_single_source_line_is_kept_as_is(zshrc, line):
+    text = f"{OH_MY_ZSH}\n{line}\nalias ll='ls -l'"  # no trailing newline
+    zshrc.parent.mkdir()
+    zshrc.write_text(text)
+    assert p10k_setup.ensure_zshrc_sources_p10k() is False
+    assert zshrc.read_text() == text
+
+
+def test_duplicates_keep_the_last_source_line(zshrc, capsys):
+    zshrc.parent.mkdir()
+    zshrc.write_text("\n".join([
+        "source ~/.p10k.zsh",
+        "# edit ~/.p10k.zsh to customize",
+        OH_MY_ZSH,
+        '  [[ -f "$HOME/.p10k.zsh" ]] && source "$HOME/.p10k.zsh"',
+        "alias ll='ls -l'",
+        GUARDED,
+    ]) + "\n")
+    assert p10k_setup.ensure_zshrc_sources_p10k() is True
+    assert zshrc.read_text().splitlines() == [
+        "# edit ~/.p10k.zsh to customize", OH_MY_ZSH, "alias ll='ls -l'", GUARDED]
+    assert "Removed 2 duplicate" in capsys.readouterr().out
+
+    # A second run finds exactly one line and leaves the file alone
+    before = zshrc.read_text()
+    assert p10k_setup.ensure_zshrc_sources_p10k() is False
+    assert zshrc.read_text() == before
+
+
+def test_the_line_after_oh_my_zsh_wins(zshrc):
+    zshrc.parent.mkdir()
+    zshrc.write_text(f"{GUARDED}\n{OH_MY_ZSH}\nsource ~/.p10k.zsh\n")
+    p10k_setup.ensure_zshrc_sources_p10k()
+    lines = zshrc.read_text().splitlines()
+    assert lines == [OH_MY_ZSH, "source ~/.p10k.zsh"]
+    assert sum(bool(re.search(r"\.p10k\.zsh", line)) for line in lines) == 1
@@ -0,0 +1,559 @@
+import argparse
+import fcntl
+import io
+import json
+import os
+import pty
+import re
+import select
+import signal
+import struct
+import subprocess
+import sys
+import termios
+import threading
+import time
+
+import pytest
+
+import manifest_resolver
+import package_selector
+from manifest_index import Descriptions, Item
+from conftest import SCRIPTS_DIR
+from package_selector import FRAME_CHROME, FrameRenderer, Terminal, page_starts, run_selector
+
+CSI = re.compile(r"\033\[(\d*)(?:;(\d*))?([HJK])")
+
+
+class Screen:
+    """Just enough of a terminal to replay FrameRenderer output.
+
+    Rows hold raw text (SGR colour codes included), which is all the
+    renderer needs: it always writes whole lines from column 1.
+    """
+
+    def __init__(self):
+        self.rows = [""]
+        self.row = self.col = 0
+
+    def write(self, text):
+        pos = 0
+        for match in CSI.finditer(text):
+            self._text(text[pos:match.start()])
+            pos = match.end()
+            a, b, op = match.groups()
+            if op == "H":
+                self.row, self.col = int(a or 1) - 1, int(b or 1) - 1
+                while len(self.rows) <= self.row:
+                    self.rows.append("")
+            elif op == "K":
+                self.rows[self.row] = self.rows[self.row][:self.col]
+            elif a == "2":
+                self.rows = [""]
+            else:
+                self.rows[self.row] = self.rows[self.row][:self.col]
+                del self.rows[self.row + 1:]
+        self._text(text[pos:])
+
+    def _text(self, text):
+        for n, chunk in enumerate(text.split("\n")):
+            if n:
+                self.row, self.col = self.row + 1, 0
+                while len(self.rows) <= self.row:
+                    self.rows.append("")
+            line = self.rows[self.row]
+            self.rows[self.row] = line[:self.col] + chunk + line[self.col + len(chunk):]
+            self.col += len(chunk)
+
+    def flush(self):
+        pass
+
+    def lines(self):
+        rows = list(self.rows)
+        while rows and not rows[-1]:
+            rows.pop()
+        return rows
+
+
+class CheckedRenderer(FrameRenderer):
+    """Asserts after every frame that the screen shows exactly that frame."""
+
+    def __init__(self, rows):
+        super().__init__(out=Screen(), rows=rows)
+        self.frames = 0
+        self.full = 0
+
+    def draw(self, lines):
+        before = self.bytes_written
+        full = self.prev is None
+        super().draw(lines)
+        expected = list(lines)
+        while expected and not expected[-1]:
+            expected.pop()
+        assert self.out.lines() == expected
+        self.frames += 1
+        self.full += full
+        self.last_bytes = self.bytes_written - before
+
+
+def make_items(n=60, cats=4):
+    return [Item(f"Category {i % cats}", f"Package {i}", f"pkg-{i}", {"apt": f"pkg-{i}"})
+            for i in sorted(range(n), key=lambda i: i % cats)]
+
+
+def keys(*sequence):
+    it = iter(sequence)
+    return lambda: next(it)
+
+
+def test_first_frame_is_a_full_draw_and_repeats_rewrite_only_the_prompt():
+    out = io.StringIO()
+    renderer = FrameRenderer(out=out, rows=40)
+    frame = ["title", "", "row a", "row b", "", "> "]
+    renderer.draw(frame)
+    assert out.getvalue().startswith("\033[2J\033[H")
+    out.seek(0)
+    out.truncate()
+    renderer.draw(frame)
+    assert out.getvalue() == "\033[6;1H> \033[K"
+
+
+def test_changed_rows_are_addressed_and_a_shorter_frame_clears_the_rest():
+    out = io.StringIO()
+    renderer = FrameRenderer(out=out, rows=40)
+    renderer.draw(["a", "b", "c", "d", "> "])
+    out.seek(0)
+    out.truncate()
+    renderer.draw(["a", "B", "> "])
+    assert out.getvalue() == "\033[2;1HB\033[K\033[4;1H\033[J\033[3;1H> \033[K"
+
+
+def test_full_redraw_after_invalidate_or_when_the_frame_does_not_fit():
+    out = io.StringIO()
+    renderer = FrameRenderer(out=out, rows=5)
+    renderer.draw(["a", "> "])
+    renderer.invalidate()
+    renderer.draw(["a", "> "])
+    assert out.getvalue().count("\033[2J") == 2
+    renderer.draw(["a", "b", "c", "d", "e", "> "])  # taller than the terminal
+    assert out.getvalue().count("\033[2J") == 3
+
+
+def test_screen_matches_every_frame_through_a_session():
+    items = make_items()
+    renderer = CheckedRenderer(rows=30)
+    result = run_selector(items, "Ubuntu", renderer=renderer, rows=30, read_key=keys(
+        "j", "j", " ", "n", " ", "p", "3", "-", "7", "enter", "d", "a", "r",
+        "/", "1", "5", "enter", "k", " ", "esc", "G", " ", "1", "esc", "c"))
+    # Only the first frame needs a full redraw
+    assert renderer.full == 1
+    assert renderer.frames > 20
+    # "r" undid the early toggles; the filtered toggle acted on "pkg-15"
+    assert sorted(result["deselected"]) == sorted(["pkg-15", items[-1].id])
+
+
+def test_toggle_redraws_one_row_plus_status_and_prompt():
+    items = make_items()
+    renderer = CheckedRenderer(rows=30)
+    sizes = []
+
+    def read_key(script=iter(["j", " ", "q"])):
+        sizes.append(renderer.last_bytes)
+        return next(script)
+
+    run_selector(items, "Ubuntu", renderer=renderer, rows=30, read_key=read_key)
+    full_frame = sizes[0]
+    # Moving the cursor touches the two marker rows, a toggle its row and
+    # the status line; both stay a small fraction of a full frame
+    assert sizes[1] < full_frame / 5
+    assert renderer.last_bytes < full_frame / 5
+
+
+def test_pages_fit_the_terminal_height():
+    items = make_items(200, cats=7)
+    view = list(range(len(items)))
+    rows = 30 - FRAME_CHROME
+    starts = page_starts(items, view, rows)
+    for n, start in enumerate(starts):
+        end = starts[n + 1] if n + 1 < len(starts) else len(view)
+        lines = package_selector._build_frame(items, view, starts, n, "Ubuntu", len(items), 0)
+        assert len(lines) < 30
+        assert end > start
+
+
+def search_items():
+    return [
+        Item("Editors", "Visual Studio Code", "vscode", {"apt": "code"}),
+        Item("Editors", "Docker for VS Code", "vscode-docker",
+             {"extension_id": "ms-azuretools.vscode-docker"}),
+        Item("Tools", "Git", "git", {"apt": "git", "dnf": "git"}),
+        Item("Tools", "ab", "cd", {}),
+        Item("Fonts", "Fira Code", "font-fira-code", {"linux_dest": "~/.local/share/fonts"}),
+    ]
+
+
+@pytest.fixture
+def descriptions(tmp_path, monkeypatch):
+    path = tmp_path / "descriptions.json"
+    path.write_text(json.dumps({"git": "Distributed version control system",
+                                "cd": "Changes the working directory"}))
+    monkeypatch.setattr(package_selector, "DESCRIPTIONS", Descriptions(str(path)))
+
+
+def ids(items, hits):
+    return [items[i].id for i in hits]
+
+
+@pytest.mark.parametrize("query, expected", [
+    ("", ["vscode", "vscode-docker", "git", "cd", "font-fira-code"]),
+    ("vsdk", ["vscode-docker"]),                 # in order within one field
+    ("VS Code", ["vscode", "vscode-docker"]),    # case and spaces ignored for names
+    ("bc", []),                                  # never across fields ("ab" / "cd")
+    ("version control", ["git"]),                # descriptions match as a substring
+    ("vrsn", []),                                # ... but not fuzzily
+    ("working dir", ["cd"]),
+    ("fonts", ["font-fira-code"]),               # platform details are searched
+    ("zzq", []),
+])
+def test_search_matches(descriptions, query, expected):
+    items = search_items()
+    assert ids(items, package_selector.SearchIndex(items).search(query)) == expected
+
+
+def test_incremental_search_matches_a_fresh_index(descriptions):
+    items = make_items(40) + search_items()
+    index = package_selector.SearchIndex(items)
+    typed = ["v", "vs", "vsc", "vsco", "vsc", "vs", "vs ", "vs d", "vs do", "g", "gi", "git",
+             "gix", "", "p", "pk", "pkg-1", "pkg-1 ", "pkg-12", "pkg-2"]
+    for query in typed:
+        hits = index.search(query)
+        assert hits == sorted(hits)
+        assert hits == package_selector.SearchIndex(items).search(query), query
+
+
+# ---------------------------------------------------------------------------
+# Keystrokes through a real pty
+# ---------------------------------------------------------------------------
+
+def set_size(fd, rows, cols=100):
+    fcntl.ioctl(fd, termios.TIOCSWINSZ, struct.pack("HHHH", rows, cols, 0, 0))
+
+
+@pytest.fixture
+def tty():
+    """``(master, slave)`` of a fresh pty; keys written to master reach the Terminal."""
+    master, slave = pty.openpty()
+    set_size(slave, 30)
+    yield master, slave
+    os.close(master)
+    os.close(slave)
+
+
+@pytest.mark.parametrize("data, expected", [
+    (b"jk /", ["j", "k", " ", "/"]),
+    (b"\x1b[A\x1b[B\x1bOC\x1b[D", ["up", "down", "right", "left"]),
+    (b"\x1b[5~\x1b[6~\x1b[H\x1b[4~\x1b[3~", ["pgup", "pgdn", "home", "end", "delete"]),
+    (b"\r\x7f\x08\t\x01\x04", ["enter", "backspace", "backspace", "tab", "ctrl-a", "ctrl-d"]),
+    (b"\xc3\xa9\xe2\x86\x92", ["é", "→"]),
+    (b"\x1bx\x1b[99~q", ["esc", "x", "unknown", "q"]),
+])
+def test_terminal_decodes_keys(tty, data, expected):
+    master, slave = tty
+    with Terminal(slave) as term:
+        os.write(master, data)
+        assert [term.read_key() for _ in expected] == expected
+
+
+def test_terminal_reassembles_split_sequences_and_times_out_a_lone_esc(tty):
+    master, slave = tty
+    with Terminal(slave, esc_timeout=0.5) as term:
+        for parts, key in (([b"\x1b", b"[", b"B"], "down"), ([b"\x1b[6", b"~"], "pgdn"),
+                           ([b"\xe2\x86", b"\x92"], "→")):
+            writer = threading.Thread(target=lambda: [
+                (os.write(master, part), time.sleep(0.05)) for part in parts])
+            writer.start()
+            assert term.read_key() == key
+            writer.join()
+    with Terminal(slave, esc_timeout=0.05) as term:
+        os.write(master, b"\x1b")
+        start = time.monotonic()
+        assert term.read_key() == "esc"
+        assert time.monotonic() - start < 0.5
+
+
+def test_terminal_mode_is_set_once_and_restored(tty):
+    master, slave = tty
+    before = termios.tcgetattr(slave)
+    with Terminal(slave):
+        lflag, oflag = termios.tcgetattr(slave)[3], termios.tcgetattr(slave)[1]
+        assert not lflag & (termios.ICANON | termios.ECHO)
+        # cbreak, not raw: Ctrl-C and output processing keep working
+        assert lflag & termios.ISIG and oflag & termios.OPOST
+    assert termios.tcgetattr(slave) == before
+
+
+def test_terminal_reports_resize(tty):
+    master, slave = tty
+    handler = signal.getsignal(signal.SIGWINCH)
+    with Terminal(slave) as term:
+        assert term.rows() == 30
+        set_size(slave, 12)
+        os.kill(os.getpid(), signal.SIGWINCH)
+        assert term.read_key() == "resize"
+        assert term.rows() == 12
+        os.write(master, b"j")
+        assert term.read_key() == "j"
+    assert signal.getsignal(signal.SIGWINCH) == handler
+
+
+SESSION = """
+import json, sys
+sys.path.insert(0, sys.argv[1])
+import package_selector
+from manifest_index import Item
+items = [Item(f"Category {i % 4}", f"Package {i}", f"pkg-{i}") for i in sorted(range(60), key=lambda i: i % 4)]
+result = package_selector.run_selector(items, "Ubuntu")
+with open(sys.argv[2], "w") as fh:
+    json.dump(result, fh)
+"""
+
+
+class Session:
+    """The selector as a child process on its own pty (its controlling tty)."""
+
+    def __init__(self, result_path, rows=40):
+        self.result_path = str(result_path)
+        self.pid, self.master = pty.fork()
+        if self.pid == 0:
+            os.execv(sys.executable, [sys.executable, "-c", SESSION, SCRIPTS_DIR, self.result_path])
+        set_size(self.master, rows)
+        self.output = bytearray()
+        self.reader = threading.Thread(target=self._drain, daemon=True)
+        self.reader.start()
+
+    def _drain(self):
+        while True:
+            try:
+                ready, _, _ = select.select([self.master], [], [], 5)
+                data = os.read(self.master, 65536) if ready else b""
+            except OSError:
+                return
+            if not data:
+                return
+            self.output += data
+
+    def wait_for(self, pattern, timeout=10):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            found = re.findall(pattern, self.output.decode("utf-8", "replace"))
+            if found:
+                return found
+            time.sleep(0.02)
+        raise AssertionError(f"{pattern!r} never appeared:\n{self.output.decode('utf-8', 'replace')[-2000:]}")
+
+    def send(self, *chunks):
+        for chunk in chunks:
+            os.write(self.master, chunk)
+            time.sleep(0.02)
+
+    def finish(self, timeout=10):
+        deadline = time.monotonic() + timeout
+        while True:
+            pid, status = os.waitpid(self.pid, os.WNOHANG)
+            if pid:
+                break
+            if time.monotonic() > deadline:
+                os.kill(self.pid, signal.SIGKILL)
+                os.waitpid(self.pid, 0)
+                raise AssertionError("the selector did not exit")
+            time.sleep(0.02)
+        self.reader.join(5)
+        os.close(self.master)
+        with open(self.result_path) as fh:
+            return os.waitstatus_to_exitcode(status), json.load(fh)
+
+
+def test_session_toggles_with_single_keys(tmp_path):
+    session = Session(tmp_path / "result.json")
+    session.wait_for(r"Page 1/")
+    # Space, Down, Space, a number range, Confirm
+    session.send(b" ", b"\x1b[B", b" ", b"4-5", b"\r", b"c")
+    code, result = session.finish()
+    assert code == 0
+    assert result == {"deselected": ["pkg-0", "pkg-4", "pkg-12", "pkg-16"], "remove_from_blacklist": []}
+
+
+def test_session_search_then_cancel_with_ctrl_c(tmp_path):
+    session = Session(tmp_path / "result.json")
+    session.wait_for(r"Page 1/")
+    session.send(b"/", b"5", b"9")
+    session.wait_for(r'Filter: "59"  \|  1 of 60 shown')
+    session.send(b"\r", b"\x03")
+    assert session.finish() == (0, None)
+
+
+def test_session_repages_on_resize(tmp_path):
+    session = Session(tmp_path / "result.json", rows=40)
+    tall = int(session.wait_for(r"Page 1/(\d+)")[-1])
+    set_size(session.master, 20)
+    os.kill(session.pid, signal.SIGWINCH)
+    short = int(session.wait_for(rf"Page 1/(?!{tall}\b)(\d+)")[-1])
+    assert short > tall
+    session.send(b"q")
+    assert session.finish() == (0, None)
+
+
+# ---------------------------------------------------------------------------
+# Headless plans
+# ---------------------------------------------------------------------------
+
+PLAN_MANIFEST = {"package_manifest": {
+    "cli_tools": [
+        {"name": "git", "apt": "git", "dnf": "git", "brew_formula": "git"},
+        {"name": "ripgrep", "apt": "ripgrep", "dnf": "ripgrep", "brew_formula": "ripgrep"},
+        {"name": "gemini-cli", "brew_formula": "gemini-cli",
+         "linux": {"type": "npm", "package": "@google/gemini-cli"}},
+    ],
+    "gui_apps": [
+        {"name": "handbrake", "brew_cask": "handbrake", "apt": "handbrake"},
+        {"name": "signal-desktop", "linux": {"type": "apt", "package": "signal-desktop"}},
+        {"name": "vscode", "brew_cask": "visual-studio-code",
+         "linux": {"type": "deb", "url": "https://example.invalid/code.deb"}},
+    ],
+    "flatpak_apps": ["com.slack.Slack", "org.gimp.GIMP"],
+    "x86_64_only_flatpak_apps": ["com.slack.Slack"],
+    "vscode_extensions": ["ms-python.python"],
+    "fonts": [{"name": "font-hack", "brew_cask": "font-hack-nerd-font",
+               "linux": {"url": "https://example.invalid/Hack.zip"}}],
+    "apt_only": {"common": ["tree"], "by_distribution": {"ubuntu": ["software-properties-common"]}},
+    "dnf_only": {"common": ["@development-tools"]},
+}}
+
+
+@pytest.fixture(scope="module")
+def compiled():
+    return manifest_resolver.compile_manifest(PLAN_MANIFEST)
+
+
+@pytest.fixture
+def packages_file(tmp_path):
+    path = tmp_path / "packages.yml"
+    path.write_text(json.dumps(PLAN_MANIFEST))  # JSON is valid YAML
+    return str(path)
+
+
+def test_build_plan_backends_are_the_playbook_targets(compiled):
+    plan = package_selector.build_plan(compiled, "ubuntu", "x86_64")
+    targets = manifest_resolver.select_targets(compiled, "ubuntu", (), "x86_64")
+    assert plan["backends"] == {
+        "apt": targets["apt_packages"], "flatpak": targets["flatpak_apps"],
+        "vscode": targets["vscode_extensions"], "npm": ["@google/gemini-cli"],
+        "apt_app": ["signal-desktop"], "deb": ["vscode"], "font": ["font-hack"]}
+    assert plan["backends"]["apt"] == ["git", "ripgrep", "tree", "software-properties-common"]
+    # A GUI app with a bare apt: entry has no install path in site.yml
+    assert plan["unmanaged"] == ["handbrake"]
+    assert "handbrake" in plan["categories"]["GUI Apps"]
+
+    mac = package_selector.build_plan(compiled, "macos", "arm64")
+    assert mac["backends"]["brew_cask"] == ["handbrake", "visual-studio-code", "font-hack-nerd-font"]
+    assert mac["unmanaged"] == []
+
+
+def test_build_plan_exclude_then_include(compiled):
+    plan = package_selector.build_plan(compiled, "fedora", "x86_64", blacklist={"git"},
+                                       include=["com.slack.*", "git"],
+                                       exclude=["category:flatpak apps", "rip*"])
+    assert plan["deselected"] == ["ripgrep", "org.gimp.GIMP"]
+    assert plan["backends"]["dnf"] == ["git", "@development-tools"]
+    assert plan["backends"]["flatpak"] == ["com.slack.Slack"]
+    assert plan["categories"]["Flatpak Apps"] == ["com.slack.Slack"]
+
+    allow = package_selector.build_plan(compiled, "ubuntu", "x86_64", exclude=["*"], include=["tree"])
+    assert allow["categories"] == {"System Packages": ["tree"]}
+    # Distribution extras are not selector items, so they always come along
+    assert allow["backends"] == {"apt": ["tree", "software-properties-common"]}
+
+
+def test_build_plan_blacklist_and_arch(compiled):
+    plan = package_selector.build_plan(compiled, "ubuntu", "aarch64", blacklist={"ms-python.python"})
+    assert plan["backends"]["flatpak"] == ["org.gimp.GIMP"]
+    assert "vscode" not in plan["backends"]
+    assert plan["deselected"] == ["ms-python.python"]
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("ubuntu", ("ubuntu", "x86_64")),
+    ("fedora/aarch64", ("fedora", "aarch64")),
+    ("macos/arm64", ("macos", "arm64")),
+])
+def test_parse_target(text, expected):
+    assert package_selector.parse_target(text, "x86_64") == expected
+
+
+def test_parse_target_rejects_unknown_os():
+    with pytest.raises(ValueError, match="unknown OS in target 'windows/x86_64'"):
+        package_selector.parse_target("windows/x86_64", "x86_64")
+
+
+def _headless(compiled, capsys, blacklist=(), **options):
+    args = dict(include=[], exclude=[], target=[], profile=None, os=None, arch="x86_64")
+    code = package_selector.run_headless(argparse.Namespace(**dict(args, **options)), compiled, blacklist)
+    out, err = capsys.readouterr()
+    return code, (json.loads(out)["plans"] if code == 0 else err)
+
+
+def test_run_headless_one_plan_per_target(compiled, capsys):
+    code, plans = _headless(compiled, capsys, target=["ubuntu", "fedora/aarch64", "macos/arm64"],
+                            exclude=["category:Fonts"])
+    assert code == 0
+    assert [(p["os"], p["arch"]) for p in plans] == [
+        ("ubuntu", "x86_64"), ("fedora", "aarch64"), ("macos", "arm64")]
+    assert all("font-hack" in p["deselected"] for p in plans)
+    assert plans[1]["backends"]["flatpak"] == ["org.gimp.GIMP"]
+
+    code, plans = _headless(compiled, capsys, os="fedora")
+    assert code == 0 and [p["os"] for p in plans] == ["fedora"]
+
+
+@pytest.mark.parametrize("options, message", [
+    ({}, "--headless needs --os or at least one --target"),
+    ({"target": ["ubuntu", "beos"]}, "unknown OS in target 'beos'"),
+])
+def test_run_headless_errors(compiled, capsys, options, message):
+    code, err = _headless(compiled, capsys, **options)
+    assert code == 1 and message in err
+
+
+def test_run_headless_profile(compiled, capsys, tmp_path):
+    profile = tmp_path / "desk.yml"
+    profile.write_text("targets:\n  - macos/arm64\ninclude: [git]\nexclude:\n  - '*'\n")
+    code, plans = _headless(compiled, capsys, profile=str(profile), include=["handbrake"])
+    assert code == 0
+    assert [p["os"] for p in plans] == ["macos"]
+    assert plans[0]["backends"] == {"brew": ["git"], "brew_cask": ["handbrake"]}
+    # Command-line targets replace the profile's
+    code, plans = _headless(compiled, capsys, profile=str(profile), target=["ubuntu"])
+    assert [p["os"] for p in plans] == ["ubuntu"]
+
+    profile.write_text("- not a mapping\n")
+    code, err = _headless(compiled, capsys, profile=str(profile))
+    assert code == 1 and "profile must be a mapping" in err
+
+
+def test_headless_cli_needs_no_tty(packages_file, tmp_path):
+    blacklist = tmp_path / "blacklist.txt"
+    blacklist.write_text("ripgrep\n")
+    cmd = [sys.executable, os.path.join(SCRIPTS_DIR, "package_selector.py"),
+           "--packages-file", packages_file, "--blacklist-file", str(blacklist)]
+    env = dict(os.environ, HOME=str(tmp_path))  # keep the compiled-manifest cache in tmp
+    proc = subprocess.run(cmd + ["--headless", "--target", "ubuntu/x86_64"], stdin=subprocess.DEVNULL,
+                          capture_output=True, text=True, env=env)
+    assert proc.returncode == 0, proc.stderr
+    (plan,) = json.loads(proc.stdout)["plans"]
+    assert plan["deselected"] == ["ripgrep"]
+    assert plan["backends"]["apt"] == ["git", "tree", "software-properties-common"]
+
+    proc = subprocess.run(cmd + ["--os", "ubuntu", "--no-availability-check"], stdin=subprocess.DEVNULL,
+                          capture_output=True, text=True, env=env)
+    assert proc.returncode == 1
+    assert "needs a terminal on stdin (use --headless)" in proc.stderr
@@ -0,0 +1,232 @@
+import base64
+import json
+import os
+import shutil
+import subprocess
+
+import pytest
+
+import repo_setup
+from conftest import fixture_path
+
+KEYS = ("ed25519", "rsa2048")
+HAVE_GPG = shutil.which("gpg") is not None
+
+
+def _key(name, ext):
+    with open(fixture_path("keys", f"{name}.{ext}"), "rb") as fh:
+        return fh.read()
+
+
+def _with_lines(armored, edit):
+    return "\n".join(edit(armored.decode().splitlines())).encode() + b"\n"
+
+
+def _crc_line(lines):
+    return next(n for n, line in enumerate(lines) if line.startswith("="))
+
+
+@pytest.mark.parametrize("name", KEYS)
+def test_dearmor_matches_the_binary_export(name):
+    assert repo_setup.dearmor(_key(name, "asc")) == _key(name, "gpg")
+    # Binary keyrings pass through untouched
+    assert repo_setup.dearmor(_key(name, "gpg")) == _key(name, "gpg")
+
+
+def test_dearmor_concatenates_blocks():
+    both = _key("ed25519", "asc") + b"\n" + _key("rsa2048", "asc")
+    assert repo_setup.dearmor(both) == _key("ed25519", "gpg") + _key("rsa2048", "gpg")
+
+
+def test_dearmor_skips_headers_only_up_to_the_blank_line():
+    armored = _key("ed25519", "asc")
+    headers = _with_lines(armored, lambda lines: lines[:1] + [
+        "Version: GnuPG v2", "Comment: https://example.test/keys/release.asc"] + lines[1:])
+    assert repo_setup.dearmor(headers) == _key("ed25519", "gpg")
+    # Text around the block, CRLF line ends and trailing blanks are fine
+    framed = b"Fingerprint below\r\n" + armored.replace(b"\n", b"  \r\n") + b"-- \r\n"
+    assert repo_setup.dearmor(framed) == _key("ed25519", "gpg")
+    # Without the blank line the first base64 line is no header
+    with pytest.raises(ValueError, match="invalid armor header"):
+        repo_setup.dearmor(_with_lines(armored, lambda lines: lines[:1] + lines[2:]))
+
+
+def test_dearmor_verifies_the_checksum():
+    armored = _key("rsa2048", "asc")
+
+    def corrupt_crc(lines):
+        n = _crc_line(lines)
+        lines[n] = "=" + ("AAAA" if lines[n] != "=AAAA" else "BBBB")
+        return lines
+
+    def corrupt_body(lines):
+        n = _crc_line(lines) - 2
+        lines[n] = lines[n][:10] + ("A" if lines[n][10] != "A" else "B") + lines[n][11:]
+        return lines
+
+    for edit in (corrupt_crc, corrupt_body):
+        with pytest.raises(ValueError, match="checksum mismatch"):
+            repo_setup.dearmor(_with_lines(armored, edit))
+    # The checksum line is optional (RFC 9580)
+    without = _with_lines(armored, lambda lines: lines[:_crc_line(lines)] + lines[_crc_line(lines) + 1:])
+    assert repo_setup.dearmor(without) == _key("rsa2048", "gpg")
+
+
+@pytest.mark.parametrize("data, message", [
+    (b"<html><body>404 Not Found</body></html>\n", "no OpenPGP public key block"),
+    (b"-----BEGIN PGP SIGNATURE-----\n\niQEz\n-----END PGP SIGNATURE-----\n", "no OpenPGP public key block"),
+    (b"-----BEGIN PGP PUBLIC KEY BLOCK-----\n\nmDMEZ\n", "missing -----END"),
+    (b"-----BEGIN PGP PUBLIC KEY BLOCK-----\n\nmDM*\n-----END PGP PUBLIC KEY BLOCK-----\n", "not valid base64"),
+])
+def test_dearmor_rejects_what_is_not_a_key(data, message):
+    with pytest.raises(ValueError, match=message):
+        repo_setup.dearmor(data)
+
+
+def test_crc24_reference_values():
+    assert repo_setup.crc24(b"") == 0xB704CE
+    armored = _key("ed25519", "asc").decode().splitlines()
+    checksum = armored[_crc_line(armored)][1:]
+    assert repo_setup.crc24(_key("ed25519", "gpg")) == int.from_bytes(base64.b64decode(checksum), "big")
+
+
+@pytest.mark.skipif(not HAVE_GPG, reason="gpg is not installed")
+def test_dearmor_matches_gpg_for_a_fresh_key(tmp_path):
+    home = tmp_path / "gnupg"
+    home.mkdir(mode=0o700)
+    env = dict(os.environ, GNUPGHOME=str(home))
+
+    def gpg(*args, data=None):
+        return subprocess.run(["gpg", "--batch", "--quiet", *args], input=data, env=env,
+                              stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, check=True).stdout
+
+    for uid, algo in (("Repo One <one@example.test>", "rsa3072"), ("Repo Two <two@example.test>", "ed25519")):
+        gpg("--passphrase", "", "--quick-gen-key", uid, algo, "sign", "never")
+    armored = gpg("--armor", "--export", "one@example.test") + gpg("--armor", "--export", "two@example.test")
+    assert repo_setup.dearmor(armored) == gpg("--dearmor", data=armored)
+    assert repo_setup.dearmor(armored) == gpg("--export", "one@example.test") + gpg("--export", "two@example.test")
+
+
+REPOS = [{"name": "example", "apt": {
+    "uris": "https://apt.example.test/debian", "suites": "stable", "components": ["main"],
+    "key_url": "https://apt.example.test/key.asc", "keyring": "/etc/apt/keyrings/example.gpg"}}]
+
+
+def _apply(tmp_path, capsys):
+    code = repo_setup.main(["apply", "--family", "apt", "--repos-json", json.dumps(REPOS),
+                            "--root", str(tmp_path / "root"), "--keys-dir", str(tmp_path / "keys")])
+    out, err = capsys.readouterr()
+    return code, json.loads(out) if code == 0 else err
+
+
+def test_apply_installs_the_dearmored_keyring(tmp_path, capsys):
+    (tmp_path / "keys").mkdir()
+    (tmp_path / "keys" / "example.key").write_bytes(_key("rsa2048", "asc"))
+    code, result = _apply(tmp_path, capsys)
+    assert code == 0
+    assert [(c["action"], c["path"]) for c in result["changes"]] == [
+        ("create", "/etc/apt/keyrings/example.gpg"), ("create", "/etc/apt/sources.list.d/example.sources")]
+    assert result["changed"] is True and result["refresh"] is True
+    root = tmp_path / "root"
+    assert (root / "etc/apt/keyrings/example.gpg").read_bytes() == _key("rsa2048", "gpg")
+    assert "Signed-By: /etc/apt/keyrings/example.gpg" in (root / "etc/apt/sources.list.d/example.sources").read_text()
+
+    code, result = _apply(tmp_path, capsys)
+    assert (code, result["changes"], result["changed"]) == (0, [], False)
+
+
+def test_apply_refuses_a_corrupt_key(tmp_path, capsys):
+    (tmp_path / "keys").mkdir()
+    armored = _key("rsa2048", "asc").decode().splitlines()
+    armored[_crc_line(armored)] = "=AAAA"
+    (tmp_path / "keys" / "example.key").write_text("\n".join(armored) + "\n")
+    code, err = _apply(tmp_path, capsys)
+    assert code == 1 and err.startswith("Error: line")
+    assert not (tmp_path / "root").exists()
+
+
+GATED = [
+    {"name": "always", "apt": {"uris": "https://a.test", "suites": "stable"}},
+    {"name": "signal", "app": "signal-desktop", "apt": {"uris": "https://s.test", "suites": "xenial"}},
+    {"name": "nvidia", "flag": "install_nvidia", "dnf": {"baseurl": "https://n.test/$basearch"}},
+    {"name": "neovim-ppa", "apt": {"ppa": "neovim-ppa/unstable", "distributions": ["ubuntu", "pop_os"]}},
+]
+
+
+def _names(selected):
+    return [name for name, _ in selected]
+
+
+def test_select_repositories_gates_on_family_app_flag_and_distribution():
+    assert _names(repo_setup.select_repositories(GATED, "apt", "debian")) == ["always"]
+    assert _names(repo_setup.select_repositories(GATED, "apt", "pop_os", apps=["signal-desktop"])) == [
+        "always", "signal", "neovim-ppa"]
+    assert _names(repo_setup.select_repositories(GATED, "dnf", "fedora")) == []
+    assert _names(repo_setup.select_repositories(GATED, "dnf", "fedora", flags=["install_nvidia"])) == ["nvidia"]
+
+
+def _installed(tmp_path, repos=REPOS):
+    """Root with every file of *repos* in place; returns ``(root, selected, keys_dir)``."""
+    root, keys = tmp_path / "root", tmp_path / "keys"
+    keys.mkdir()
+    for repo in repos:
+        (keys / f"{repo['name']}.key").write_bytes(_key("ed25519", "asc"))
+    selected = repo_setup.select_repositories(repos, "apt", "ubuntu")
+    files = repo_setup.desired_files(selected, "apt", str(keys), str(root))
+    repo_setup.apply_changes(repo_setup.diff(selected, "apt", files, str(root)), files, str(root))
+    return root, selected, str(keys)
+
+
+def _plan(selected, keys, root):
+    files = repo_setup.desired_files(selected, "apt", keys, str(root), strict=False)
+    changes = repo_setup.diff(selected, "apt", files, str(root))
+    return [(c["action"], c["path"]) for c in changes], repo_setup.needs_refresh(changes)
+
+
+def test_unchanged_tree_needs_no_refresh(tmp_path):
+    root, selected, keys = _installed(tmp_path)
+    assert _plan(selected, keys, root) == ([], False)
+    assert repo_setup.missing_keys(selected, str(root)) == []
+
+
+def test_changed_sources_file_is_updated(tmp_path):
+    root, selected, keys = _installed(tmp_path)
+    sources = root / "etc/apt/sources.list.d/example.sources"
+    sources.write_text(sources.read_text().replace("stable", "oldstable"))
+    assert _plan(selected, keys, root) == ([("update", "/etc/apt/sources.list.d/example.sources")], True)
+
+
+def test_missing_keyring_is_recreated(tmp_path):
+    root, selected, keys = _installed(tmp_path)
+    (root / "etc/apt/keyrings/example.gpg").unlink()
+    assert repo_setup.missing_keys(selected, str(root)) == [
+        {"repo": "example", "url": "https://apt.example.test/key.asc"}]
+    assert _plan(selected, keys, root) == ([("create", "/etc/apt/keyrings/example.gpg")], True)
+    # Planned before the key is fetched, the keyring is still listed
+    empty = tmp_path / "no-keys"
+    empty.mkdir()
+    assert _plan(selected, str(empty), root) == ([("create", "/etc/apt/keyrings/example.gpg")], True)
+    with pytest.raises(FileNotFoundError, match="signing key not found"):
+        repo_setup.desired_files(selected, "apt", str(empty), str(root))
+
+
+def test_replaced_files_are_removed(tmp_path):
+    repos = [dict(REPOS[0], apt=dict(REPOS[0]["apt"], replaces=["example.list"]))]
+    root, selected, keys = _installed(tmp_path, repos)
+    (root / "etc/apt/sources.list.d/example.list").write_text("deb https://apt.example.test/debian stable main\n")
+    assert _plan(selected, keys, root) == ([("remove", "/etc/apt/sources.list.d/example.list")], True)
+
+
+@pytest.mark.parametrize("host", repo_setup.PPA_HOSTS)
+def test_existing_ppa_is_detected(tmp_path, host):
+    selected = repo_setup.select_repositories(GATED, "apt", "ubuntu")[1:]
+    root = tmp_path / "root"
+    assert _plan(selected, str(tmp_path), root) == ([("add-ppa", "ppa:neovim-ppa/unstable")], True)
+
+    sources = root / "etc/apt/sources.list.d"
+    sources.mkdir(parents=True)
+    (sources / "neovim-ppa-ubuntu-unstable-noble.sources").write_text(
+        f"Types: deb\nURIs: https://{host}/neovim-ppa/unstable/ubuntu/\nSuites: noble\n")
+    assert repo_setup.ppa_present("neovim-ppa/unstable", str(root))
+    assert not repo_setup.ppa_present("neovim-ppa/stable", str(root))
+    assert _plan(selected, str(tmp_path), root) == ([], False)
@@ -0,0 +1,227 @@
+import json
+import os
+import textwrap
+
+import pytest
+
+import role_graph
+import timing_report
+from conftest import write_stub
+
+# Stand-in for ansible-playbook: runs the one role named in
+# compsetup_roles for the seconds in durations.json, logging start and
+# end and recording a one-task timing run like compsetup_timing; roles
+# listed in failing.txt exit 2.
+PLAYBOOK_STUB = textwrap.dedent("""
+    import json, os, sys, time
+    here = os.path.dirname(os.path.abspath(__file__))
+    extra = json.loads(sys.argv[sys.argv.index("--extra-vars") + 1])
+    role = extra["compsetup_roles"][0]
+    with open(os.path.join(here, "durations.json")) as fh:
+        seconds = json.load(fh).get(role, 0.1)
+    with open(os.path.join(here, "failing.txt")) as fh:
+        failing = fh.read().split()
+    started = time.time()
+    with open(os.path.join(here, "events.log"), "a") as fh:
+        fh.write(json.dumps([role, "start", started, extra, sys.argv[4:]]) + "\\n")
+    time.sleep(seconds)
+    finished = time.time()
+    with open(os.path.join(here, "events.log"), "a") as fh:
+        fh.write(json.dumps([role, "end", finished]) + "\\n")
+    timing = os.environ["COMPSETUP_TIMING_DIR"]
+    os.makedirs(timing, exist_ok=True)
+    with open(os.path.join(timing, "latest.json"), "w") as fh:
+        json.dump({"version": 1, "playbook": "site.yml", "started": started, "finished": finished,
+                   "events": [{"type": "task_start", "ts": started, "uuid": "t1", "role": role,
+                               "task": f"Run {role}"},
+                              {"type": "task_end", "ts": finished, "uuid": "t1", "host": "localhost",
+                               "status": "failed" if role in failing else "ok"}]}, fh)
+    sys.exit(2 if role in failing else 0)
+""")
+
+
+def _graph(specs, system="Debian"):
+    return role_graph.build_graph(specs, system)
+
+
+@pytest.mark.parametrize("system", ["Darwin", "Debian", "RedHat"])
+def test_repository_graph_is_valid(system):
+    roles = role_graph.site_roles()
+    graph = _graph(role_graph.load_specs(roles), system)
+    assert graph["errors"] == []
+    assert set(graph["roles"]) <= set(roles)
+    # Package managers of one system never run alongside each other
+    package_roles = [r for r in graph["roles"] if "package_manager" in graph["locks"][r]]
+    assert {"aptPackages", "rpmPackages", "brewPackages"} & set(package_roles)
+
+
+@pytest.mark.parametrize("system, package_role", [
+    ("Debian", "aptPackages"), ("RedHat", "rpmPackages"), ("Darwin", None)])
+def test_shell_and_editor_roles_wait_for_linux_packages(system, package_role):
+    graph = _graph(role_graph.load_specs(role_graph.site_roles()), system)
+    # nvchad installs neovim from the package role's repo and clones with
+    # its git; the oh-my-zsh installer needs its curl and git
+    for role in ("nvchad", "ohmyzsh"):
+        assert graph["deps"][role] == ([package_role] if package_role else [])
+    assert role_graph.levels(graph)[0].count("nvchad") == (0 if package_role else 1)
+
+
+def test_site_roles_follow_site_yml_order():
+    roles = role_graph.site_roles()
+    assert roles[:3] == ["brewPackages", "aptPackages", "rpmPackages"]
+    assert len(roles) == len(set(roles))
+
+
+def test_systems_and_per_system_locks():
+    specs = {
+        "brew": {"systems": ["Darwin"], "provides": ["packages"], "locks": ["package_manager"]},
+        "apt": {"systems": ["Debian"], "provides": ["packages"], "locks": ["package_manager"]},
+        "desktop": {"systems": ["Linux"], "needs": ["packages"]},
+        "shell": {"locks": {"Darwin": ["package_manager"], "Linux": ["home"]}},
+        "editor": {"needs": {"Linux": ["packages"]}},
+    }
+    debian = _graph(specs, "Debian")
+    assert debian["roles"] == ["apt", "desktop", "shell", "editor"]
+    assert debian["deps"]["desktop"] == ["apt"]
+    assert debian["deps"]["editor"] == ["apt"]
+    assert debian["locks"]["shell"] == ["home"]
+    darwin = _graph(specs, "Darwin")
+    assert darwin["roles"] == ["brew", "shell", "editor"]
+    assert darwin["deps"]["editor"] == []
+    assert darwin["locks"]["shell"] == ["package_manager"]
+
+
+def test_specification_errors():
+    specs = {
+        "a": {"needs": ["missing"], "lock": ["typo"]},
+        "b": None,
+        "c": {"provides": ["self"], "needs": ["self"]},
+    }
+    assert _graph(specs)["errors"] == [
+        "a: unknown key(s) lock",
+        "b: missing roles/b/meta/schedule.yml",
+        "a: nothing on Debian provides 'missing'",
+        # A role never waits for itself
+        "c: nothing on Debian provides 'self'",
+    ]
+
+
+@pytest.mark.parametrize("specs,cycle", [
+    ({"a": {"provides": ["a"], "needs": ["b"]}, "b": {"provides": ["b"], "needs": ["a"]}},
+     ["a", "b", "a"]),
+    ({"x": {"provides": ["x"]},
+      "a": {"provides": ["a"], "needs": ["x", "c"]},
+      "b": {"provides": ["b"], "needs": ["a"]},
+      "c": {"provides": ["c"], "needs": ["b"]}},
+     ["a", "c", "b", "a"]),
+])
+def test_cycles_are_reported(specs, cycle):
+    graph = _graph(specs)
+    assert role_graph.find_cycle(graph) == cycle
+    assert graph["errors"] == ["dependency cycle: " + " -> ".join(cycle)]
+
+
+def test_levels_and_critical_path():
+    specs = {
+        "pkgs": {"provides": ["packages"], "locks": ["pm"]},
+        "zsh": {"provides": ["zsh"]},
+        "prompt": {"needs": ["zsh"]},
+        "ext": {"needs": ["packages"]},
+        "extra": {"needs": ["packages"], "locks": ["pm"]},
+    }
+    graph = _graph(specs)
+    assert role_graph.levels(graph) == [["pkgs", "zsh"], ["prompt", "ext", "extra"]]
+    durations = {"pkgs": 10, "zsh": 3, "prompt": 2, "ext": 1, "extra": 4}
+    assert role_graph.critical_path(graph, durations) == (14, ["pkgs", "extra"])
+    assert role_graph.simulate(graph, durations, jobs=4) == 14
+    # One slot: everything in sequence
+    assert role_graph.simulate(graph, durations, jobs=1) == sum(durations.values())
+
+
+def test_startable_honours_locks_jobs_and_priority():
+    specs = {"a": {"locks": ["pm"]}, "b": {"locks": ["pm"]}, "c": {}, "d": {}}
+    graph = _graph(specs)
+    priority = {"a": 1, "b": 5, "c": 2, "d": 3}
+    assert role_graph.startable(graph, ["a", "b", "c", "d"], set(), {}, 4, priority) == ["b", "d", "c"]
+    assert role_graph.startable(graph, ["a", "b", "c", "d"], set(), {}, 2, priority) == ["b", "d"]
+    assert role_graph.startable(graph, ["a", "c"], set(), {"b": None}, 4, priority) == ["c"]
+
+
+@pytest.fixture
+def playbook(tmp_path, monkeypatch):
+    write_stub(tmp_path, "ansible-playbook", PLAYBOOK_STUB)
+    monkeypatch.setenv("PATH", f"{tmp_path}{os.pathsep}{os.environ['PATH']}")
+    monkeypatch.setenv("COMPSETUP_TIMING_DIR", str(tmp_path / "timing"))
+    (tmp_path / "failing.txt").write_text("")
+    return tmp_path
+
+
+def test_locked_roles_never_overlap(tmp_path, playbook):
+    (tmp_path / "durations.json").write_text(json.dumps({"pkgs": 0.4, "snap": 0.3, "zsh": 0.2}))
+    graph = _graph({
+        "pkgs": {"provides": ["packages"], "locks": ["pm"]},
+        "snap": {"locks": ["pm"]},
+        "zsh": {"provides": ["zsh"]},
+        "prompt": {"needs": ["zsh"]},
+        "ext": {"needs": ["packages"]},
+    })
+    summary = role_graph.run(graph, 4, ["--check"], graph_dir=str(tmp_path / "graph"),
+                             lock_timeout=42, poll=0.02)
+    assert {r["status"] for r in summary["results"].values()} == {"ok"}
+
+    spans, calls = {}, {}
+    for line in (tmp_path / "events.log").read_text().splitlines():
+        event = json.loads(line)
+        spans.setdefault(event[0], []).append(event[2])
+        if event[1] == "start":
+            calls[event[0]] = event[3:]
+    assert calls["ext"] == [{"compsetup_roles": ["ext"], "compsetup_lock_timeout": 42}, ["--check"]]
+    (p0, p1), (s0, s1) = spans["pkgs"], spans["snap"]
+    assert p1 <= s0 or s1 <= p0
+    assert spans["ext"][0] >= spans["pkgs"][1]
+    assert spans["prompt"][0] >= spans["zsh"][1]
+    # zsh holds no lock, so it ran alongside the package manager
+    assert spans["zsh"][0] < p1 and p0 < spans["zsh"][1]
+
+    with open(tmp_path / "graph" / "latest.json") as fh:
+        assert json.load(fh)["critical_path"] == summary["critical_path"]
+    assert role_graph.load_durations(str(tmp_path / "graph")) == summary["roles"]
+
+
+def test_failed_role_blocks_its_dependents(tmp_path, playbook):
+    (tmp_path / "durations.json").write_text("{}")
+    (tmp_path / "failing.txt").write_text("pkgs\n")
+    graph = _graph({"pkgs": {"provides": ["packages"]}, "ext": {"needs": ["packages"]}, "zsh": {}})
+    summary = role_graph.run(graph, 2, [], graph_dir=str(tmp_path / "graph"), poll=0.02)
+    status = {role: r["status"] for role, r in summary["results"].items()}
+    assert status == {"pkgs": "failed", "zsh": "ok", "ext": "blocked"}
+    assert "ext" not in (tmp_path / "events.log").read_text()
+
+
+def test_run_merges_the_role_timings_into_the_latest_timing_run(tmp_path, playbook):
+    # A sequential run left an older latest.json behind
+    (tmp_path / "timing").mkdir()
+    (tmp_path / "timing" / "latest.json").write_text(json.dumps(
+        {"started": 0.0, "finished": 1.0, "events": [{"type": "task_start", "ts": 0.0, "uuid": "x",
+                                                      "role": "stale", "task": "Old"}]}))
+    (tmp_path / "durations.json").write_text(json.dumps({"pkgs": 0.3, "zsh": 0.2}))
+    graph = _graph({"pkgs": {"locks": ["pm"]}, "zsh": {}})
+    summary = role_graph.run(graph, 2, [], graph_dir=str(tmp_path / "graph"), poll=0.02)
+
+    latest = timing_report.load_run(str(tmp_path / "timing" / "latest.json"))
+    runs = timing_report.recent_runs(str(tmp_path / "timing"), 5)
+    assert len(runs) == 1 and timing_report.load_run(runs[0]) == latest
+    report = timing_report.aggregate(latest)
+    roles = {r["role"]: r["seconds"] for r in report["roles"]}
+    assert sorted(roles) == ["pkgs", "zsh"]
+    assert roles["pkgs"] >= 0.3 and roles["zsh"] >= 0.2
+    # Both roles ran at once, so the run took less than their sum
+    assert report["total_s"] < roles["pkgs"] + roles["zsh"]
+    assert set(role_graph.load_durations(str(tmp_path / "graph"))) == set(summary["roles"])
+
+
+def test_run_without_timing_data_leaves_the_timing_directory_alone(tmp_path, monkeypatch):
+    monkeypatch.setenv("COMPSETUP_TIMING_DIR", str(tmp_path / "timing"))
+    (tmp_path / "graph" / "pkgs").mkdir(parents=True)
+    assert role_graph.save_timing(str(tmp_path / "graph"), {"pkgs": {"status": "ok"}}) is None
+    assert not (tmp_path / "timing").exists()
@@ -0,0 +1,254 @@
+import json
+import os
+import subprocess
+import sys
+import textwrap
+import time
+
+import pytest
+
+import role_state
+from conftest import REPO_ROOT, SCRIPTS_DIR, write_stub
+
+NOW = 1_700_000_000.0
+
+# Prints "<pkg>:amd64\tii " for packages listed in installed.txt
+DPKG_QUERY_STUB = textwrap.dedent("""
+    import json, os, sys
+    here = os.path.dirname(os.path.abspath(__file__))
+    with open(os.path.join(here, "calls.log"), "a") as fh:
+        fh.write(json.dumps(sys.argv[1:]) + "\\n")
+    with open(os.path.join(here, "installed.txt")) as fh:
+        installed = fh.read().split()
+    for name in sys.argv[4:]:
+        name = name.split(":", 1)[0]
+        if name in installed:
+            print(f"{name}:amd64\\tii ")
+""")
+
+
+@pytest.fixture
+def home(tmp_path, monkeypatch):
+    home = tmp_path / "home"
+    home.mkdir()
+    monkeypatch.setenv("HOME", str(home))
+    return home
+
+
+def _state(**roles):
+    return {"version": role_state.STATE_VERSION, "roles": roles}
+
+
+def _rec(fingerprint="f1", recorded=NOW, verify=None):
+    return {"fingerprint": fingerprint, "recorded": recorded, "verify": verify or {}}
+
+
+# ---------------------------------------------------------------------------
+# check
+# ---------------------------------------------------------------------------
+
+def test_check_skips_unchanged_and_verified_roles(home):
+    (home / ".zshrc").write_text("")
+    state = _state(ohmyzsh=_rec(verify={"paths": ["~/.zshrc"]}))
+    assert role_state.check(state, {"ohmyzsh": "f1"}, now=NOW + 60) == {
+        "ohmyzsh": {"skip": True, "reason": "unchanged and verified"}}
+
+
+@pytest.mark.parametrize("prints, kwargs, reason", [
+    ({"ohmyzsh": "f2"}, {}, "inputs changed"),
+    ({"nvchad": "f1"}, {}, "no previous run"),
+    ({"ohmyzsh": "f1"}, {"now": NOW + 8 * 24 * 3600}, "last full run over 168h ago"),
+    ({"ohmyzsh": "f1"}, {"verify_full": True}, "--verify-full"),
+])
+def test_check_runs_roles_in_full(home, prints, kwargs, reason):
+    state = _state(ohmyzsh=_rec())
+    result = role_state.check(state, prints, **dict({"now": NOW}, **kwargs))
+    assert result == {next(iter(prints)): {"skip": False, "reason": reason}}
+
+
+def test_check_max_age_zero_never_expires(home):
+    state = _state(ohmyzsh=_rec())
+    result = role_state.check(state, {"ohmyzsh": "f1"}, max_age_hours=0, now=NOW + 365 * 24 * 3600)
+    assert result["ohmyzsh"]["skip"] is True
+
+
+def test_check_runs_a_role_whose_verification_fails(home):
+    state = _state(ohmyzsh=_rec(verify={"paths": ["~/.oh-my-zsh"]}))
+    assert role_state.check(state, {"ohmyzsh": "f1"}, now=NOW)["ohmyzsh"] == {
+        "skip": False, "reason": "missing ~/.oh-my-zsh"}
+
+
+def test_check_only_skips_unselected_roles(home):
+    state = _state(ohmyzsh=_rec(), nvchad=_rec())
+    result = role_state.check(state, {"ohmyzsh": "f1", "nvchad": "f2"}, now=NOW, only=["nvchad"])
+    assert result == {"ohmyzsh": {"skip": True, "reason": "not selected"},
+                      "nvchad": {"skip": False, "reason": "inputs changed"}}
+    # --only wins over --verify-full for the roles it leaves out
+    result = role_state.check(state, {"ohmyzsh": "f1"}, verify_full=True, now=NOW, only=["nvchad"])
+    assert result["ohmyzsh"]["skip"] is True
+
+
+def test_check_cli_reads_the_state_file(home, tmp_path, capsys):
+    state_file = tmp_path / "roles.json"
+    role_state.save_state(str(state_file), _state(ohmyzsh=_rec(recorded=time.time())))
+    assert role_state.main(["check", "--state-file", str(state_file),
+                            "--fingerprints-json", '{"ohmyzsh": "f1", "nvchad": "f1"}',
+                            "--only", "ohmyzsh"]) == 0
+    assert json.loads(capsys.readouterr().out) == {
+        "ohmyzsh": {"skip": True, "reason": "unchanged and verified"},
+        "nvchad": {"skip": True, "reason": "not selected"}}
+
+
+def test_load_state_discards_other_versions(tmp_path):
+    path = tmp_path / "roles.json"
+    path.write_text(json.dumps({"version": 0, "roles": {"ohmyzsh": _rec()}}))
+    assert role_state.load_state(str(path)) == _state()
+    path.write_text("{not json")
+    assert role_state.load_state(str(path)) == _state()
+
+
+# ---------------------------------------------------------------------------
+# record
+# ---------------------------------------------------------------------------
+
+def _record_cmd(state_file, role):
+    return [sys.executable, os.path.join(SCRIPTS_DIR, "role_state.py"), "record",
+            "--state-file", state_file, "--fingerprints-json", json.dumps({role: f"fp-{role}"}),
+            "--verify-json", json.dumps({role: {"paths": [f"~/{role}"]}})]
+
+
+def test_record_waits_for_the_lock_and_keeps_other_roles(tmp_path):
+    state_file = str(tmp_path / "state" / "roles.json")
+    roles = [f"role{i}" for i in range(6)]
+    with role_state.locked(state_file):
+        procs = [subprocess.Popen(_record_cmd(state_file, role), stdout=subprocess.PIPE)
+                 for role in roles]
+        time.sleep(0.5)
+        assert all(proc.poll() is None for proc in procs)
+        # Another process records while the lock is held; nothing may drop it
+        state = role_state.load_state(state_file)
+        role_state.record(state, {"early": "fp-early"}, {})
+        role_state.save_state(state_file, state)
+    for proc in procs:
+        assert proc.wait(timeout=30) == 0
+
+    recorded = role_state.load_state(state_file)["roles"]
+    assert sorted(recorded) == sorted(roles + ["early"])
+    assert recorded["role3"]["fingerprint"] == "fp-role3"
+    assert recorded["role3"]["verify"] == {"paths": ["~/role3"]}
+
+
+def test_record_and_clear_cli(tmp_path, capsys):
+    state_file = str(tmp_path / "roles.json")
+    assert role_state.main(["record", "--state-file", state_file,
+                            "--fingerprints-json", '{"b": "2", "a": "1"}']) == 0
+    assert json.loads(capsys.readouterr().out) == {"recorded": ["a", "b"]}
+    assert role_state.load_state(state_file)["roles"]["a"]["verify"] == {}
+
+    assert role_state.main(["clear", "a", "--state-file", state_file]) == 0
+    assert json.loads(capsys.readouterr().out) == {"cleared": ["a"]}
+    assert sorted(role_state.load_state(state_file)["roles"]) == ["b"]
+
+
+# ---------------------------------------------------------------------------
+# verify
+# ---------------------------------------------------------------------------
+
+def test_verify_paths_and_globs(home):
+    (home / ".oh-my-zsh").mkdir()
+    (home / ".fonts").mkdir()
+    (home / ".fonts" / "0xProtoNerdFont-Regular.ttf").write_text("")
+    assert role_state.verify({"paths": ["~/.oh-my-zsh"], "globs": ["~/.fonts/0xProto*"]}) is None
+    assert role_state.verify({"globs": ["~/.fonts/Hack*"]}) == "nothing matches ~/.fonts/Hack*"
+
+
+def test_verify_vscode_extensions_with_and_without_pins(home):
+    extensions = home / ".vscode" / "extensions"
+    extensions.mkdir(parents=True)
+    (extensions / "ms-python.python-2024.2.1").mkdir()
+    (extensions / "esbenp.prettier-vscode-10.1.0").mkdir()
+    spec = {"vscode": ["ms-python.python@2024.2.1", "esbenp.prettier-vscode", "MS-Python.Python"]}
+    assert role_state.verify(spec) is None
+    assert role_state.verify({"vscode": ["golang.go@0.41.0"]}) == "vscode extension golang.go@0.41.0 not installed"
+
+
+def test_verify_brew_checks_either_prefix(home, tmp_path, monkeypatch):
+    prefixes = [tmp_path / "opt-homebrew", tmp_path / "usr-local"]
+    monkeypatch.setattr(role_state, "BREW_PREFIXES", tuple(str(p) for p in prefixes))
+    (prefixes[1] / "Cellar" / "neovim").mkdir(parents=True)
+    (prefixes[0] / "Caskroom" / "font-hack-nerd-font").mkdir(parents=True)
+    assert role_state.verify({"brew_formulae": ["neovim"],
+                              "brew_casks": ["homebrew/cask-fonts/font-hack-nerd-font"]}) is None
+    assert role_state.verify({"brew_formulae": ["gh"]}) == "formula gh not installed"
+
+
+def test_verify_dpkg_uses_one_query(home, tmp_path, monkeypatch):
+    bin_dir = tmp_path / "bin"
+    bin_dir.mkdir()
+    write_stub(bin_dir, "dpkg-query", DPKG_QUERY_STUB)
+    (bin_dir / "installed.txt").write_text("git zsh\n")
+    monkeypatch.setenv("PATH", f"{bin_dir}{os.pathsep}{os.environ['PATH']}")
+    assert role_state.verify({"dpkg": ["git", "zsh:amd64"]}) is None
+    assert role_state.verify({"dpkg": ["git", "htop", "tmux"]}) == \
+        "2 apt package(s) not installed, e.g. htop"
+    assert len((bin_dir / "calls.log").read_text().splitlines()) == 2
+
+
+# ---------------------------------------------------------------------------
+# Fingerprints
+# ---------------------------------------------------------------------------
+
+@pytest.fixture
+def repo(tmp_path):
+    repo = tmp_path / "repo"
+    (repo / "roles" / "editor" / "tasks").mkdir(parents=True)
+    (repo / "roles" / "editor" / "meta").mkdir()
+    (repo / "roles" / "shell" / "tasks").mkdir(parents=True)
+    (repo / "scripts").mkdir()
+    (repo / "site.yml").write_text("- hosts: all\n")
+    (repo / "roles" / "editor" / "tasks" / "main.yml").write_text(
+        "- ansible.builtin.script: >-\n    {{ playbook_dir }}/scripts/bundle.py build\n")
+    (repo / "roles" / "editor" / "meta" / "schedule.yml").write_text(
+        "# Scheduling hints for scripts/graph.py\nneeds: []\n")
+    (repo / "roles" / "shell" / "tasks" / "main.yml").write_text("- debug: msg=hi\n")
+    (repo / "scripts" / "bundle.py").write_text("import os\nfrom helpers import pack\n")
+    (repo / "scripts" / "helpers.py").write_text("def pack():\n    pass\n")
+    (repo / "scripts" / "graph.py").write_text("print('graph')\n")
+    return repo
+
+
+def test_role_scripts_follow_calls_and_local_imports(repo):
+    assert role_state.role_scripts(str(repo), "editor") == ["bundle.py", "helpers.py"]
+    assert role_state.role_scripts(str(repo), "shell") == []
+
+
+def test_fingerprints_change_only_with_the_scripts_a_role_calls(repo):
+    inputs = {"editor": {}, "shell": {}}
+    before = role_state.fingerprints(str(repo), inputs)
+
+    (repo / "scripts" / "graph.py").write_text("print('graph v2')\n")
+    assert role_state.fingerprints(str(repo), inputs) == before
+
+    (repo / "scripts" / "helpers.py").write_text("def pack():\n    return 1\n")
+    after = role_state.fingerprints(str(repo), inputs)
+    assert after["editor"] != before["editor"]
+    assert after["shell"] == before["shell"]
+
+    (repo / "site.yml").write_text("- hosts: localhost\n")
+    assert all(after[role] != new for role, new in role_state.fingerprints(str(repo), inputs).items())
+
+
+def test_fingerprints_include_resolved_inputs(repo):
+    one = role_state.fingerprints(str(repo), {"shell": {"packages": ["zsh"]}})
+    two = role_state.fingerprints(str(repo), {"shell": {"packages": ["zsh", "tmux"]}})
+    assert one["shell"] != two["shell"]
+    assert role_state.fingerprints(str(repo), {"shell": {}}, {"arch": "x86_64"}) != \
+        role_state.fingerprints(str(repo), {"shell": {}}, {"arch": "aarch64"})
+
+
+def test_repo_roles_hash_the_scripts_they_call():
+    assert role_state.role_scripts(REPO_ROOT, "vscode_extensions") == ["vscode_ext_installer.py"]
+    assert role_state.role_scripts(REPO_ROOT, "davinci_resolve") == ["apt_resolver.py"]
+    apt = role_state.role_scripts(REPO_ROOT, "aptPackages")
+    assert {"apt_resolver.py", "artifact_cache.py", "repo_setup.py"} <= set(apt)
+    assert "role_graph.py" not in apt and "package_selector.py" not in apt
@@ -0,0 +1,40 @@
+import json
+
+import selector_bench
+from manifest_index import Item
+from conftest import REPO_ROOT
+
+
+def test_render_bench_diff_writes_less_than_full_redraws():
+    view = {"cats": ["Tools"], "counts": [50], "ids": [f"pkg-{i}" for i in range(50)],
+            "displays": [""] * 50, "details": [""] * 50}
+    report = selector_bench.render_bench(view, "Ubuntu")
+    assert report["diff_bytes"] < report["full_bytes"] / 3
+    assert [i["input"] for i in report["interactions"]] == list(selector_bench.RENDER_BENCH_SCRIPT[:-1])
+    for interaction in report["interactions"]:
+        assert interaction["diff_bytes"] <= interaction["full_bytes"]
+
+
+def test_search_bench_reports_keystroke_timings():
+    base = [Item("Tools", "Git", "git", {"apt": "git"}), Item("Editors", "Neovim", "neovim", {})]
+    report = selector_bench.search_bench(base, min_items=50, queries=("git",))
+    assert report["items"] == 50
+    assert report["keystrokes"] == 3
+    assert report["max_ms"] >= report["mean_ms"] > 0
+
+
+def test_startup_bench_compares_both_paths():
+    report = selector_bench.startup_bench(200, runs=1)
+    assert report["items"] == 200
+    for path in ("dicts", "index"):
+        assert set(report[path]) == {"median_ms", "retained_kib", "peak_kib"}
+
+
+def test_cli(capsys, tmp_path, monkeypatch):
+    monkeypatch.setenv("HOME", str(tmp_path))  # manifest cache
+    packages = f"{REPO_ROOT}/packages.yml"
+    assert selector_bench.main(["search", "--packages-file", packages, "--items", "100",
+                                "--arch", "x86_64"]) == 0
+    assert json.loads(capsys.readouterr().out)["items"] >= 100
+    assert selector_bench.main(["render", "--packages-file", str(tmp_path / "missing.yml")]) == 1
+    assert "cannot read" in capsys.readouterr().err
@@ -0,0 +1,134 @@
+import json
+
+import pytest
+
+import timing_report
+
+
+def start(ts, uuid, task, role="base"):
+    return {"type": "task_start", "ts": ts, "uuid": uuid, "task": task, "role": role}
+
+
+def item(ts, uuid, host, label, status="ok"):
+    return {"type": "item", "ts": ts, "uuid": uuid, "host": host, "item": label, "status": status}
+
+
+def end(ts, uuid, host, status="ok"):
+    return {"type": "task_end", "ts": ts, "uuid": uuid, "host": host, "status": status}
+
+
+def by_task(summary):
+    return {rec["task"]: rec for rec in summary["tasks"]}
+
+
+def by_item(summary):
+    return {(rec["task"], rec["host"], rec["item"]): rec for rec in summary["items"]}
+
+
+def test_linear_run():
+    run = {"playbook": "site.yml", "started": 0.0, "finished": 10.0, "events": [
+        start(0.0, "a", "Install packages"),
+        item(2.0, "a", "h1", "git"), item(5.0, "a", "h1", "vim", "changed"),
+        end(5.0, "a", "h1", "changed"),
+        start(5.0, "b", "Nothing to report", role="shell"),
+        start(6.0, "c", "Configure", role="shell"),
+        end(9.0, "c", "h1"),
+    ]}
+    summary = timing_report.aggregate(run)
+    tasks = by_task(summary)
+    assert tasks["Install packages"]["seconds"] == 5.0
+    assert tasks["Install packages"]["status"] == ["changed"]
+    assert tasks["Nothing to report"]["seconds"] == 1.0  # ends when the next task starts
+    items = by_item(summary)
+    assert items[("Install packages", "h1", "git")]["seconds"] == 2.0
+    assert items[("Install packages", "h1", "vim")]["seconds"] == 3.0
+    roles = {rec["role"]: rec for rec in summary["roles"]}
+    assert roles["base"]["seconds"] == 5.0
+    assert roles["shell"] == {"role": "shell", "tasks": 2, "seconds": 4.0}
+    assert summary["total_s"] == 10.0
+
+
+def test_free_strategy_with_interleaved_hosts():
+    # The free strategy announces each task once per host; results and
+    # announcements from h1 and h2 interleave
+    run = {"started": 0.0, "finished": 9.5, "events": [
+        start(0.0, "a", "Install packages"),
+        start(1.0, "a", "Install packages"),
+        item(2.0, "a", "h1", "git"),
+        item(3.0, "a", "h1", "vim"),
+        end(3.0, "a", "h1"),
+        start(3.1, "b", "Configure"),
+        item(4.0, "a", "h2", "git", "changed"),
+        item(5.0, "a", "h2", "vim"),
+        end(5.0, "a", "h2", "changed"),
+        start(5.1, "b", "Configure"),
+        end(6.0, "b", "h1"),
+        end(9.0, "b", "h2", "failed"),
+    ]}
+    summary = timing_report.aggregate(run)
+    tasks = by_task(summary)
+    assert len(summary["tasks"]) == 2
+    assert tasks["Install packages"]["seconds"] == 5.0
+    assert tasks["Install packages"]["items"] == 4
+    assert tasks["Install packages"]["status"] == ["changed", "ok"]
+    assert tasks["Configure"]["seconds"] == pytest.approx(5.9)
+    assert tasks["Configure"]["status"] == ["failed", "ok"]
+    # h2 starts Configure when it finishes Install packages, not at the first announcement
+    assert tasks["Configure"]["slowest_host"] == {"host": "h2", "seconds": 4.0}
+
+    items = by_item(summary)
+    assert items[("Install packages", "h1", "git")]["seconds"] == 2.0
+    assert items[("Install packages", "h1", "vim")]["seconds"] == 1.0
+    assert items[("Install packages", "h2", "git")]["seconds"] == 4.0
+    assert items[("Install packages", "h2", "git")]["status"] == "changed"
+    assert items[("Install packages", "h2", "vim")]["seconds"] == 1.0
+
+    # Overlapping tasks count once towards the role: 0.0 -> 9.0
+    assert summary["roles"] == [{"role": "base", "tasks": 2, "seconds": 9.0}]
+
+
+def test_repeated_item_labels_on_one_host_add_up():
+    run = {"events": [start(0.0, "a", "Fetch"), item(1.0, "a", "h1", "x"), item(4.0, "a", "h1", "x"),
+                      item(2.0, "a", "h2", "x"), end(4.0, "a", "h1"), end(2.0, "a", "h2")]}
+    items = by_item(timing_report.aggregate(run))
+    assert items[("Fetch", "h1", "x")]["seconds"] == 4.0
+    assert items[("Fetch", "h2", "x")]["seconds"] == 2.0
+
+
+def test_compare_and_summarize_json(tmp_path, capsys):
+    old = {"playbook": "site.yml", "started": 0.0, "finished": 4.0,
+           "events": [start(0.0, "a", "Slow"), end(4.0, "a", "h1")]}
+    new = {"playbook": "site.yml", "started": 0.0, "finished": 1.0,
+           "events": [start(0.0, "z", "Slow"), end(1.0, "z", "h1")]}
+    paths = []
+    for name, run in (("run-1.json", old), ("run-2.json", new)):
+        path = tmp_path / name
+        path.write_text(json.dumps(run))
+        paths.append(str(path))
+
+    assert timing_report.main(["compare", *paths, "--json"]) == 0
+    diff = json.loads(capsys.readouterr().out)
+    assert diff["delta_s"] == -3.0
+    assert diff["tasks"][0]["task"] == "Slow"
+
+    assert timing_report.main(["summarize", paths[0], "--json"]) == 0
+    summary = json.loads(capsys.readouterr().out)
+    assert summary["tasks"][0]["slowest_host"] == {"host": "h1", "seconds": 4.0}
+
+
+def test_merge_runs_keeps_parallel_roles_apart():
+    # Two playbooks ran side by side; each numbered its tasks "a"
+    zsh = {"started": 1.0, "finished": 4.0, "events": [start(1.0, "a", "Install zsh", role="zsh"),
+                                                       end(4.0, "a", "localhost")]}
+    pkgs = {"started": 0.0, "finished": 6.0, "events": [start(0.0, "a", "Install packages", role="pkgs"),
+                                                        end(6.0, "a", "localhost", "changed")]}
+    merged = timing_report.merge_runs({"zsh": zsh, "pkgs": pkgs})
+    assert (merged["playbook"], merged["started"], merged["finished"]) == ("site.yml", 0.0, 6.0)
+    assert [(e["ts"], e["uuid"]) for e in merged["events"]] == [
+        (0.0, "pkgs:a"), (1.0, "zsh:a"), (4.0, "zsh:a"), (6.0, "pkgs:a")]
+    assert zsh["events"][0]["uuid"] == "a"  # the inputs are not modified
+
+    summary = timing_report.aggregate(merged)
+    assert summary["total_s"] == 6.0
+    assert {r["role"]: r["seconds"] for r in summary["roles"]} == {"pkgs": 6.0, "zsh": 3.0}
+    assert by_task(summary)["Install packages"]["status"] == ["changed"]
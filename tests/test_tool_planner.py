@@ -0,0 +1,193 @@
+import json
+import shutil
+import textwrap
+
+import pytest
+
+import tool_planner
+from conftest import fixture_path, write_stub
+
+# One stub serves as npm, gem and ruby (by file name). Installed globals
+# live in npm-ls.json/gem-list.txt next to it, gem executables in gembin/,
+# and installs of specs listed in broken.txt fail.
+TOOL_STUB = textwrap.dedent("""
+    import json, os, sys
+    here = os.path.dirname(os.path.abspath(__file__))
+    me = os.path.basename(sys.argv[0])
+    args = sys.argv[1:]
+    with open(os.path.join(here, "calls.log"), "a") as fh:
+        fh.write(json.dumps([me, *args]) + "\\n")
+    specs = [a for a in args[1:] if not a.startswith("-")]
+    try:
+        with open(os.path.join(here, "broken.txt")) as fh:
+            broken = set(fh.read().split())
+    except OSError:
+        broken = set()
+    if me == "ruby":
+        print(os.path.join(here, "gembin"))
+    elif me == "npm" and args[0] == "ls":
+        with open(os.path.join(here, "npm-ls.json")) as fh:
+            sys.stdout.write(fh.read())
+    elif me == "gem" and args[0] == "list":
+        with open(os.path.join(here, "gem-list.txt")) as fh:
+            sys.stdout.write(fh.read())
+    elif args[0] == "install":
+        if broken & set(specs):
+            sys.exit(1)
+        if me == "npm":
+            with open(os.path.join(here, "npm-ls.json")) as fh:
+                tree = json.load(fh)
+            for item in specs:
+                name, _, version = item[1:].partition("@")
+                tree["dependencies"][item[0] + name] = {"version": version or "1.0.0"}
+            with open(os.path.join(here, "npm-ls.json"), "w") as fh:
+                json.dump(tree, fh)
+        else:
+            for item in specs:
+                name, _, version = item.partition(":")
+                with open(os.path.join(here, "gem-list.txt"), "a") as fh:
+                    fh.write(f"{name} ({version or '1.0.0'})\\n")
+                open(os.path.join(here, "gembin", name), "w").close()
+""")
+
+TOOLS = [
+    {"type": "npm", "package": "typescript", "version": "5.4"},
+    {"type": "npm", "package": "@anthropic-ai/sdk", "version": "0.31"},
+    {"type": "npm", "package": "@google/gemini-cli"},
+    {"type": "npm", "package": "typescript"},
+    {"type": "gem", "package": "rake", "version": "13.0"},
+    {"type": "gem", "package": "colorls", "version": "1.6"},
+    {"type": "gem", "package": "tmuxinator"},
+    {"type": "gem", "package": "lolcat"},
+    {"type": "apt", "package": "ripgrep"},
+]
+
+
+@pytest.fixture
+def tools(tmp_path):
+    for name in ("npm", "gem", "ruby"):
+        write_stub(tmp_path, name, TOOL_STUB)
+    shutil.copy(fixture_path("tools", "npm-ls.json"), tmp_path)
+    shutil.copy(fixture_path("tools", "gem-list.txt"), tmp_path)
+    (tmp_path / "gembin").mkdir()
+    for exe in ("rake", "colorls", "tmuxinator"):
+        (tmp_path / "gembin" / exe).touch()
+    (tmp_path / "links").mkdir()
+    return tmp_path
+
+
+def _run(tmp_path, command, tools=TOOLS, *extra):
+    argv = [command, "--tools-json", json.dumps(tools),
+            "--npm", str(tmp_path / "npm"), "--gem", str(tmp_path / "gem"), *extra]
+    if command == "apply":
+        argv += ["--ruby", str(tmp_path / "ruby"), "--link-dir", str(tmp_path / "links")]
+    return tool_planner.main(argv)
+
+
+def _calls(tmp_path):
+    log = tmp_path / "calls.log"
+    return [json.loads(line) for line in log.read_text().splitlines()] if log.exists() else []
+
+
+def _installs(tmp_path):
+    return [c for c in _calls(tmp_path) if "install" in c]
+
+
+def test_parse_gem_list_keeps_default_versions():
+    with open(fixture_path("tools", "gem-list.txt")) as fh:
+        gems = tool_planner.parse_gem_list(fh.read())
+    assert gems == {
+        "bigdecimal": ["3.1.1"],
+        "bundler": ["2.5.11", "2.4.22"],
+        "colorls": ["1.5.0"],
+        "rake": ["13.1.0", "13.0.6"],
+        "tmuxinator": ["3.1.2"],
+    }
+
+
+def test_plan_matches_pins_by_prefix():
+    snapshots = {"npm": {"typescript": ["5.4.5"], "@anthropic-ai/sdk": ["0.30.1"]},
+                 "gem": {"rake": ["13.1.0", "13.0.6"], "colorls": ["1.5.0"], "tmuxinator": ["3.1.2"]}}
+    result = tool_planner.plan(TOOLS, snapshots)
+    assert result["npm"] == {
+        "present": ["typescript"],
+        "missing": ["@google/gemini-cli"],
+        "outdated": {"@anthropic-ai/sdk": ["0.30.1"]},
+        "install": ["@anthropic-ai/sdk@0.31", "@google/gemini-cli"],
+    }
+    assert result["gem"] == {
+        "present": ["rake", "tmuxinator"],
+        "missing": ["lolcat"],
+        "outdated": {"colorls": ["1.5.0"]},
+        "install": ["colorls:1.6", "lolcat"],
+    }
+    # "5.4" must not match 5.40.x
+    assert not tool_planner.version_matches(["5.40.1"], "5.4")
+
+
+def test_plan_reads_each_manager_once_and_installs_nothing(tools, capsys):
+    assert _run(tools, "plan") == 0
+    result = json.loads(capsys.readouterr().out)
+    assert result["changed"] is False
+    assert result["npm"]["install"] == ["@anthropic-ai/sdk@0.31", "@google/gemini-cli"]
+    assert _calls(tools) == [["npm", "ls", "-g", "--depth=0", "--json"], ["gem", "list", "--local"]]
+
+
+def test_apply_batches_installs_and_links_gems(tools, capsys):
+    assert _run(tools, "apply") == 0
+    result = json.loads(capsys.readouterr().out)
+    assert _installs(tools) == [
+        ["npm", "install", "-g", "--no-audit", "--no-fund", "@anthropic-ai/sdk@0.31", "@google/gemini-cli"],
+        ["gem", "install", "--no-document", "colorls:1.6", "lolcat"],
+    ]
+    assert result["gem"]["installed"] == ["colorls:1.6", "lolcat"]
+    assert result["gem_bindir"] == str(tools / "gembin")
+    assert sorted(result["links"]["created"]) == sorted(
+        str(tools / "links" / exe) for exe in ("rake", "colorls", "tmuxinator", "lolcat"))
+    assert (tools / "links" / "lolcat").resolve() == tools / "gembin" / "lolcat"
+    assert result["changed"] is True
+
+    # Second run: everything is present and linked
+    (tools / "calls.log").unlink()
+    assert _run(tools, "apply") == 0
+    result = json.loads(capsys.readouterr().out)
+    assert _installs(tools) == []
+    assert result["links"]["created"] == []
+    assert len(result["links"]["unchanged"]) == 4
+    assert result["changed"] is False
+
+
+def test_failed_batch_is_retried_one_by_one(tools, capsys):
+    (tools / "broken.txt").write_text("@google/gemini-cli\n")
+    assert _run(tools, "apply") == 1
+    result = json.loads(capsys.readouterr().out)
+    assert [c[5:] for c in _installs(tools) if c[0] == "npm"] == [
+        ["@anthropic-ai/sdk@0.31", "@google/gemini-cli"],
+        ["@anthropic-ai/sdk@0.31"],
+        ["@google/gemini-cli"],
+    ]
+    assert result["npm"]["installed"] == ["@anthropic-ai/sdk@0.31"]
+    assert result["npm"]["failed"] == ["@google/gemini-cli"]
+    assert result["gem"]["failed"] == []
+    assert result["changed"] is True
+
+
+def test_skip_leaves_a_manager_alone(tools, capsys):
+    assert _run(tools, "apply", TOOLS, "--skip", "gem") == 0
+    result = json.loads(capsys.readouterr().out)
+    assert {c[0] for c in _calls(tools)} == {"npm"}
+    assert result["gem"]["install"] == []
+    assert result["gem_bindir"] is None
+
+
+def test_missing_gem_executable_is_reported(tools, capsys):
+    (tools / "gembin" / "tmuxinator").unlink()
+    assert _run(tools, "apply") == 0
+    result = json.loads(capsys.readouterr().out)
+    assert result["links"]["missing"] == [str(tools / "gembin" / "tmuxinator")]
+
+
+def test_unreadable_npm_tree_is_an_error(tools, capsys):
+    (tools / "npm-ls.json").write_text("npm ERR! code ENOENT\n")
+    assert _run(tools, "plan") == 1
+    assert "npm ls printed no JSON" in capsys.readouterr().err
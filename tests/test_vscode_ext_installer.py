@@ -0,0 +1,95 @@
+import json
+import textwrap
+
+import vscode_ext_installer
+from conftest import write_stub
+
+# extensions.json maps ids to versions; ids in broken.txt fail to install
+# and make any batch that contains them fail
+CODE_STUB = textwrap.dedent("""
+    import json, os, sys
+    here = os.path.dirname(os.path.abspath(__file__))
+    state = os.path.join(here, "extensions.json")
+    with open(os.path.join(here, "calls.log"), "a") as fh:
+        fh.write(" ".join(sys.argv[1:]) + "\\n")
+    with open(state) as fh:
+        installed = json.load(fh)
+    with open(os.path.join(here, "broken.txt")) as fh:
+        broken = fh.read().split()
+    if "--list-extensions" in sys.argv:
+        for ext, version in installed.items():
+            print(f"{ext}@{version}")
+        sys.exit(0)
+    args = sys.argv[1:]
+    wanted = [args[i + 1] for i, a in enumerate(args) if a == "--install-extension"]
+    failed = False
+    for spec in wanted:
+        ext, _, version = spec.partition("@")
+        if ext in broken:
+            failed = True
+            continue
+        if ext in installed and version and "--force" not in args:
+            failed = True
+            continue
+        installed[ext] = version or "1.0.0"
+    # The fallback pool runs two of these at once
+    tmp = f"{state}.{os.getpid()}"
+    with open(tmp, "w") as fh:
+        json.dump(installed, fh)
+    os.replace(tmp, state)
+    sys.exit(1 if failed else 0)
+""")
+
+
+def _code(tmp_path, installed=None, broken=()):
+    (tmp_path / "extensions.json").write_text(json.dumps(installed or {}))
+    (tmp_path / "broken.txt").write_text("\n".join(broken))
+    return write_stub(tmp_path, "code", CODE_STUB)
+
+
+def _installs(tmp_path):
+    return [c for c in (tmp_path / "calls.log").read_text().splitlines()
+            if "--install-extension" in c]
+
+
+def test_plan_splits_present_new_and_pinned_upgrades():
+    installed = vscode_ext_installer.parse_installed("golang.go@0.41.0\nRedHat.Ansible@24.1.0\n")
+    present, new, upgrades = vscode_ext_installer.plan(
+        ["golang.go", "redhat.ansible@24.2.0", "ms-python.python", "GOLANG.GO"], installed)
+    assert present == [("golang.go", "0.41.0")]
+    assert new == [("ms-python.python", None)]
+    assert upgrades == [("redhat.ansible", "24.2.0")]
+
+
+def test_missing_extensions_install_in_one_call(tmp_path):
+    code = _code(tmp_path, {"golang.go": "0.41.0"})
+    result = vscode_ext_installer.install(code, ["golang.go", "ms-python.python", "redhat.vscode-yaml"])
+    assert result["changed"] is True
+    assert [r["status"] for r in result["extensions"]] == ["present", "installed", "installed"]
+    assert _installs(tmp_path) == [
+        "--install-extension ms-python.python --install-extension redhat.vscode-yaml"]
+
+
+def test_force_only_for_pinned_version_changes(tmp_path):
+    code = _code(tmp_path, {"redhat.ansible": "24.1.0"})
+    result = vscode_ext_installer.install(code, ["redhat.ansible@24.2.0", "golang.go"])
+    assert {r["id"]: r["status"] for r in result["extensions"]} == {
+        "golang.go": "installed", "redhat.ansible": "upgraded"}
+    assert _installs(tmp_path) == ["--install-extension golang.go",
+                                   "--install-extension redhat.ansible@24.2.0 --force"]
+
+
+def test_failed_batch_falls_back_per_extension(tmp_path, capsys):
+    code = _code(tmp_path, broken=["bad.extension"])
+    rc = vscode_ext_installer.main(["--code", code, "golang.go", "bad.extension"])
+    result = json.loads(capsys.readouterr().out)
+    assert rc == 1
+    assert {r["id"]: r["status"] for r in result["extensions"]} == {
+        "golang.go": "installed", "bad.extension": "failed"}
+    assert len(_installs(tmp_path)) == 3
+
+
+def test_all_present_makes_no_install_call(tmp_path):
+    code = _code(tmp_path, {"golang.go": "0.41.0"})
+    assert vscode_ext_installer.install(code, ["golang.go"])["changed"] is False
+    assert _installs(tmp_path) == []
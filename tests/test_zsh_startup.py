@@ -0,0 +1,121 @@
+import json
+import os
+import textwrap
+
+import pytest
+
+import zsh_startup
+from conftest import fixture_path, write_stub
+
+# Stand-in for zsh: "sources" $ZDOTDIR/.zshrc (else ~/.zshrc), which holds
+# "sleep <ms>" and optionally "exit <code>" lines, and prints the zprof
+# fixture when COMPSETUP_ZPROF=1. Every start is logged to calls.log.
+ZSH_STUB = textwrap.dedent("""
+    import json, os, sys, time
+    here = os.path.dirname(os.path.abspath(__file__))
+    assert sys.argv[1:] == ["-i", "-c", "exit"], sys.argv
+    zshrc = os.path.join(os.environ.get("ZDOTDIR") or os.environ["HOME"], ".zshrc")
+    with open(zshrc) as fh:
+        lines = [line.split() for line in fh if line.strip()]
+    profile = os.environ.get("COMPSETUP_ZPROF") == "1"
+    with open(os.path.join(here, "calls.log"), "a") as fh:
+        fh.write(json.dumps([zshrc, lines[0][1], profile]) + "\\n")
+    for word, value in lines:
+        if word == "sleep":
+            time.sleep(int(value) / 1000)
+        elif word == "exit":
+            print(f"{zshrc}: command not found: p10k")
+            sys.exit(int(value))
+    if profile:
+        with open(os.environ["ZPROF_FIXTURE"]) as fh:
+            sys.stdout.write(fh.read())
+""")
+
+
+@pytest.fixture
+def shell(tmp_path, monkeypatch):
+    home = tmp_path / "home"
+    home.mkdir()
+    (home / ".zshrc").write_text("sleep 5\n")
+    (tmp_path / "slow.zshrc").write_text("sleep 40\n")
+    monkeypatch.setenv("HOME", str(home))
+    monkeypatch.setenv("ZPROF_FIXTURE", fixture_path("zsh", "zprof.txt"))
+    monkeypatch.delenv("ZDOTDIR", raising=False)
+    write_stub(tmp_path, "zsh", ZSH_STUB)
+    return tmp_path
+
+
+def _calls(tmp_path):
+    return [json.loads(line) for line in (tmp_path / "calls.log").read_text().splitlines()]
+
+
+def _main(tmp_path, capsys, *argv):
+    code = zsh_startup.main([*argv, "--zsh", str(tmp_path / "zsh")])
+    out, err = capsys.readouterr()
+    return code, json.loads(out) if code == 0 else err
+
+
+def test_parse_zprof_reads_only_the_first_table():
+    with open(fixture_path("zsh", "zprof.txt")) as fh:
+        text = fh.read()
+    rows = zsh_startup.parse_zprof(text)
+    assert [r["name"] for r in rows] == ["compinit", "_p9k_preinit", "compdef", "_omz_source",
+                                         "is-at-least", "(anon)", "add-zsh-hook"]
+    assert rows[1] == {"calls": 1, "total_ms": 24.18, "self_ms": 19.87, "name": "_p9k_preinit"}
+    assert len(zsh_startup.parse_zprof(text, top=3)) == 3
+    assert zsh_startup.parse_zprof("zsh: zprof not loaded\n") == []
+
+
+def test_summarize():
+    assert zsh_startup.summarize("~/.zshrc", [30.0, 10.0, 20.0, 100.0]) == {
+        "zshrc": "~/.zshrc", "runs": 4, "mean_ms": 40.0, "median_ms": 25.0,
+        "min_ms": 10.0, "max_ms": 100.0}
+
+
+def test_run_times_the_real_zshrc_and_profiles_once(shell, capsys, monkeypatch):
+    # A profile left on in the caller's environment must not leak into timed starts
+    monkeypatch.setenv("COMPSETUP_ZPROF", "1")
+    code, result = _main(shell, capsys, "run", "--runs", "3", "--zprof")
+    assert code == 0
+    assert (result["zshrc"], result["runs"]) == ("~/.zshrc", 3)
+    assert 5 <= result["min_ms"] <= result["median_ms"] <= result["max_ms"]
+    assert result["zprof"][0]["name"] == "compinit"
+    # One warm-up, three timed starts, one profiled start
+    assert [profile for _, _, profile in _calls(shell)] == [False, False, False, False, True]
+
+
+def test_run_with_another_zshrc_uses_a_temporary_zdotdir(shell, capsys):
+    code, result = _main(shell, capsys, "run", "--runs", "2", "--zshrc", str(shell / "slow.zshrc"))
+    assert code == 0
+    assert result["zshrc"] == str(shell / "slow.zshrc") and result["min_ms"] >= 40
+    used = {zshrc for zshrc, _, _ in _calls(shell)}
+    assert len(used) == 1
+    zdotdir = os.path.dirname(used.pop())
+    assert os.path.basename(zdotdir).startswith("compsetup-zsh-")
+    assert not os.path.exists(zdotdir)
+
+
+def test_compare_alternates_before_and_after(shell, capsys):
+    code, result = _main(shell, capsys, "compare", "--before", str(shell / "slow.zshrc"), "--runs", "3")
+    assert code == 0
+    assert result["before"]["zshrc"] == str(shell / "slow.zshrc")
+    assert result["after"]["zshrc"] == "~/.zshrc"
+    assert result["saved_ms"] > 10 and result["speedup"] > 1
+    order = [sleep for _, sleep, _ in _calls(shell)]
+    assert order == ["40", "5"] + ["40", "5"] * 3
+
+
+def test_failed_start_is_an_error(shell, capsys):
+    (shell / "broken.zshrc").write_text("sleep 1\nexit 3\n")
+    code, err = _main(shell, capsys, "run", "--runs", "2", "--zshrc", str(shell / "broken.zshrc"))
+    assert code == 1
+    assert "failed (3)" in err and "command not found: p10k" in err
+    zdotdir = os.path.dirname(_calls(shell)[0][0])
+    assert not os.path.exists(zdotdir)
+
+
+def test_invalid_arguments(shell, capsys):
+    assert zsh_startup.main(["run", "--zsh", str(shell / "no-such-zsh")]) == 1
+    assert "not found" in capsys.readouterr().err
+    assert zsh_startup.main(["run", "--zsh", str(shell / "zsh"), "--runs", "0"]) == 1
+    assert "--runs must be at least 1" in capsys.readouterr().err